@@ -11,6 +11,8 @@ import json
 from supabase import Client
 from typing import Optional
 
+from data_cache import invalidate
+
 # Supabaseクライアントをグローバル変数として宣言（ただし、初期化は後で行う）
 supabase: Optional[Client] = None
 
@@ -55,6 +57,7 @@ def create_announcement(title, content, image_url=None, tournament_info=None, di
             data["tournament_info"] = tournament_info
         
         response = supabase.table("announcements").insert(data).execute()
+        invalidate("announcements")
         return True, "お知らせを作成しました"
     except Exception as e:
         return False, f"エラー: {e}"
@@ -79,6 +82,7 @@ def update_announcement(announcement_id, title=None, content=None, image_url=Non
             data["is_active"] = is_active
         
         response = supabase.table("announcements").update(data).eq("id", announcement_id).execute()
+        invalidate("announcements")
         return True, "お知らせを更新しました"
     except Exception as e:
         return False, f"エラー: {e}"
@@ -89,6 +93,7 @@ def delete_announcement(announcement_id):
         return False, "Supabaseクライアントが初期化されていません。"
     try:
         response = supabase.table("announcements").update({"is_active": False}).eq("id", announcement_id).execute()
+        invalidate("announcements")
         return True, "お知らせを非表示にしました"
     except Exception as e:
         return False, f"エラー: {e}"
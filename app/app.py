@@ -5,7 +5,6 @@ import platform
 import os
 import pandas as pd
 import streamlit as st
-import matplotlib.pyplot as plt
 # japanize_matplotlibの代わりに直接日本語フォントを設定
 import matplotlib
 matplotlib.rcParams['font.family'] = 'MS Gothic'  # Windowsの場合
@@ -15,14 +14,10 @@ matplotlib.rcParams['font.family'] = 'MS Gothic'  # Windowsの場合
 from datetime import datetime
 import pytz
 import json
-from supabase import create_client, Client
-from dotenv import load_dotenv
 import subprocess
 import warnings
 import logging
 import japanize_matplotlib
-from matplotlib.ticker import MaxNLocator
-from typing import Optional
 import re
 
 # 他のモジュールをインポート
@@ -31,6 +26,28 @@ from announcement_management import announcement_management_tab
 from player_management import player_management_tab
 from competition_management import competition_management_tab
 from score_entry import score_entry_page as score_entry_tab
+from data_cache import get_or_load, invalidate
+from supabase_client import (
+    SUPABASE_KEY,
+    SUPABASE_SERVICE_KEY,
+    SUPABASE_URL,
+    get_secret_supabase,
+    get_supabase_admin_client,
+    get_supabase_client,
+    is_supabase_healthy,
+)
+from score_frames import SCORE_COLUMN_LABELS, build_scores_frame
+from data_backend import get_data_backend
+from delta_sync import DATA_SYNC_MODE, sync_rows
+from local_replica import REPLICA_COLUMNS, get_local_replica
+from live_leaderboard import LIVE_LEADERBOARD_INTERVAL_SECONDS, get_score_change_feed
+from player_stats import PLAYER_STATS_COLUMNS, summarize_player_scores, summary_from_stats_row
+from paginated_reader import concat_frames, fetch_all_rows
+from hole_scores import hole_matrix, hole_summary
+from data_grid import PAGE_SIZES, filter_rows, page_count, page_rows, sort_rows
+from chart_backend import get_chart_backend
+from chart_cache import get_chart_cache
+from figure_pool import get_figure_pool
 
 
 
@@ -227,42 +244,12 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# 環境変数の読み込み
-# .envファイルのパスをプロジェクトルートから解決
-dotenv_path = os.path.join(get_project_root(), '.env')
-load_dotenv(dotenv_path=dotenv_path, override=True)
-
-# Supabase接続情報 - Streamlit secrets と環境変数の両方をサポート
-def _get_secret_supabase(*keys: str) -> str:
-    try:
-        supabase_secrets = st.secrets.get("supabase", {})
-        for key in keys:
-            value = supabase_secrets.get(key, "")
-            if isinstance(value, str) and value.strip():
-                return value.strip()
-        return ""
-    except Exception:
-        return ""
-
-
-SUPABASE_URL = _get_secret_supabase("url") or os.getenv("SUPABASE_URL", "").strip()
-SUPABASE_KEY = (
-    _get_secret_supabase("key", "anon_key", "anonKey")
-    or os.getenv("SUPABASE_KEY", "").strip()
-    or os.getenv("SUPABASE_ANON_KEY", "").strip()
-)
-SUPABASE_SERVICE_KEY = (
-    _get_secret_supabase("service_key", "service_role_key", "serviceKey", "serviceRoleKey")
-    or os.getenv("SUPABASE_SERVICE_KEY", "").strip()
-    or os.getenv("SUPABASE_SERVICE_ROLE_KEY", "").strip()
-)
-
 # デバッグ: 環境変数の読み込み確認（開発時のみ）
 if os.getenv("DEBUG_SUPABASE") == "true":
     st.write("DEBUG: SUPABASE_URL =", "SET" if SUPABASE_URL else "NOT SET")
     st.write("DEBUG: SUPABASE_KEY =", "SET" if SUPABASE_KEY else "NOT SET") 
     st.write("DEBUG: SUPABASE_SERVICE_KEY =", "SET" if SUPABASE_SERVICE_KEY else "NOT SET")
-    st.write("DEBUG: from secrets =", _get_secret_supabase("service_key"))
+    st.write("DEBUG: from secrets =", get_secret_supabase("service_key"))
     st.write("DEBUG: from env =", os.getenv("SUPABASE_SERVICE_KEY", "NOT SET"))
 
 # 接続情報が不足している場合の対応
@@ -330,155 +317,220 @@ if "admin_logged_in" not in st.session_state:
 if "page" not in st.session_state:
     st.session_state.page = "login"  # デフォルト：ログイン画面
 
-@st.cache_resource
-def get_supabase_client():
-    """Supabaseクライアントを取得（キャッシュ付き）"""
-    if not SUPABASE_URL or not SUPABASE_KEY:
+def fetch_table_version(table: str):
+    """テーブルのバージョン（件数と最大updated_at）を取得"""
+    backend = get_data_backend()
+    if not backend:
         return None
-    
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-            # 接続テスト
-            test_response = supabase.table("players").select("count").limit(1).execute()
-            return supabase
-        except Exception as e:
-            if attempt == max_retries - 1:
-                st.error(f"Supabase接続エラー（{max_retries}回試行後）: {str(e)}")
-                return None
-            # リトライ前に少し待機
-            import time
-            time.sleep(0.5 * (attempt + 1))
-    return None
-
-@st.cache_resource
-def get_supabase_admin_client() -> Optional[Client]:
-    """管理者（サービスロール）用のSupabaseクライアントを取得（キャッシュ付き）"""
-    if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
+    return backend.table_version(table)
+
+# 画面ごとに必要なカラム（scores_with_players ビューのカラム名）
+# メイン画面（集計・グラフ・過去データ・ベストグロス）は表示用の全カラムを使用
+MAIN_PAGE_SCORE_COLUMNS = tuple(SCORE_COLUMN_LABELS)
+# 競技結果一覧（表彰台・完全順位表・統計）も全カラムを使用
+RESULTS_PAGE_SCORE_COLUMNS = tuple(SCORE_COLUMN_LABELS)
+# 個人成績ダッシュボードは競技IDを使用しない
+STATS_PAGE_SCORE_COLUMNS = tuple(column for column in SCORE_COLUMN_LABELS if column != "competition_id")
+# プレイヤーマスターはデータの有無の確認と名前の参照にのみ使用
+# 差分同期ではすべての画面で1つのスナップショットを共有するため、全画面のカラムをまとめて同期し、画面ごとに絞り込む
+SCORE_SYNC_COLUMNS = tuple(dict.fromkeys(MAIN_PAGE_SCORE_COLUMNS + RESULTS_PAGE_SCORE_COLUMNS + STATS_PAGE_SCORE_COLUMNS))
+PLAYER_NAME_COLUMNS = ("id", "name")
+COMPETITION_COLUMNS = ("competition_id", "date", "course")
+
+def fetch_scores(columns=MAIN_PAGE_SCORE_COLUMNS):
+    """スコアデータを取得（プロセス共有キャッシュ付き）"""
+    columns = tuple(columns)
+    return get_or_load(
+        ("scores", columns), lambda: _load_scores(columns), ("scores", "players"), fetch_table_version
+    )
+
+def fetch_players(columns=PLAYER_NAME_COLUMNS):
+    """プレイヤーデータを取得（プロセス共有キャッシュ付き）"""
+    columns = tuple(columns)
+    return get_or_load(
+        ("players", columns), lambda: _load_players(columns), ("players",), fetch_table_version
+    )
+
+def fetch_competitions(columns=COMPETITION_COLUMNS):
+    """コンペデータを取得（プロセス共有キャッシュ付き）"""
+    columns = tuple(columns)
+    return get_or_load(
+        ("competitions", columns), lambda: _load_competitions(columns), ("competitions",), fetch_table_version
+    )
+
+def fetch_player_stats():
+    """プレイヤーごとの集計（player_stats）を取得（プロセス共有キャッシュ付き）"""
+    return get_or_load(
+        ("player_stats",), _load_player_stats, ("player_stats", "scores", "players"), fetch_table_version
+    )
+
+def _load_player_stats():
+    """player_stats を取得（マイグレーション未適用の場合は空のデータフレーム）"""
+    backend = get_data_backend()
+    if not backend:
+        return pd.DataFrame()
+    try:
+        return backend.fetch_all_frame("player_stats", PLAYER_STATS_COLUMNS, order_key="player_id")
+    except Exception as e:
+        logging.warning(f"player_stats を取得できません（スコアから集計します）: {e}")
+        return pd.DataFrame()
+
+def get_player_summary(player_name, player_data):
+    """プレイヤーの成績サマリーを取得（player_stats の1行を使用し、無い場合はスコア行から集計）"""
+    stats_df = fetch_player_stats()
+    players_df = fetch_players(PLAYER_NAME_COLUMNS)
+    if not stats_df.empty and not players_df.empty:
+        player_ids = players_df.loc[players_df["name"] == player_name, "id"]
+        if len(player_ids) == 1:
+            stats_row = stats_df[stats_df["player_id"] == player_ids.iloc[0]]
+            if not stats_row.empty:
+                return summary_from_stats_row(stats_row.iloc[0].to_dict())
+    return summarize_player_scores(player_data)
+
+def get_analytics_replica():
+    """分析画面用のローカルレプリカを取得（無効な場合、または一度も取得できていない場合はNone）"""
+    replica = get_local_replica()
+    if replica is None:
         return None
     
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            return create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
-        except Exception as e:
-            if attempt == max_retries - 1:
-                st.error(f"Supabase管理者クライアント接続エラー（{max_retries}回試行後）: {str(e)}")
-                return None
-            import time
-            time.sleep(0.5 * (attempt + 1))
-    return None
-
-def fetch_scores():
-    """スコアデータをSupabaseから取得"""
-    supabase = get_supabase_client()
-    if not supabase:
+    def load_rows():
+        backend = get_data_backend()
+        if not backend:
+            raise RuntimeError("データベースに接続できません")
+        if DATA_SYNC_MODE == "delta":
+            return sync_rows(backend, "scores_with_players", REPLICA_COLUMNS, sync_columns=SCORE_SYNC_COLUMNS)
+        return backend.fetch_all_rows("scores_with_players", REPLICA_COLUMNS)
+    
+    def probe_version():
+        # 他のプロセス・管理ツールからの書き込みも検出する
+        return [fetch_table_version(table) for table in ("scores", "players")]
+    
+    return replica if replica.ensure_fresh(load_rows, probe_version) else None
+
+def _load_scores(columns):
+    """スコアデータを取得（プレイヤー名結合済みビューを1回のクエリで取得）"""
+    backend = get_data_backend()
+    if not backend:
         return pd.DataFrame()
     
     try:
-        # スコアデータを取得
-        response = supabase.table("scores").select("*").execute()
+        try:
+            if DATA_SYNC_MODE == "delta":
+                # 全画面で共有するスナップショットに、前回以降の変更分だけを取得して反映し、この画面のカラムに絞り込む
+                rows = sync_rows(backend, "scores_with_players", columns, sync_columns=SCORE_SYNC_COLUMNS)
+                result_df = build_scores_frame(rows, columns)
+            else:
+                # ページごとに整形し、JSONの行データ全体を一度に保持しない
+                result_df = concat_frames(
+                    build_scores_frame(rows, columns)
+                    for rows in backend.iter_pages("scores_with_players", columns)
+                )
+        except Exception as view_error:
+            # ビュー未作成（マイグレーション未適用）の場合は従来どおりクライアント側で結合
+            logging.warning(f"scores_with_players ビューを取得できません: {view_error}")
+            return _load_scores_with_client_join(backend, columns)
         
         # レスポンスの検証
-        if not response.data:
+        if result_df.empty:
             st.warning("スコアデータが空です。データベースに値が存在しないか、RLS設定により取得できない可能性があります。")
             return pd.DataFrame()
         
-        scores = response.data
-        
-        # プレイヤー情報を取得
-        players_response = supabase.table("players").select("*").execute()
-        
-        # プレイヤーレスポンスの検証
-        if not players_response.data:
-            st.warning("プレイヤーデータが空です。データベースに値が存在しないか、RLS設定により取得できない可能性があります。")
-            players = {}
-        else:
-            players = {
-                player["id"]: player["name"]
-                for player in players_response.data
-                if isinstance(player, dict) and "id" in player and "name" in player
-            }
-        
-        # スコアデータを整形
-        scores_list = []
-        for score in scores:
-            if not isinstance(score, dict):
-                continue  # scoreが辞書でない場合はスキップ
-
-            # null/Noneチェックを追加
-            out_score_val = score.get("out_score")
-            out_score = int(out_score_val) if isinstance(out_score_val, (int, str)) and str(out_score_val).isdigit() else 0
-            in_score_val = score.get("in_score")
-            in_score = int(in_score_val) if isinstance(in_score_val, (int, str)) and str(in_score_val).isdigit() else 0
-            
-            # 合計スコアを計算（両方のスコアが有効な場合のみ）
-            if out_score > 0 and in_score > 0:
-                total_score = out_score + in_score
-            else:
-                total_score = None  # 無効な場合はNoneを設定
-            
-            score_dict = {
-                "競技ID": score.get("competition_id"),
-                "日付": score.get("date"),
-                "コース": score.get("course"),
-                "プレイヤー名": players.get(score.get("player_id"), "不明"),
-                "アウトスコア": out_score,
-                "インスコア": in_score,
-                "合計スコア": total_score,
-                "ハンディキャップ": score.get("handicap"),
-                "ネットスコア": score.get("net_score"),
-                "順位": score.get("ranking")
-            }
-            scores_list.append(score_dict)
-        
-        # データフレームに変換
-        result_df = pd.DataFrame(scores_list)
-        
-        # debug用のprint文を削除
-            
         return result_df
     except Exception as e:
         st.error(f"データ取得エラー詳細: {type(e).__name__} - {e}")
         return pd.DataFrame()
 
-def fetch_players():
-    """プレイヤーデータをSupabaseから取得"""
-    supabase = get_supabase_client()
-    if not supabase:
+def fetch_hole_scores(player_name):
+    """プレイヤーのホール別スコアを (ラウンド数, 18) の配列で取得（プロセス共有キャッシュ付き）"""
+    return get_or_load(
+        ("hole_scores", player_name), lambda: _load_hole_scores(player_name), ("scores", "players"), fetch_table_version
+    )
+
+def _load_hole_scores(player_name):
+    """hole_scores 列だけを取得し、入力済みのラウンドを1つの配列にまとめる"""
+    backend = get_data_backend()
+    if not backend:
+        return hole_matrix([])
+    try:
+        rows = backend.fetch_all_rows(
+            "scores_with_players", ("hole_scores",), filters=[("player_name", "eq", player_name)]
+        )
+    except Exception as e:
+        # hole_scores 列が無い（マイグレーション 0011 未適用）環境ではホール別の集計を表示しない
+        logging.warning(f"ホール別スコアを取得できません: {e}")
+        return hole_matrix([])
+    return hole_matrix(row["hole_scores"] for row in rows if row.get("hole_scores"))
+
+def _load_scores_with_client_join(backend, columns):
+    """scores_with_players ビューが無い環境向けに、scoresとplayersを取得してクライアント側で結合"""
+    # ビューで計算しているカラムの代わりに、計算に必要な元のカラムを取得
+    source_columns = [column for column in columns if column not in ("player_name", "gross_score")]
+    source_columns += [column for column in ("player_id", "out_score", "in_score") if column not in source_columns]
+    scores_df = backend.fetch_all_frame("scores", source_columns)
+    
+    # レスポンスの検証
+    if scores_df.empty:
+        st.warning("スコアデータが空です。データベースに値が存在しないか、RLS設定により取得できない可能性があります。")
+        return pd.DataFrame()
+    
+    # プレイヤー情報を取得
+    players_df = backend.fetch_all_frame("players", ("id", "name"))
+    
+    # プレイヤーレスポンスの検証
+    if players_df.empty:
+        st.warning("プレイヤーデータが空です。データベースに値が存在しないか、RLS設定により取得できない可能性があります。")
+        players = pd.Series(dtype=object)
+    else:
+        players = players_df.set_index("id")["name"]
+    
+    scores_df["player_name"] = scores_df["player_id"].map(players)
+    return build_scores_frame(scores_df, columns)
+
+def _load_table_frame(backend, table, columns):
+    """テーブルを取得（差分同期モードではスナップショットに変更分だけを反映）"""
+    if DATA_SYNC_MODE != "delta":
+        return backend.fetch_all_frame(table, columns)
+    rows = sync_rows(backend, table, columns)
+    if not rows:
+        return pd.DataFrame()
+    return pd.DataFrame(rows)[list(columns)]
+
+def _load_players(columns):
+    """プレイヤーデータを取得"""
+    backend = get_data_backend()
+    if not backend:
         return pd.DataFrame()
     
     try:
         # st.info("プレイヤーマスターデータを取得中...") - 表示を削除
-        response = supabase.table("players").select("*").execute()
+        players_df = _load_table_frame(backend, "players", columns)
         
         # レスポンスの検証
-        if not response.data:
+        if players_df.empty:
             st.warning("プレイヤーマスターデータが空です。データベースに値が存在しないか、RLS設定により取得できない可能性があります。")
             return pd.DataFrame()
         
-        # st.success(f"プレイヤーマスターデータ取得成功: {len(response.data)}件") - 表示を削除
-        return pd.DataFrame(response.data)
+        # st.success(f"プレイヤーマスターデータ取得成功: {len(players_df)}件") - 表示を削除
+        return players_df
     except Exception as e:
         st.error(f"プレイヤーデータ取得エラー詳細: {type(e).__name__} - {e}")
         return pd.DataFrame()
 
-def fetch_competitions():
-    """コンペデータをSupabaseから取得"""
-    supabase = get_supabase_client()
-    if not supabase:
+def _load_competitions(columns):
+    """コンペデータを取得"""
+    backend = get_data_backend()
+    if not backend:
         return pd.DataFrame()
     
     try:
-        response = supabase.table("competitions").select("*").execute()
+        competitions_df = _load_table_frame(backend, "competitions", columns)
         
         # レスポンスの検証
-        if not response.data:
+        if competitions_df.empty:
             st.warning("コンペデータが空です。データベースに値が存在しないか、RLS設定により取得できない可能性があります。")
             return pd.DataFrame()
         
-        return pd.DataFrame(response.data)
+        return competitions_df
     except Exception as e:
         st.error(f"コンペデータ取得エラー詳細: {type(e).__name__} - {e}")
         return pd.DataFrame()
@@ -488,54 +540,30 @@ def display_aggregations(scores_df):
     
     st.markdown("### 総合ランキング")
     if "プレイヤー名" in scores_df.columns and "合計スコア" in scores_df.columns:
-        # データのフィルタリングを強化
-        # 合計スコアが0または異常に低い値、または欠損値のデータを除外
-        valid_scores_df = scores_df.dropna(subset=["合計スコア"])
-        valid_scores_df = valid_scores_df[
-            (valid_scores_df["合計スコア"] >= 50) &  # スコアの最小妥当値（通常は50以上が妥当）
-            (valid_scores_df["アウトスコア"] > 0) & 
-            (valid_scores_df["インスコア"] > 0)
-        ]
-        
-        # 平均スコアの計算
-        overall_ranking = valid_scores_df.groupby("プレイヤー名")["合計スコア"].mean().sort_values(ascending=True)
-        
-        # プレイヤー数に基づいてグラフの幅を動的に調整
-        fig_width = max(10, len(overall_ranking) * 0.5)  # 最小幅は10インチ
-        
-        plt.figure(figsize=(fig_width, 8))
-        ax = plt.gca()
-        
-        # 垂直棒グラフに変更（横棒ではなく縦棒）
-        bars = ax.bar(overall_ranking.index, overall_ranking.values, color='skyblue')
-        
-        # グラフのタイトルと軸ラベルを設定
-        plt.title("プレイヤーごとの平均合計スコア (低いほど良い)", fontsize=14, pad=20)
-        plt.ylabel("平均合計スコア", fontsize=12)
-        plt.xlabel("プレイヤー名", fontsize=12)
-        
-        # X軸（プレイヤー名）のフォントサイズと回転を調整
-        plt.xticks(rotation=45, ha='right', fontsize=10)
-        
-        # Y軸（スコア）のフォントサイズと間隔を調整
-        plt.yticks(fontsize=10)
-        
-        # 各バーにスコア値を表示
-        for bar in bars:
-            height = bar.get_height()
-            ax.text(bar.get_x() + bar.get_width()/2, height + 0.5, f'{height:.2f}',
-                    ha='center', va='bottom', fontsize=9)
-        
-        # 表示範囲を調整（値のラベルが見切れないように）
-        if len(overall_ranking) > 0:
-            plt.ylim(0, max(overall_ranking.values) * 1.1)
+        replica = get_analytics_replica()
+        if replica is not None:
+            # ローカルレプリカでは同じ条件での絞り込みと平均をSQLで計算
+            overall_ranking = replica.average_gross_by_player()
+        else:
+            # データのフィルタリングを強化
+            # 合計スコアが0または異常に低い値、または欠損値のデータを除外
+            valid_scores_df = scores_df.dropna(subset=["合計スコア"])
+            valid_scores_df = valid_scores_df[
+                (valid_scores_df["合計スコア"] >= 50) &  # スコアの最小妥当値（通常は50以上が妥当）
+                (valid_scores_df["アウトスコア"] > 0) & 
+                (valid_scores_df["インスコア"] > 0)
+            ]
+            
+            # 平均スコアの計算
+            overall_ranking = valid_scores_df.groupby("プレイヤー名")["合計スコア"].mean().sort_values(ascending=True)
         
-        plt.tight_layout()
-        st.pyplot(plt.gcf())
+        get_chart_backend().render("average_ranking", overall_ranking)
     else:
         st.error("必要なカラムがデータフレームに存在しません。")
 
+@st.fragment
 def display_visualizations(scores_df, players_df):
+    """スコア推移グラフ（プレイヤーの選択ではこの部分だけを再実行）"""
     st.subheader("スコア推移グラフ")
     
     # 必要なカラムを確認
@@ -556,24 +584,24 @@ def display_visualizations(scores_df, players_df):
         return
     
     # スコア推移のプロット
-    plt.figure(figsize=(10, 5))
-    plt.plot(player_scores['日付'], player_scores['合計スコア'], marker='o', linestyle='-')
-    plt.title(f"{selected_player} のスコア推移")
-    plt.xlabel("日付")
-    plt.ylabel("合計スコア")
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    st.pyplot(plt.gcf())
+    trend = player_scores[['日付', '合計スコア']]
+    get_chart_backend().render("score_trend", trend, player=selected_player)
 
 def personal_stats_page():
     """個人成績ダッシュボード"""
     st.title("📊 個人成績ダッシュボード")
     
-    # データ取得
-    scores_df = fetch_scores()
-    players_df = fetch_players()
+    # データ取得（ローカルレプリカがある場合は参加回数の集計と選択したプレイヤーの行だけを読み込む）
+    replica = get_analytics_replica()
+    if replica is not None:
+        player_counts = replica.participation_counts()
+        has_data = not player_counts.empty
+    else:
+        scores_df = fetch_scores(STATS_PAGE_SCORE_COLUMNS)
+        players_df = fetch_players(PLAYER_NAME_COLUMNS)
+        has_data = not scores_df.empty and not players_df.empty
     
-    if scores_df.empty or players_df.empty:
+    if not has_data:
         st.warning("データが取得できません。")
         if st.button("← メイン画面へ"):
             st.session_state.page = "main"
@@ -581,7 +609,8 @@ def personal_stats_page():
         return
     
     # プレイヤー選択（参加回数順にソート）
-    player_counts = scores_df['プレイヤー名'].value_counts()
+    if replica is None:
+        player_counts = scores_df['プレイヤー名'].value_counts()
     players_list = player_counts.index.tolist()
     
     # セッションにプレイヤー名がない場合は最初のプレイヤー（参加回数最多）を設定
@@ -597,7 +626,10 @@ def personal_stats_page():
     st.session_state.selected_player_for_stats = selected_player
     
     # 選択されたプレイヤーのデータをフィルタリング
-    player_data = scores_df[scores_df['プレイヤー名'] == selected_player].copy()
+    if replica is not None:
+        player_data = replica.scores_frame(STATS_PAGE_SCORE_COLUMNS, player_name=selected_player)
+    else:
+        player_data = scores_df[scores_df['プレイヤー名'] == selected_player].copy()
     
     if player_data.empty:
         st.info(f"{selected_player} のデータがありません。")
@@ -613,27 +645,26 @@ def personal_stats_page():
     st.markdown("---")
     st.subheader(f"🎯 {selected_player} の成績サマリー")
     
+    # 集計済みの player_stats を使用（未作成の環境ではスコア行から集計）
+    summary = get_player_summary(selected_player, player_data)
+    
     col1, col2, col3, col4, col5 = st.columns(5)
     
     with col1:
-        participation_count = len(player_data)
+        participation_count = summary.participation_count
         st.metric("参加回数", f"{participation_count}回")
     
     with col2:
-        avg_net = player_data['ネットスコア'].mean()
-        st.metric("平均ネット", f"{avg_net:.1f}")
+        st.metric("平均ネット", f"{summary.avg_net:.1f}")
     
     with col3:
-        avg_gross = player_data['合計スコア'].mean()
-        st.metric("平均グロス", f"{avg_gross:.1f}")
+        st.metric("平均グロス", f"{summary.avg_gross:.1f}")
     
     with col4:
-        best_net = player_data['ネットスコア'].min()
-        st.metric("ベストネット", f"{best_net:.1f}")
+        st.metric("ベストネット", f"{summary.best_net:.1f}")
     
     with col5:
-        best_gross = player_data['合計スコア'].min()
-        st.metric("ベストグロス", f"{best_gross:.0f}")
+        st.metric("ベストグロス", f"{summary.best_gross:.0f}")
     
     # === 改善率 ===
     st.markdown("---")
@@ -724,36 +755,9 @@ def personal_stats_page():
     if len(valid_data) == 0:
         st.error("有効なスコアデータがありません。")
     else:
-        # 折れ線グラフ
-        fig, ax = plt.subplots(figsize=(12, 6))
-        
-        # ネットスコアとグロススコアの推移
-        ax.plot(range(len(valid_data)), valid_data['ネットスコア'], 
-                marker='o', linestyle='-', linewidth=2, markersize=8, 
-                label='ネットスコア', color='#1f77b4')
-        ax.plot(range(len(valid_data)), valid_data['合計スコア'], 
-                marker='s', linestyle='--', linewidth=2, markersize=6, 
-                label='グロススコア', color='#ff7f0e', alpha=0.7)
-        
-        # 平均線を追加（有効なデータの平均）
-        valid_avg_net = valid_data['ネットスコア'].mean()
-        valid_avg_gross = valid_data['合計スコア'].mean()
-        ax.axhline(y=valid_avg_net, color='#1f77b4', linestyle=':', alpha=0.5, label=f'平均ネット ({valid_avg_net:.1f})')
-        ax.axhline(y=valid_avg_gross, color='#ff7f0e', linestyle=':', alpha=0.5, label=f'平均グロス ({valid_avg_gross:.1f})')
-        
-        # 日付ラベル
-        date_labels = [d[:10] for d in valid_data['日付']]
-        ax.set_xticks(range(len(valid_data)))
-        ax.set_xticklabels(date_labels, rotation=45, ha='right')
-        
-        ax.set_xlabel("競技日", fontsize=12)
-        ax.set_ylabel("スコア", fontsize=12)
-        ax.set_title(f"{selected_player} のスコア推移", fontsize=14, fontweight='bold')
-        ax.legend(loc='best')
-        ax.grid(True, alpha=0.3)
-        
-        plt.tight_layout()
-        st.pyplot(fig)
+        # 折れ線グラフ（ネット・グロススコアの推移と平均線）
+        trend = valid_data[['日付', 'ネットスコア', '合計スコア']]
+        get_chart_backend().render("net_gross_trend", trend, player=selected_player)
     
     # === ハンディキャップ履歴 ===
     st.markdown("---")
@@ -762,27 +766,8 @@ def personal_stats_page():
     if len(valid_data) == 0:
         st.error("有効なスコアデータがありません。")
     else:
-        fig2, ax2 = plt.subplots(figsize=(12, 5))
-        ax2.plot(range(len(valid_data)), valid_data['ハンディキャップ'], 
-                marker='D', linestyle='-', linewidth=2, markersize=6, 
-                color='#2ca02c')
-        
-        # 平均HC線
-        avg_hc = valid_data['ハンディキャップ'].mean()
-        ax2.axhline(y=avg_hc, color='#2ca02c', linestyle=':', alpha=0.5, label=f'平均HC ({avg_hc:.1f})')
-        
-        # 日付ラベル（valid_dataから取得）
-        hc_date_labels = [d[:10] for d in valid_data['日付']]
-        ax2.set_xticks(range(len(valid_data)))
-        ax2.set_xticklabels(hc_date_labels, rotation=45, ha='right')
-        ax2.set_xlabel("競技日", fontsize=12)
-        ax2.set_ylabel("ハンディキャップ", fontsize=12)
-        ax2.set_title(f"{selected_player} のハンディキャップ推移", fontsize=14, fontweight='bold')
-        ax2.legend(loc='best')
-        ax2.grid(True, alpha=0.3)
-        
-        plt.tight_layout()
-        st.pyplot(fig2)
+        history = valid_data[['日付', 'ハンディキャップ']]
+        get_chart_backend().render("handicap_history", history, player=selected_player)
     
     # === 最近5回の成績 ===
     st.markdown("---")
@@ -827,8 +812,8 @@ def personal_stats_page():
     
     with col1:
         st.markdown("**🏆 入賞回数**")
-        top3_count = len(player_data[player_data['順位'] <= 3])
-        first_count = len(player_data[player_data['順位'] == 1])
+        top3_count = summary.top3_count
+        first_count = summary.win_count
         st.write(f"- 優勝: {first_count}回")
         st.write(f"- 3位以内: {top3_count}回")
         if participation_count > 0:
@@ -836,17 +821,25 @@ def personal_stats_page():
     
     with col2:
         st.markdown("**📈 スコア分布**")
-        st.write(f"- 最高ネット: {player_data['ネットスコア'].max():.1f}")
-        st.write(f"- 最低ネット: {player_data['ネットスコア'].min():.1f}")
-        st.write(f"- 標準偏差: {player_data['ネットスコア'].std():.2f}")
+        st.write(f"- 最高ネット: {summary.worst_net:.1f}")
+        st.write(f"- 最低ネット: {summary.best_net:.1f}")
+        st.write(f"- 標準偏差: {summary.stddev_net:.2f}")
     
     with col3:
         st.markdown("**⛳ コース別平均**")
-        course_avg = player_data.groupby('コース')['ネットスコア'].mean().sort_values()
+        course_avg = summary.course_net_averages
         if len(course_avg) > 0:
             for course, avg in course_avg.head(3).items():
                 st.write(f"- {course}: {avg:.1f}")
     
+    # === ホール別平均（ホール別スコアを入力したラウンドのみ） ===
+    hole_rounds = fetch_hole_scores(selected_player)
+    if len(hole_rounds) > 0:
+        st.markdown("---")
+        st.subheader("⛳ ホール別平均")
+        st.caption(f"ホール別スコアを入力した {len(hole_rounds)} ラウンドの集計")
+        st.dataframe(hole_summary(hole_rounds).set_index("ホール").T, use_container_width=True)
+    
     # ナビゲーションボタン
     st.markdown("---")
     if st.button("← メイン画面へ", key="back_to_main_from_stats"):
@@ -857,11 +850,24 @@ def competition_results_page():
     """競技結果一覧ページ"""
     st.title("🏆 競技結果一覧")
     
-    # データ取得
-    scores_df = fetch_scores()
-    competitions_df = fetch_competitions()
+    # ライブ速報（ラウンド中のコンペの順位表だけを定期的に更新し、全スコアは読み込まない）
+    if st.sidebar.toggle("📡 ライブ速報", key="live_leaderboard_mode"):
+        live_leaderboard_section()
+        st.markdown("---")
+        if st.button("← メイン画面へ", key="back_to_main_from_live"):
+            st.session_state.page = "main"
+            st.rerun()
+        return
     
-    if scores_df.empty:
+    # データ取得（ローカルレプリカがある場合は絞り込みをSQLで行い、該当する行だけを読み込む）
+    replica = get_analytics_replica()
+    if replica is not None:
+        has_data = bool(replica.years())
+    else:
+        scores_df = fetch_scores(RESULTS_PAGE_SCORE_COLUMNS)
+        has_data = not scores_df.empty
+    
+    if not has_data:
         st.warning("競技結果データがありません。")
         if st.button("← メイン画面へ"):
             st.session_state.page = "main"
@@ -872,7 +878,10 @@ def competition_results_page():
     st.sidebar.header("🔍 フィルター")
     
     # 年別フィルター
-    available_years = sorted(scores_df['日付'].str[:4].unique(), reverse=True)
+    if replica is not None:
+        available_years = sorted(replica.years(), reverse=True)
+    else:
+        available_years = sorted(scores_df['日付'].str[:4].unique(), reverse=True)
     selected_year = st.sidebar.selectbox(
         "年を選択",
         ["全て"] + available_years,
@@ -880,7 +889,9 @@ def competition_results_page():
     )
     
     # 月別フィルター
-    if selected_year != "全て":
+    if replica is not None:
+        available_months = replica.months(selected_year if selected_year != "全て" else None)
+    elif selected_year != "全て":
         filtered_by_year = scores_df[scores_df['日付'].str.startswith(selected_year)]
         available_months = sorted(filtered_by_year['日付'].str[5:7].unique())
         available_months = [m for m in available_months if m]  # 空文字列を除外
@@ -895,7 +906,10 @@ def competition_results_page():
     )
     
     # コース別フィルター
-    available_courses = sorted(scores_df['コース'].unique())
+    if replica is not None:
+        available_courses = replica.courses()
+    else:
+        available_courses = sorted(scores_df['コース'].unique())
     selected_course = st.sidebar.selectbox(
         "コースを選択",
         ["全て"] + available_courses,
@@ -903,16 +917,24 @@ def competition_results_page():
     )
     
     # フィルタリング適用
-    filtered_df = scores_df.copy()
-    
-    if selected_year != "全て":
-        filtered_df = filtered_df[filtered_df['日付'].str.startswith(selected_year)]
-    
-    if selected_month != "全て":
-        filtered_df = filtered_df[filtered_df['日付'].str[5:7] == selected_month]
-    
-    if selected_course != "全て":
-        filtered_df = filtered_df[filtered_df['コース'] == selected_course]
+    if replica is not None:
+        filtered_df = replica.scores_frame(
+            RESULTS_PAGE_SCORE_COLUMNS,
+            year=selected_year if selected_year != "全て" else None,
+            month=selected_month if selected_month != "全て" else None,
+            course=selected_course if selected_course != "全て" else None,
+        )
+    else:
+        filtered_df = scores_df.copy()
+        
+        if selected_year != "全て":
+            filtered_df = filtered_df[filtered_df['日付'].str.startswith(selected_year)]
+        
+        if selected_month != "全て":
+            filtered_df = filtered_df[filtered_df['日付'].str[5:7] == selected_month]
+        
+        if selected_course != "全て":
+            filtered_df = filtered_df[filtered_df['コース'] == selected_course]
     
     # 競技ごとにグループ化
     competitions = filtered_df.groupby('競技ID')
@@ -1015,32 +1037,78 @@ def competition_results_page():
         st.session_state.page = "main"
         st.rerun()
 
+def live_leaderboard_section():
+    """ライブ速報：コンペを選択し、順位表のフラグメントを表示"""
+    competitions_df = fetch_competitions()
+    if competitions_df.empty:
+        st.warning("コンペデータがありません。")
+        return
+    
+    competitions_df = competitions_df.sort_values("date", ascending=False)
+    options = {
+        int(row["competition_id"]): f"{row['date']} {row['course']}（競技ID: {row['competition_id']}）"
+        for _, row in competitions_df.iterrows()
+    }
+    competition_id = st.selectbox(
+        "コンペを選択", list(options), format_func=options.get, key="live_leaderboard_competition"
+    )
+    live_leaderboard_fragment(competition_id)
+
+@st.fragment(run_every=LIVE_LEADERBOARD_INTERVAL_SECONDS)
+def live_leaderboard_fragment(competition_id):
+    """順位表のフラグメント（変更通知を反映したメモリ上の順位表を表示し、この部分だけを再実行）"""
+    feed = get_score_change_feed()
+    if feed is None:
+        st.error("データベースに接続できません。")
+        return
+    
+    try:
+        board = feed.board(competition_id)
+    except Exception as e:
+        handle_error(e, "ライブ速報の取得")
+        return
+    
+    standings = board.standings()
+    if standings.empty:
+        st.info("このコンペのスコアはまだ登録されていません。")
+    else:
+        st.dataframe(
+            standings.style.format({"ハンディ": "{:.1f}", "ネット": "{:.1f}"}, na_rep="-"),
+            use_container_width=True,
+            hide_index=True,
+        )
+    mode = "変更通知" if feed.mode == "listen" else "更新確認"
+    st.caption(f"🔄 {LIVE_LEADERBOARD_INTERVAL_SECONDS:g}秒ごとに自動更新（{mode}） 最終更新: {datetime.now(pytz.timezone('Asia/Tokyo')).strftime('%H:%M:%S')}")
+
+@st.fragment
 def display_winner_count_ranking(scores_df):
+    """優勝回数ランキング（ランキングの種類・年度の選択ではこの部分だけを再実行）"""
     st.subheader("優勝回数ランキング")
 
     ranking_type = st.radio("ランキングの種類を選択してください:", ["トータルランキング", "年度ランキング"])
+    replica = get_analytics_replica()
 
+    year = None
     if ranking_type == "年度ランキング":
-        available_years = scores_df['日付'].str[:4].unique()
+        available_years = replica.years() if replica is not None else scores_df['日付'].str[:4].unique()
         year = st.selectbox("表示する年度を選択してください:", sorted(available_years))
-        scores_df = scores_df[scores_df['日付'].str.startswith(year)]
+        if replica is None:
+            scores_df = scores_df[scores_df['日付'].str.startswith(year)]
 
-    rank_one_winners = scores_df[scores_df['順位'] == 1].groupby('プレイヤー名').size().reset_index(name='優勝回数')
-    rank_one_winners = rank_one_winners.sort_values(by='優勝回数', ascending=False).reset_index(drop=True)
+    if replica is not None:
+        # ローカルレプリカでは優勝者の抽出と集計をSQLで行う
+        rank_one_winners = replica.winner_counts(year)
+    else:
+        rank_one_winners = scores_df[scores_df['順位'] == 1].groupby('プレイヤー名').size().reset_index(name='優勝回数')
+        rank_one_winners = rank_one_winners.sort_values(by='優勝回数', ascending=False).reset_index(drop=True)
     rank_one_winners.index += 1
     rank_one_winners.index.name = '順位'
 
     st.dataframe(rank_one_winners, use_container_width=True)
     
     # グラフ表示
-    fig, ax = plt.subplots(figsize=(10, 6))
-    ax.bar(rank_one_winners['プレイヤー名'], rank_one_winners['優勝回数'], color='skyblue')
-    ax.set_ylabel("優勝回数")
-    ax.set_title("優勝回数ランキング")
-    ax.set_xticks(range(len(rank_one_winners['プレイヤー名'])))
-    ax.set_xticklabels(rank_one_winners['プレイヤー名'], rotation=45, ha='right')
-    ax.yaxis.set_major_locator(MaxNLocator(integer=True))
-    st.pyplot(fig)
+    winners = rank_one_winners[['プレイヤー名', '優勝回数']]
+    get_chart_backend().render("winner_counts", winners)
 
 
 def backup_database():
@@ -1061,18 +1129,19 @@ def backup_database():
     
     try:
         # 各テーブルのデータを取得
-        competitions_response = supabase.table("competitions").select("*").execute()
-        players_response = supabase.table("players").select("*").execute()
-        scores_response = supabase.table("scores").select("*").execute()
+        backend = get_data_backend()
+        competitions_data = backend.fetch_all_rows("competitions")
+        players_data = backend.fetch_all_rows("players")
+        scores_data = backend.fetch_all_rows("scores")
         
         # バックアップデータを準備
         backup_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         backup_id = datetime.now().strftime('%Y%m%d_%H%M%S')
         
         backup_data = {
-            "competitions": competitions_response.data,
-            "players": players_response.data,
-            "scores": scores_response.data,
+            "competitions": competitions_data,
+            "players": players_data,
+            "scores": scores_data,
             "backup_date": backup_date
         }
         
@@ -1191,7 +1260,8 @@ def restore_database():
             # バックアップの存在確認
             try:
                 # テーブルの構造に関係なく、まずバックアップの存在確認のみ実行
-                count_response = supabase.table("backups").select("*", count="exact").execute() # type: ignore
+                # 件数のみ必要なため、バックアップ本体（data）は取得しない
+                count_response = supabase.table("backups").select("id", count="exact").limit(1).execute() # type: ignore
                 
                 # バックアップカウント表示（デバッグ用）
                 backup_count = count_response.count
@@ -1199,8 +1269,10 @@ def restore_database():
                 st.success(f"バックアップが見つかりました: {backup_count}件")
                 
                 # backupsテーブルからバックアップ一覧を取得
-                response = supabase.table("backups").select("id, backup_id, backup_date").order('backup_date', desc=True).execute()
-                backups = response.data
+                backups = fetch_all_rows(
+                    supabase, "backups", "id, backup_id, backup_date",
+                    modify=lambda query: query.order('backup_date', desc=True),
+                )
                 
                 if not backups:
                     st.warning("Supabaseバックアップテーブルにバックアップが見つかりません。")
@@ -1288,24 +1360,23 @@ CREATE POLICY "管理者のみbackupsテーブルにアクセス可能" ON backu
 def perform_restore(backup_data):
     """実際のリストア処理を実行する共通関数"""
     supabase = get_supabase_client()
-    if not supabase:
+    backend = get_data_backend()
+    if not supabase or not backend:
         return
     
-    # 既存のデータを削除
-    supabase.table("scores").delete().execute()
-    supabase.table("competitions").delete().execute()
-    supabase.table("players").delete().execute()
-    
-    # データを復元
-    supabase.table("competitions").insert(backup_data["competitions"]).execute()
-    supabase.table("players").insert(backup_data["players"]).execute()
-    
-    # スコアデータは量が多い可能性があるのでチャンクに分ける
-    scores = backup_data["scores"]
-    chunk_size = 100
-    for i in range(0, len(scores), chunk_size):
-        chunk = scores[i:i+chunk_size]
-        supabase.table("scores").insert(chunk).execute()
+    try:
+        # 既存のデータを削除
+        supabase.table("scores").delete().execute()
+        supabase.table("competitions").delete().execute()
+        supabase.table("players").delete().execute()
+        
+        # データを復元（直接接続の場合はバイナリCOPY、REST APIの場合はチャンクに分けて一括挿入）
+        backend.insert_rows("competitions", backup_data["competitions"])
+        backend.insert_rows("players", backup_data["players"])
+        backend.insert_rows("scores", backup_data["scores"])
+    finally:
+        # 全テーブルが置き換わるため、途中で失敗した場合も含めてキャッシュをすべて破棄
+        invalidate()
 
 def login_page():
     st.title("88会ログイン")
@@ -1336,20 +1407,27 @@ def admin_login_page():
         else:
             st.error("パスワードが間違っています")
 
-def main_app():
-    st.title("88会ゴルフコンペ・スコア管理システム")
-    
-    # お知らせをデータベースから取得して表示
+def _load_active_announcement():
+    """表示中のお知らせ（display_order が最大の1件）を取得"""
+    supabase_client = get_supabase_client()
+    if not supabase_client:
+        raise RuntimeError("データベースに接続できません")
+    response = supabase_client.table("announcements").select("title, content, image_url, tournament_info").eq("is_active", True).order("display_order", desc=True).limit(1).execute()
+    # お知らせが無い場合も結果をキャッシュするため、辞書に包んで返す
+    return {"announcement": response.data[0] if response.data else None}
+
+def fetch_active_announcement():
+    """表示中のお知らせを取得（プロセス共有キャッシュ付き）"""
+    return get_or_load(
+        ("announcements", "active"), _load_active_announcement, ("announcements",), fetch_table_version
+    )
+
+def display_announcement():
+    """お知らせ（無い場合・取得できない場合は既定の大会案内）を表示"""
     try:
-        supabase_client = get_supabase_client()
-        announcements_response = None
+        announcement = fetch_active_announcement()["announcement"]
         
-        if supabase_client:
-            announcements_response = supabase_client.table("announcements").select("*").eq("is_active", True).order("display_order", desc=True).limit(1).execute()
-        
-        if announcements_response and announcements_response.data and len(announcements_response.data) > 0:
-            announcement = announcements_response.data[0]
-            
+        if announcement:
             # タイトル表示
             st.markdown(f"### 🏌️ {announcement.get('title', 'お知らせ')}")
             
@@ -1425,102 +1503,179 @@ def main_app():
 💰 **費用**: 18,000+昼食（少し引いてくれるかも）  
 👔 **幹事**: 吉井.福澤
     """)
+
+def lazy_section(label, key):
+    """開いたときだけ中身を描画する折りたたみ（コンテナと開いているかどうかを返す）
+
+    開閉でアプリを再実行し、閉じている間は中身を計算・送信しない。
+    開閉状態を取得できない古い Streamlit ではトグルで切り替える。
+    """
+    try:
+        section = st.expander(label, key=key, on_change="rerun")
+        return section, bool(section.open)
+    except TypeError:
+        return st.container(), st.toggle(label, key=key)
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def prepare_past_data(scores_df):
+    """過去データ（競技ID・順位順、順位を先頭に）を作成"""
+    past_data_df = scores_df.sort_values(by=["競技ID", "順位"], ascending=[True, True])
+    past_data_df = past_data_df.reset_index()
+    columns_order = ["順位"] + [col for col in past_data_df.columns if col != "順位" and col != "index"] + ["index"]
+    return past_data_df[columns_order]
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def best_gross_scores(scores_df, unique_players):
+    """ベストグロススコアトップ10（unique_players の場合は各プレイヤーの最高スコアのみ）"""
+    # 競技IDが41でないデータのみを対象にする
+    filtered_scores_df = scores_df[scores_df["競技ID"] != 41]
+    
+    # 競技IDが100未満のデータのみを対象にする（要件に基づく）
+    filtered_scores_df = filtered_scores_df[filtered_scores_df["競技ID"] < 100]
+    
+    # 合計スコアが0または欠損値のデータを除外する
+    filtered_scores_df = filtered_scores_df[
+        (filtered_scores_df["合計スコア"] > 0) & 
+        (~filtered_scores_df["合計スコア"].isna()) &
+        (filtered_scores_df["アウトスコア"] > 0) & 
+        (~filtered_scores_df["アウトスコア"].isna()) &
+        (filtered_scores_df["インスコア"] > 0) & 
+        (~filtered_scores_df["インスコア"].isna())
+    ]
     
-    # Supabaseからデータを取得
-    scores_df = fetch_scores()
-    players_df = fetch_players()
+    # 合計スコアが0以上のデータのみを対象にする（不正なデータの除外）
+    filtered_scores_df = filtered_scores_df[filtered_scores_df["合計スコア"] > 0]
     
-    if not scores_df.empty and not players_df.empty:
-        display_aggregations(scores_df)
-        display_visualizations(scores_df, players_df)
-        display_winner_count_ranking(scores_df)
-        
-        # 過去データを準備
-        past_data_df = scores_df.sort_values(by=["競技ID", "順位"], ascending=[True, True])
-        past_data_df = past_data_df.reset_index()
-        columns_order = ["順位"] + [col for col in past_data_df.columns if col != "順位" and col != "index"] + ["index"]
-        past_data_df = past_data_df[columns_order]
-        
-        st.subheader("過去データ")
-        # 過去データのフォーマットを適用
-        st.dataframe(
-            past_data_df.style.format({
-                "ハンディキャップ": "{:.2f}", 
-                "ネットスコア": "{:.2f}",
-                "アウトスコア": "{:.0f}",
-                "インスコア": "{:.0f}",
-                "合計スコア": "{:.0f}",
-                "順位": "{:.0f}",
-                "競技ID": "{:.0f}"
-            }), 
-            use_container_width=True
+    # 表示方法に応じたデータ処理
+    if unique_players:
+        # 各プレイヤーのベストスコア（最小の合計スコア）を取得
+        best_player_scores = filtered_scores_df.groupby("プレイヤー名")["合計スコア"].min().reset_index()
+    
+        # プレイヤーごとのベストスコアを合計スコアでソート（昇順）し、トップ10を取得
+        top_player_scores = best_player_scores.sort_values(by="合計スコア").head(10).reset_index(drop=True)
+    
+        # 各ベストスコアの詳細情報を取得
+        best_scores_with_details = []
+        for _, row in top_player_scores.iterrows():
+            player_name = row["プレイヤー名"]
+            best_score = row["合計スコア"]
+    
+            # 該当プレイヤーの該当スコアの詳細データを検索（最初の一致を使用）
+            player_best_score_records = filtered_scores_df[
+                (filtered_scores_df["プレイヤー名"] == player_name) & 
+                (filtered_scores_df["合計スコア"] == best_score)
+            ]
+    
+            if not player_best_score_records.empty:
+                best_scores_with_details.append(player_best_score_records.iloc[0].to_dict())
+    
+        # データフレームに変換し、インデックスを1から始める連番に設定
+        if best_scores_with_details:
+            best_gross_scores_detailed = pd.DataFrame(best_scores_with_details).reset_index(drop=True)
+            best_gross_scores_detailed.index += 1
+            best_gross_scores_detailed.index.name = '順位'
+        else:
+            best_gross_scores_detailed = pd.DataFrame()
+    else:
+        # 純粋なトップ10（同じプレイヤーが複数回登場する可能性あり）
+        # 合計スコアで昇順ソートし、純粋にトップ10のスコアを取得
+        best_gross_scores_detailed = filtered_scores_df.sort_values(by="合計スコア").head(10).reset_index(drop=True)
+        best_gross_scores_detailed.index += 1
+        best_gross_scores_detailed.index.name = '順位'
+    return best_gross_scores_detailed
+
+# 過去データの数値の表示形式（column_config で指定し、ブラウザ側で整形する）
+PAST_DATA_NUMBER_FORMATS = {
+    "ハンディキャップ": "%.2f",
+    "ネットスコア": "%.2f",
+    "アウトスコア": "%d",
+    "インスコア": "%d",
+    "合計スコア": "%d",
+    "順位": "%d",
+    "競技ID": "%d",
+}
+PAST_DATA_ALL = "すべて"
+PAST_DATA_DEFAULT_ORDER = "標準（競技ID・順位）"
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def query_past_data(scores_df, player, course, sort_column, ascending):
+    """過去データを絞り込み・並べ替えた結果（条件ごとにキャッシュ）"""
+    past_data_df = filter_rows(prepare_past_data(scores_df), {"プレイヤー名": player, "コース": course})
+    return sort_rows(past_data_df, sort_column, ascending)
+
+def _reset_past_data_page():
+    st.session_state.past_data_page = 1
+
+@st.fragment
+def past_data_section(scores_df):
+    """過去データ（開いたときだけ表示し、開閉・絞り込み・ページ送りではこの部分だけを再実行）
+
+    絞り込み・並べ替え・ページ分割はサーバー側で行い、表示中のページの行だけを送る。
+    """
+    section, opened = lazy_section("📋 過去データ", key="main_past_data_open")
+    if not opened:
+        return
+    with section:
+        players = sorted(scores_df["プレイヤー名"].dropna().unique()) if "プレイヤー名" in scores_df.columns else []
+        courses = sorted(scores_df["コース"].dropna().unique()) if "コース" in scores_df.columns else []
+        col1, col2, col3, col4 = st.columns([2, 2, 2, 1])
+        with col1:
+            player = st.selectbox("プレイヤー", [PAST_DATA_ALL] + players, key="past_data_player", on_change=_reset_past_data_page)
+        with col2:
+            course = st.selectbox("コース", [PAST_DATA_ALL] + courses, key="past_data_course", on_change=_reset_past_data_page)
+        with col3:
+            sort_column = st.selectbox(
+                "並び替え", [PAST_DATA_DEFAULT_ORDER] + list(scores_df.columns),
+                key="past_data_sort", on_change=_reset_past_data_page,
+            )
+        with col4:
+            descending = st.toggle("降順", key="past_data_descending", on_change=_reset_past_data_page)
+
+        past_data_df = query_past_data(
+            scores_df,
+            None if player == PAST_DATA_ALL else player,
+            None if course == PAST_DATA_ALL else course,
+            None if sort_column == PAST_DATA_DEFAULT_ORDER else sort_column,
+            not descending,
         )
-        
-        # ベストグロススコアトップ10を準備
-        st.subheader("ベストグロススコアトップ10")
-        
+
+        col1, col2, _ = st.columns([1, 1, 2])
+        with col1:
+            page_size = st.selectbox("表示件数", PAGE_SIZES, key="past_data_page_size", on_change=_reset_past_data_page)
+        pages = page_count(len(past_data_df), page_size)
+        # 絞り込みでページ数が減った場合は最後のページを表示
+        if st.session_state.get("past_data_page", 1) > pages:
+            st.session_state.past_data_page = pages
+        with col2:
+            page = st.number_input(f"ページ（全{pages}ページ）", min_value=1, max_value=pages, step=1, key="past_data_page")
+
+        page_df = page_rows(past_data_df, page, page_size)
+        column_config = {
+            column: st.column_config.NumberColumn(column, format=number_format)
+            for column, number_format in PAST_DATA_NUMBER_FORMATS.items()
+            if column in page_df.columns
+        }
+        st.dataframe(page_df, column_config=column_config, use_container_width=True, hide_index=True)
+        if len(past_data_df):
+            start = (min(page, pages) - 1) * page_size
+            st.caption(f"全{len(past_data_df)}件中 {start + 1}〜{start + len(page_df)}件目を表示")
+        else:
+            st.caption("条件に一致するデータがありません。")
+
+@st.fragment
+def best_gross_section(scores_df):
+    """ベストグロススコアトップ10（表示方法の選択ではこの部分だけを再実行）"""
+    section, opened = lazy_section("🏅 ベストグロススコアトップ10", key="main_best_gross_open")
+    if not opened:
+        return
+    with section:
         # 表示方法の選択（ユニークユーザーか純粋なトップ10か）
         display_mode = st.radio(
             "表示方法を選択してください：",
             ["ユニークユーザー（各プレイヤーの最高スコアのみ表示）", "純粋なトップ10（同じプレイヤーが複数回登場する可能性あり）"],
             key="best_score_display_mode"
         )
-        
-        # 競技IDが41でないデータのみを対象にする
-        filtered_scores_df = scores_df[scores_df["競技ID"] != 41]
-        
-        # 競技IDが100未満のデータのみを対象にする（要件に基づく）
-        filtered_scores_df = filtered_scores_df[filtered_scores_df["競技ID"] < 100]
-        
-        # 合計スコアが0または欠損値のデータを除外する
-        filtered_scores_df = filtered_scores_df[
-            (filtered_scores_df["合計スコア"] > 0) & 
-            (~filtered_scores_df["合計スコア"].isna()) &
-            (filtered_scores_df["アウトスコア"] > 0) & 
-            (~filtered_scores_df["アウトスコア"].isna()) &
-            (filtered_scores_df["インスコア"] > 0) & 
-            (~filtered_scores_df["インスコア"].isna())
-        ]
-        
-        # 合計スコアが0以上のデータのみを対象にする（不正なデータの除外）
-        filtered_scores_df = filtered_scores_df[filtered_scores_df["合計スコア"] > 0]
-        
-        # 表示方法に応じたデータ処理
-        if display_mode.startswith("ユニークユーザー"):
-            # 各プレイヤーのベストスコア（最小の合計スコア）を取得
-            best_player_scores = filtered_scores_df.groupby("プレイヤー名")["合計スコア"].min().reset_index()
-            
-            # プレイヤーごとのベストスコアを合計スコアでソート（昇順）し、トップ10を取得
-            best_gross_scores = best_player_scores.sort_values(by="合計スコア").head(10).reset_index(drop=True)
-            
-            # 各ベストスコアの詳細情報を取得
-            best_scores_with_details = []
-            for _, row in best_gross_scores.iterrows():
-                player_name = row["プレイヤー名"]
-                best_score = row["合計スコア"]
-                
-                # 該当プレイヤーの該当スコアの詳細データを検索（最初の一致を使用）
-                player_best_score_records = filtered_scores_df[
-                    (filtered_scores_df["プレイヤー名"] == player_name) & 
-                    (filtered_scores_df["合計スコア"] == best_score)
-                ]
-                
-                if not player_best_score_records.empty:
-                    best_scores_with_details.append(player_best_score_records.iloc[0].to_dict())
-            
-            # データフレームに変換し、インデックスを1から始める連番に設定
-            if best_scores_with_details:
-                best_gross_scores_detailed = pd.DataFrame(best_scores_with_details).reset_index(drop=True)
-                best_gross_scores_detailed.index += 1
-                best_gross_scores_detailed.index.name = '順位'
-            else:
-                best_gross_scores_detailed = pd.DataFrame()
-        else:
-            # 純粋なトップ10（同じプレイヤーが複数回登場する可能性あり）
-            # 合計スコアで昇順ソートし、純粋にトップ10のスコアを取得
-            best_gross_scores_detailed = filtered_scores_df.sort_values(by="合計スコア").head(10).reset_index(drop=True)
-            best_gross_scores_detailed.index += 1
-            best_gross_scores_detailed.index.name = '順位'
+        best_gross_scores_detailed = best_gross_scores(scores_df, display_mode.startswith("ユニークユーザー"))
         
         # 結果の表示
         if not best_gross_scores_detailed.empty:
@@ -1539,6 +1694,29 @@ def main_app():
             )
         else:
             st.warning("有効なスコアデータが見つかりませんでした。")
+
+def main_app():
+    st.title("88会ゴルフコンペ・スコア管理システム")
+    
+    if not is_supabase_healthy():
+        st.warning("⚠️ データベースへの接続が不安定です。表示中のデータが最新でない可能性があります。")
+    
+    # お知らせをデータベースから取得して表示
+    display_announcement()
+    
+    # Supabaseからデータを取得
+    scores_df = fetch_scores(MAIN_PAGE_SCORE_COLUMNS)
+    players_df = fetch_players(PLAYER_NAME_COLUMNS)
+    
+    if not scores_df.empty and not players_df.empty:
+        display_aggregations(scores_df)
+        display_visualizations(scores_df, players_df)
+        display_winner_count_ranking(scores_df)
+        
+        # 画面の下の方の表は開いたときだけ表示する
+        st.subheader("過去データ・ベストスコア")
+        past_data_section(scores_df)
+        best_gross_section(scores_df)
         
         # 最終更新日時を表示
         st.subheader("最終更新日時")
@@ -1578,6 +1756,37 @@ def main_app():
                 del st.session_state.score_data
             st.rerun()
 
+def server_status_tab():
+    """このサーバープロセスの描画用の図とグラフ画像キャッシュの状態（長時間稼働でメモリが増えていないかの確認用）"""
+    st.subheader("描画用の図（matplotlib）")
+    pool = get_figure_pool()
+    figures = pool.stats()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("使用中", f"{figures.live} / {pool.size}")
+    with col2:
+        st.metric("最大同時使用", figures.peak)
+    with col3:
+        st.metric("作成 / 破棄", f"{figures.created} / {figures.disposed}")
+    with col4:
+        st.metric("未解放", figures.unreleased)
+    if figures.pyplot_figures:
+        st.warning(f"pyplot の管理下に図が {figures.pyplot_figures} 枚残っています（pyplot を使う描画処理があります）")
+
+    st.subheader("グラフ画像のキャッシュ")
+    charts = get_chart_cache().stats()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("画像数", charts.entries)
+    with col2:
+        st.metric("サイズ", f"{charts.bytes / 1024 / 1024:.1f} MB")
+    with col3:
+        st.metric("ヒット / ミス", f"{charts.hits} / {charts.misses}")
+    st.caption("値はこのサーバープロセスの起動後の累計です（未解放は破棄後もメモリに残っている図の数）")
+    if st.button("更新", key="server_status_refresh"):
+        st.rerun()
+
+
 def admin_app():
     """管理者向けアプリ"""
     st.title("ゴルフコンペ管理 - 管理者モード")
@@ -1604,7 +1813,7 @@ def admin_app():
         st.info("💡 ヒント: 環境変数 SUPABASE_SERVICE_KEY が正しく設定されているか確認してください。")
         return
 
-    tab_titles = ["お知らせ管理", "プレイヤー管理", "コンペ設定", "スコア入力", "バックアップ", "リストア"]
+    tab_titles = ["お知らせ管理", "プレイヤー管理", "コンペ設定", "スコア入力", "バックアップ", "リストア", "サーバー状態"]
     tabs = st.tabs(tab_titles)
 
     with tabs[0]:
@@ -1628,6 +1837,9 @@ def admin_app():
         st.subheader("データベースのリストア")
         restore_database()
 
+    with tabs[6]:
+        server_status_tab()
+
 
 def login_app():
     """ログイン画面"""
@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""
+グラフ描画バックエンド
+画面のグラフ（平均スコアランキング・スコア推移・ハンディキャップ推移・優勝回数ランキング）を、描画方式に依存しない形で提供する
+
+- AltairChartBackend: Vega-Lite の仕様（JSON）だけを送り、ブラウザで描画する
+- PlotlyChartBackend: Plotly の図（JSON）を送り、ブラウザで描画する
+- MatplotlibChartBackend: 従来どおりサーバーで matplotlib の画像を描画（chart_cache で描画済みの画像を共有）
+
+環境変数 CHART_BACKEND（altair / plotly / matplotlib）で選択する（既定は altair）
+"""
+
+import logging
+import os
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Mapping, Optional
+
+import pandas as pd
+import streamlit as st
+
+CHART_BACKEND = os.getenv("CHART_BACKEND", "altair").strip().lower()
+
+# グラフの種類（chart_cache のキーにも使う）と入力データ
+# average_ranking: プレイヤー名 → 平均合計スコア の Series
+# score_trend: 日付, 合計スコア
+# net_gross_trend: 日付, ネットスコア, 合計スコア
+# handicap_history: 日付, ハンディキャップ
+# winner_counts: プレイヤー名, 優勝回数
+CHART_KINDS = ("average_ranking", "score_trend", "net_gross_trend", "handicap_history", "winner_counts")
+
+NET_COLOR = "#1f77b4"
+GROSS_COLOR = "#ff7f0e"
+HANDICAP_COLOR = "#2ca02c"
+BAR_COLOR = "skyblue"
+
+
+def _date_labels(dates: pd.Series) -> pd.Series:
+    return dates.astype(str).str[:10]
+
+
+class ChartBackend(ABC):
+    """グラフ描画バックエンドの共通インターフェース"""
+
+    name = ""
+
+    @abstractmethod
+    def build(self, kind: str, data: Any, **options: Any) -> Any:
+        """グラフを作成（画面に渡すオブジェクトを返す）"""
+
+    @abstractmethod
+    def show(self, chart: Any) -> None:
+        """build() で作成したグラフを画面に表示"""
+
+    def render(self, kind: str, data: Any, **options: Any) -> None:
+        """グラフを作成して表示"""
+        if kind not in CHART_KINDS:
+            raise ValueError(f"未対応のグラフです: {kind}")
+        self.show(self.build(kind, data, **options))
+
+
+class MatplotlibChartBackend(ChartBackend):
+    """サーバーで matplotlib の画像を描画するバックエンド（描画済みの画像はプロセス全体で共有）"""
+
+    name = "matplotlib"
+
+    def build(self, kind: str, data: Any, **options: Any) -> bytes:
+        import charts
+        from chart_cache import render_chart
+
+        return render_chart(kind, data, getattr(charts, f"draw_{kind}"), options)
+
+    def show(self, chart: bytes) -> None:
+        st.image(chart, use_container_width=True)
+
+
+class AltairChartBackend(ChartBackend):
+    """Vega-Lite の仕様を送り、ブラウザで描画するバックエンド"""
+
+    name = "altair"
+
+    def build(self, kind: str, data: Any, **options: Any):
+        return getattr(self, f"_{kind}")(data, **options)
+
+    def show(self, chart) -> None:
+        st.altair_chart(chart, use_container_width=True)
+
+    @staticmethod
+    def _average_ranking(overall_ranking: pd.Series):
+        import altair as alt
+
+        frame = pd.DataFrame({"プレイヤー名": overall_ranking.index.astype(str), "平均合計スコア": overall_ranking.to_numpy()})
+        base = alt.Chart(frame, title="プレイヤーごとの平均合計スコア (低いほど良い)").encode(
+            x=alt.X("プレイヤー名:N", sort=None, axis=alt.Axis(labelAngle=-45)),
+            y=alt.Y("平均合計スコア:Q"),
+            tooltip=["プレイヤー名", alt.Tooltip("平均合計スコア:Q", format=".2f")],
+        )
+        labels = base.mark_text(dy=-6, fontSize=9).encode(text=alt.Text("平均合計スコア:Q", format=".2f"))
+        return (base.mark_bar(color=BAR_COLOR) + labels).properties(height=400)
+
+    @staticmethod
+    def _score_trend(player_scores: pd.DataFrame, player: str):
+        import altair as alt
+
+        frame = pd.DataFrame({"日付": _date_labels(player_scores["日付"]), "合計スコア": player_scores["合計スコア"].to_numpy()})
+        return alt.Chart(frame, title=f"{player} のスコア推移").mark_line(point=True).encode(
+            x=alt.X("日付:O", sort=None, axis=alt.Axis(labelAngle=-45)),
+            y=alt.Y("合計スコア:Q", scale=alt.Scale(zero=False)),
+            tooltip=["日付", "合計スコア"],
+        )
+
+    @staticmethod
+    def _net_gross_trend(valid_data: pd.DataFrame, player: str):
+        import altair as alt
+
+        frame = pd.DataFrame({
+            "競技日": _date_labels(valid_data["日付"]),
+            "ネットスコア": valid_data["ネットスコア"].to_numpy(),
+            "グロススコア": valid_data["合計スコア"].to_numpy(),
+        })
+        long = frame.melt("競技日", var_name="種類", value_name="スコア")
+        color = alt.Color("種類:N", scale=alt.Scale(domain=["ネットスコア", "グロススコア"], range=[NET_COLOR, GROSS_COLOR]))
+        lines = alt.Chart(long).mark_line(point=True).encode(
+            x=alt.X("競技日:O", sort=None, axis=alt.Axis(labelAngle=-45)),
+            y=alt.Y("スコア:Q", scale=alt.Scale(zero=False)),
+            color=color,
+            strokeDash=alt.StrokeDash("種類:N", legend=None),
+            tooltip=["競技日", "種類", "スコア"],
+        )
+        averages = pd.DataFrame({
+            "種類": ["ネットスコア", "グロススコア"],
+            "平均": [frame["ネットスコア"].mean(), frame["グロススコア"].mean()],
+        })
+        rules = alt.Chart(averages).mark_rule(strokeDash=[2, 2], opacity=0.5).encode(
+            y="平均:Q", color=color, tooltip=["種類", alt.Tooltip("平均:Q", format=".1f")],
+        )
+        return (lines + rules).properties(title=f"{player} のスコア推移", height=400)
+
+    @staticmethod
+    def _handicap_history(valid_data: pd.DataFrame, player: str):
+        import altair as alt
+
+        frame = pd.DataFrame({"競技日": _date_labels(valid_data["日付"]), "ハンディキャップ": valid_data["ハンディキャップ"].to_numpy()})
+        line = alt.Chart(frame).mark_line(point=True, color=HANDICAP_COLOR).encode(
+            x=alt.X("競技日:O", sort=None, axis=alt.Axis(labelAngle=-45)),
+            y=alt.Y("ハンディキャップ:Q", scale=alt.Scale(zero=False)),
+            tooltip=["競技日", "ハンディキャップ"],
+        )
+        average = alt.Chart(pd.DataFrame({"平均HC": [frame["ハンディキャップ"].mean()]})).mark_rule(
+            color=HANDICAP_COLOR, strokeDash=[2, 2], opacity=0.5,
+        ).encode(y="平均HC:Q", tooltip=[alt.Tooltip("平均HC:Q", format=".1f")])
+        return (line + average).properties(title=f"{player} のハンディキャップ推移", height=340)
+
+    @staticmethod
+    def _winner_counts(rank_one_winners: pd.DataFrame):
+        import altair as alt
+
+        frame = rank_one_winners[["プレイヤー名", "優勝回数"]].reset_index(drop=True)
+        return alt.Chart(frame, title="優勝回数ランキング").mark_bar(color=BAR_COLOR).encode(
+            x=alt.X("プレイヤー名:N", sort=None, axis=alt.Axis(labelAngle=-45)),
+            y=alt.Y("優勝回数:Q", axis=alt.Axis(format="d", tickMinStep=1)),
+            tooltip=["プレイヤー名", "優勝回数"],
+        ).properties(height=400)
+
+
+class PlotlyChartBackend(ChartBackend):
+    """Plotly の図を送り、ブラウザで描画するバックエンド"""
+
+    name = "plotly"
+
+    def build(self, kind: str, data: Any, **options: Any):
+        return getattr(self, f"_{kind}")(data, **options)
+
+    def show(self, chart) -> None:
+        st.plotly_chart(chart, use_container_width=True)
+
+    @staticmethod
+    def _layout(fig, title: str, xaxis: str, yaxis: str):
+        fig.update_layout(title=title, xaxis_title=xaxis, yaxis_title=yaxis, xaxis_tickangle=-45)
+        return fig
+
+    @classmethod
+    def _average_ranking(cls, overall_ranking: pd.Series):
+        import plotly.graph_objects as go
+
+        fig = go.Figure(go.Bar(
+            x=overall_ranking.index.astype(str).tolist(), y=overall_ranking.to_numpy(), marker_color=BAR_COLOR,
+            text=[f"{value:.2f}" for value in overall_ranking.to_numpy()], textposition="outside",
+        ))
+        return cls._layout(fig, "プレイヤーごとの平均合計スコア (低いほど良い)", "プレイヤー名", "平均合計スコア")
+
+    @classmethod
+    def _score_trend(cls, player_scores: pd.DataFrame, player: str):
+        import plotly.graph_objects as go
+
+        fig = go.Figure(go.Scatter(
+            x=_date_labels(player_scores["日付"]).tolist(), y=player_scores["合計スコア"].to_numpy(), mode="lines+markers",
+        ))
+        fig.update_xaxes(type="category")
+        return cls._layout(fig, f"{player} のスコア推移", "日付", "合計スコア")
+
+    @classmethod
+    def _net_gross_trend(cls, valid_data: pd.DataFrame, player: str):
+        import plotly.graph_objects as go
+
+        dates = _date_labels(valid_data["日付"]).tolist()
+        fig = go.Figure()
+        for column, label, short, color, dash, symbol in (
+            ("ネットスコア", "ネットスコア", "ネット", NET_COLOR, "solid", "circle"),
+            ("合計スコア", "グロススコア", "グロス", GROSS_COLOR, "dash", "square"),
+        ):
+            average = valid_data[column].mean()
+            fig.add_trace(go.Scatter(
+                x=dates, y=valid_data[column].to_numpy(), name=label, mode="lines+markers",
+                line=dict(color=color, dash=dash), marker=dict(symbol=symbol),
+            ))
+            fig.add_hline(y=average, line=dict(color=color, dash="dot"), opacity=0.5,
+                          annotation_text=f"平均{short} ({average:.1f})")
+        fig.update_xaxes(type="category")
+        return cls._layout(fig, f"{player} のスコア推移", "競技日", "スコア")
+
+    @classmethod
+    def _handicap_history(cls, valid_data: pd.DataFrame, player: str):
+        import plotly.graph_objects as go
+
+        average = valid_data["ハンディキャップ"].mean()
+        fig = go.Figure(go.Scatter(
+            x=_date_labels(valid_data["日付"]).tolist(), y=valid_data["ハンディキャップ"].to_numpy(),
+            mode="lines+markers", line=dict(color=HANDICAP_COLOR), marker=dict(symbol="diamond"),
+        ))
+        fig.add_hline(y=average, line=dict(color=HANDICAP_COLOR, dash="dot"), opacity=0.5,
+                      annotation_text=f"平均HC ({average:.1f})")
+        fig.update_xaxes(type="category")
+        return cls._layout(fig, f"{player} のハンディキャップ推移", "競技日", "ハンディキャップ")
+
+    @classmethod
+    def _winner_counts(cls, rank_one_winners: pd.DataFrame):
+        import plotly.graph_objects as go
+
+        fig = go.Figure(go.Bar(
+            x=rank_one_winners["プレイヤー名"].astype(str).tolist(), y=rank_one_winners["優勝回数"].to_numpy(),
+            marker_color=BAR_COLOR,
+        ))
+        fig.update_yaxes(dtick=1, tickformat="d")
+        return cls._layout(fig, "優勝回数ランキング", "プレイヤー名", "優勝回数")
+
+
+CHART_BACKENDS: Mapping[str, Callable[[], ChartBackend]] = {
+    "altair": AltairChartBackend,
+    "plotly": PlotlyChartBackend,
+    "matplotlib": MatplotlibChartBackend,
+}
+
+
+def create_chart_backend(name: Optional[str] = None) -> ChartBackend:
+    """名前（省略時は CHART_BACKEND）に対応するバックエンドを作成（未対応・未インストールの場合は matplotlib）"""
+    name = (name or CHART_BACKEND).strip().lower()
+    factory = CHART_BACKENDS.get(name)
+    if factory is None:
+        logging.warning(f"CHART_BACKEND={name} には対応していないため、matplotlib で描画します")
+        return MatplotlibChartBackend()
+    if name != "matplotlib":
+        try:
+            __import__(name)
+        except ImportError as e:
+            logging.warning(f"{name} を読み込めないため、matplotlib で描画します: {e}")
+            return MatplotlibChartBackend()
+    return factory()
+
+
+@st.cache_resource
+def get_chart_backend() -> ChartBackend:
+    """設定に応じたグラフ描画バックエンドを取得（プロセス全体で共有）"""
+    return create_chart_backend()
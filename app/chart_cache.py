@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+グラフ画像の共有キャッシュ
+(グラフの種類, 入力データのハッシュ, オプション) ごとに matplotlib のグラフを1回だけ描画し、
+PNG/SVG のバイト列をプロセス全体で再利用する（同じページを見ている複数のセッションでも共有）
+
+- 最近使われていないものから破棄（LRU）し、合計サイズを CHART_CACHE_MAX_BYTES 以下に保つ
+- matplotlib はスレッドセーフではないため、描画は1つずつ行う（待っている間に同じグラフが描画された場合はそれを返す）
+- 描画には figure_pool が貸し出す Figure を使い、書き出し後に必ず破棄する
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Mapping, Optional, Tuple
+
+import pandas as pd
+
+from figure_pool import get_figure_pool
+
+CHART_CACHE_MAX_BYTES = int(os.getenv("CHART_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+CHART_CACHE_MAX_ENTRIES = int(os.getenv("CHART_CACHE_MAX_ENTRIES", "256"))
+CHART_FORMATS = ("png", "svg")
+
+
+def data_fingerprint(data: Any) -> str:
+    """グラフの入力データのハッシュ（データフレーム・Seriesは列名・型・インデックスを含めて値から計算）"""
+    digest = hashlib.sha1()
+    if isinstance(data, pd.DataFrame):
+        digest.update(repr((list(data.columns), [str(dtype) for dtype in data.dtypes])).encode("utf-8"))
+        digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    elif isinstance(data, pd.Series):
+        digest.update(repr((data.name, str(data.dtype))).encode("utf-8"))
+        digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    else:
+        digest.update(repr(data).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _options_key(options: Optional[Mapping[str, Any]]) -> Tuple[Tuple[str, Any], ...]:
+    return tuple(sorted((options or {}).items()))
+
+
+@dataclass
+class ChartCacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    entries: int = 0
+    bytes: int = 0
+
+
+class ChartCache:
+    """描画済みのグラフ画像を保持するLRUキャッシュ（件数と合計バイト数の上限つき）"""
+
+    def __init__(self, max_bytes: int = CHART_CACHE_MAX_BYTES, max_entries: int = CHART_CACHE_MAX_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # 描画は1つずつ（matplotlib のフォント・文字描画のキャッシュを共有するため）
+        self._render_lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._stats = ChartCacheStats()
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            image = self._entries.get(key)
+            if image is None:
+                self._stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats.hits += 1
+            return image
+
+    def put(self, key: Hashable, image: bytes) -> None:
+        """画像を保存し、上限を超えた分を古いものから破棄（1枚で上限を超える画像は保存しない）"""
+        if len(image) > self.max_bytes or self.max_entries < 1:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._entries[key] = image
+            self._bytes += len(image)
+            while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self._stats.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> ChartCacheStats:
+        with self._lock:
+            return ChartCacheStats(
+                hits=self._stats.hits,
+                misses=self._stats.misses,
+                evictions=self._stats.evictions,
+                entries=len(self._entries),
+                bytes=self._bytes,
+            )
+
+    def render(
+        self,
+        kind: str,
+        data: Any,
+        draw: Callable[..., Any],
+        options: Optional[Mapping[str, Any]] = None,
+        fmt: str = "png",
+    ) -> bytes:
+        """draw(fig, data, **options) で描いたグラフの画像を返す（キャッシュにあれば描画しない）
+
+        Args:
+            kind: グラフの種類（キーの一部。描画関数ごとに別の名前にする）
+            data: グラフの入力データ（ハッシュをキーに使う）
+            draw: 渡された matplotlib の Figure に描画する関数
+            options: 描画関数に渡すオプション（キーの一部。ハッシュ可能な値のみ）
+            fmt: "png" または "svg"
+        """
+        if fmt not in CHART_FORMATS:
+            raise ValueError(f"未対応の画像形式です: {fmt}")
+        options = dict(options or {})
+        key = (kind, data_fingerprint(data), _options_key(options), fmt)
+        image = self.get(key)
+        if image is not None:
+            return image
+
+        with self._render_lock:
+            # 待っている間に他のセッションが描画していればそれを使う
+            with self._lock:
+                image = self._entries.get(key)
+            if image is not None:
+                return image
+            image = get_figure_pool().render(draw, data, fmt=fmt, **options)
+            # ロックを離す前に保存する（離してから保存すると、待っていたセッションが同じグラフを描き直す）
+            self.put(key, image)
+        return image
+
+
+_cache: Optional[ChartCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_chart_cache() -> ChartCache:
+    """プロセス全体で共有するグラフキャッシュ"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ChartCache()
+        return _cache
+
+
+def render_chart(
+    kind: str,
+    data: Any,
+    draw: Callable[..., Any],
+    options: Optional[Mapping[str, Any]] = None,
+    fmt: str = "png",
+) -> bytes:
+    """共有キャッシュを使ってグラフの画像を返す（ChartCache.render を参照）"""
+    return get_chart_cache().render(kind, data, draw, options=options, fmt=fmt)
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+画面に表示するグラフの描画
+各関数は渡された matplotlib の Figure（figure_pool が貸し出す）にグラフの入力データだけから描画する（pyplot・Streamlit には依存しない）。
+画面では chart_cache.render_chart に渡し、同じデータ・オプションのグラフは描画済みの画像を再利用する
+"""
+
+import pandas as pd
+from matplotlib.figure import Figure
+from matplotlib.ticker import MaxNLocator
+
+
+def draw_average_ranking(fig: Figure, overall_ranking: pd.Series) -> None:
+    """プレイヤーごとの平均合計スコア（プレイヤー名 → 平均）の棒グラフ"""
+    # プレイヤー数に基づいてグラフの幅を動的に調整
+    fig_width = max(10, len(overall_ranking) * 0.5)  # 最小幅は10インチ
+
+    fig.set_size_inches(fig_width, 8)
+    ax = fig.subplots()
+
+    # 垂直棒グラフに変更（横棒ではなく縦棒）
+    bars = ax.bar(overall_ranking.index, overall_ranking.values, color='skyblue')
+
+    # グラフのタイトルと軸ラベルを設定
+    ax.set_title("プレイヤーごとの平均合計スコア (低いほど良い)", fontsize=14, pad=20)
+    ax.set_ylabel("平均合計スコア", fontsize=12)
+    ax.set_xlabel("プレイヤー名", fontsize=12)
+
+    # X軸（プレイヤー名）のフォントサイズと回転を調整
+    ax.tick_params(axis='x', labelrotation=45, labelsize=10)
+    for label in ax.get_xticklabels():
+        label.set_horizontalalignment('right')
+
+    # Y軸（スコア）のフォントサイズと間隔を調整
+    ax.tick_params(axis='y', labelsize=10)
+
+    # 各バーにスコア値を表示
+    for bar in bars:
+        height = bar.get_height()
+        ax.text(bar.get_x() + bar.get_width()/2, height + 0.5, f'{height:.2f}',
+                ha='center', va='bottom', fontsize=9)
+
+    # 表示範囲を調整（値のラベルが見切れないように）
+    if len(overall_ranking) > 0:
+        ax.set_ylim(0, max(overall_ranking.values) * 1.1)
+
+    fig.tight_layout()
+
+
+def draw_score_trend(fig: Figure, player_scores: pd.DataFrame, player: str) -> None:
+    """1人の合計スコアの推移（日付, 合計スコア）"""
+    fig.set_size_inches(10, 5)
+    ax = fig.subplots()
+    ax.plot(player_scores['日付'], player_scores['合計スコア'], marker='o', linestyle='-')
+    ax.set_title(f"{player} のスコア推移")
+    ax.set_xlabel("日付")
+    ax.set_ylabel("合計スコア")
+    ax.tick_params(axis='x', labelrotation=45)
+    fig.tight_layout()
+
+
+def draw_net_gross_trend(fig: Figure, valid_data: pd.DataFrame, player: str) -> None:
+    """個人成績のネット・グロススコアの推移と平均線（日付, ネットスコア, 合計スコア）"""
+    fig.set_size_inches(12, 6)
+    ax = fig.subplots()
+
+    # ネットスコアとグロススコアの推移
+    ax.plot(range(len(valid_data)), valid_data['ネットスコア'],
+            marker='o', linestyle='-', linewidth=2, markersize=8,
+            label='ネットスコア', color='#1f77b4')
+    ax.plot(range(len(valid_data)), valid_data['合計スコア'],
+            marker='s', linestyle='--', linewidth=2, markersize=6,
+            label='グロススコア', color='#ff7f0e', alpha=0.7)
+
+    # 平均線を追加（有効なデータの平均）
+    valid_avg_net = valid_data['ネットスコア'].mean()
+    valid_avg_gross = valid_data['合計スコア'].mean()
+    ax.axhline(y=valid_avg_net, color='#1f77b4', linestyle=':', alpha=0.5, label=f'平均ネット ({valid_avg_net:.1f})')
+    ax.axhline(y=valid_avg_gross, color='#ff7f0e', linestyle=':', alpha=0.5, label=f'平均グロス ({valid_avg_gross:.1f})')
+
+    # 日付ラベル
+    date_labels = [d[:10] for d in valid_data['日付']]
+    ax.set_xticks(range(len(valid_data)))
+    ax.set_xticklabels(date_labels, rotation=45, ha='right')
+
+    ax.set_xlabel("競技日", fontsize=12)
+    ax.set_ylabel("スコア", fontsize=12)
+    ax.set_title(f"{player} のスコア推移", fontsize=14, fontweight='bold')
+    ax.legend(loc='best')
+    ax.grid(True, alpha=0.3)
+
+    fig.tight_layout()
+
+
+def draw_handicap_history(fig: Figure, valid_data: pd.DataFrame, player: str) -> None:
+    """個人成績のハンディキャップの推移と平均線（日付, ハンディキャップ）"""
+    fig.set_size_inches(12, 5)
+    ax = fig.subplots()
+    ax.plot(range(len(valid_data)), valid_data['ハンディキャップ'],
+            marker='D', linestyle='-', linewidth=2, markersize=6,
+            color='#2ca02c')
+
+    # 平均HC線
+    avg_hc = valid_data['ハンディキャップ'].mean()
+    ax.axhline(y=avg_hc, color='#2ca02c', linestyle=':', alpha=0.5, label=f'平均HC ({avg_hc:.1f})')
+
+    date_labels = [d[:10] for d in valid_data['日付']]
+    ax.set_xticks(range(len(valid_data)))
+    ax.set_xticklabels(date_labels, rotation=45, ha='right')
+    ax.set_xlabel("競技日", fontsize=12)
+    ax.set_ylabel("ハンディキャップ", fontsize=12)
+    ax.set_title(f"{player} のハンディキャップ推移", fontsize=14, fontweight='bold')
+    ax.legend(loc='best')
+    ax.grid(True, alpha=0.3)
+
+    fig.tight_layout()
+
+
+def draw_winner_counts(fig: Figure, rank_one_winners: pd.DataFrame) -> None:
+    """優勝回数ランキングの棒グラフ（プレイヤー名, 優勝回数）"""
+    fig.set_size_inches(10, 6)
+    ax = fig.subplots()
+    ax.bar(rank_one_winners['プレイヤー名'], rank_one_winners['優勝回数'], color='skyblue')
+    ax.set_ylabel("優勝回数")
+    ax.set_title("優勝回数ランキング")
+    ax.set_xticks(range(len(rank_one_winners['プレイヤー名'])))
+    ax.set_xticklabels(rank_one_winners['プレイヤー名'], rotation=45, ha='right')
+    ax.yaxis.set_major_locator(MaxNLocator(integer=True))
@@ -3,11 +3,13 @@ import pandas as pd
 from datetime import datetime, date
 import pytz
 
+from data_cache import invalidate
+from paginated_reader import fetch_all_rows
+
 def fetch_competitions_data(supabase):
     """コンペ一覧を取得"""
     try:
-        response = supabase.table("competitions").select("*").order("date", desc=True).execute()
-        return response.data
+        return fetch_all_rows(supabase, "competitions", modify=lambda query: query.order("date", desc=True))
     except Exception as e:
         st.error(f"コンペデータの取得に失敗しました: {e}")
         return []
@@ -30,6 +32,7 @@ def add_competition(supabase, comp_date, course, description=""):
             "course": course,
             "description": description if description else None
         }).execute()
+        invalidate("competitions")
         return True, "コンペを追加しました"
     except Exception as e:
         return False, f"コンペの追加に失敗しました: {e}"
@@ -43,6 +46,7 @@ def update_competition(supabase, competition_id, comp_date, course, description=
             "course": course,
             "description": description if description else None
         }).eq("competition_id", competition_id).execute()
+        invalidate("competitions")
         return True, "コンペ情報を更新しました"
     except Exception as e:
         return False, f"コンペ情報の更新に失敗しました: {e}"
@@ -59,6 +63,7 @@ def delete_competition(supabase, competition_id):
         supabase.table("participants").delete().eq("competition_id", competition_id).execute()
         
         response = supabase.table("competitions").delete().eq("competition_id", competition_id).execute()
+        invalidate("competitions", "participants")
         return True, "コンペを削除しました"
     except Exception as e:
         return False, f"コンペの削除に失敗しました: {e}"
@@ -66,8 +71,7 @@ def delete_competition(supabase, competition_id):
 def fetch_players_for_participation(supabase):
     """参加者選択用のプレイヤー一覧を取得"""
     try:
-        response = supabase.table("players").select("*").order("name").execute()
-        return response.data
+        return fetch_all_rows(supabase, "players", "id, name, affiliation", modify=lambda query: query.order("name"))
     except Exception as e:
         st.error(f"プレイヤーデータの取得に失敗しました: {e}")
         return []
@@ -75,10 +79,10 @@ def fetch_players_for_participation(supabase):
 def fetch_participants(supabase, competition_id):
     """特定のコンペの参加者を取得"""
     try:
-        response = supabase.table("participants").select(
-            "*, players!inner(*)"
-        ).eq("competition_id", competition_id).execute()
-        return response.data
+        return fetch_all_rows(
+            supabase, "participants", "player_id, players!inner(name)",
+            modify=lambda query: query.eq("competition_id", competition_id),
+        )
     except Exception as e:
         st.error(f"参加者データの取得に失敗しました: {e}")
         return []
@@ -95,6 +99,7 @@ def add_participant(supabase, competition_id, player_id):
             "competition_id": competition_id,
             "player_id": player_id
         }).execute()
+        invalidate("participants")
         return True, "参加者を追加しました"
     except Exception as e:
         return False, f"参加者の追加に失敗しました: {e}"
@@ -103,6 +108,7 @@ def remove_participant(supabase, competition_id, player_id):
     """コンペから参加者を削除"""
     try:
         response = supabase.table("participants").delete().eq("competition_id", competition_id).eq("player_id", player_id).execute()
+        invalidate("participants")
         return True, "参加者を削除しました"
     except Exception as e:
         return False, f"参加者の削除に失敗しました: {e}"
@@ -0,0 +1,436 @@
+# -*- coding: utf-8 -*-
+"""
+データアクセスバックエンド
+画面の読み込み処理（スコア・プレイヤー・コンペ）と一括書き込みを、接続方式に依存しない形で提供する
+
+- SupabaseRestBackend: 従来どおり Supabase（PostgREST）のREST APIを使用
+- PostgresPoolBackend: DATABASE_URL に psycopg_pool のコネクションプールで直接接続し、
+  プリペアドステートメントでの読み込みとバイナリCOPYでの一括書き込みを行う
+
+環境変数 DATA_BACKEND=postgres で直接接続を選択する（既定は supabase）
+直接接続はRLSを経由しないため、サーバー側（Streamlitのプロセス内）でのみ使用すること
+"""
+
+import logging
+import os
+from abc import ABC, abstractmethod
+from datetime import date
+from decimal import Decimal
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+import streamlit as st
+
+from paginated_reader import DEFAULT_PAGE_SIZE, concat_frames
+from paginated_reader import iter_pages as iter_rest_pages
+from timestamps import parse_timestamp
+
+DATA_BACKEND = os.getenv("DATA_BACKEND", "supabase").strip().lower()
+DATABASE_POOL_MIN_SIZE = int(os.getenv("DATABASE_POOL_MIN_SIZE", "1"))
+DATABASE_POOL_MAX_SIZE = int(os.getenv("DATABASE_POOL_MAX_SIZE", "5"))
+# PgBouncer（Supabaseのトランザクションモードのプーラー）経由ではプリペアドステートメントを無効にする
+DATABASE_PREPARED_STATEMENTS = os.getenv("DATABASE_PREPARED_STATEMENTS", "1").strip().lower() not in ("0", "false", "no")
+
+# manage_migrations.py と同じ順序で接続文字列を探す
+DATABASE_URL_ENV_KEYS = (
+    "DATABASE_URL",
+    "SUPABASE_DB_URL",
+    "SUPABASE_POSTGRES_URL",
+    "SUPABASE_CONNECTION_STRING",
+)
+
+# 絞り込み条件：(カラム, 演算子, 値)
+Filter = Tuple[str, str, Any]
+# 並び順：(カラム, 降順かどうか)
+Order = Tuple[str, bool]
+Columns = Union[str, Sequence[str]]
+
+FILTER_OPERATORS = {
+    "eq": "=",
+    "neq": "<>",
+    "lt": "<",
+    "lte": "<=",
+    "gt": ">",
+    "gte": ">=",
+    "in": "= ANY",
+}
+
+# REST APIの一括挿入1回あたりの件数
+REST_INSERT_CHUNK_SIZE = 100
+
+
+def column_list(columns: Columns) -> List[str]:
+    """カンマ区切りの文字列またはカラム名のシーケンスをカラム名のリストに変換"""
+    if isinstance(columns, str):
+        columns = columns.split(",")
+    return [column.strip() for column in columns if column.strip()]
+
+
+def resolve_database_url() -> str:
+    """直接接続用の接続文字列を環境変数から取得（未設定の場合は空文字）"""
+    for key in DATABASE_URL_ENV_KEYS:
+        value = os.getenv(key, "").strip()
+        if value:
+            return value
+    return ""
+
+
+class DataBackend(ABC):
+    """データアクセスバックエンドの共通インターフェース"""
+
+    name = ""
+
+    @abstractmethod
+    def iter_pages(
+        self,
+        table: str,
+        columns: Columns = "*",
+        filters: Sequence[Filter] = (),
+        order: Sequence[Order] = (),
+        page_size: int = DEFAULT_PAGE_SIZE,
+        order_key: Optional[str] = "id",
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """テーブル（ビュー）を page_size 件ずつ読み込み、ページごとの行リストを返す"""
+
+    @abstractmethod
+    def table_version(self, table: str) -> Tuple[Optional[int], Any]:
+        """テーブルのバージョン（件数と最大updated_at）を取得"""
+
+    @abstractmethod
+    def insert_rows(self, table: str, rows: Sequence[Dict[str, Any]]) -> int:
+        """行を一括で挿入し、挿入した件数を返す"""
+
+    def fetch_all_rows(
+        self,
+        table: str,
+        columns: Columns = "*",
+        filters: Sequence[Filter] = (),
+        order: Sequence[Order] = (),
+        page_size: int = DEFAULT_PAGE_SIZE,
+        order_key: Optional[str] = "id",
+    ) -> List[Dict[str, Any]]:
+        """全ページの行をまとめてリストで返す"""
+        rows: List[Dict[str, Any]] = []
+        for page in self.iter_pages(table, columns, filters, order, page_size, order_key):
+            rows.extend(page)
+        return rows
+
+    def fetch_all_frame(
+        self,
+        table: str,
+        columns: Columns = "*",
+        filters: Sequence[Filter] = (),
+        order: Sequence[Order] = (),
+        page_size: int = DEFAULT_PAGE_SIZE,
+        order_key: Optional[str] = "id",
+    ) -> pd.DataFrame:
+        """全ページを1つのデータフレームにまとめて返す"""
+        return concat_frames(
+            pd.DataFrame(rows)
+            for rows in self.iter_pages(table, columns, filters, order, page_size, order_key)
+        )
+
+    def close(self) -> None:
+        """保持している接続を解放する"""
+
+
+class SupabaseRestBackend(DataBackend):
+    """Supabase（PostgREST）のREST APIを使用するバックエンド"""
+
+    name = "supabase"
+
+    def __init__(self, client):
+        self.client = client
+
+    def iter_pages(
+        self,
+        table: str,
+        columns: Columns = "*",
+        filters: Sequence[Filter] = (),
+        order: Sequence[Order] = (),
+        page_size: int = DEFAULT_PAGE_SIZE,
+        order_key: Optional[str] = "id",
+    ) -> Iterator[List[Dict[str, Any]]]:
+        for _, operator, _ in filters:
+            if operator not in FILTER_OPERATORS:
+                raise ValueError(f"unsupported filter operator: {operator}")
+
+        def modify(query):
+            for column, operator, value in filters:
+                method = "in_" if operator == "in" else operator
+                query = getattr(query, method)(column, list(value) if operator == "in" else value)
+            for column, desc in order:
+                query = query.order(column, desc=desc)
+            return query
+
+        return iter_rest_pages(
+            self.client, table, ", ".join(column_list(columns)), modify, page_size, order_key
+        )
+
+    def table_version(self, table: str) -> Tuple[Optional[int], Any]:
+        response = (
+            self.client.table(table)
+            .select("updated_at", count="exact")  # type: ignore
+            .order("updated_at", desc=True)
+            .limit(1)
+            .execute()
+        )
+        latest = response.data[0].get("updated_at") if response.data else None
+        return response.count, latest
+
+    def insert_rows(self, table: str, rows: Sequence[Dict[str, Any]]) -> int:
+        rows = list(rows)
+        for start in range(0, len(rows), REST_INSERT_CHUNK_SIZE):
+            self.client.table(table).insert(rows[start:start + REST_INSERT_CHUNK_SIZE]).execute()
+        return len(rows)
+
+
+def _configure_connection(connection) -> None:
+    """REST APIと同じ型で値を返すように、日付は文字列・numericはfloatとして読み込む"""
+    from psycopg.types.numeric import FloatLoader
+    from psycopg.types.string import TextLoader
+
+    connection.adapters.register_loader("numeric", FloatLoader)
+    for type_name in ("date", "timestamp", "timestamptz"):
+        connection.adapters.register_loader(type_name, TextLoader)
+
+
+def _copy_value(type_name: str, value: Any) -> Any:
+    """JSON（バックアップ）由来の値を、バイナリCOPYで送れるPythonの型に変換"""
+    if value is None:
+        return None
+    if type_name == "date" and isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    if type_name in ("timestamp", "timestamptz") and isinstance(value, str):
+        return parse_timestamp(value)
+    if type_name == "numeric" and not isinstance(value, Decimal):
+        return Decimal(str(value))
+    if type_name in ("int2", "int4", "int8"):
+        return int(value)
+    if type_name in ("float4", "float8"):
+        return float(value)
+    if type_name in ("json", "jsonb"):
+        from psycopg.types.json import Json, Jsonb
+
+        return Jsonb(value) if type_name == "jsonb" else Json(value)
+    return value
+
+
+def build_select_query(
+    table: str,
+    columns: Columns = "*",
+    filters: Sequence[Filter] = (),
+    order: Sequence[Order] = (),
+    order_key: Optional[str] = "id",
+    after: Any = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+):
+    """SELECT文（psycopg.sql.Composed）とパラメータを組み立てる
+
+    after を指定すると order_key が after より大きい行だけを返し（キーセットページング）、
+    limit / offset で1ページ分に絞り込む。
+    """
+    from psycopg import sql
+
+    names = column_list(columns)
+    if names == ["*"]:
+        select_list = sql.SQL("*")
+    else:
+        select_list = sql.SQL(", ").join(sql.Identifier(name) for name in names)
+    query = sql.SQL("SELECT {} FROM {}").format(select_list, sql.Identifier(table))
+
+    params: List[Any] = []
+    conditions = []
+    for column, operator, value in filters:
+        if operator not in FILTER_OPERATORS:
+            raise ValueError(f"unsupported filter operator: {operator}")
+        if operator == "in":
+            conditions.append(sql.SQL("{} = ANY(%s)").format(sql.Identifier(column)))
+            params.append(list(value))
+        else:
+            conditions.append(
+                sql.SQL("{} {} %s").format(sql.Identifier(column), sql.SQL(FILTER_OPERATORS[operator]))
+            )
+            params.append(value)
+    if after is not None:
+        conditions.append(sql.SQL("{} > %s").format(sql.Identifier(order_key)))
+        params.append(after)
+    if conditions:
+        query += sql.SQL(" WHERE ") + sql.SQL(" AND ").join(conditions)
+
+    # REST版と同じく、指定の並び順の後に一意なカラムを付けて順序を安定させる
+    order_items = [
+        sql.SQL("{} DESC" if desc else "{}").format(sql.Identifier(column)) for column, desc in order
+    ]
+    if order_key and order_key not in [column for column, _ in order]:
+        order_items.append(sql.Identifier(order_key))
+    if order_items:
+        query += sql.SQL(" ORDER BY ") + sql.SQL(", ").join(order_items)
+    if limit is not None:
+        query += sql.SQL(" LIMIT %s")
+        params.append(limit)
+    if offset:
+        query += sql.SQL(" OFFSET %s")
+        params.append(offset)
+    return query, params
+
+
+class PostgresPoolBackend(DataBackend):
+    """psycopg_pool のコネクションプールでPostgreSQLに直接接続するバックエンド"""
+
+    name = "postgres"
+
+    def __init__(
+        self,
+        conninfo: str,
+        min_size: int = DATABASE_POOL_MIN_SIZE,
+        max_size: int = DATABASE_POOL_MAX_SIZE,
+        prepare: bool = DATABASE_PREPARED_STATEMENTS,
+        **connect_kwargs: Any,
+    ):
+        try:
+            from psycopg_pool import ConnectionPool
+        except ModuleNotFoundError as exc:
+            raise RuntimeError(
+                "psycopg_pool is required for DATA_BACKEND=postgres. Install dependencies via `pip install -r requirements.txt`."
+            ) from exc
+
+        self.prepare = prepare
+        kwargs = {"autocommit": True, **connect_kwargs}
+        if not prepare:
+            kwargs["prepare_threshold"] = None
+        self.pool = ConnectionPool(
+            conninfo,
+            min_size=min_size,
+            max_size=max_size,
+            kwargs=kwargs,
+            configure=_configure_connection,
+            open=False,
+        )
+        self.pool.open(wait=True)
+
+    def iter_pages(
+        self,
+        table: str,
+        columns: Columns = "*",
+        filters: Sequence[Filter] = (),
+        order: Sequence[Order] = (),
+        page_size: int = DEFAULT_PAGE_SIZE,
+        order_key: Optional[str] = "id",
+    ) -> Iterator[List[Dict[str, Any]]]:
+        if page_size <= 0:
+            raise ValueError("page_size must be positive")
+        from psycopg.rows import dict_row
+
+        # 1ページずつ LIMIT で読み込み、読み込むたびに接続をプールへ返す
+        # （結果全体をメモリに載せず、呼び出し側がページを処理している間も接続を占有しない）
+        # 並び順の指定が無ければ order_key のキーセットで、指定があれば REST版と同じく位置で次のページを読む
+        keyset = bool(order_key) and not order
+        names = column_list(columns)
+        strip_key = keyset and names != ["*"] and order_key not in names
+        select_columns = [*names, order_key] if strip_key else columns
+        after: Any = None
+        offset = 0
+        while True:
+            query, params = build_select_query(
+                table, select_columns, filters, order, order_key,
+                after=after, limit=page_size, offset=0 if keyset else offset,
+            )
+            with self.pool.connection() as connection:
+                with connection.cursor(row_factory=dict_row) as cursor:
+                    rows = cursor.execute(query, params, prepare=self.prepare).fetchall()
+            if not rows:
+                return
+            if keyset:
+                after = rows[-1][order_key]
+            offset += len(rows)
+            if strip_key:
+                for row in rows:
+                    del row[order_key]
+            yield rows
+            if len(rows) < page_size:
+                return
+
+    def table_version(self, table: str) -> Tuple[Optional[int], Any]:
+        from psycopg import sql
+
+        query = sql.SQL("SELECT count(*), max(updated_at) FROM {}").format(sql.Identifier(table))
+        with self.pool.connection() as connection:
+            count, latest = connection.execute(query, prepare=self.prepare).fetchone()
+        return count, latest
+
+    def _column_types(self, connection, table: str, columns: Sequence[str]) -> List[Tuple[int, str]]:
+        rows = connection.execute(
+            """
+            SELECT a.attname, a.atttypid::int, t.typname
+            FROM pg_attribute a
+            JOIN pg_type t ON t.oid = a.atttypid
+            WHERE a.attrelid = %s::regclass AND a.attnum > 0 AND NOT a.attisdropped
+            """,
+            (table,),
+            prepare=self.prepare,
+        ).fetchall()
+        types = {name: (oid, type_name) for name, oid, type_name in rows}
+        missing = [column for column in columns if column not in types]
+        if missing:
+            raise ValueError(f"unknown columns for {table}: {', '.join(missing)}")
+        return [types[column] for column in columns]
+
+    def insert_rows(self, table: str, rows: Sequence[Dict[str, Any]]) -> int:
+        if not rows:
+            return 0
+        from psycopg import sql
+
+        # 省略されたカラムに既定値が入るように、キーの組み合わせごとにCOPYを分ける
+        groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for row in rows:
+            groups.setdefault(tuple(row), []).append(row)
+
+        with self.pool.connection() as connection:
+            with connection.transaction():
+                with connection.cursor() as cursor:
+                    for columns, group in groups.items():
+                        types = self._column_types(connection, table, columns)
+                        copy_query = sql.SQL("COPY {} ({}) FROM STDIN (FORMAT BINARY)").format(
+                            sql.Identifier(table), sql.SQL(", ").join(sql.Identifier(column) for column in columns)
+                        )
+                        with cursor.copy(copy_query) as copy:
+                            copy.set_types([oid for oid, _ in types])
+                            for row in group:
+                                copy.write_row(
+                                    [_copy_value(type_name, row[column]) for column, (_, type_name) in zip(columns, types)]
+                                )
+                    if any("id" in columns for columns in groups):
+                        # idを指定して挿入した場合、以降の通常のINSERTと衝突しないようにシーケンスを進める
+                        cursor.execute(
+                            sql.SQL(
+                                "SELECT setval(pg_get_serial_sequence(%s, 'id'), max(id)) FROM {} HAVING max(id) IS NOT NULL"
+                            ).format(sql.Identifier(table)),
+                            (table,),
+                        )
+        return len(rows)
+
+    def close(self) -> None:
+        self.pool.close()
+
+
+@st.cache_resource
+def get_data_backend() -> Optional[DataBackend]:
+    """設定に応じたデータアクセスバックエンドを取得（プロセス全体で共有）"""
+    if DATA_BACKEND == "postgres":
+        database_url = resolve_database_url()
+        if database_url:
+            try:
+                return PostgresPoolBackend(database_url)
+            except Exception as e:
+                logging.warning(f"PostgreSQLへの直接接続に失敗したため、REST APIを使用します: {e}")
+        else:
+            logging.warning("DATA_BACKEND=postgres ですが DATABASE_URL が未設定のため、REST APIを使用します")
+
+    from supabase_client import get_supabase_client
+
+    client = get_supabase_client()
+    if client is None:
+        return None
+    return SupabaseRestBackend(client)
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+データセット共有キャッシュ
+Streamlitの再実行をまたいで、プロセス全体でスコア・プレイヤー・コンペのデータを保持する
+
+- TTL内はネットワークに一切アクセスせずキャッシュを返す
+- TTL切れ時はテーブルのバージョン（件数と最大updated_at）だけを確認し、変化がなければ再取得しない
+- 管理者の書き込み処理から invalidate() を呼ぶことで、書き込み直後に古いデータが表示されないようにする
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+DEFAULT_TTL_SECONDS = float(os.getenv("DATA_CACHE_TTL_SECONDS", "300"))
+
+
+@dataclass
+class _CacheEntry:
+    value: Any
+    tables: Tuple[str, ...]
+    version: Any
+    expires_at: float
+
+
+_lock = threading.RLock()
+_entries: Dict[Hashable, _CacheEntry] = {}
+# テーブルごとの無効化カウンタ（読み込み中に無効化された結果を保存しないために使用）
+_generations: Dict[str, int] = {}
+_epoch = 0
+# 無効化の通知先（差分同期のスナップショットなど）
+_listeners: List[Callable[[Tuple[str, ...]], None]] = []
+
+
+def _is_empty(value: Any) -> bool:
+    if value is None:
+        return True
+    if isinstance(value, pd.DataFrame):
+        return value.empty
+    try:
+        return len(value) == 0
+    except TypeError:
+        return False
+
+
+def _clone(value: Any) -> Any:
+    """呼び出し側での変更がキャッシュに波及しないようにコピーを返す"""
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    return value
+
+
+def _current_generation(tables: Tuple[str, ...]) -> Tuple[int, Tuple[int, ...]]:
+    with _lock:
+        return _epoch, tuple(_generations.get(table, 0) for table in tables)
+
+
+def _probe_version(
+    version_probe: Optional[Callable[[str], Any]], tables: Tuple[str, ...]
+) -> Any:
+    """各テーブルのバージョンを取得（取得できない場合はNone）"""
+    if version_probe is None:
+        return None
+    try:
+        return tuple(version_probe(table) for table in tables)
+    except Exception:
+        return None
+
+
+def get_or_load(
+    key: Hashable,
+    loader: Callable[[], Any],
+    tables: Iterable[str],
+    version_probe: Optional[Callable[[str], Any]] = None,
+    ttl: Optional[float] = None,
+) -> Any:
+    """キャッシュ済みの値を返し、なければ loader() で取得して保存する
+
+    Args:
+        key: キャッシュキー
+        loader: データを取得する関数
+        tables: 値が依存するテーブル名（無効化とバージョン確認に使用）
+        version_probe: テーブル名を受け取りバージョンを返す関数
+        ttl: 有効期間（秒）。省略時は DEFAULT_TTL_SECONDS
+    """
+    tables = tuple(tables)
+    ttl = DEFAULT_TTL_SECONDS if ttl is None else ttl
+
+    with _lock:
+        entry = _entries.get(key)
+    if entry is not None and time.monotonic() < entry.expires_at:
+        return _clone(entry.value)
+
+    # TTL切れ：バージョンが変わっていなければ期限だけ延長する
+    version = _probe_version(version_probe, tables)
+    if entry is not None and version is not None and version == entry.version:
+        with _lock:
+            if _entries.get(key) is entry:
+                entry.expires_at = time.monotonic() + ttl
+        return _clone(entry.value)
+
+    generation = _current_generation(tables)
+    value = loader()
+
+    # 空の結果（取得失敗を含む）はキャッシュしない
+    if _is_empty(value):
+        return value
+
+    with _lock:
+        # 読み込み中に無効化された場合は保存しない
+        if _current_generation(tables) == generation:
+            _entries[key] = _CacheEntry(
+                value=value,
+                tables=tables,
+                version=version,
+                expires_at=time.monotonic() + ttl,
+            )
+    return _clone(value)
+
+
+def add_invalidation_listener(listener: Callable[[Tuple[str, ...]], None]) -> None:
+    """invalidate() の呼び出し時に、対象テーブル（すべての場合は空のタプル）を受け取る関数を登録する"""
+    with _lock:
+        if listener not in _listeners:
+            _listeners.append(listener)
+
+
+def invalidate(*tables: str) -> None:
+    """指定テーブルに依存するキャッシュを破棄する（引数なしの場合はすべて破棄）"""
+    global _epoch
+    with _lock:
+        if not tables:
+            _epoch += 1
+            _entries.clear()
+        else:
+            for table in tables:
+                _generations[table] = _generations.get(table, 0) + 1
+            stale_keys = [
+                key for key, entry in _entries.items()
+                if any(table in entry.tables for table in tables)
+            ]
+            for key in stale_keys:
+                del _entries[key]
+        listeners = list(_listeners)
+
+    for listener in listeners:
+        listener(tables)
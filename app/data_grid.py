@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+ページ単位の表示用データグリッド
+大きなデータフレームの絞り込み・並べ替え・ページ分割をサーバー側で行い、画面には表示中のページの行だけを送る
+
+- filter_rows: 列ごとの一致条件で絞り込み（None の条件は無視）
+- sort_rows: 安定ソートで並べ替え（欠損値は常に末尾）
+- page_rows: 1始まりのページ番号で行を切り出す（範囲外のページ番号は最初・最後のページに丸める）
+"""
+
+import math
+from typing import Any, Mapping, Optional
+
+import pandas as pd
+
+# 1ページあたりの表示件数の選択肢
+PAGE_SIZES = (25, 50, 100, 200)
+
+
+def filter_rows(frame: pd.DataFrame, equals: Mapping[str, Any]) -> pd.DataFrame:
+    """列の値が条件と一致する行だけを返す（値が None の条件・存在しない列は無視）"""
+    mask = pd.Series(True, index=frame.index)
+    for column, value in equals.items():
+        if value is None or column not in frame.columns:
+            continue
+        mask &= frame[column] == value
+    return frame if bool(mask.all()) else frame[mask]
+
+
+def sort_rows(frame: pd.DataFrame, column: Optional[str], ascending: bool = True) -> pd.DataFrame:
+    """column で並べ替え（column が None の場合はそのまま。同じ値の行は元の順序を保つ）"""
+    if column is None or column not in frame.columns:
+        return frame
+    return frame.sort_values(column, ascending=ascending, kind="mergesort", na_position="last")
+
+
+def page_count(total: int, page_size: int) -> int:
+    """ページ数（0件でも1ページ）"""
+    if page_size < 1:
+        raise ValueError("1ページあたりの件数は1以上を指定してください")
+    return max(1, math.ceil(total / page_size))
+
+
+def page_rows(frame: pd.DataFrame, page: int, page_size: int) -> pd.DataFrame:
+    """page ページ目（1始まり）の行"""
+    page = min(max(1, int(page)), page_count(len(frame), page_size))
+    start = (page - 1) * page_size
+    return frame.iloc[start:start + page_size]
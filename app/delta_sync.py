@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+"""
+差分同期
+テーブル（ビュー）ごとにローカルのスナップショットと updated_at の最大値（ウォーターマーク）を保持し、
+更新時は updated_at がウォーターマークより新しい行だけを取得してマージする
+
+- 削除された行は、サーバーの件数とスナップショットの件数が一致しない場合のみ、IDの一覧を取得して取り除く
+- 環境変数 DELTA_SYNC_DIR を指定すると、スナップショットをJSONファイルに保存し、再起動後も差分だけを取得する
+- 全データの置き換え（リストアなど）で invalidate() が引数なしで呼ばれた場合はスナップショットを破棄する
+"""
+
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from data_cache import add_invalidation_listener
+from timestamps import parse_timestamp
+
+# full を指定すると従来どおり毎回全件を取得する
+DATA_SYNC_MODE = os.getenv("DATA_SYNC_MODE", "delta").strip().lower()
+DELTA_SYNC_DIR = os.getenv("DELTA_SYNC_DIR", "").strip()
+# ウォーターマークの直前に書き込まれたが、コミットが遅れた行を取りこぼさないための重複取得幅（秒）
+DELTA_SYNC_OVERLAP_SECONDS = float(os.getenv("DELTA_SYNC_OVERLAP_SECONDS", "5"))
+# IDを指定して取得する際の1回あたりの件数
+ID_FETCH_CHUNK_SIZE = 200
+
+
+@dataclass
+class SyncResult:
+    """1回の同期で取得・反映した件数"""
+
+    full_reload: bool = False
+    fetched: int = 0
+    deleted: int = 0
+
+
+def _parse_timestamp(value: Any) -> Optional[datetime]:
+    """REST API（ISO 8601）と直接接続（PostgreSQLのテキスト形式）の両方のタイムスタンプを解釈（未設定は None）"""
+    if value is None:
+        return None
+    return parse_timestamp(value)
+
+
+class TableSnapshot:
+    """1つのテーブル（ビュー）のスナップショットとウォーターマーク"""
+
+    def __init__(
+        self,
+        table: str,
+        columns: Sequence[str],
+        key: str = "id",
+        watermark_column: str = "updated_at",
+        path: Optional[str] = None,
+        overlap_seconds: float = DELTA_SYNC_OVERLAP_SECONDS,
+    ):
+        self.table = table
+        self.key = key
+        self.watermark_column = watermark_column
+        self.columns = tuple(dict.fromkeys([key, *columns, watermark_column]))
+        self.path = path
+        self.overlap = timedelta(seconds=overlap_seconds)
+        self._lock = threading.RLock()
+        self.rows: Optional[Dict[Any, Dict[str, Any]]] = None
+        self.watermark: Optional[datetime] = None
+        self.version: Any = None
+        self._load_from_disk()
+
+    def reset(self) -> None:
+        """スナップショットを破棄し、次回の同期で全件を取得する"""
+        with self._lock:
+            self.rows = None
+            self.watermark = None
+            self.version = None
+            if self.path and os.path.exists(self.path):
+                os.remove(self.path)
+
+    def snapshot_rows(self) -> List[Dict[str, Any]]:
+        """スナップショットの行をキー順に返す"""
+        with self._lock:
+            if not self.rows:
+                return []
+            return [self.rows[key] for key in sorted(self.rows)]
+
+    def refresh(self, backend) -> SyncResult:
+        """サーバーの変更をスナップショットに反映する"""
+        with self._lock:
+            if self.rows is None:
+                return self._full_reload(backend)
+
+            # 件数と最大updated_atが前回と同じ場合は取得しない
+            version = backend.table_version(self.table)
+            if version == self.version:
+                return SyncResult()
+
+            result = SyncResult()
+            since = self.watermark - self.overlap if self.watermark else None
+            filters = [(self.watermark_column, "gt", since.isoformat())] if since else []
+            changed = backend.fetch_all_rows(self.table, self.columns, filters=filters, order_key=self.key)
+            self._merge(changed)
+            result.fetched += len(changed)
+
+            count = version[0] if version else None
+            if count is not None and count != len(self.rows):
+                result.deleted, restored = self._reconcile(backend)
+                result.fetched += restored
+
+            self.version = version
+            if result.fetched or result.deleted:
+                self._save_to_disk()
+            return result
+
+    def _full_reload(self, backend) -> SyncResult:
+        # 取得中の書き込みは次回の差分で取得されるよう、バージョンを先に確認する
+        version = backend.table_version(self.table)
+        rows = backend.fetch_all_rows(self.table, self.columns, order_key=self.key)
+        self.rows = {}
+        self.watermark = None
+        self._merge(rows)
+        self.version = version
+        self._save_to_disk()
+        return SyncResult(full_reload=True, fetched=len(rows))
+
+    def _merge(self, rows: Sequence[Dict[str, Any]]) -> None:
+        for row in rows:
+            self.rows[row[self.key]] = row
+            updated_at = _parse_timestamp(row.get(self.watermark_column))
+            if updated_at is not None and (self.watermark is None or updated_at > self.watermark):
+                self.watermark = updated_at
+
+    def _reconcile(self, backend) -> Tuple[int, int]:
+        """サーバー側のIDの一覧と突き合わせ、削除された行を取り除く（不足している行は取得する）"""
+        server_keys = {row[self.key] for row in backend.fetch_all_rows(self.table, (self.key,), order_key=self.key)}
+        deleted = [key for key in self.rows if key not in server_keys]
+        for key in deleted:
+            del self.rows[key]
+
+        missing = sorted(server_keys - set(self.rows))
+        restored = 0
+        for start in range(0, len(missing), ID_FETCH_CHUNK_SIZE):
+            chunk = missing[start:start + ID_FETCH_CHUNK_SIZE]
+            rows = backend.fetch_all_rows(
+                self.table, self.columns, filters=[(self.key, "in", chunk)], order_key=self.key
+            )
+            self._merge(rows)
+            restored += len(rows)
+        return len(deleted), restored
+
+    def _save_to_disk(self) -> None:
+        if not self.path:
+            return
+        payload = {
+            "table": self.table,
+            "columns": list(self.columns),
+            "watermark": self.watermark.isoformat() if self.watermark else None,
+            "rows": self.snapshot_rows(),
+        }
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(payload, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logging.warning(f"差分同期のスナップショットを保存できません（{self.path}）: {e}")
+
+    def _load_from_disk(self) -> None:
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"差分同期のスナップショットを読み込めません（{self.path}）: {e}")
+            return
+        # カラム構成が変わった場合は使用しない
+        if payload.get("table") != self.table or tuple(payload.get("columns", ())) != self.columns:
+            return
+        self.rows = {}
+        self._merge(payload.get("rows", []))
+        self.watermark = _parse_timestamp(payload.get("watermark")) or self.watermark
+
+
+_registry_lock = threading.Lock()
+_snapshots: Dict[Hashable, TableSnapshot] = {}
+
+
+def _snapshot_path(table: str, columns: Sequence[str]) -> Optional[str]:
+    if not DELTA_SYNC_DIR:
+        return None
+    return os.path.join(DELTA_SYNC_DIR, f"{table}__{'_'.join(columns)}.json")
+
+
+def get_snapshot(table: str, columns: Sequence[str], key: str = "id") -> TableSnapshot:
+    """テーブルとカラムの組み合わせごとのスナップショットを取得（プロセス全体で共有）"""
+    columns = tuple(columns)
+    with _registry_lock:
+        snapshot = _snapshots.get((table, columns, key))
+        if snapshot is None:
+            snapshot = TableSnapshot(table, columns, key=key, path=_snapshot_path(table, columns))
+            _snapshots[(table, columns, key)] = snapshot
+        return snapshot
+
+
+def sync_rows(
+    backend,
+    table: str,
+    columns: Sequence[str],
+    key: str = "id",
+    sync_columns: Optional[Sequence[str]] = None,
+) -> List[Dict[str, Any]]:
+    """差分同期したうえで、スナップショットの行を返す
+
+    sync_columns を指定すると、スナップショットは sync_columns で1つだけ保持し（画面ごとに別々に同期しない）、
+    返す行は columns（とキー）に絞り込む
+    """
+    snapshot = get_snapshot(table, sync_columns if sync_columns is not None else columns, key)
+    snapshot.refresh(backend)
+    rows = snapshot.snapshot_rows()
+    if sync_columns is None:
+        return rows
+    output_columns = tuple(dict.fromkeys([key, *columns]))
+    return [{column: row.get(column) for column in output_columns} for row in rows]
+
+
+def reset_snapshots() -> None:
+    """すべてのスナップショットを破棄する"""
+    with _registry_lock:
+        snapshots = list(_snapshots.values())
+    for snapshot in snapshots:
+        snapshot.reset()
+
+
+def _on_invalidate(tables: Tuple[str, ...]) -> None:
+    # 個別テーブルの書き込みは差分で取得できるが、全データの置き換えはupdated_atが巻き戻るため破棄する
+    if not tables:
+        reset_snapshots()
+
+
+add_invalidation_listener(_on_invalidate)
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+matplotlib の Figure の管理
+pyplot（グローバルな図の管理）を使わずにオブジェクト指向の Figure API で図を作り、使い終わったら必ず破棄する
+
+- 同時に存在できる図の数を FIGURE_POOL_SIZE 枚に制限し、空きが無い場合は FIGURE_POOL_TIMEOUT_SECONDS 秒まで待つ
+- stats() で使用中・未解放（ガベージコレクションされていない）の図の数を確認できる（長時間の負荷試験でメモリが増えないことの確認用）
+"""
+
+import io
+import os
+import threading
+import weakref
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator, Optional, Tuple
+
+FIGURE_POOL_SIZE = int(os.getenv("FIGURE_POOL_SIZE", "4"))
+FIGURE_POOL_TIMEOUT_SECONDS = float(os.getenv("FIGURE_POOL_TIMEOUT_SECONDS", "30"))
+# st.pyplot と同じ書き出し設定
+FIGURE_DPI = 200
+
+
+@dataclass
+class FigurePoolStats:
+    live: int = 0
+    peak: int = 0
+    created: int = 0
+    disposed: int = 0
+    # 破棄後もどこかから参照されていてメモリに残っている図の数
+    unreleased: int = 0
+    # pyplot の管理下にある図の数（pyplot を使う処理が残っていれば増える）
+    pyplot_figures: int = 0
+
+
+class FigurePool:
+    """同時に存在できる図の数を制限し、使い終わった図を必ず破棄する"""
+
+    def __init__(self, size: int = FIGURE_POOL_SIZE, timeout: float = FIGURE_POOL_TIMEOUT_SECONDS):
+        if size < 1:
+            raise ValueError("FIGURE_POOL_SIZE は1以上を指定してください")
+        self.size = size
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._figures: "weakref.WeakSet[Any]" = weakref.WeakSet()
+        self._stats = FigurePoolStats()
+
+    @contextmanager
+    def figure(self, figsize: Optional[Tuple[float, float]] = None) -> Iterator[Any]:
+        """Figure を1枚貸し出し、with を抜けるときに破棄する"""
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f"{self.timeout:g}秒待っても描画用の図が空きませんでした（FIGURE_POOL_SIZE={self.size}）")
+        try:
+            fig = Figure(figsize=figsize)
+            FigureCanvasAgg(fig)
+            with self._lock:
+                self._figures.add(fig)
+                self._stats.created += 1
+                self._stats.live += 1
+                self._stats.peak = max(self._stats.peak, self._stats.live)
+            try:
+                yield fig
+            finally:
+                # 軸・描画要素への参照を切り、図が参照され続けてもメモリを保持しないようにする
+                fig.clear()
+                with self._lock:
+                    self._stats.live -= 1
+                    self._stats.disposed += 1
+        finally:
+            self._slots.release()
+
+    def render(self, draw: Callable[..., Any], *args: Any, fmt: str = "png", **kwargs: Any) -> bytes:
+        """draw(fig, *args, **kwargs) で描いた図を画像（PNG/SVG）にして返す"""
+        with self.figure() as fig:
+            draw(fig, *args, **kwargs)
+            buffer = io.BytesIO()
+            fig.savefig(buffer, format=fmt, dpi=FIGURE_DPI, bbox_inches="tight")
+            return buffer.getvalue()
+
+    def stats(self) -> FigurePoolStats:
+        from matplotlib._pylab_helpers import Gcf
+
+        with self._lock:
+            return FigurePoolStats(
+                live=self._stats.live,
+                peak=self._stats.peak,
+                created=self._stats.created,
+                disposed=self._stats.disposed,
+                unreleased=len(self._figures),
+                pyplot_figures=Gcf.get_num_fig_managers(),
+            )
+
+
+_pool: Optional[FigurePool] = None
+_pool_lock = threading.Lock()
+
+
+def get_figure_pool() -> FigurePool:
+    """プロセス全体で共有する Figure の管理"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = FigurePool()
+        return _pool
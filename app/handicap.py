@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+"""
+ハンディキャップの計算
+直近 HANDICAP_ROUNDS ラウンドのうち、差（グロス − HANDICAP_PAR）の小さい HANDICAP_BEST ラウンドの平均をハンディキャップとする
+（ラウンド数が足りない場合は同じ割合のラウンド数（最低1）で平均し、0〜HANDICAP_MAX に収める）
+
+- compute_handicaps / handicap_rows: 全プレイヤー分をスコアのデータフレームから並べ替えとグループ集計だけで計算（一括再計算用）
+- apply_round / remove_round: 1人分の直近ラウンド（player_handicaps.recent_rounds、マイグレーション 0013）を更新。
+  新しいラウンドの登録時は履歴を読み直さず、保存済みの直近ラウンドだけから再計算する
+- refresh_player_handicaps: スコアの保存後に、保存したプレイヤーの player_handicaps を更新
+  （関数 refresh_player_handicaps（マイグレーション 0014）があればサーバー側でロックを取って作り直す）
+"""
+
+import logging
+import math
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from scorecard_import import HANDICAP_MAX
+
+HANDICAP_ROUNDS = int(os.getenv("HANDICAP_ROUNDS", "20"))
+HANDICAP_BEST = int(os.getenv("HANDICAP_BEST", "8"))
+HANDICAP_PAR = int(os.getenv("HANDICAP_PAR", "72"))
+
+# 計算に使うスコアのカラム
+ROUND_COLUMNS = ("player_id", "competition_id", "date", "out_score", "in_score")
+HANDICAP_COLUMNS = ("player_id", "handicap", "rounds_counted")
+
+
+@dataclass(frozen=True)
+class HandicapRule:
+    """直近 rounds ラウンドのうちベスト best ラウンドの差（グロス − par）の平均"""
+
+    rounds: int = HANDICAP_ROUNDS
+    best: int = HANDICAP_BEST
+    par: int = HANDICAP_PAR
+
+    def __post_init__(self):
+        if self.rounds < 1 or self.best < 1:
+            raise ValueError("ハンディキャップのラウンド数は1以上を指定してください")
+        if self.best > self.rounds:
+            raise ValueError(f"ベストのラウンド数（{self.best}）が対象のラウンド数（{self.rounds}）を超えています")
+
+    @property
+    def key(self) -> str:
+        """player_handicaps.rule に保存する規則の識別子（規則が変わった行は作り直す）"""
+        return f"best{self.best}of{self.rounds}/par{self.par}"
+
+    def best_counts(self, counts: np.ndarray) -> np.ndarray:
+        """ラウンド数ごとに平均に使うラウンド数（rounds 未満の場合は同じ割合、最低1）"""
+        counts = np.asarray(counts)
+        return np.clip(np.ceil(counts * self.best / self.rounds), 1, self.best).astype(int)
+
+
+def _round_handicap(values: np.ndarray) -> np.ndarray:
+    # numeric(4,1) と同じく小数1桁に四捨五入する（np.round は偶数丸め）
+    return np.clip(np.floor(np.asarray(values, dtype=float) * 10 + 0.5) / 10, 0.0, HANDICAP_MAX)
+
+
+def rounds_frame(scores: Any, rule: HandicapRule) -> pd.DataFrame:
+    """スコア行（辞書のリストまたはデータフレーム）から、OUT/INが入力済みのラウンドと差を取り出す"""
+    frame = scores if isinstance(scores, pd.DataFrame) else pd.DataFrame(list(scores))
+    if frame.empty:
+        return pd.DataFrame(
+            {"player_id": pd.Series(dtype="int64"), "competition_id": pd.Series(dtype="int64"),
+             "date": pd.Series(dtype=object), "differential": pd.Series(dtype=float)}
+        )
+    out_scores = pd.to_numeric(frame["out_score"], errors="coerce")
+    in_scores = pd.to_numeric(frame["in_score"], errors="coerce")
+    complete = (out_scores > 0) & (in_scores > 0)
+    return pd.DataFrame({
+        "player_id": frame.loc[complete, "player_id"].astype("int64"),
+        "competition_id": frame.loc[complete, "competition_id"].astype("int64"),
+        "date": frame.loc[complete, "date"].astype(str).str[:10],
+        "differential": (out_scores + in_scores - rule.par)[complete].astype(float),
+    })
+
+
+def recent_rounds(scores: Any, rule: Optional[HandicapRule] = None) -> pd.DataFrame:
+    """プレイヤーごとの直近 rule.rounds ラウンド（新しい順）"""
+    rule = rule or HandicapRule()
+    frame = rounds_frame(scores, rule).sort_values(
+        ["player_id", "date", "competition_id"], ascending=[True, False, False], kind="mergesort"
+    )
+    return frame[frame.groupby("player_id").cumcount().to_numpy() < rule.rounds]
+
+
+def compute_handicaps(scores: Any, rule: Optional[HandicapRule] = None) -> pd.DataFrame:
+    """全プレイヤーのハンディキャップ（player_id, handicap, rounds_counted）をまとめて計算"""
+    rule = rule or HandicapRule()
+    return _window_handicaps(recent_rounds(scores, rule), rule)
+
+
+def _window_handicaps(window: pd.DataFrame, rule: HandicapRule) -> pd.DataFrame:
+    """recent_rounds() の結果からハンディキャップを計算"""
+    if window.empty:
+        return pd.DataFrame({column: pd.Series(dtype="int64" if column != "handicap" else float) for column in HANDICAP_COLUMNS})
+
+    counts = window.groupby("player_id")["differential"].transform("size").to_numpy()
+    ordered = window.assign(take=rule.best_counts(counts)).sort_values(
+        ["player_id", "differential"], kind="mergesort"
+    )
+    best = ordered[ordered.groupby("player_id").cumcount().to_numpy() < ordered["take"].to_numpy()]
+    averages = best.groupby("player_id")["differential"].mean()
+    rounds_counted = window.groupby("player_id").size().reindex(averages.index)
+    return pd.DataFrame({
+        "player_id": averages.index.to_numpy(),
+        "handicap": _round_handicap(averages.to_numpy()),
+        "rounds_counted": rounds_counted.to_numpy(),
+    })
+
+
+def _round_entry(competition_id: Any, date: Any, differential: Any) -> Dict[str, Any]:
+    return {"competition_id": int(competition_id), "date": str(date)[:10], "differential": float(differential)}
+
+
+def _is_blank(value: Any) -> bool:
+    # 未入力（None・NaN・0）のOUT/INはラウンドに数えない
+    return value is None or (isinstance(value, float) and math.isnan(value)) or value <= 0
+
+
+def _recency(entry: Mapping[str, Any]) -> Tuple[str, int]:
+    return str(entry["date"]), int(entry["competition_id"])
+
+
+def apply_round(
+    window: Sequence[Mapping[str, Any]],
+    score: Mapping[str, Any],
+    rule: Optional[HandicapRule] = None,
+) -> Optional[List[Dict[str, Any]]]:
+    """直近ラウンド（新しい順）に保存したスコア1行を反映（作り直しが必要な場合は None）
+
+    同じコンペの行は置き換え、直近 rule.rounds ラウンドより古いラウンドは無視する。
+    """
+    rule = rule or HandicapRule()
+    out_score, in_score = score.get("out_score"), score.get("in_score")
+    if _is_blank(out_score) or _is_blank(in_score):
+        return remove_round(window, score["competition_id"], rule)
+
+    entry = _round_entry(score["competition_id"], score["date"], int(out_score) + int(in_score) - rule.par)
+    rounds = [dict(item) for item in window if int(item["competition_id"]) != entry["competition_id"]]
+    if len(rounds) == len(window) and len(rounds) >= rule.rounds and _recency(entry) < _recency(rounds[-1]):
+        return [dict(item) for item in window]
+    rounds.append(entry)
+    rounds.sort(key=_recency, reverse=True)
+    return rounds[:rule.rounds]
+
+
+def remove_round(
+    window: Sequence[Mapping[str, Any]],
+    competition_id: Any,
+    rule: Optional[HandicapRule] = None,
+) -> Optional[List[Dict[str, Any]]]:
+    """直近ラウンドから削除したスコアを除く
+
+    直近 rule.rounds ラウンドが揃っていた場合は、次に古いラウンドが分からないため None（作り直しが必要）を返す。
+    """
+    rule = rule or HandicapRule()
+    rounds = [dict(item) for item in window if int(item["competition_id"]) != int(competition_id)]
+    if len(rounds) < len(window) and len(window) >= rule.rounds:
+        return None
+    return rounds
+
+
+def window_handicap(window: Sequence[Mapping[str, Any]], rule: Optional[HandicapRule] = None) -> Optional[float]:
+    """直近ラウンドからハンディキャップを計算（ラウンドが無い場合は None）"""
+    rule = rule or HandicapRule()
+    if not window:
+        return None
+    differentials = np.sort(np.array([float(item["differential"]) for item in window[:rule.rounds]]))
+    take = int(rule.best_counts(np.array([len(differentials)]))[0])
+    return float(_round_handicap(differentials[:take].mean()))
+
+
+def handicap_row(player_id: int, window: Sequence[Mapping[str, Any]], rule: HandicapRule) -> Dict[str, Any]:
+    """player_handicaps に保存する1行"""
+    return {
+        "player_id": int(player_id),
+        "handicap": window_handicap(window, rule),
+        "rounds_counted": len(window),
+        "recent_rounds": [dict(item) for item in window],
+        "rule": rule.key,
+    }
+
+
+def handicap_rows(scores: Any, player_ids: Iterable[int], rule: Optional[HandicapRule] = None) -> List[Dict[str, Any]]:
+    """指定したプレイヤー全員分の player_handicaps の行（ラウンドが無いプレイヤーは handicap が None）
+
+    ハンディキャップは compute_handicaps と同じくまとめて計算し、プレイヤーごとの処理は recent_rounds の組み立てだけにする。
+    """
+    rule = rule or HandicapRule()
+    window = recent_rounds(scores, rule)
+    handicaps = _window_handicaps(window, rule)
+    values = dict(zip(handicaps["player_id"].tolist(), zip(handicaps["handicap"].tolist(), handicaps["rounds_counted"].tolist())))
+
+    entries = window[["competition_id", "date", "differential"]].to_dict("records")
+    windows = {
+        int(player_id): [entries[position] for position in positions]
+        for player_id, positions in window.groupby("player_id", sort=False).indices.items()
+    }
+    rows = []
+    for player_id in player_ids:
+        handicap, rounds_counted = values.get(int(player_id), (None, 0))
+        rows.append({
+            "player_id": int(player_id),
+            "handicap": handicap,
+            "rounds_counted": int(rounds_counted),
+            "recent_rounds": windows.get(int(player_id), []),
+            "rule": rule.key,
+        })
+    return rows
+
+
+def is_missing_table(error: Exception) -> bool:
+    """player_handicaps テーブルが無い（マイグレーション 0013 未適用）エラーかどうか"""
+    return getattr(error, "code", None) in ("PGRST205", "42P01")
+
+
+def load_player_handicaps(supabase) -> Dict[int, float]:
+    """保存済みのハンディキャップ（プレイヤーID → ハンディキャップ）"""
+    from paginated_reader import fetch_all_rows
+
+    rows = fetch_all_rows(supabase, "player_handicaps", "player_id, handicap", order_key="player_id")
+    return {int(row["player_id"]): float(row["handicap"]) for row in rows if row.get("handicap") is not None}
+
+
+def refresh_player_handicaps(
+    supabase,
+    scores: Sequence[Mapping[str, Any]],
+    removed: Sequence[Tuple[int, int]] = (),
+    rule: Optional[HandicapRule] = None,
+) -> Dict[int, Optional[float]]:
+    """保存したスコア行と削除した (コンペID, プレイヤーID) の対象プレイヤーの player_handicaps を更新
+
+    関数 refresh_player_handicaps（マイグレーション 0014）がある場合は、プレイヤーごとのロックを取ってから
+    サーバー側で直近ラウンドを読み直して保存する（並行して保存したラウンドを取りこぼさない）。
+    関数が無い場合は、保存したスコアを保存済みの直近ラウンドに反映し、1回の upsert で保存する
+    （保存済みの行が無い・規則が変わった・直近ラウンドが欠けたプレイヤーだけは、そのプレイヤーのスコアから作り直す）。
+    """
+    rule = rule or HandicapRule()
+    player_ids = sorted({int(score["player_id"]) for score in scores} | {int(player_id) for _, player_id in removed})
+    if not player_ids:
+        return {}
+
+    try:
+        response = supabase.rpc(
+            "refresh_player_handicaps",
+            {
+                "p_player_ids": player_ids,
+                "p_rounds": rule.rounds,
+                "p_best": rule.best,
+                "p_par": rule.par,
+                "p_max": HANDICAP_MAX,
+                "p_rule": rule.key,
+            },
+        ).execute()
+    except Exception as e:
+        if getattr(e, "code", None) not in ("PGRST202", "42883"):
+            raise
+        return _merge_player_handicaps(supabase, player_ids, scores, removed, rule)
+    return {
+        int(row["player_id"]): None if row.get("handicap") is None else float(row["handicap"])
+        for row in response.data or []
+    }
+
+
+def _merge_player_handicaps(
+    supabase,
+    player_ids: Sequence[int],
+    scores: Sequence[Mapping[str, Any]],
+    removed: Sequence[Tuple[int, int]],
+    rule: HandicapRule,
+) -> Dict[int, Optional[float]]:
+    """保存済みの直近ラウンドを読んでアプリ側で更新し、1回の upsert で保存（マイグレーション 0014 未適用時）"""
+    from paginated_reader import fetch_all_rows
+
+    response = supabase.table("player_handicaps").select("player_id, recent_rounds, rule").in_("player_id", player_ids).execute()
+    stored = {int(row["player_id"]): row for row in response.data or []}
+    windows: Dict[int, Optional[List[Dict[str, Any]]]] = {
+        player_id: list(stored[player_id].get("recent_rounds") or [])
+        for player_id in player_ids
+        if player_id in stored and stored[player_id].get("rule") == rule.key
+    }
+    for score in scores:
+        player_id = int(score["player_id"])
+        if windows.get(player_id) is not None:
+            windows[player_id] = apply_round(windows[player_id], score, rule)
+    for competition_id, player_id in removed:
+        if windows.get(int(player_id)) is not None:
+            windows[int(player_id)] = remove_round(windows[int(player_id)], competition_id, rule)
+
+    rows = [handicap_row(player_id, window, rule) for player_id, window in windows.items() if window is not None]
+    rebuild = [player_id for player_id in player_ids if windows.get(player_id) is None]
+    if rebuild:
+        logging.info(f"ハンディキャップをスコアから作り直します: {rebuild}")
+        history = fetch_all_rows(
+            supabase, "scores", ", ".join(ROUND_COLUMNS),
+            modify=lambda query: query.in_("player_id", rebuild),
+        )
+        rows += handicap_rows(history, rebuild, rule)
+
+    supabase.table("player_handicaps").upsert(rows, on_conflict="player_id").execute()
+    return {row["player_id"]: row["handicap"] for row in rows}
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+ホール別スコア
+scores.hole_scores（SMALLINT[18]、マイグレーション 0011）をラウンド数 × 18 の NumPy 配列として扱う
+
+- hole_matrix: 取得した配列（またはNone）のリストを (ラウンド数, 18) の float 配列に変換（未入力は NaN）
+- half_totals: 前半・後半の合計（OUT/IN）を配列の集計でまとめて計算
+- hole_summary: ホールごとの平均・ベスト・ラウンド数（統計用）
+"""
+
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+HOLE_COUNT = 18
+HALF_HOLES = 9
+# 1ホールの打数の上限（scores_hole_scores_check と同じ）
+HOLE_SCORE_MAX = 20
+
+# 入力グリッドの列名
+HOLE_COLUMNS = tuple(f"{hole}H" for hole in range(1, HOLE_COUNT + 1))
+
+
+def hole_matrix(values: Iterable[Optional[Sequence[Any]]]) -> np.ndarray:
+    """ラウンドごとのホール別スコアを (ラウンド数, 18) の配列に変換（None のラウンド・ホールは NaN）"""
+    blank = [None] * HOLE_COUNT
+    rows = [blank if holes is None else list(holes) for holes in values]
+    if not rows:
+        return np.empty((0, HOLE_COUNT))
+    matrix = np.array(rows, dtype=float)
+    if matrix.ndim != 2 or matrix.shape[1] != HOLE_COUNT:
+        raise ValueError(f"hole scores must have {HOLE_COUNT} holes")
+    return matrix
+
+
+def complete_rounds(matrix: np.ndarray) -> np.ndarray:
+    """18ホールすべて入力されたラウンドかどうか"""
+    return ~np.isnan(matrix).any(axis=1)
+
+
+def invalid_holes(matrix: np.ndarray) -> np.ndarray:
+    """入力値が不正なホール（整数でない・1〜HOLE_SCORE_MAXの範囲外）かどうか"""
+    with np.errstate(invalid="ignore"):
+        return ~np.isnan(matrix) & ((matrix % 1 != 0) | (matrix < 1) | (matrix > HOLE_SCORE_MAX))
+
+
+def half_totals(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """前半（1〜9H）・後半（10〜18H）の合計を返す（未入力のホールがある場合は NaN）"""
+    halves = matrix.reshape(-1, 2, HALF_HOLES).sum(axis=2)
+    return halves[:, 0], halves[:, 1]
+
+
+def to_db_array(holes: Sequence[Any]) -> Optional[List[int]]:
+    """1ラウンド分を保存用のリスト（Python の int）に変換（未入力のホールがある場合は None）"""
+    row = np.asarray(holes, dtype=float)
+    if row.shape != (HOLE_COUNT,) or np.isnan(row).any():
+        return None
+    return [int(value) for value in row]
+
+
+def matches_totals(holes: Optional[Sequence[Any]], out_score: Any, in_score: Any) -> bool:
+    """ホール別スコアの前半・後半の合計が OUT/IN と一致するかどうか"""
+    if holes is None or out_score is None or in_score is None:
+        return False
+    out_total, in_total = half_totals(hole_matrix([holes]))
+    return bool(out_total[0] == out_score and in_total[0] == in_score)
+
+
+def hole_summary(matrix: np.ndarray) -> pd.DataFrame:
+    """ホールごとの平均打数・ベスト・入力済みのラウンド数"""
+    rounds = (~np.isnan(matrix)).sum(axis=0)
+    totals = np.nansum(matrix, axis=0)
+    averages = np.where(rounds > 0, totals / np.maximum(rounds, 1), np.nan)
+    best = np.where(np.isnan(matrix), np.inf, matrix).min(axis=0, initial=np.inf)
+    best = np.where(rounds > 0, best, np.nan)
+    return pd.DataFrame(
+        {"ホール": np.arange(1, HOLE_COUNT + 1), "平均": averages.round(2), "ベスト": best, "ラウンド数": rounds}
+    )
@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""
+ライブ速報の順位表
+ラウンド中のコンペの順位表をメモリ上に保持し、スコアの変更分だけを反映する
+
+- ScoreChangeFeed: PostgreSQL の LISTEN/NOTIFY（チャンネル score_changes、マイグレーション 0009）を
+  バックグラウンドのスレッドで受信し、該当するコンペの順位表に変更行を反映する（DATABASE_URL が必要）
+- PollingScoreFeed: 直接接続できない環境向け。scores のバージョン（件数と最大updated_at）だけを確認し、
+  変わった場合にそのコンペの行だけを取得し直す
+- 画面側は st.fragment(run_every=...) で順位表の部分だけを定期的に再実行する
+"""
+
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Mapping
+
+import pandas as pd
+import streamlit as st
+
+from ranking import compute_rankings
+from timestamps import parse_timestamp
+
+SCORE_CHANGES_CHANNEL = "score_changes"
+LIVE_LEADERBOARD_INTERVAL_SECONDS = float(os.getenv("LIVE_LEADERBOARD_INTERVAL_SECONDS", "3"))
+
+# 順位表に使うカラム（scores_with_players ビューのカラム名）
+LIVE_LEADERBOARD_COLUMNS = (
+    "id",
+    "competition_id",
+    "player_id",
+    "player_name",
+    "out_score",
+    "in_score",
+    "handicap",
+    "net_score",
+    "updated_at",
+)
+
+# 読み込み関数：コンペID → そのコンペのスコア行
+RowLoader = Callable[[int], Iterable[Mapping[str, Any]]]
+
+
+def _timestamp(value: Any) -> datetime:
+    """updated_at（ISO形式またはPostgreSQLのテキスト形式）を比較用に変換"""
+    if isinstance(value, datetime):
+        return value
+    if not value:
+        return datetime.min.replace(tzinfo=timezone.utc)
+    return parse_timestamp(value)
+
+
+class LiveLeaderboard:
+    """1つのコンペの順位表（プレイヤーID → スコア行）"""
+
+    def __init__(self, competition_id: int):
+        self.competition_id = competition_id
+        self.version = 0
+        self.needs_reload = True
+        self._rows: Dict[int, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def load(self, rows: Iterable[Mapping[str, Any]]) -> None:
+        """コンペの全行で置き換える（読み込み中に通知で反映した、より新しい行は残す）"""
+        loaded = {int(row["player_id"]): dict(row) for row in rows}
+        with self._lock:
+            for player_id, current in self._rows.items():
+                row = loaded.get(player_id)
+                if row is not None and _timestamp(current.get("updated_at")) > _timestamp(row.get("updated_at")):
+                    loaded[player_id] = current
+            self._rows = loaded
+            self.version += 1
+
+    def apply(self, change: Mapping[str, Any]) -> bool:
+        """score_changes の通知1件を反映し、順位表が変わったかどうかを返す"""
+        if change.get("reload"):
+            self.needs_reload = True
+            return True
+
+        changed = False
+        with self._lock:
+            for row in change.get("rows") or ():
+                player_id = int(row["player_id"])
+                current = self._rows.get(player_id)
+                if row.get("deleted"):
+                    # 同じプレイヤーの行が作り直された後の古い削除通知は無視する
+                    if current is not None and current.get("id") == row.get("id"):
+                        del self._rows[player_id]
+                        changed = True
+                    continue
+                # 読み込み直後に届いた古い通知で、新しい値を上書きしない
+                if current is not None and _timestamp(current.get("updated_at")) > _timestamp(row.get("updated_at")):
+                    continue
+                self._rows[player_id] = dict(row)
+                changed = True
+            if changed:
+                self.version += 1
+        return changed
+
+    def rows(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(row) for row in self._rows.values()]
+
+    def standings(self) -> pd.DataFrame:
+        """現在の順位表（スコア入力画面と同じ規則で順位を計算）"""
+        rows = [row for row in self.rows() if row.get("out_score") is not None and row.get("in_score") is not None]
+        if not rows:
+            return pd.DataFrame()
+        rankings = compute_rankings(rows)
+        standings = pd.DataFrame([
+            {
+                "順位": rankings[int(row["player_id"])],
+                "プレイヤー名": row.get("player_name") or "不明",
+                "OUT": row.get("out_score"),
+                "IN": row.get("in_score"),
+                "グロス": int(row["out_score"]) + int(row["in_score"]),
+                "ハンディ": row.get("handicap"),
+                "ネット": row.get("net_score"),
+            }
+            for row in rows
+        ])
+        return standings.sort_values(["順位", "プレイヤー名"]).reset_index(drop=True)
+
+
+class _FeedBase:
+    """コンペごとの順位表を保持し、必要に応じて読み込み直す"""
+
+    def __init__(self, loader: RowLoader):
+        self.loader = loader
+        self._boards: Dict[int, LiveLeaderboard] = {}
+        self._lock = threading.Lock()
+
+    def board(self, competition_id: int) -> LiveLeaderboard:
+        """コンペの順位表を取得（初回や再読み込みが必要な場合はコンペの行を取得）"""
+        with self._lock:
+            board = self._boards.get(competition_id)
+            if board is None:
+                board = self._boards[competition_id] = LiveLeaderboard(competition_id)
+        self.refresh(board)
+        return board
+
+    def refresh(self, board: LiveLeaderboard) -> None:
+        if board.needs_reload:
+            self._reload(board)
+
+    def _reload(self, board: LiveLeaderboard) -> None:
+        # 読み込み中に届いた再読み込みの指示は、次回の refresh で反映する
+        board.needs_reload = False
+        try:
+            board.load(self.loader(board.competition_id))
+        except Exception:
+            board.needs_reload = True
+            raise
+
+    def close(self) -> None:
+        pass
+
+
+class ScoreChangeFeed(_FeedBase):
+    """LISTEN score_changes を専用の接続で待ち受け、順位表に変更行を反映する"""
+
+    mode = "listen"
+
+    def __init__(self, conninfo: str, loader: RowLoader, poll_timeout: float = 1.0, **connect_kwargs: Any):
+        super().__init__(loader)
+        self.conninfo = conninfo
+        self.connect_kwargs = connect_kwargs
+        self.poll_timeout = poll_timeout
+        self._stopped = threading.Event()
+        self._listening = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="score-change-feed", daemon=True)
+        self._thread.start()
+        # 待ち受け開始前の変更を取りこぼさないよう、LISTEN してから順位表を読み込む
+        self._listening.wait(timeout=10)
+
+    @property
+    def listening(self) -> bool:
+        return self._listening.is_set()
+
+    def dispatch(self, payload: str) -> None:
+        try:
+            change = json.loads(payload)
+        except ValueError:
+            logging.warning(f"score_changes の通知を解析できません: {payload[:200]}")
+            return
+        board = self._boards.get(change.get("competition_id"))
+        if board is not None:
+            board.apply(change)
+
+    def _mark_all_stale(self) -> None:
+        with self._lock:
+            boards = list(self._boards.values())
+        for board in boards:
+            board.needs_reload = True
+
+    def _run(self) -> None:
+        import psycopg
+
+        backoff = 1.0
+        while not self._stopped.is_set():
+            try:
+                with psycopg.connect(self.conninfo, autocommit=True, **self.connect_kwargs) as connection:
+                    connection.execute(f"LISTEN {SCORE_CHANGES_CHANNEL}")
+                    # 再接続した場合は、切断中の変更を反映するため全コンペを読み込み直す
+                    self._mark_all_stale()
+                    self._listening.set()
+                    backoff = 1.0
+                    while not self._stopped.is_set():
+                        for notify in connection.notifies(timeout=self.poll_timeout):
+                            self.dispatch(notify.payload)
+            except Exception as e:
+                self._listening.clear()
+                if self._stopped.is_set():
+                    break
+                logging.warning(f"score_changes の待ち受けに失敗しました（{backoff:.0f}秒後に再接続）: {e}")
+                self._stopped.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    def close(self) -> None:
+        self._stopped.set()
+        self._thread.join(timeout=self.poll_timeout + 5)
+
+
+class PollingScoreFeed(_FeedBase):
+    """scores のバージョンが変わった場合だけ、表示中のコンペの行を取得し直す"""
+
+    mode = "polling"
+
+    def __init__(self, loader: RowLoader, version_probe: Callable[[], Any]):
+        super().__init__(loader)
+        self.version_probe = version_probe
+        self._versions: Dict[int, Any] = {}
+
+    def refresh(self, board: LiveLeaderboard) -> None:
+        version = self.version_probe()
+        if board.needs_reload or self._versions.get(board.competition_id) != version:
+            self._reload(board)
+            self._versions[board.competition_id] = version
+
+
+def competition_row_loader(backend) -> RowLoader:
+    """データアクセスバックエンドからコンペの行を取得する読み込み関数"""
+
+    def load(competition_id: int) -> List[Dict[str, Any]]:
+        return backend.fetch_all_rows(
+            "scores_with_players", LIVE_LEADERBOARD_COLUMNS, filters=[("competition_id", "eq", competition_id)]
+        )
+
+    return load
+
+
+@st.cache_resource
+def get_score_change_feed():
+    """ライブ速報用のフィードを取得（プロセス全体で共有）
+
+    DATABASE_URL がある場合は LISTEN/NOTIFY、待ち受けできない場合（PgBouncer のトランザクションモードなど）は
+    scores のバージョン確認による取得に切り替える
+    """
+    from data_backend import get_data_backend, resolve_database_url
+
+    backend = get_data_backend()
+    if backend is None:
+        return None
+    loader = competition_row_loader(backend)
+
+    database_url = resolve_database_url()
+    if database_url:
+        feed = ScoreChangeFeed(database_url, loader)
+        if feed.listening:
+            return feed
+        feed.close()
+        logging.warning("score_changes を待ち受けできないため、バージョン確認による更新を使用します")
+    return PollingScoreFeed(loader, lambda: backend.table_version("scores"))
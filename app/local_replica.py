@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+"""
+分析画面用ローカルレプリカ
+スコア（scores_with_players ビュー）をローカルのSQLiteファイルに複製し、
+集計・優勝回数ランキング・個人成績・競技結果一覧の各画面はリモートのAPIではなくこのファイルを参照する
+
+- 環境変数 LOCAL_REPLICA_PATH を指定した場合のみ有効
+- 管理者の書き込み（invalidate()）で古いとみなし、次回の参照時に取得し直す
+- 他のプロセス・管理ツールからの書き込みに備え、LOCAL_REPLICA_PROBE_SECONDS ごとにテーブルのバージョン（件数と最大updated_at）を確認し、
+  前回取得時から変わっていれば取得し直す（data_cache と同じ確認方法）
+- 書き込みがなくても LOCAL_REPLICA_REFRESH_SECONDS ごとに取得し直す
+- 取得に失敗した場合（Supabaseの障害時など）は、前回取得したデータをそのまま使用する
+- 絞り込みと集計はSQLで行い、画面に必要な行・集計結果だけをデータフレームにする
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import pandas as pd
+
+from data_cache import DEFAULT_TTL_SECONDS, add_invalidation_listener
+from score_frames import SCORE_COLUMN_LABELS, UNKNOWN_PLAYER_NAME, build_scores_frame
+
+LOCAL_REPLICA_PATH = os.getenv("LOCAL_REPLICA_PATH", "").strip()
+LOCAL_REPLICA_REFRESH_SECONDS = float(os.getenv("LOCAL_REPLICA_REFRESH_SECONDS", "3600"))
+# バージョン確認の間隔（秒）。既定はプロセス共有キャッシュのTTLと同じ
+LOCAL_REPLICA_PROBE_SECONDS = float(os.getenv("LOCAL_REPLICA_PROBE_SECONDS", str(DEFAULT_TTL_SECONDS)))
+
+# 複製するカラム（scores_with_players ビューのカラム名）
+REPLICA_COLUMNS = ("id",) + tuple(SCORE_COLUMN_LABELS)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    id INTEGER PRIMARY KEY,
+    competition_id INTEGER,
+    date TEXT,
+    course TEXT,
+    player_name TEXT,
+    out_score INTEGER,
+    in_score INTEGER,
+    gross_score INTEGER,
+    handicap REAL,
+    net_score REAL,
+    ranking INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_scores_player_name ON scores (player_name);
+CREATE INDEX IF NOT EXISTS idx_scores_date ON scores (date);
+CREATE INDEX IF NOT EXISTS idx_scores_ranking ON scores (ranking);
+CREATE TABLE IF NOT EXISTS replica_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# 総合ランキングの対象とする合計スコアの最小値（display_aggregations と同じ条件）
+MIN_VALID_GROSS_SCORE = 50
+
+
+class LocalReplica:
+    """SQLiteファイルに複製したスコアデータ"""
+
+    def __init__(
+        self,
+        path: str,
+        refresh_interval: float = LOCAL_REPLICA_REFRESH_SECONDS,
+        probe_interval: float = LOCAL_REPLICA_PROBE_SECONDS,
+    ):
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self.probe_interval = probe_interval
+        self.stale = False
+        # 最後にバージョンを確認した時刻（time.monotonic()、未確認の場合はNone）
+        self._probed_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=10)
+
+    def refreshed_at(self) -> Optional[float]:
+        """最後に取得した時刻（UNIX時間、未取得の場合はNone）"""
+        with closing(self._connect()) as connection:
+            row = connection.execute("SELECT value FROM replica_meta WHERE key = 'refreshed_at'").fetchone()
+        return float(row[0]) if row else None
+
+    def stored_version(self) -> Optional[str]:
+        """最後に取得したときのテーブルのバージョン（JSON文字列）"""
+        with closing(self._connect()) as connection:
+            row = connection.execute("SELECT value FROM replica_meta WHERE key = 'version'").fetchone()
+        return row[0] if row else None
+
+    def has_data(self) -> bool:
+        return self.refreshed_at() is not None
+
+    def needs_refresh(self) -> bool:
+        refreshed_at = self.refreshed_at()
+        return self.stale or refreshed_at is None or time.time() - refreshed_at >= self.refresh_interval
+
+    def _probe_version(self, version_probe: Optional[Callable[[], Any]], force: bool = False) -> Optional[str]:
+        """probe_interval ごとにバージョンを確認する（間隔内・確認に失敗した場合はNone）"""
+        now = time.monotonic()
+        due = force or self._probed_at is None or now - self._probed_at >= self.probe_interval
+        if version_probe is None or not due:
+            return None
+        self._probed_at = now
+        try:
+            version = version_probe()
+        except Exception as e:
+            logging.warning(f"ローカルレプリカのバージョンを確認できません: {e}")
+            return None
+        return None if version is None else json.dumps(version, default=str)
+
+    def replace_rows(self, rows: Sequence[Dict[str, Any]], version: Optional[str] = None) -> None:
+        """レプリカの内容を rows で置き換える（1トランザクションで行い、読み込み側は常に一貫した状態を参照する）"""
+        # プレイヤー名が無い行は、fetch_scores() と同じく「不明」として集計する
+        values = [
+            tuple(
+                (row.get(column) or UNKNOWN_PLAYER_NAME) if column == "player_name" else row.get(column)
+                for column in REPLICA_COLUMNS
+            )
+            for row in rows
+        ]
+        placeholders = ", ".join("?" for _ in REPLICA_COLUMNS)
+        with closing(self._connect()) as connection:
+            with connection:
+                connection.execute("DELETE FROM scores")
+                connection.executemany(
+                    f"INSERT INTO scores ({', '.join(REPLICA_COLUMNS)}) VALUES ({placeholders})", values
+                )
+                connection.execute(
+                    "INSERT OR REPLACE INTO replica_meta (key, value) VALUES ('refreshed_at', ?)",
+                    (str(time.time()),),
+                )
+                if version is not None:
+                    connection.execute(
+                        "INSERT OR REPLACE INTO replica_meta (key, value) VALUES ('version', ?)", (version,)
+                    )
+
+    def ensure_fresh(
+        self,
+        loader: Callable[[], Sequence[Dict[str, Any]]],
+        version_probe: Optional[Callable[[], Any]] = None,
+    ) -> bool:
+        """必要に応じて loader() で取得し直す。取得に失敗しても前回のデータがあればTrueを返す
+
+        version_probe を指定すると、その戻り値が前回取得時と異なる場合も取得し直す
+        """
+        with self._lock:
+            # 取得中の書き込みは次回の確認で検出されるよう、バージョンを先に確認する
+            needs_refresh = self.needs_refresh()
+            version = self._probe_version(version_probe, force=needs_refresh)
+            if needs_refresh or (version is not None and version != self.stored_version()):
+                # 取得中の書き込みで古いとみなされた場合は、次回もう一度取得する
+                self.stale = False
+                try:
+                    self.replace_rows(loader(), version)
+                    self.last_error = None
+                except Exception as e:
+                    self.stale = True
+                    self.last_error = str(e)
+                    logging.warning(f"ローカルレプリカを更新できません（前回のデータを使用します）: {e}")
+            return self.has_data()
+
+    def _read(self, query: str, params: Sequence[Any] = ()) -> pd.DataFrame:
+        with closing(self._connect()) as connection:
+            return pd.read_sql_query(query, connection, params=list(params))
+
+    def scores_frame(
+        self,
+        columns: Sequence[str] = tuple(SCORE_COLUMN_LABELS),
+        year: Optional[str] = None,
+        month: Optional[str] = None,
+        course: Optional[str] = None,
+        player_name: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """条件に一致するスコアを fetch_scores() と同じ形式（表示用カラム名）で返す"""
+        conditions: List[str] = []
+        params: List[Any] = []
+        if year is not None:
+            conditions.append("substr(date, 1, 4) = ?")
+            params.append(year)
+        if month is not None:
+            conditions.append("substr(date, 6, 2) = ?")
+            params.append(month)
+        if course is not None:
+            conditions.append("course = ?")
+            params.append(course)
+        if player_name is not None:
+            conditions.append("player_name = ?")
+            params.append(player_name)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        frame = self._read(f"SELECT * FROM scores{where} ORDER BY id", params)
+        return build_scores_frame(frame.drop(columns="id"), columns)
+
+    def years(self) -> List[str]:
+        frame = self._read("SELECT DISTINCT substr(date, 1, 4) AS year FROM scores WHERE date IS NOT NULL ORDER BY year")
+        return frame["year"].tolist()
+
+    def months(self, year: Optional[str] = None) -> List[str]:
+        query = "SELECT DISTINCT substr(date, 6, 2) AS month FROM scores WHERE substr(date, 6, 2) <> ''"
+        params: List[Any] = []
+        if year is not None:
+            query += " AND substr(date, 1, 4) = ?"
+            params.append(year)
+        return self._read(query + " ORDER BY month", params)["month"].tolist()
+
+    def courses(self) -> List[str]:
+        frame = self._read("SELECT DISTINCT course FROM scores WHERE course IS NOT NULL ORDER BY course")
+        return frame["course"].tolist()
+
+    def average_gross_by_player(self) -> pd.Series:
+        """プレイヤーごとの平均合計スコア（低い順）"""
+        frame = self._read(
+            """
+            SELECT player_name AS "プレイヤー名", AVG(gross_score) AS "合計スコア"
+            FROM scores
+            WHERE gross_score >= ? AND out_score > 0 AND in_score > 0
+            GROUP BY player_name
+            ORDER BY AVG(gross_score), player_name
+            """,
+            (MIN_VALID_GROSS_SCORE,),
+        )
+        return frame.set_index("プレイヤー名")["合計スコア"]
+
+    def winner_counts(self, year: Optional[str] = None) -> pd.DataFrame:
+        """プレイヤーごとの優勝回数（多い順）"""
+        query = 'SELECT player_name AS "プレイヤー名", COUNT(*) AS "優勝回数" FROM scores WHERE ranking = 1'
+        params: List[Any] = []
+        if year is not None:
+            query += " AND substr(date, 1, 4) = ?"
+            params.append(year)
+        query += " GROUP BY player_name ORDER BY COUNT(*) DESC, MIN(id)"
+        return self._read(query, params)
+
+    def participation_counts(self) -> pd.Series:
+        """プレイヤーごとの参加回数（多い順）"""
+        frame = self._read(
+            """
+            SELECT player_name, COUNT(*) AS count
+            FROM scores
+            GROUP BY player_name
+            ORDER BY COUNT(*) DESC, MIN(id)
+            """
+        )
+        return frame.set_index("player_name")["count"]
+
+
+_replica_lock = threading.Lock()
+_replica: Optional[LocalReplica] = None
+
+
+def get_local_replica() -> Optional[LocalReplica]:
+    """設定されたローカルレプリカを取得（LOCAL_REPLICA_PATH が未設定の場合はNone）"""
+    global _replica
+    if not LOCAL_REPLICA_PATH:
+        return None
+    with _replica_lock:
+        if _replica is None:
+            try:
+                _replica = LocalReplica(LOCAL_REPLICA_PATH)
+            except (OSError, sqlite3.Error) as e:
+                logging.warning(f"ローカルレプリカを開けません（{LOCAL_REPLICA_PATH}）: {e}")
+                return None
+        return _replica
+
+
+def _on_invalidate(tables) -> None:
+    # スコアまたはプレイヤー名の変更時は、次回の参照時に取得し直す
+    if _replica is not None and (not tables or "scores" in tables or "players" in tables):
+        _replica.stale = True
+
+
+add_invalidation_listener(_on_invalidate)
@@ -0,0 +1,481 @@
+# -*- coding: utf-8 -*-
+"""
+スコア入力の送信待ちキュー（オフライン対応）
+コース上など通信が不安定な環境でも、スコアの登録をローカルのSQLiteファイル（WALモード）に即座に記録し、
+バックグラウンドのスレッドがまとめてSupabaseに送信する
+
+- 環境変数 OFFLINE_QUEUE_PATH を指定した場合のみ有効
+- (competition_id, player_id) ごとに最新の値だけを保持し、送信前に上書きされた古い編集は送らない
+- 送信はコンペ単位のバッチで save_competition_scores（差分モード）を1回呼び出し、rerank_competition（マイグレーション 0007）で
+  コンペの順位をサーバー側で付け直す（端末ごとに計算した順位は他の端末のスコアを含まないため、そのまま残さない）
+- スコア入力画面は通信できない場合（再送すれば成功しうるエラー）と、未送信の変更が残っているコンペの保存だけをキューに登録する
+- 失敗したバッチは指数バックオフ（OFFLINE_QUEUE_RETRY_SECONDS から最大 OFFLINE_QUEUE_MAX_BACKOFF_SECONDS）で再送する
+- 再送しても成功しないエラー（制約違反・不正な値など）で失敗したバッチは1件ずつ送り直し、
+  OFFLINE_QUEUE_MAX_ATTEMPTS 回失敗した行は送信失敗の一覧（failed_scores）に移す（同じコンペの後続の送信を止めない）。
+  一覧の行は画面から破棄するか、送信待ちに戻す
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence
+
+OFFLINE_QUEUE_PATH = os.getenv("OFFLINE_QUEUE_PATH", "").strip()
+OFFLINE_QUEUE_BATCH_SIZE = int(os.getenv("OFFLINE_QUEUE_BATCH_SIZE", "200"))
+OFFLINE_QUEUE_FLUSH_SECONDS = float(os.getenv("OFFLINE_QUEUE_FLUSH_SECONDS", "5"))
+OFFLINE_QUEUE_RETRY_SECONDS = float(os.getenv("OFFLINE_QUEUE_RETRY_SECONDS", "2"))
+OFFLINE_QUEUE_MAX_BACKOFF_SECONDS = float(os.getenv("OFFLINE_QUEUE_MAX_BACKOFF_SECONDS", "300"))
+OFFLINE_QUEUE_MAX_ATTEMPTS = int(os.getenv("OFFLINE_QUEUE_MAX_ATTEMPTS", "5"))
+
+# 再送しても結果が変わらないエラーの SQLSTATE クラス（22: 不正な値、23: 制約違反、42: 構文・未定義のオブジェクト）
+PERMANENT_SQLSTATE_CLASSES = ("22", "23", "42")
+# 4xx のうち、時間をおけば成功しうるもの（認証の期限切れ・タイムアウト・流量制限）
+RETRYABLE_HTTP_STATUSES = (401, 403, 408, 429)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pending_scores (
+    competition_id INTEGER NOT NULL,
+    player_id INTEGER NOT NULL,
+    record TEXT,
+    revision INTEGER NOT NULL,
+    queued_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    PRIMARY KEY (competition_id, player_id)
+);
+CREATE INDEX IF NOT EXISTS idx_pending_scores_next_attempt ON pending_scores (next_attempt_at);
+CREATE TABLE IF NOT EXISTS failed_scores (
+    competition_id INTEGER NOT NULL,
+    player_id INTEGER NOT NULL,
+    record TEXT,
+    revision INTEGER NOT NULL,
+    queued_at REAL NOT NULL,
+    attempts INTEGER NOT NULL,
+    failed_at REAL NOT NULL,
+    last_error TEXT,
+    PRIMARY KEY (competition_id, player_id)
+);
+CREATE TABLE IF NOT EXISTS queue_meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# 送信関数：(コンペID, 保存する行, 削除するプレイヤーID) を受け取り、失敗時は例外を送出する
+Sender = Callable[[int, List[Dict[str, Any]], List[int]], Any]
+
+
+@dataclass
+class PendingScore:
+    """送信待ちの1件（record が None の場合はそのプレイヤーの行の削除）"""
+
+    competition_id: int
+    player_id: int
+    record: Optional[Dict[str, Any]]
+    revision: int
+    attempts: int = 0
+    last_error: Optional[str] = None
+
+
+@dataclass
+class FlushResult:
+    sent: int = 0
+    failed: int = 0
+    batches: int = 0
+    # 送信失敗の一覧に移した件数
+    dead: int = 0
+
+
+@dataclass
+class QueueStatus:
+    pending: int = 0
+    failing: int = 0
+    last_error: Optional[str] = None
+    # 送信失敗の一覧の件数
+    dead: int = 0
+
+
+def retry_delay(attempts: int) -> float:
+    """attempts 回目の失敗後に次の送信まで待つ秒数（指数バックオフ）"""
+    return min(OFFLINE_QUEUE_RETRY_SECONDS * (2 ** max(attempts - 1, 0)), OFFLINE_QUEUE_MAX_BACKOFF_SECONDS)
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """通信障害・サーバーの一時的なエラーなど、再送すれば成功しうるエラーかどうか"""
+    # psycopg は sqlstate、PostgREST（APIError）は code に SQLSTATE または PGRSTxxx を持つ
+    code = str(getattr(error, "sqlstate", None) or getattr(error, "code", None) or "")
+    if code[:2] in PERMANENT_SQLSTATE_CLASSES or code.startswith("PGRST1"):
+        return False
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status, int) and 400 <= status < 500 and status not in RETRYABLE_HTTP_STATUSES:
+        return False
+    return True
+
+
+def _json_default(value: Any) -> Any:
+    # numpy の数値型や日付は JSON の値に変換して保存する
+    return value.item() if hasattr(value, "item") else str(value)
+
+
+class OfflineScoreQueue:
+    """SQLiteファイルに保存する送信待ちのスコア"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=10)
+        # WALモードでは NORMAL でもコミット済みの内容はアプリの異常終了で失われない
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def enqueue(
+        self,
+        competition_id: int,
+        records: Sequence[Mapping[str, Any]],
+        deleted_player_ids: Sequence[int] = (),
+    ) -> int:
+        """保存する行と削除するプレイヤーを記録し、件数を返す（同じプレイヤーの送信待ちは新しい値で置き換える）"""
+        entries = [(int(record["player_id"]), json.dumps(dict(record), default=_json_default)) for record in records]
+        entries += [(int(player_id), None) for player_id in deleted_player_ids]
+        if not entries:
+            return 0
+
+        now = time.time()
+        with self._lock, closing(self._connect()) as connection:
+            with connection:
+                row = connection.execute(
+                    "INSERT INTO queue_meta (key, value) VALUES ('revision', 1)"
+                    " ON CONFLICT (key) DO UPDATE SET value = value + 1 RETURNING value"
+                ).fetchone()
+                revision = int(row[0])
+                connection.executemany(
+                    """
+                    INSERT INTO pending_scores (competition_id, player_id, record, revision, queued_at)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (competition_id, player_id) DO UPDATE SET
+                        record = excluded.record,
+                        revision = excluded.revision,
+                        queued_at = excluded.queued_at,
+                        attempts = 0,
+                        next_attempt_at = 0,
+                        last_error = NULL
+                    """,
+                    [(int(competition_id), player_id, record, revision, now) for player_id, record in entries],
+                )
+                # 送信に失敗した古い値は、新しい値で置き換える
+                connection.executemany(
+                    "DELETE FROM failed_scores WHERE competition_id = ? AND player_id = ?",
+                    [(int(competition_id), player_id) for player_id, _ in entries],
+                )
+        return len(entries)
+
+    def pending(self, competition_id: Optional[int] = None) -> List[PendingScore]:
+        """送信待ちの一覧（コンペ・登録順）"""
+        query = "SELECT competition_id, player_id, record, revision, attempts, last_error FROM pending_scores"
+        params: List[Any] = []
+        if competition_id is not None:
+            query += " WHERE competition_id = ?"
+            params.append(int(competition_id))
+        with closing(self._connect()) as connection:
+            rows = connection.execute(query + " ORDER BY competition_id, queued_at, player_id", params).fetchall()
+        return [_pending_score(row) for row in rows]
+
+    def status(self) -> QueueStatus:
+        with closing(self._connect()) as connection:
+            pending, failing = connection.execute(
+                "SELECT count(*), coalesce(sum(attempts > 0), 0) FROM pending_scores"
+            ).fetchone()
+            row = connection.execute(
+                "SELECT last_error FROM pending_scores WHERE last_error IS NOT NULL ORDER BY next_attempt_at DESC LIMIT 1"
+            ).fetchone()
+            dead = connection.execute("SELECT count(*) FROM failed_scores").fetchone()[0]
+        return QueueStatus(pending=int(pending), failing=int(failing), last_error=row[0] if row else None, dead=int(dead))
+
+    def failed(self, competition_id: Optional[int] = None) -> List[PendingScore]:
+        """送信失敗の一覧（コンペ・登録順）"""
+        query = "SELECT competition_id, player_id, record, revision, attempts, last_error FROM failed_scores"
+        params: List[Any] = []
+        if competition_id is not None:
+            query += " WHERE competition_id = ?"
+            params.append(int(competition_id))
+        with closing(self._connect()) as connection:
+            rows = connection.execute(query + " ORDER BY competition_id, queued_at, player_id", params).fetchall()
+        return [_pending_score(row) for row in rows]
+
+    def discard_failed(self, entries: Optional[Sequence[PendingScore]] = None) -> int:
+        """送信失敗の一覧から削除し、件数を返す（entries を省略した場合はすべて）"""
+        with self._lock, closing(self._connect()) as connection:
+            with connection:
+                if entries is None:
+                    return connection.execute("DELETE FROM failed_scores").rowcount
+                return connection.executemany(
+                    "DELETE FROM failed_scores WHERE competition_id = ? AND player_id = ? AND revision = ?",
+                    [(entry.competition_id, entry.player_id, entry.revision) for entry in entries],
+                ).rowcount
+
+    def requeue_failed(self, entries: Optional[Sequence[PendingScore]] = None) -> int:
+        """送信失敗の一覧の行を送信待ちに戻し、件数を返す（entries を省略した場合はすべて）"""
+        keys = None if entries is None else [(entry.competition_id, entry.player_id, entry.revision) for entry in entries]
+        with self._lock, closing(self._connect()) as connection:
+            with connection:
+                rows = connection.execute(
+                    "SELECT competition_id, player_id, record, revision, queued_at FROM failed_scores"
+                ).fetchall()
+                rows = [row for row in rows if keys is None or tuple(row[:2]) + (row[3],) in keys]
+                # 同じプレイヤーの新しい値が送信待ちにある場合はそちらを優先する
+                connection.executemany(
+                    """
+                    INSERT INTO pending_scores (competition_id, player_id, record, revision, queued_at)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (competition_id, player_id) DO NOTHING
+                    """,
+                    rows,
+                )
+                connection.executemany(
+                    "DELETE FROM failed_scores WHERE competition_id = ? AND player_id = ? AND revision = ?",
+                    [(row[0], row[1], row[3]) for row in rows],
+                )
+        return len(rows)
+
+    def due_batch(self, now: Optional[float] = None, limit: int = OFFLINE_QUEUE_BATCH_SIZE) -> Dict[int, List[PendingScore]]:
+        """送信時刻を過ぎた行をコンペごとにまとめて返す（1つのコンペの行は分割しない）"""
+        now = time.time() if now is None else now
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                """
+                SELECT competition_id, player_id, record, revision, attempts, last_error
+                FROM pending_scores
+                WHERE competition_id IN (
+                    SELECT competition_id FROM pending_scores
+                    GROUP BY competition_id
+                    HAVING max(next_attempt_at) <= ?
+                )
+                ORDER BY competition_id, queued_at, player_id
+                """,
+                (now,),
+            ).fetchall()
+
+        batches: Dict[int, List[PendingScore]] = {}
+        size = 0
+        for row in rows:
+            entry = _pending_score(row)
+            if entry.competition_id not in batches:
+                if batches and size >= limit:
+                    break
+                batches[entry.competition_id] = []
+            batches[entry.competition_id].append(entry)
+            size += 1
+        return batches
+
+    def complete(self, entries: Sequence[PendingScore]) -> None:
+        """送信済みの行を削除（送信中に新しい値で置き換えられた行は残す）"""
+        with self._lock, closing(self._connect()) as connection:
+            with connection:
+                connection.executemany(
+                    "DELETE FROM pending_scores WHERE competition_id = ? AND player_id = ? AND revision = ?",
+                    [(entry.competition_id, entry.player_id, entry.revision) for entry in entries],
+                )
+
+    def fail(
+        self,
+        entries: Sequence[PendingScore],
+        error: str,
+        now: Optional[float] = None,
+        retryable: bool = True,
+    ) -> int:
+        """送信に失敗した行の再送時刻を、失敗回数に応じて遅らせる
+
+        retryable=False の場合、OFFLINE_QUEUE_MAX_ATTEMPTS 回失敗した行は送信失敗の一覧に移し、その件数を返す
+        """
+        now = time.time() if now is None else now
+        dead = [entry for entry in entries if not retryable and entry.attempts + 1 >= OFFLINE_QUEUE_MAX_ATTEMPTS]
+        retry = [entry for entry in entries if entry not in dead]
+        with self._lock, closing(self._connect()) as connection:
+            with connection:
+                connection.executemany(
+                    """
+                    UPDATE pending_scores
+                    SET attempts = attempts + 1, next_attempt_at = ?, last_error = ?
+                    WHERE competition_id = ? AND player_id = ? AND revision = ?
+                    """,
+                    [
+                        (now + retry_delay(entry.attempts + 1), error[:500], entry.competition_id, entry.player_id, entry.revision)
+                        for entry in retry
+                    ],
+                )
+                # 送信中に新しい値で置き換えられた行は移さない
+                keys = [(entry.competition_id, entry.player_id, entry.revision) for entry in dead]
+                connection.executemany(
+                    """
+                    INSERT OR REPLACE INTO failed_scores
+                        (competition_id, player_id, record, revision, queued_at, attempts, failed_at, last_error)
+                    SELECT competition_id, player_id, record, revision, queued_at, attempts + 1, ?, ?
+                    FROM pending_scores
+                    WHERE competition_id = ? AND player_id = ? AND revision = ?
+                    """,
+                    [(now, error[:500], *key) for key in keys],
+                )
+                connection.executemany(
+                    "DELETE FROM pending_scores WHERE competition_id = ? AND player_id = ? AND revision = ?", keys
+                )
+        return len(dead)
+
+    def retry_now(self) -> None:
+        """再送待ちの行を、バックオフを待たずに次回の送信対象にする"""
+        with self._lock, closing(self._connect()) as connection:
+            with connection:
+                connection.execute("UPDATE pending_scores SET next_attempt_at = 0 WHERE next_attempt_at > 0")
+
+    def flush(self, send: Sender, now: Optional[float] = None, limit: int = OFFLINE_QUEUE_BATCH_SIZE) -> FlushResult:
+        """送信時刻を過ぎた行をコンペごとに1回ずつ送信する"""
+        result = FlushResult()
+        for competition_id, entries in self.due_batch(now, limit).items():
+            result.batches += 1
+            self._send_batch(send, competition_id, entries, result, now)
+        return result
+
+    def _send_batch(
+        self,
+        send: Sender,
+        competition_id: int,
+        entries: Sequence[PendingScore],
+        result: FlushResult,
+        now: Optional[float],
+    ) -> None:
+        records = [entry.record for entry in entries if entry.record is not None]
+        deleted = [entry.player_id for entry in entries if entry.record is None]
+        try:
+            send(competition_id, records, deleted)
+        except Exception as e:
+            retryable = is_retryable_error(e)
+            if not retryable and len(entries) > 1:
+                # 1件ずつ送り直し、原因の行だけを残す（他の行は送信する）
+                for entry in entries:
+                    self._send_batch(send, competition_id, [entry], result, now)
+                return
+            result.dead += self.fail(entries, str(e), now, retryable=retryable)
+            result.failed += len(entries)
+            logging.warning(f"送信待ちのスコアを送信できません（コンペ {competition_id}、{len(entries)}件）: {e}")
+        else:
+            self.complete(entries)
+            result.sent += len(entries)
+
+
+def _pending_score(row: Sequence[Any]) -> PendingScore:
+    competition_id, player_id, record, revision, attempts, last_error = row
+    return PendingScore(
+        competition_id=int(competition_id),
+        player_id=int(player_id),
+        record=json.loads(record) if record is not None else None,
+        revision=int(revision),
+        attempts=int(attempts),
+        last_error=last_error,
+    )
+
+
+class QueueFlusher:
+    """送信待ちのキューを一定間隔（または登録時）にバックグラウンドで送信するスレッド"""
+
+    def __init__(self, queue: OfflineScoreQueue, send: Sender, interval: float = OFFLINE_QUEUE_FLUSH_SECONDS):
+        self.queue = queue
+        self.send = send
+        self.interval = interval
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="offline-score-queue", daemon=True)
+        self._thread.start()
+
+    def notify(self) -> None:
+        """すぐに送信を試みる"""
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wake.wait(timeout=self.interval)
+            self._wake.clear()
+            if self._stopped.is_set():
+                break
+            try:
+                self.queue.flush(self.send)
+            except Exception as e:
+                logging.warning(f"送信待ちのキューを処理できません: {e}")
+
+    def close(self) -> None:
+        self._stopped.set()
+        self._wake.set()
+        self._thread.join(timeout=self.interval + 5)
+
+
+_queue_lock = threading.Lock()
+_queue: Optional[OfflineScoreQueue] = None
+_flusher: Optional[QueueFlusher] = None
+
+
+def _send_to_supabase(competition_id: int, records: List[Dict[str, Any]], deleted_player_ids: List[int]) -> Any:
+    from data_cache import invalidate
+    from handicap import is_missing_table, refresh_player_handicaps
+    from ranking import rerank_competition
+    from score_writer import write_score_changes
+    from supabase_client import get_supabase_client
+
+    supabase = get_supabase_client()
+    if not supabase:
+        raise RuntimeError("Supabaseに接続できません")
+    try:
+        result = write_score_changes(supabase, competition_id, records, deleted_player_ids)
+        # 送信した順位は各端末が登録時の入力画面だけから計算した値のため、サーバー側で付け直す
+        # （付け直しに失敗した場合はバッチを再送し、送信と同じ順序で付け直す）
+        try:
+            rerank_competition(supabase, competition_id)
+        except Exception as e:
+            if getattr(e, "code", None) not in ("PGRST202", "42883"):
+                raise
+            logging.warning(f"関数 rerank_competition が無いため、送信したスコアの順位を付け直せません（コンペ {competition_id}）")
+    finally:
+        invalidate("scores")
+
+    # スコアは保存済みのため、ハンディキャップの更新に失敗してもバッチは再送しない
+    try:
+        refresh_player_handicaps(supabase, records, [(competition_id, player_id) for player_id in deleted_player_ids])
+    except Exception as e:
+        if not is_missing_table(e):
+            logging.warning(f"ハンディキャップを更新できません（コンペ {competition_id}）: {e}")
+    return result
+
+
+def get_offline_queue() -> Optional[OfflineScoreQueue]:
+    """設定された送信待ちキューを取得し、送信用のスレッドを開始（OFFLINE_QUEUE_PATH が未設定の場合はNone）"""
+    global _queue, _flusher
+    if not OFFLINE_QUEUE_PATH:
+        return None
+    with _queue_lock:
+        if _queue is None:
+            try:
+                _queue = OfflineScoreQueue(OFFLINE_QUEUE_PATH)
+            except (OSError, sqlite3.Error) as e:
+                logging.warning(f"送信待ちキューを開けません（{OFFLINE_QUEUE_PATH}）: {e}")
+                return None
+            _flusher = QueueFlusher(_queue, _send_to_supabase)
+        return _queue
+
+
+def flush_now(retry_failed: bool = False) -> None:
+    """送信用のスレッドにすぐ送信させる（retry_failed=True の場合は再送待ちの行もバックオフを待たずに送る）"""
+    if retry_failed and _queue is not None:
+        _queue.retry_now()
+    if _flusher is not None:
+        _flusher.notify()
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+ページ分割読み込み
+PostgRESTの最大行数（max-rows）で結果が切り捨てられないように、.range() で一定件数ずつテーブルを読み込む
+
+- iter_pages / iter_frames: ページ単位で行（またはデータフレーム）を返すジェネレータ
+- fetch_all_rows / fetch_all_frame: 全ページをまとめて返すヘルパー
+"""
+
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+# Supabase（PostgREST）の既定の max-rows と同じ値
+DEFAULT_PAGE_SIZE = 1000
+
+QueryModifier = Callable[[Any], Any]
+
+
+def iter_pages(
+    supabase,
+    table: str,
+    columns: str = "*",
+    modify: Optional[QueryModifier] = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    order_key: Optional[str] = "id",
+) -> Iterator[List[Dict[str, Any]]]:
+    """テーブルを page_size 件ずつ読み込み、ページごとの行リストを返す
+
+    Args:
+        supabase: Supabaseクライアント
+        table: テーブル名（ビュー名も可）
+        columns: 取得するカラム（select句）
+        modify: フィルタや並び順を追加する関数（クエリを受け取りクエリを返す）
+        page_size: 1ページあたりの件数
+        order_key: ページ間で順序を安定させるための一意なカラム（Noneで付与しない）
+    """
+    if page_size <= 0:
+        raise ValueError("page_size must be positive")
+
+    start = 0
+    total: Optional[int] = None
+    while True:
+        # 件数は初回のみ取得し、サーバー側の max-rows が page_size より小さい場合にも最後まで読む
+        query = supabase.table(table).select(columns, count="exact" if total is None else None)
+        if modify is not None:
+            query = modify(query)
+        if order_key:
+            query = query.order(order_key)
+        response = query.range(start, start + page_size - 1).execute()
+
+        if total is None:
+            total = response.count
+        rows = response.data or []
+        if not rows:
+            return
+        yield rows
+
+        start += len(rows)
+        if total is not None and start >= total:
+            return
+        if total is None and len(rows) < page_size:
+            return
+
+
+def iter_frames(
+    supabase,
+    table: str,
+    columns: str = "*",
+    modify: Optional[QueryModifier] = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    order_key: Optional[str] = "id",
+) -> Iterator[pd.DataFrame]:
+    """iter_pages と同じ条件で、ページごとのデータフレームを返す"""
+    for rows in iter_pages(supabase, table, columns, modify, page_size, order_key):
+        yield pd.DataFrame(rows)
+
+
+def fetch_all_rows(
+    supabase,
+    table: str,
+    columns: str = "*",
+    modify: Optional[QueryModifier] = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    order_key: Optional[str] = "id",
+) -> List[Dict[str, Any]]:
+    """全ページの行をまとめてリストで返す"""
+    rows: List[Dict[str, Any]] = []
+    for page in iter_pages(supabase, table, columns, modify, page_size, order_key):
+        rows.extend(page)
+    return rows
+
+
+def fetch_all_frame(
+    supabase,
+    table: str,
+    columns: str = "*",
+    modify: Optional[QueryModifier] = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    order_key: Optional[str] = "id",
+) -> pd.DataFrame:
+    """全ページを1つのデータフレームにまとめて返す"""
+    return concat_frames(iter_frames(supabase, table, columns, modify, page_size, order_key))
+
+
+def concat_frames(frames) -> pd.DataFrame:
+    """ページごとのデータフレームを結合（全て欠損のページがあっても型を推論し直す）"""
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame()
+    if len(frames) == 1:
+        return frames[0]
+    return pd.concat(frames, ignore_index=True).infer_objects()
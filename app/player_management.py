@@ -1,11 +1,13 @@
 import streamlit as st
 import pandas as pd
 
+from data_cache import invalidate
+from paginated_reader import fetch_all_rows
+
 def fetch_players_data(supabase):
     """プレイヤー一覧を取得"""
     try:
-        response = supabase.table("players").select("*").order("id").execute()
-        return response.data
+        return fetch_all_rows(supabase, "players", "id, name, initial_handicap, affiliation")
     except Exception as e:
         st.error(f"プレイヤーデータの取得に失敗しました: {e}")
         return []
@@ -18,6 +20,7 @@ def add_player(supabase, name, initial_handicap, affiliation):
             "initial_handicap": initial_handicap,
             "affiliation": affiliation
         }).execute()
+        invalidate("players")
         return True, "プレイヤーを追加しました"
     except Exception as e:
         return False, f"プレイヤーの追加に失敗しました: {e}"
@@ -30,6 +33,7 @@ def update_player(supabase, player_id, name, initial_handicap, affiliation):
             "initial_handicap": initial_handicap,
             "affiliation": affiliation
         }).eq("id", player_id).execute()
+        invalidate("players")
         return True, "プレイヤー情報を更新しました"
     except Exception as e:
         return False, f"プレイヤー情報の更新に失敗しました: {e}"
@@ -43,6 +47,7 @@ def delete_player(supabase, player_id):
             return False, "このプレイヤーに関連するスコアが存在するため、削除できません。先にスコアを削除してください。"
 
         response = supabase.table("players").delete().eq("id", player_id).execute()
+        invalidate("players")
         return True, "プレイヤーを削除しました"
     except Exception as e:
         return False, f"プレイヤーの削除に失敗しました: {e}"
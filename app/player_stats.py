@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+プレイヤー成績サマリー
+個人成績ダッシュボードのサマリー・詳細統計に表示する値をまとめる
+
+- player_stats テーブル（マイグレーション 0004、scores への書き込み時にトリガーで更新）の1行から作成する
+- テーブルが無い環境では、従来どおりプレイヤーのスコア行から計算する
+"""
+
+import math
+from dataclasses import dataclass
+from typing import Any, Mapping
+
+import pandas as pd
+
+# player_stats から取得するカラム
+PLAYER_STATS_COLUMNS = (
+    "player_id",
+    "participation_count",
+    "avg_net",
+    "best_net",
+    "worst_net",
+    "stddev_net",
+    "avg_gross",
+    "best_gross",
+    "win_count",
+    "top3_count",
+    "course_net_averages",
+)
+
+
+@dataclass
+class PlayerSummary:
+    participation_count: int
+    avg_net: float
+    avg_gross: float
+    best_net: float
+    worst_net: float
+    stddev_net: float
+    best_gross: float
+    win_count: int
+    top3_count: int
+    # コース名 → 平均ネット（低い順）
+    course_net_averages: pd.Series
+
+
+def _to_float(value: Any) -> float:
+    """欠損値（None）は pandas の集計結果と同じくNaNとして扱う"""
+    if value is None:
+        return math.nan
+    return float(value)
+
+
+def summarize_player_scores(player_data: pd.DataFrame) -> PlayerSummary:
+    """プレイヤーのスコア行（表示用カラム名）から集計する"""
+    return PlayerSummary(
+        participation_count=len(player_data),
+        avg_net=player_data['ネットスコア'].mean(),
+        avg_gross=player_data['合計スコア'].mean(),
+        best_net=player_data['ネットスコア'].min(),
+        worst_net=player_data['ネットスコア'].max(),
+        stddev_net=player_data['ネットスコア'].std(),
+        best_gross=player_data['合計スコア'].min(),
+        win_count=int((player_data['順位'] == 1).sum()),
+        top3_count=int((player_data['順位'] <= 3).sum()),
+        course_net_averages=player_data.groupby('コース')['ネットスコア'].mean().sort_values(),
+    )
+
+
+def summary_from_stats_row(row: Mapping[str, Any]) -> PlayerSummary:
+    """player_stats の1行から作成する"""
+    course_averages = row.get("course_net_averages") or {}
+    return PlayerSummary(
+        participation_count=int(row.get("participation_count") or 0),
+        avg_net=_to_float(row.get("avg_net")),
+        avg_gross=_to_float(row.get("avg_gross")),
+        best_net=_to_float(row.get("best_net")),
+        worst_net=_to_float(row.get("worst_net")),
+        stddev_net=_to_float(row.get("stddev_net")),
+        best_gross=_to_float(row.get("best_gross")),
+        win_count=int(row.get("win_count") or 0),
+        top3_count=int(row.get("top3_count") or 0),
+        course_net_averages=pd.Series(course_averages, dtype="float64").sort_values(),
+    )
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+コンペ順位の計算
+ネットスコアなどのタイブレーク順で並べ、同順位を RANK（1,1,3）または DENSE_RANK（1,1,2）で扱う
+
+- サーバー側の関数 competition_rankings / rerank_competition（マイグレーション 0007）と同じ規則で計算する
+- 数値は DB に保存される桁数（小数2桁、四捨五入）で比較し、未入力（NULL）は最後に並べる
+"""
+
+import os
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any, Dict, Iterable, Mapping, Optional, Sequence, Tuple
+
+# タイブレークに使えるキー（すべて小さいほど上位）
+RANKING_KEYS = ("net_score", "handicap", "in_score", "out_score", "gross_score")
+RANKING_METHODS = ("competition", "dense")
+DEFAULT_TIEBREAK = ("net_score", "handicap")
+
+# タイブレーク順（カンマ区切り）と同順位の扱い
+RANKING_TIEBREAK = tuple(
+    key.strip() for key in os.getenv("RANKING_TIEBREAK", ",".join(DEFAULT_TIEBREAK)).split(",") if key.strip()
+)
+RANKING_METHOD = os.getenv("RANKING_METHOD", "competition").strip().lower()
+
+_NUMERIC_KEYS = ("net_score", "handicap")
+_TWO_PLACES = Decimal("0.01")
+
+
+def validate_ranking_rule(tiebreak: Sequence[str], method: str) -> None:
+    """タイブレーク順と同順位の扱いが正しいか確認（不正な場合は ValueError）"""
+    if not tiebreak:
+        raise ValueError("タイブレーク順が指定されていません")
+    unknown = [key for key in tiebreak if key not in RANKING_KEYS]
+    if unknown:
+        raise ValueError(f"不明なタイブレークキー: {', '.join(unknown)}")
+    if method not in RANKING_METHODS:
+        raise ValueError(f"不明な順位の付け方: {method}")
+
+
+def _key_value(row: Mapping[str, Any], key: str) -> Optional[Any]:
+    if key == "gross_score":
+        out_score, in_score = row.get("out_score"), row.get("in_score")
+        if out_score is None or in_score is None:
+            return None
+        return int(out_score) + int(in_score)
+    value = row.get(key)
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    if key in _NUMERIC_KEYS:
+        # numeric(…,2) に保存したときと同じ値で比較する
+        return Decimal(str(value)).quantize(_TWO_PLACES, rounding=ROUND_HALF_UP)
+    return int(value)
+
+
+def _sort_key(row: Mapping[str, Any], tiebreak: Sequence[str]) -> Tuple[Any, ...]:
+    # 昇順・NULLは最後（PostgreSQL の ASC NULLS LAST と同じ）
+    key = []
+    for name in tiebreak:
+        value = _key_value(row, name)
+        key.append((value is None, value if value is not None else 0))
+    return tuple(key)
+
+
+def compute_rankings(
+    rows: Iterable[Mapping[str, Any]],
+    tiebreak: Optional[Sequence[str]] = None,
+    method: Optional[str] = None,
+) -> Dict[Any, int]:
+    """スコア行（player_id と各スコア）からプレイヤーID → 順位を計算"""
+    tiebreak = tuple(tiebreak or RANKING_TIEBREAK)
+    method = method or RANKING_METHOD
+    validate_ranking_rule(tiebreak, method)
+
+    keyed = sorted(((_sort_key(row, tiebreak), row["player_id"]) for row in rows), key=lambda item: item[0])
+    rankings: Dict[Any, int] = {}
+    previous = None
+    rank = 0
+    for position, (key, player_id) in enumerate(keyed, start=1):
+        if key != previous:
+            rank = position if method == "competition" else rank + 1
+            previous = key
+        rankings[player_id] = rank
+    return rankings
+
+
+def rerank_competition(
+    supabase,
+    competition_id: int,
+    tiebreak: Optional[Sequence[str]] = None,
+    method: Optional[str] = None,
+) -> int:
+    """登録済みスコアの順位をサーバー側で再計算し、順位が変わった行数を返す"""
+    tiebreak = tuple(tiebreak or RANKING_TIEBREAK)
+    method = method or RANKING_METHOD
+    validate_ranking_rule(tiebreak, method)
+
+    response = supabase.rpc(
+        "rerank_competition",
+        {"p_competition_id": competition_id, "p_tiebreak": list(tiebreak), "p_method": method},
+    ).execute()
+    return int(response.data or 0)
@@ -8,9 +8,14 @@
 機能:
 - コンペ選択と参加メンバーの表示
 - スコア入力（OUT/INスコア、ハンディキャップ）
+- ホール別スコアの一括入力（18ホールのグリッド、OUT/INは前半・後半の合計）
 - グロススコア・ネットスコアの自動計算
 - 順位の自動計算
 - スコアの登録と更新
+- スコアカード（CSV / Excel）の一括取り込み
+- 送信待ちキュー（OFFLINE_QUEUE_PATH 指定時）：通信が不安定でも登録を即座に受け付け、バックグラウンドで送信
+- 同時編集の競合確認：読み込み後に他の管理者が保存した行は上書きせず、どちらの値を残すかを選んで再保存
+- ハンディキャップ：直近の成績から計算した値（player_handicaps）を初期値にし、保存後に対象プレイヤーの値を更新
 
 使用方法:
 1. 入力対象のコンペを選択します
@@ -20,13 +25,49 @@
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 import os
-from dotenv import load_dotenv
-from supabase import create_client
 import datetime
 import pytz
 import matplotlib
 import platform
+import logging
+import sqlite3
+
+from data_cache import invalidate
+from hole_scores import (
+    HOLE_COLUMNS,
+    HOLE_SCORE_MAX,
+    complete_rounds,
+    half_totals,
+    hole_matrix,
+    invalid_holes,
+    matches_totals,
+    to_db_array,
+)
+from paginated_reader import fetch_all_frame, fetch_all_rows
+from handicap import is_missing_table, load_player_handicaps, refresh_player_handicaps
+from offline_queue import flush_now, get_offline_queue, is_retryable_error
+from ranking import compute_rankings
+from score_writer import (
+    SaveResult,
+    build_score_records,
+    diff_score_records,
+    import_score_records,
+    resolve_conflicts,
+    save_competition_scores,
+    score_baseline,
+)
+from scorecard_import import (
+    GROSS_SCORE_LOW,
+    GROSS_SCORE_MAX,
+    HALF_SCORE_MAX,
+    HANDICAP_MAX,
+    ScorecardFormatError,
+    read_scorecard,
+    scorecard_template,
+)
+from supabase_client import get_supabase_client
 
 # 環境に応じたフォント設定
 if platform.system() == 'Windows':
@@ -36,18 +77,15 @@ elif platform.system() == 'Darwin':  # Macの場合
 else:  # Linux（Streamlit Cloud含む）
     matplotlib.rcParams['font.family'] = 'IPAexGothic'
 
-# 環境変数の読み込み
-load_dotenv()
+# スコアの入力方法
+TOTAL_INPUT_MODE = "合計（OUT / IN）"
+HOLE_INPUT_MODE = "ホール別"
+SCORE_INPUT_MODES = (TOTAL_INPUT_MODE, HOLE_INPUT_MODE)
 
-# Supabase接続情報の取得
-try:
-    # まずStreamlit secretsを試す
-    SUPABASE_URL = st.secrets.get("supabase", {}).get("url", "")
-    SUPABASE_KEY = st.secrets.get("supabase", {}).get("key", "")
-except Exception:
-    # 次に環境変数を試す
-    SUPABASE_URL = os.getenv("SUPABASE_URL", "")
-    SUPABASE_KEY = os.getenv("SUPABASE_KEY", "")
+# 同時編集の競合の解決方法
+CONFLICT_KEEP_MINE = "自分の入力で上書き"
+CONFLICT_TAKE_THEIRS = "保存済みの値を採用"
+CONFLICT_CHOICES = (CONFLICT_KEEP_MINE, CONFLICT_TAKE_THEIRS)
 
 # ログイン用のパスワード設定
 USER_PASSWORD = "88"
@@ -67,21 +105,6 @@ if "participants" not in st.session_state:
 if "score_data" not in st.session_state:
     st.session_state.score_data = {}
 
-def get_supabase_client():
-    """Supabaseクライアントを取得"""
-    if not SUPABASE_URL or not SUPABASE_KEY:
-        st.error("Supabase接続情報が設定されていません。.streamlit/secrets.tomlまたは.envファイルを確認してください。")
-        return None
-    
-    try:
-        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-        # 接続テスト
-        test_response = supabase.table("players").select("count").limit(1).execute()
-        return supabase
-    except Exception as e:
-        st.error(f"Supabase接続エラー: {e}")
-        return None
-
 def fetch_competitions():
     """コンペデータをSupabaseから取得"""
     supabase = get_supabase_client()
@@ -89,13 +112,16 @@ def fetch_competitions():
         return pd.DataFrame()
     
     try:
-        response = supabase.table("competitions").select("*").order('date', desc=True).execute()
+        competitions_df = fetch_all_frame(
+            supabase, "competitions", "competition_id, date, course",
+            modify=lambda query: query.order('date', desc=True),
+        )
         
-        if not response.data:
+        if competitions_df.empty:
             st.warning("コンペデータが見つかりません。")
             return pd.DataFrame()
         
-        return pd.DataFrame(response.data)
+        return competitions_df
     except Exception as e:
         st.error(f"コンペデータ取得エラー: {e}")
         return pd.DataFrame()
@@ -107,13 +133,13 @@ def fetch_players():
         return pd.DataFrame()
     
     try:
-        response = supabase.table("players").select("*").order('name').execute()
+        players_df = fetch_all_frame(supabase, "players", "id, name, initial_handicap", modify=lambda query: query.order('name'))
         
-        if not response.data:
+        if players_df.empty:
             st.warning("プレイヤーデータが見つかりません。")
             return pd.DataFrame()
         
-        return pd.DataFrame(response.data)
+        return players_df
     except Exception as e:
         st.error(f"プレイヤーデータ取得エラー: {e}")
         return pd.DataFrame()
@@ -126,13 +152,14 @@ def fetch_participants(competition_id):
     
     try:
         # participantsテーブルから該当コンペの参加者を取得
-        response = supabase.table("participants").select("*").eq("competition_id", competition_id).execute()
+        by_competition = lambda query: query.eq("competition_id", competition_id)
+        participants = fetch_all_rows(supabase, "participants", "player_id", modify=by_competition)
         
-        if not response.data:
+        if not participants:
             # participantsテーブルにデータがない場合は、scoresテーブルから参加者を推定
-            scores_response = supabase.table("scores").select("player_id").eq("competition_id", competition_id).execute()
-            if scores_response.data:
-                player_ids = [score["player_id"] for score in scores_response.data]
+            scores_rows = fetch_all_rows(supabase, "scores", "player_id", modify=by_competition)
+            if scores_rows:
+                player_ids = [score["player_id"] for score in scores_rows]
                 # 重複を削除
                 player_ids = list(set(player_ids))
                 return player_ids
@@ -140,7 +167,7 @@ def fetch_participants(competition_id):
                 return []
         
         # participantsテーブルからplayer_idのリストを作成
-        return [participant["player_id"] for participant in response.data]
+        return [participant["player_id"] for participant in participants]
     except Exception as e:
         st.error(f"参加者データ取得エラー: {e}")
         return []
@@ -151,89 +178,485 @@ def fetch_existing_scores(competition_id):
     if not supabase:
         return pd.DataFrame()
     
+    columns = "player_id, date, course, out_score, in_score, handicap, net_score, ranking"
+    by_competition = lambda query: query.eq("competition_id", competition_id)
+    # version（0012）・hole_scores（0011）列が無い環境では、ある列だけを取得
+    optional_columns = [", hole_scores, version", ", hole_scores"]
+    for extra in optional_columns:
+        try:
+            return fetch_all_frame(supabase, "scores", columns + extra, modify=by_competition)
+        except Exception as column_error:
+            logging.warning(f"スコアの追加の列（{extra.lstrip(', ')}）を取得できません: {column_error}")
     try:
-        response = supabase.table("scores").select("*").eq("competition_id", competition_id).execute()
-        
-        if not response.data:
-            return pd.DataFrame()
-        
-        return pd.DataFrame(response.data)
+        return fetch_all_frame(supabase, "scores", columns, modify=by_competition)
     except Exception as e:
         st.error(f"スコアデータ取得エラー: {e}")
         return pd.DataFrame()
 
+def fetch_player_handicaps():
+    """直近の成績から計算したハンディキャップ（プレイヤーID → ハンディキャップ）を取得"""
+    supabase = get_supabase_client()
+    if not supabase:
+        return {}
+    
+    try:
+        return load_player_handicaps(supabase)
+    except Exception as e:
+        # player_handicaps が無い（マイグレーション 0013 未適用）環境では登録時のハンディキャップを使う
+        if not is_missing_table(e):
+            logging.warning(f"ハンディキャップを取得できません: {e}")
+        return {}
+
+def default_handicap(player_id):
+    """スコア未入力のプレイヤーのハンディキャップ（直近の成績から計算した値、無ければ登録時の値）"""
+    handicap = st.session_state.get("player_handicaps", {}).get(player_id)
+    if handicap is None:
+        players = st.session_state.get("players", pd.DataFrame())
+        if "initial_handicap" in players.columns:
+            matched = players.loc[players["id"] == player_id, "initial_handicap"].dropna()
+            handicap = matched.iloc[0] if not matched.empty else None
+    return float(handicap or 0.0)
+
+def update_handicaps(supabase, scores, removed=()):
+    """保存したスコアを対象プレイヤーのハンディキャップに反映（失敗してもスコアの保存結果は変えない）"""
+    try:
+        handicaps = refresh_player_handicaps(supabase, scores, removed)
+    except Exception as e:
+        if not is_missing_table(e):
+            st.warning(f"ハンディキャップの更新エラー: {e}")
+        return
+    current = st.session_state.get("player_handicaps", {})
+    current.update({player_id: handicap for player_id, handicap in handicaps.items() if handicap is not None})
+    st.session_state.player_handicaps = current
+
+def score_entry_values(score):
+    """スコア行から入力中のスコアデータ（1プレイヤー分）を作成"""
+    out_score = score.get("out_score", 0) or 0
+    in_score = score.get("in_score", 0) or 0
+    hole_scores = score.get("hole_scores")
+    return {
+        "out_score": out_score,
+        "in_score": in_score,
+        "handicap": score.get("handicap", 0) or 0,
+        "gross_score": out_score + in_score,
+        "net_score": score.get("net_score", 0) or 0,
+        "hole_scores": list(hole_scores) if isinstance(hole_scores, (list, tuple)) else None,
+    }
+
+def load_existing_scores(competition_id):
+    """既存のスコアを入力中のスコアデータに設定し、差分保存用のベースラインとして保持"""
+    existing_scores = fetch_existing_scores(competition_id)
+    rows = {row["player_id"]: row for row in existing_scores.to_dict("records")}
+    
+    # 送信待ちのスコアがあれば、サーバーの値より新しいものとして反映
+    queue = get_offline_queue()
+    if queue is not None:
+        for entry in queue.pending(competition_id):
+            if entry.record is None:
+                rows.pop(entry.player_id, None)
+            else:
+                rows[entry.player_id] = {**rows.get(entry.player_id, {}), **entry.record}
+    
+    # スコアデータの初期化
+    st.session_state.score_data = {}
+    
+    # 既存のスコアデータがあれば設定
+    if rows:
+        for score in rows.values():
+            st.session_state.get("score_data", {})[score["player_id"]] = score_entry_values(score)
+    
+    st.session_state.score_baseline = {
+        "competition_id": competition_id,
+        "rows": score_baseline(rows.values()),
+    }
+
 def calculate_rankings(scores_data):
-    """ネットスコアに基づいて順位を計算"""
+    """ネットスコアなどのタイブレーク順で順位を計算（同スコアは同順位、サーバー側の competition_rankings と同じ規則）"""
     if not scores_data:
         return {}
     
-    # スコアデータをネットスコアでソート
-    sorted_scores = sorted(
-        scores_data.items(),
-        key=lambda x: (x[1].get("net_score", float('inf')), x[1].get("handicap", 0))
+    return compute_rankings(
+        {"player_id": player_id, **score_info} for player_id, score_info in scores_data.items()
     )
-    
-    # 順位を割り当て
-    rankings = {}
-    for i, (player_id, _) in enumerate(sorted_scores):
-        rankings[player_id] = i + 1
-    
-    return rankings
 
 def save_scores(competition_id, scores_data, players_data):
-    """スコアデータをSupabaseに保存"""
+    """スコアデータをSupabaseに保存（変更のあった行だけを upsert し、保存結果の件数を返す）
+
+    送信待ちキューが有効な場合は変更分をキューに登録して即座に返し、送信はバックグラウンドで行う
+    """
+    competition_info = st.session_state.competitions[
+        st.session_state.get("competitions", pd.DataFrame())["competition_id"] == competition_id
+    ]
+    
+    if competition_info.empty:
+        st.error("コンペ情報が見つかりません。")
+        return None
+    
+    date = competition_info.iloc[0]["date"]
+    course = competition_info.iloc[0]["course"]
+    
+    # 順位を計算し、登録用の行を作成
+    rankings = calculate_rankings(scores_data)
+    records = build_score_records(competition_id, scores_data, date, course, rankings)
+    
+    if not records:
+        st.warning("登録するスコアデータがありません。")
+        return None
+    
+    # 読み込み時のベースラインとの差分（変更行と順位が変わった行）だけを送信
+    baseline = st.session_state.get("score_baseline") or {}
+    baseline_rows = baseline.get("rows") if baseline.get("competition_id") == competition_id else None
+    
+    # 送信待ちキューは通信できない場合だけ使い、通信できる場合は同時編集の確認つきで直接保存する
+    # （未送信の変更が残っているコンペは、古い変更が後から上書きしないよう続けてキューに登録する）
+    queue = get_offline_queue()
+    if queue is not None and queue.pending(competition_id):
+        return queue_scores(queue, competition_id, records, baseline_rows)
+    
     supabase = get_supabase_client()
     if not supabase:
-        return False
+        if queue is not None:
+            return queue_scores(queue, competition_id, records, baseline_rows)
+        return None
     
     try:
-        # 既存のスコアを削除
-        supabase.table("scores").delete().eq("competition_id", competition_id).execute()
-        
-        # データ登録用の辞書のリストを作成
-        records_to_insert = []
-        competition_info = st.session_state.competitions[
-            st.session_state.get("competitions", pd.DataFrame())["competition_id"] == competition_id
-        ]
-        
-        if competition_info.empty:
-            st.error("コンペ情報が見つかりません。")
-            return False
-        
-        date = competition_info.iloc[0]["date"]
-        course = competition_info.iloc[0]["course"]
-        
-        # 順位を計算
-        rankings = calculate_rankings(scores_data)
-        
-        for player_id, score_info in scores_data.items():
-            if score_info.get("out_score") is not None and score_info.get("in_score") is not None:
-                record = {
-                    "competition_id": competition_id,
-                    "player_id": player_id,
-                    "date": date,
-                    "course": course,
-                    "out_score": score_info.get("out_score"),
-                    "in_score": score_info.get("in_score"),
-                    "handicap": score_info.get("handicap", 0),
-                    "net_score": score_info.get("net_score", 0),
-                    "ranking": rankings.get(player_id, 0)
-                }
-                records_to_insert.append(record)
-        
-        # データを登録
-        if records_to_insert:
-            response = supabase.table("scores").insert(records_to_insert).execute()
-            return True
-        else:
-            st.warning("登録するスコアデータがありません。")
-            return False
-        
+        result = save_competition_scores(supabase, competition_id, records, baseline=baseline_rows)
     except Exception as e:
+        if queue is not None and is_retryable_error(e):
+            logging.warning(f"スコアを送信できないため送信待ちに登録します（コンペ {competition_id}）: {e}")
+            return queue_scores(queue, competition_id, records, baseline_rows)
         st.error(f"スコア登録エラー: {e}")
         import traceback
         st.error(traceback.format_exc())
-        return False
+        return None
+    finally:
+        # 一部が書き込まれた可能性もあるため、成否にかかわらずスコアのキャッシュを破棄
+        invalidate("scores")
+    
+    if result.touched:
+        saved_players = {record["player_id"] for record in records}
+        removed = [(competition_id, player_id) for player_id in (baseline_rows or {}) if player_id not in saved_players]
+        update_handicaps(supabase, records, removed)
+    return result
+
+def queue_scores(queue, competition_id, records, baseline_rows):
+    """変更のあった行だけを送信待ちキューに登録（同じプレイヤーの未送信の変更は最新の値で置き換わる）"""
+    changed, removed, unchanged = diff_score_records(records, (baseline_rows or {}).values())
+    try:
+        queue.enqueue(competition_id, changed, removed)
+    except sqlite3.Error as e:
+        st.error(f"送信待ちキューへの登録エラー: {e}")
+        return None
+    
+    # 送信前でも次回の差分に同じ変更を含めないよう、ベースラインを登録した値に進める
+    st.session_state.score_baseline = {"competition_id": competition_id, "rows": score_baseline(records)}
+    if changed or removed:
+        flush_now()
+    return SaveResult(upserted=len(changed), deleted=len(removed), unchanged=unchanged, queued=True)
+
+def offline_queue_status():
+    """送信待ちキューの件数と直近の送信エラーを表示"""
+    queue = get_offline_queue()
+    if queue is None:
+        return
+    
+    status = queue.status()
+    if status.dead:
+        failed_scores_section(queue)
+    if not status.pending:
+        return
+    
+    if status.failing:
+        st.warning(
+            f"📶 送信待ちのスコアが{status.pending}件あります（送信失敗 {status.failing}件: {status.last_error}）。"
+            "通信が回復すると自動で再送します。"
+        )
+    else:
+        st.info(f"📤 送信待ちのスコアが{status.pending}件あります。")
+    if st.button("今すぐ送信", key="flush_offline_queue"):
+        flush_now(retry_failed=True)
+        st.rerun()
+
+def failed_scores_section(queue):
+    """再送しても保存できなかった（制約違反など）送信待ちのスコアを表示し、破棄するか送信待ちに戻させる"""
+    failed = queue.failed()
+    players_df = st.session_state.get("players", pd.DataFrame())
+    players_dict = dict(zip(players_df["id"], players_df["name"])) if not players_df.empty else {}
+    
+    st.error(f"⚠️ 保存できなかったスコアが{len(failed)}件あります。内容を確認して破棄するか、修正後に送信待ちに戻してください。")
+    st.dataframe(
+        pd.DataFrame([
+            {
+                "競技ID": entry.competition_id,
+                "プレイヤー名": players_dict.get(entry.player_id, f"不明なプレイヤー({entry.player_id})"),
+                "内容": _conflict_summary(entry.record),
+                "失敗回数": entry.attempts,
+                "エラー": entry.last_error,
+            }
+            for entry in failed
+        ]),
+        hide_index=True,
+        use_container_width=True,
+    )
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("送信待ちに戻す", key="requeue_failed_scores"):
+            queue.requeue_failed(failed)
+            flush_now()
+            st.rerun()
+    with col2:
+        if st.button("破棄", key="discard_failed_scores"):
+            queue.discard_failed(failed)
+            st.rerun()
+
+def submit_scores(competition_id):
+    """入力中のスコアに基づいて順位を計算して保存し、結果を表示"""
+    result = save_scores(competition_id, st.session_state.get("score_data", {}), st.session_state.get("players", pd.DataFrame()))
+    if result is not None and result.conflicts:
+        st.session_state.score_conflicts = {"competition_id": competition_id, "conflicts": result.conflicts}
+        st.warning(
+            f"⚠️ 読み込み後に他の管理者が保存したスコアが{len(result.conflicts)}件あるため、登録を中止しました。"
+            "下の「同時編集の競合」でどちらの値を残すかを選んでください。"
+        )
+    elif result is not None and result.queued:
+        if result.touched:
+            st.success(
+                f"スコアを送信待ちに登録しました（追加・更新 {result.upserted}件、削除 {result.deleted}件）。"
+                "通信が回復すると自動で登録されます。"
+            )
+        else:
+            st.info("変更されたスコアはありません。")
+    elif result is not None:
+        if result.touched:
+            st.success(
+                f"スコアが正常に登録されました！（追加・更新 {result.upserted}件、削除 {result.deleted}件、変更なし {result.unchanged}件）"
+            )
+        else:
+            st.info("変更されたスコアはありません。")
+        # 最新のデータを再取得（次回の差分のベースラインも更新）
+        load_existing_scores(competition_id)
+    else:
+        st.error("スコア登録に失敗しました。もう一度お試しください。")
+
+def _conflict_summary(row):
+    if row is None:
+        return "削除"
+    return (
+        f"OUT {row.get('out_score')} / IN {row.get('in_score')} / "
+        f"HC {float(row.get('handicap') or 0):.1f} / ネット {float(row.get('net_score') or 0):.1f}"
+    )
+
+def apply_conflict_choices(competition_id):
+    """競合の選択を入力中のスコアとベースラインに反映し、再登録を予約（ボタンのコールバック）"""
+    pending = st.session_state.pop("score_conflicts", None)
+    if not pending:
+        return
+    conflicts = pending["conflicts"]
+    
+    # ベースラインを相手が保存した行（バージョン）に進めると、残した自分の入力はその上書きとして保存される
+    baseline = st.session_state.get("score_baseline") or {}
+    rows = baseline.get("rows") if baseline.get("competition_id") == competition_id else None
+    st.session_state.score_baseline = {"competition_id": competition_id, "rows": resolve_conflicts(rows or {}, conflicts)}
+    
+    score_data = st.session_state.get("score_data", {})
+    for conflict in conflicts:
+        choice = st.session_state.pop(f"conflict_choice_{conflict.player_id}", CONFLICT_KEEP_MINE)
+        if choice != CONFLICT_TAKE_THEIRS:
+            continue
+        if conflict.theirs is None:
+            score_data.pop(conflict.player_id, None)
+        else:
+            score_data[conflict.player_id] = score_entry_values(conflict.theirs)
+        # 入力欄を採用した値で作り直す
+        for prefix in ("out", "in", "hcp"):
+            st.session_state.pop(f"{prefix}_{conflict.player_id}", None)
+    st.session_state.pop(f"hole_grid_{competition_id}", None)
+    st.session_state.score_conflicts_resubmit = competition_id
+
+def score_conflict_section(competition_id, players_dict):
+    """保存時に競合した行について、自分の入力と他の管理者が保存した値を並べてどちらを残すかを選ばせる"""
+    if st.session_state.pop("score_conflicts_resubmit", None) == competition_id:
+        submit_scores(competition_id)
+    
+    pending = st.session_state.get("score_conflicts")
+    if not pending or pending.get("competition_id") != competition_id:
+        return
+    conflicts = pending["conflicts"]
+    
+    st.subheader("⚠️ 同時編集の競合")
+    st.caption("読み込み後に他の管理者が保存した行です。競合しなかった入力は、再登録の際にまとめて保存されます。")
+    st.dataframe(
+        pd.DataFrame([
+            {
+                "プレイヤー名": players_dict.get(conflict.player_id, f"不明なプレイヤー({conflict.player_id})"),
+                "自分の入力": _conflict_summary(conflict.mine),
+                "保存済みの値": _conflict_summary(conflict.theirs),
+            }
+            for conflict in conflicts
+        ]),
+        hide_index=True,
+        use_container_width=True,
+    )
+    for conflict in conflicts:
+        st.radio(
+            players_dict.get(conflict.player_id, f"不明なプレイヤー({conflict.player_id})"),
+            CONFLICT_CHOICES,
+            horizontal=True,
+            key=f"conflict_choice_{conflict.player_id}",
+        )
+    st.button("選択した内容で再登録", key="resolve_score_conflicts", on_click=apply_conflict_choices, args=(competition_id,))
+
+def hole_entry_form(competition_id, players_dict):
+    """ホール別スコアの入力グリッド（1プレイヤー1行・18ホール）
+
+    入力はフォームの送信時にまとめて反映し、OUT/IN・グロス・ネットは全プレイヤー分を配列で計算する
+    """
+    participants = list(st.session_state.get("participants", []))
+    score_data = st.session_state.get("score_data", {})
+    
+    grid = pd.DataFrame(
+        hole_matrix(score_data.get(player_id, {}).get("hole_scores") for player_id in participants),
+        columns=list(HOLE_COLUMNS),
+        index=participants,
+    )
+    grid.insert(0, "プレイヤー名", [players_dict.get(player_id, f"不明なプレイヤー({player_id})") for player_id in participants])
+    grid["ハンディキャップ"] = [
+        float(score_data.get(player_id, {}).get("handicap", default_handicap(player_id)) or 0.0) for player_id in participants
+    ]
+    
+    column_config = {
+        "プレイヤー名": st.column_config.TextColumn("プレイヤー名", disabled=True),
+        "ハンディキャップ": st.column_config.NumberColumn("HC", min_value=0.0, max_value=HANDICAP_MAX, step=0.1, format="%.1f"),
+    }
+    for column in HOLE_COLUMNS:
+        column_config[column] = st.column_config.NumberColumn(column, min_value=1, max_value=HOLE_SCORE_MAX, step=1, format="%d")
+    
+    with st.form("hole_entry_form"):
+        st.caption("18ホールすべてを入力したプレイヤーのスコアを登録します（OUT/INは前半・後半の合計）。")
+        edited = st.data_editor(
+            grid,
+            column_config=column_config,
+            hide_index=True,
+            num_rows="fixed",
+            use_container_width=True,
+            key=f"hole_grid_{competition_id}",
+        )
+        submit_button = st.form_submit_button("スコアを登録")
+    
+    if not submit_button:
+        return
+    
+    matrix = edited[list(HOLE_COLUMNS)].to_numpy(dtype=float)
+    handicaps = edited["ハンディキャップ"].fillna(0.0).to_numpy(dtype=float)
+    out_scores, in_scores = half_totals(matrix)
+    gross_scores = out_scores + in_scores
+    net_scores = gross_scores - handicaps
+    
+    complete = complete_rounds(matrix)
+    entered = ~np.isnan(matrix).all(axis=1)
+    names = edited["プレイヤー名"].to_numpy()
+    problems = [
+        (entered & ~complete, "未入力のホールがあります"),
+        (invalid_holes(matrix).any(axis=1), f"打数は1から{HOLE_SCORE_MAX}の範囲の整数で入力してください"),
+        (complete & (net_scores < 0), "ネットスコアがマイナスです。ハンディキャップを確認してください"),
+    ]
+    has_problem = False
+    for mask, message in problems:
+        if mask.any():
+            st.error(f"❌ {message}: {', '.join(names[mask])}")
+            has_problem = True
+    if has_problem:
+        return
+    
+    for position in np.flatnonzero(complete):
+        player_id = participants[position]
+        st.session_state.get("score_data", {})[player_id] = {
+            "out_score": int(out_scores[position]),
+            "in_score": int(in_scores[position]),
+            "handicap": float(handicaps[position]),
+            "gross_score": int(gross_scores[position]),
+            "net_score": float(net_scores[position]),
+            "hole_scores": to_db_array(matrix[position]),
+        }
+    submit_scores(competition_id)
+
+def import_scorecard(result):
+    """検証済みのスコアカードを1回の upsert で保存し、取り込んだコンペの順位を付け直す"""
+    supabase = get_supabase_client()
+    if not supabase:
+        st.error("Supabaseに接続できません。")
+        return None
+
+    try:
+        imported = import_score_records(supabase, result.records)
+    except Exception as e:
+        st.error(f"スコアカード取り込みエラー: {e}")
+        return None
+    finally:
+        invalidate("scores")
+    
+    update_handicaps(supabase, result.records)
+    return imported
+
+def scorecard_import_section():
+    """スコアカード（CSV / Excel）の一括取り込み"""
+    with st.expander("📥 スコアカードの一括取り込み（CSV / Excel）"):
+        st.caption("1行に「競技ID・プレイヤー名・OUT・IN・ハンディキャップ」を入力したファイルを取り込みます。複数のコンペをまとめて取り込めます。")
+        st.download_button(
+            "テンプレートをダウンロード",
+            scorecard_template(),
+            file_name="scorecard_template.csv",
+            mime="text/csv",
+        )
+        uploaded = st.file_uploader("スコアカードファイル", type=["csv", "xlsx", "xlsm", "xls"], key="scorecard_upload")
+        if uploaded is None:
+            return
+
+        # 同じファイルは再実行のたびに読み直さない
+        cached = st.session_state.get("scorecard_import")
+        if cached is None or cached[0] != uploaded.file_id:
+            try:
+                result = read_scorecard(
+                    uploaded,
+                    uploaded.name,
+                    st.session_state.get("players", pd.DataFrame()),
+                    st.session_state.get("competitions", pd.DataFrame()),
+                )
+            except ScorecardFormatError as e:
+                st.error(str(e))
+                return
+            except Exception as e:
+                st.error(f"スコアカード読み込みエラー: {e}")
+                return
+            st.session_state.scorecard_import = (uploaded.file_id, result)
+        result = st.session_state.scorecard_import[1]
+
+        st.write(f"{result.rows}行中 {len(result.records)}行を取り込めます（{len(result.competition_ids)}コンペ）")
+        if not result.errors.empty:
+            st.error(f"❌ エラーが{len(result.errors)}件あります。ファイルを修正してから再度アップロードしてください。")
+            st.dataframe(result.errors, use_container_width=True, hide_index=True)
+        if not result.warnings.empty:
+            st.warning(f"⚠️ 確認が必要な行が{len(result.warnings)}件あります。")
+            st.dataframe(result.warnings, use_container_width=True, hide_index=True)
+        if not result.records:
+            return
+
+        players_df = st.session_state.get("players", pd.DataFrame())
+        preview = pd.DataFrame(result.records)
+        preview.insert(2, "player_name", preview["player_id"].map(dict(zip(players_df["id"], players_df["name"]))))
+        st.dataframe(preview, use_container_width=True, hide_index=True)
+
+        if st.button("スコアカードを取り込む", disabled=not result.errors.empty):
+            summary = import_scorecard(result)
+            if summary is not None:
+                st.success(
+                    f"{summary.competitions}コンペのスコアを取り込みました！（追加・更新 {summary.upserted}件、順位の変更 {summary.reranked}件）"
+                )
+                st.session_state.pop("scorecard_import", None)
+                # 表示中のコンペが含まれていれば入力欄も最新の値にする
+                selected = st.session_state.get("selected_competition")
+                if selected in result.competition_ids:
+                    load_existing_scores(selected)
 
 def login_page():
     st.title("88会ゴルフコンペ・スコア入力")
@@ -273,6 +696,9 @@ def score_entry_page():
             st.rerun()
         return
     
+    offline_queue_status()
+    scorecard_import_section()
+    
     # コンペ選択
     competition_options = [
         f"{row['competition_id']} - {row['date']} {row['course']}" 
@@ -294,26 +720,9 @@ def score_entry_page():
             if "participants" not in st.session_state:
                 st.session_state.participants = []
             st.session_state.participants = fetch_participants(competition_id)
+            st.session_state.player_handicaps = fetch_player_handicaps()
             # 既存のスコアを取得
-            existing_scores = fetch_existing_scores(competition_id)
-            
-            # スコアデータの初期化
-            st.session_state.score_data = {}
-            
-            # 既存のスコアデータがあれば設定
-            if not existing_scores.empty:
-                for _, score in existing_scores.iterrows():
-                    player_id = score["player_id"]
-                    out_score = score.get("out_score", 0) or 0
-                    in_score = score.get("in_score", 0) or 0
-                    gross_score = out_score + in_score
-                    st.session_state.get("score_data", {})[player_id] = {
-                        "out_score": out_score,
-                        "in_score": in_score,
-                        "handicap": score.get("handicap", 0) or 0,
-                        "gross_score": gross_score,
-                        "net_score": score.get("net_score", 0) or 0
-                    }
+            load_existing_scores(competition_id)
             
             st.rerun()
         
@@ -345,106 +754,96 @@ def score_entry_page():
             # スコア入力フォームの表示
             st.subheader("スコア入力")
             
-            with st.form("score_entry_form"):
-                scores_changed = False
+            input_mode = st.radio("入力方法", SCORE_INPUT_MODES, horizontal=True, key="score_input_mode")
+            
+            if input_mode == HOLE_INPUT_MODE:
+                hole_entry_form(competition_id, players_dict)
+            else:
+                with st.form("score_entry_form"):
+                    scores_changed = False
                 
-                # 各プレイヤーのスコア入力欄を表示
-                for player_id in st.session_state.get("participants", []):
-                    player_name = players_dict.get(player_id, f"不明なプレイヤー({player_id})")
+                    # 各プレイヤーのスコア入力欄を表示
+                    for player_id in st.session_state.get("participants", []):
+                        player_name = players_dict.get(player_id, f"不明なプレイヤー({player_id})")
                     
-                    with st.expander(f"{player_name} のスコア", expanded=True):
-                        col1, col2, col3 = st.columns(3)
+                        with st.expander(f"{player_name} のスコア", expanded=True):
+                            col1, col2, col3 = st.columns(3)
                         
-                        # 既存の値を取得
-                        existing_data = st.session_state.get("score_data", {}).get(player_id, {})
+                            # 既存の値を取得
+                            existing_data = st.session_state.get("score_data", {}).get(player_id, {})
                         
-                        with col1:
-                            out_score = st.number_input(
-                                "OUTスコア", 
-                                min_value=0, 
-                                max_value=100, 
-                                value=int(existing_data.get("out_score", 0)),
-                                step=1,
-                                key=f"out_{player_id}"
-                            )
+                            with col1:
+                                out_score = st.number_input(
+                                    "OUTスコア", 
+                                    min_value=0, 
+                                    max_value=HALF_SCORE_MAX, 
+                                    value=int(existing_data.get("out_score", 0)),
+                                    step=1,
+                                    key=f"out_{player_id}"
+                                )
                         
-                        with col2:
-                            in_score = st.number_input(
-                                "INスコア", 
-                                min_value=0, 
-                                max_value=100, 
-                                value=int(existing_data.get("in_score", 0)),
-                                step=1,
-                                key=f"in_{player_id}"
-                            )
+                            with col2:
+                                in_score = st.number_input(
+                                    "INスコア", 
+                                    min_value=0, 
+                                    max_value=HALF_SCORE_MAX, 
+                                    value=int(existing_data.get("in_score", 0)),
+                                    step=1,
+                                    key=f"in_{player_id}"
+                                )
                         
-                        with col3:
-                            handicap = st.number_input(
-                                "ハンディキャップ",
-                                min_value=0.0,
-                                max_value=50.0,
-                                value=float(existing_data.get("handicap", 0.0)),
-                                step=0.1,
-                                key=f"hcp_{player_id}"
-                            )
+                            with col3:
+                                handicap = st.number_input(
+                                    "ハンディキャップ",
+                                    min_value=0.0,
+                                    max_value=HANDICAP_MAX,
+                                    value=float(existing_data.get("handicap", default_handicap(player_id))),
+                                    step=0.1,
+                                    key=f"hcp_{player_id}"
+                                )
                         
-                        # グロススコアとネットスコアを計算
-                        if out_score > 0 and in_score > 0:
-                            gross_score = out_score + in_score
+                            # グロススコアとネットスコアを計算
+                            if out_score > 0 and in_score > 0:
+                                gross_score = out_score + in_score
                             
-                            # スコアの妥当性チェック
-                            if gross_score > 200:
-                                st.warning(f"⚠️ グロススコア ({gross_score}) が通常の範囲を超えています。入力内容を確認してください。")
-                            elif gross_score < 50:
-                                st.warning(f"⚠️ グロススコア ({gross_score}) が通常より低すぎます。入力内容を確認してください。")
+                                # スコアの妥当性チェック
+                                if gross_score > GROSS_SCORE_MAX:
+                                    st.warning(f"⚠️ グロススコア ({gross_score}) が通常の範囲を超えています。入力内容を確認してください。")
+                                elif gross_score < GROSS_SCORE_LOW:
+                                    st.warning(f"⚠️ グロススコア ({gross_score}) が通常より低すぎます。入力内容を確認してください。")
                             
-                            net_score = gross_score - handicap
+                                net_score = gross_score - handicap
                             
-                            # ネットスコアの妥当性チェック
-                            if net_score < 0:
-                                st.error("❌ ネットスコアがマイナスです。ハンディキャップを確認してください。")
+                                # ネットスコアの妥当性チェック
+                                if net_score < 0:
+                                    st.error("❌ ネットスコアがマイナスです。ハンディキャップを確認してください。")
                             
-                            col1, col2 = st.columns(2)
-                            with col1:
-                                st.info(f"グロススコア: {gross_score:.1f}")
-                            with col2:
-                                st.info(f"ネットスコア: {net_score:.1f}")
+                                col1, col2 = st.columns(2)
+                                with col1:
+                                    st.info(f"グロススコア: {gross_score:.1f}")
+                                with col2:
+                                    st.info(f"ネットスコア: {net_score:.1f}")
                             
-                            # スコアデータを更新
-                            st.session_state.get("score_data", {})[player_id] = {
-                                "out_score": out_score,
-                                "in_score": in_score,
-                                "handicap": handicap,
-                                "gross_score": gross_score,
-                                "net_score": net_score
-                            }
-                            scores_changed = True
-                
-                # 登録ボタン
-                submit_button = st.form_submit_button("スコアを登録")
-                
-                if submit_button:
-                    # スコアに基づいて順位を計算し、データを保存
-                    if save_scores(competition_id, st.session_state.get("score_data", {}), st.session_state.get("players", pd.DataFrame())):
-                        st.success("スコアが正常に登録されました！")
-                        # 最新のデータを再取得
-                        existing_scores = fetch_existing_scores(competition_id)
-                        st.session_state.score_data = {}
-                        if not existing_scores.empty:
-                            for _, score in existing_scores.iterrows():
-                                player_id = score["player_id"]
-                                out_score = score.get("out_score", 0) or 0
-                                in_score = score.get("in_score", 0) or 0
-                                gross_score = out_score + in_score
+                                # スコアデータを更新
+                                # ホール別スコアは合計が一致する場合だけ残す
+                                hole_scores = existing_data.get("hole_scores")
                                 st.session_state.get("score_data", {})[player_id] = {
                                     "out_score": out_score,
                                     "in_score": in_score,
-                                    "handicap": score.get("handicap", 0) or 0,
+                                    "handicap": handicap,
                                     "gross_score": gross_score,
-                                    "net_score": score.get("net_score", 0) or 0
+                                    "net_score": net_score,
+                                    "hole_scores": hole_scores if matches_totals(hole_scores, out_score, in_score) else None,
                                 }
-                    else:
-                        st.error("スコア登録に失敗しました。もう一度お試しください。")
+                                scores_changed = True
+                
+                    # 登録ボタン
+                    submit_button = st.form_submit_button("スコアを登録")
+                
+                    if submit_button:
+                        submit_scores(competition_id)
+            
+            score_conflict_section(competition_id, players_dict)
             
             # 現在の順位を表示
             if st.session_state.get("score_data", {}):
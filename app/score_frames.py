@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+スコアデータ整形
+Supabaseから取得したスコア行（scores_with_players ビュー）を表示用のデータフレームに変換する
+
+行ごとのループではなく列単位の演算で処理するため、履歴が増えても高速に整形できる
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import pandas as pd
+
+# 取得元カラム名 → 表示用カラム名（表示順）
+SCORE_COLUMN_LABELS: Dict[str, str] = {
+    "competition_id": "競技ID",
+    "date": "日付",
+    "course": "コース",
+    "player_name": "プレイヤー名",
+    "out_score": "アウトスコア",
+    "in_score": "インスコア",
+    "gross_score": "合計スコア",
+    "handicap": "ハンディキャップ",
+    "net_score": "ネットスコア",
+    "ranking": "順位",
+}
+
+UNKNOWN_PLAYER_NAME = "不明"
+
+
+def _parse_half_score(series: pd.Series) -> pd.Series:
+    """OUT/INスコアを整数に変換（0以上の整数または数字のみの文字列以外は0）"""
+    if pd.api.types.is_bool_dtype(series):
+        return pd.Series(0, index=series.index, dtype="int64")
+
+    if series.dtype == object:
+        # 文字列や整数が混在する場合は、数字のみで構成される値だけを有効とする
+        text = series.astype("string")
+        valid = text.str.fullmatch(r"\d+").fillna(False).astype(bool)
+        values = pd.to_numeric(text.where(valid), errors="coerce")
+        return values.fillna(0).astype("int64")
+
+    values = pd.to_numeric(series, errors="coerce")
+    valid = values.notna() & (values >= 0) & (values % 1 == 0)
+    return values.where(valid, 0).astype("int64")
+
+
+def _gross_score(out_score: pd.Series, in_score: pd.Series) -> pd.Series:
+    """OUT/INの両方が有効な場合のみ合計スコアを計算（無効な場合は欠損値）"""
+    valid = (out_score > 0) & (in_score > 0)
+    if valid.all():
+        return out_score + in_score
+    if not valid.any():
+        # すべて無効な場合、行ごとにNoneを入れて作成した場合と同じくobject型にする
+        return pd.Series([None] * len(out_score), index=out_score.index, dtype=object)
+    return (out_score + in_score).where(valid).astype("float64")
+
+
+def build_scores_frame(
+    scores: Union[List[Dict[str, Any]], pd.DataFrame],
+    columns: Optional[Sequence[str]] = None,
+) -> pd.DataFrame:
+    """プレイヤー名付きのスコア行を表示用のデータフレームに整形
+
+    Args:
+        scores: scores_with_players ビューの行（辞書のリスト）またはそのデータフレーム
+        columns: 出力する取得元カラム（省略時は SCORE_COLUMN_LABELS のすべて）
+
+    Returns:
+        表示用カラム名（SCORE_COLUMN_LABELS）を持つデータフレーム
+    """
+    output_columns = [column for column in SCORE_COLUMN_LABELS if columns is None or column in columns]
+
+    if isinstance(scores, pd.DataFrame):
+        frame = scores.copy()
+    elif scores:
+        # 必要なカラムだけを指定して読み込む（updated_at などを変換しない分だけ高速）
+        source_columns = [column for column in SCORE_COLUMN_LABELS if column in scores[0]]
+        frame = pd.DataFrame(scores, columns=source_columns)
+    else:
+        frame = pd.DataFrame()
+    if frame.empty:
+        return pd.DataFrame()
+
+    # 合計スコアはビュー側で計算済み。ビューを経由しない場合のみここで計算する
+    has_gross_score = "gross_score" in frame.columns
+
+    # 取得されなかったカラムは欠損値（None）として扱う
+    for column in set(output_columns) | {"out_score", "in_score"}:
+        if column not in frame.columns:
+            frame[column] = None
+
+    for column in ("out_score", "in_score"):
+        if column in frame.columns:
+            frame[column] = _parse_half_score(frame[column])
+
+    if "gross_score" in output_columns and not has_gross_score:
+        frame["gross_score"] = _gross_score(frame["out_score"], frame["in_score"])
+
+    if "player_name" in output_columns:
+        frame["player_name"] = frame["player_name"].fillna(UNKNOWN_PLAYER_NAME).infer_objects()
+
+    result = frame[output_columns].rename(columns=SCORE_COLUMN_LABELS)
+    return result.reset_index(drop=True)
+
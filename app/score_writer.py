@@ -0,0 +1,420 @@
+# -*- coding: utf-8 -*-
+"""
+スコア保存
+コンペのスコアを (competition_id, player_id) をキーにした upsert で保存する
+
+- 既存のスコアと値が変わった行だけを書き込み、入力から外れたプレイヤーの行だけを削除する
+- 読み込み時のスコア（ベースライン）を渡した場合は手元で差分を取り、変更行（順位が変わった行を含む）だけを送信する
+- サーバー側の関数 save_competition_scores（マイグレーション 0005/0006）があれば1回の呼び出し・1トランザクションで保存する
+- 関数が無い環境では、変更行の upsert と不要行の削除をそれぞれ1回のリクエストで行う
+- ベースラインに行のバージョン（マイグレーション 0012）がある場合は save_score_changes_checked で楽観的ロックをかけ、
+  読み込み後に他の管理者が変更・削除した行があれば何も書き込まずに競合（ScoreConflict）を返す
+- スコアカードの一括取り込み（import_score_records）は複数コンペの行を1回の upsert で保存し、順位を付け直す
+"""
+
+import math
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+# 保存するカラム（キー以外、順位は最後）
+SCORE_VALUE_COLUMNS = ("date", "course", "out_score", "in_score", "handicap", "net_score", "hole_scores", "ranking")
+# 保存用の関数が無い環境（マイグレーション 0005 より前）には hole_scores（0011）も無い
+_LEGACY_VALUE_COLUMNS = tuple(column for column in SCORE_VALUE_COLUMNS if column != "hole_scores")
+# 一括取り込みで送るカラム（ホール別スコアと順位はサーバー側で扱う）
+_IMPORT_COLUMNS = ("competition_id", "player_id", "date", "course", "out_score", "in_score", "handicap", "net_score")
+# numeric(5,2) / numeric(6,2) のカラム（DBに保存される桁数で比較する）
+_NUMERIC_COLUMNS = ("handicap", "net_score")
+
+
+@dataclass
+class SaveResult:
+    """保存した件数"""
+
+    upserted: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+    # 送信待ちキューに登録しただけで、まだ送信していない場合はTrue
+    queued: bool = False
+    # 読み込み後に他の管理者が変更・削除していたため保存しなかった行（空でない場合は何も書き込んでいない）
+    conflicts: List["ScoreConflict"] = field(default_factory=list)
+
+    @property
+    def touched(self) -> int:
+        """書き込んだ（追加・更新・削除した）行数"""
+        return self.upserted + self.deleted
+
+
+@dataclass
+class ScoreConflict:
+    """楽観的ロックの競合（mine / theirs が None の場合はそれぞれ削除）"""
+
+    player_id: int
+    mine: Optional[Dict[str, Any]]
+    theirs: Optional[Dict[str, Any]]
+
+
+@dataclass
+class ImportResult:
+    """一括取り込みの件数"""
+
+    upserted: int = 0
+    reranked: int = 0
+    competitions: int = 0
+
+
+def build_score_records(
+    competition_id: int,
+    scores_data: Mapping[Any, Mapping[str, Any]],
+    date: Any,
+    course: Any,
+    rankings: Mapping[Any, int],
+) -> List[Dict[str, Any]]:
+    """入力中のスコア（プレイヤーID → スコア）から保存用の行を作成（OUT/INが未入力のプレイヤーは除く）"""
+    records = []
+    for player_id, score_info in scores_data.items():
+        if score_info.get("out_score") is None or score_info.get("in_score") is None:
+            continue
+        records.append({
+            "competition_id": competition_id,
+            "player_id": int(player_id),
+            "date": date,
+            "course": course,
+            "out_score": score_info.get("out_score"),
+            "in_score": score_info.get("in_score"),
+            "handicap": score_info.get("handicap", 0),
+            "net_score": score_info.get("net_score", 0),
+            "hole_scores": score_info.get("hole_scores"),
+            "ranking": rankings.get(player_id, 0),
+        })
+    return records
+
+
+def score_baseline(rows: Iterable[Mapping[str, Any]]) -> Dict[int, Dict[str, Any]]:
+    """DBから読み込んだスコア行をプレイヤーID → 保存済みの値（ベースライン）に変換"""
+    return {
+        int(row["player_id"]): {
+            "player_id": int(row["player_id"]),
+            **{column: row.get(column) for column in SCORE_VALUE_COLUMNS},
+            "version": _version(row.get("version")),
+        }
+        for row in rows
+    }
+
+
+def _version(value: Any) -> Optional[int]:
+    # version 列が無い（マイグレーション 0012 未適用）場合や欠損値は None
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return int(value)
+
+
+def _normalize(column: str, value: Any) -> Any:
+    # DataFrame から作成した行の欠損値（NaN）は None として比較する
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if column in _NUMERIC_COLUMNS:
+        return round(float(value), 2)
+    if column in ("out_score", "in_score", "ranking"):
+        return int(value)
+    if column == "hole_scores":
+        return tuple(int(hole) for hole in value)
+    return str(value)[:10] if column == "date" else value
+
+
+def _values(record: Mapping[str, Any]) -> Tuple[Any, ...]:
+    return tuple(_normalize(column, record.get(column)) for column in SCORE_VALUE_COLUMNS)
+
+
+def diff_score_records(
+    records: Sequence[Mapping[str, Any]],
+    existing_rows: Iterable[Mapping[str, Any]],
+) -> Tuple[List[Mapping[str, Any]], List[Any], int]:
+    """保存する行と既存の行を比較し、(書き込む行, 削除するプレイヤーID, 変更のない行数) を返す"""
+    existing = {row["player_id"]: _values(row) for row in existing_rows}
+    changed = [record for record in records if existing.get(record["player_id"]) != _values(record)]
+    keep = {record["player_id"] for record in records}
+    removed = sorted(player_id for player_id in existing if player_id not in keep)
+    return changed, removed, len(records) - len(changed)
+
+
+def _json_value(value: Any) -> Any:
+    # numpy の数値型はJSONに変換できないため Python の値に戻す
+    return value.item() if hasattr(value, "item") else value
+
+
+def _rpc_payload(records: Sequence[Mapping[str, Any]]) -> List[Dict[str, Any]]:
+    return [
+        {"player_id": int(record["player_id"]), **{column: _json_value(record.get(column)) for column in SCORE_VALUE_COLUMNS}}
+        for record in records
+    ]
+
+
+def _is_missing_function(error: Exception) -> bool:
+    """PostgRESTで関数が見つからない（マイグレーション未適用）エラーかどうか"""
+    code = getattr(error, "code", None)
+    return code in ("PGRST202", "42883")
+
+
+def _rpc_counts(response, records: Sequence[Mapping[str, Any]]) -> SaveResult:
+    counts: Optional[Mapping[str, Any]] = response.data
+    if isinstance(counts, list):
+        counts = counts[0] if counts else {}
+    upserted = int((counts or {}).get("upserted", 0))
+    return SaveResult(
+        upserted=upserted,
+        deleted=int((counts or {}).get("deleted", 0)),
+        unchanged=len(records) - upserted,
+    )
+
+
+def save_competition_scores(
+    supabase,
+    competition_id: int,
+    records: Sequence[Mapping[str, Any]],
+    baseline: Optional[Mapping[int, Mapping[str, Any]]] = None,
+) -> SaveResult:
+    """コンペのスコアを保存し、書き込んだ件数を返す
+
+    baseline（score_baseline() の戻り値）を渡した場合は、それとの差分だけを送信する。
+    省略時はコンペの全行を送り、サーバー側で変更の有無を判定する。
+    """
+    if baseline is not None:
+        return _save_changes(supabase, competition_id, records, baseline)
+
+    try:
+        response = supabase.rpc(
+            "save_competition_scores",
+            {"p_competition_id": competition_id, "p_scores": _rpc_payload(records)},
+        ).execute()
+    except Exception as e:
+        if not _is_missing_function(e):
+            raise
+        return _save_with_client_diff(supabase, competition_id, records)
+    return _rpc_counts(response, records)
+
+
+def _save_changes(
+    supabase,
+    competition_id: int,
+    records: Sequence[Mapping[str, Any]],
+    baseline: Mapping[int, Mapping[str, Any]],
+) -> SaveResult:
+    """ベースラインとの差分（変更行・順位が変わった行・削除したプレイヤー）だけを保存"""
+    if all(row.get("version") is not None for row in baseline.values()):
+        try:
+            return _save_checked(supabase, competition_id, records, baseline)
+        except Exception as e:
+            if not _is_missing_function(e):
+                raise
+
+    changed, removed, unchanged = diff_score_records(records, baseline.values())
+    result = write_score_changes(supabase, competition_id, changed, removed)
+    result.unchanged += unchanged
+    return result
+
+
+def _save_checked(
+    supabase,
+    competition_id: int,
+    records: Sequence[Mapping[str, Any]],
+    baseline: Mapping[int, Mapping[str, Any]],
+) -> SaveResult:
+    """読み込み時のバージョンを付けて値が変わった行だけを送信し、順位はサーバー側で付け直す"""
+    from ranking import RANKING_METHOD, RANKING_TIEBREAK
+
+    edited = [
+        record for record in records
+        if record["player_id"] not in baseline or _values(baseline[record["player_id"]])[:-1] != _values(record)[:-1]
+    ]
+    keep = {record["player_id"] for record in records}
+    removed = sorted(player_id for player_id in baseline if player_id not in keep)
+    if not edited and not removed:
+        return SaveResult(unchanged=len(records))
+
+    payload = [
+        {**row, "version": baseline.get(row["player_id"], {}).get("version")}
+        for row in _rpc_payload(edited)
+    ]
+    response = supabase.rpc(
+        "save_score_changes_checked",
+        {
+            "p_competition_id": competition_id,
+            "p_scores": payload,
+            "p_deleted": [{"player_id": player_id, "version": baseline[player_id]["version"]} for player_id in removed],
+            "p_tiebreak": list(RANKING_TIEBREAK),
+            "p_method": RANKING_METHOD,
+        },
+    ).execute()
+
+    counts: Optional[Mapping[str, Any]] = response.data
+    if isinstance(counts, list):
+        counts = counts[0] if counts else {}
+    counts = counts or {}
+    mine = {record["player_id"]: dict(record) for record in edited}
+    conflicts = [
+        ScoreConflict(
+            player_id=int(conflict["player_id"]),
+            mine=mine.get(int(conflict["player_id"])),
+            theirs=conflict.get("current"),
+        )
+        for conflict in counts.get("conflicts") or []
+    ]
+    upserted = int(counts.get("upserted", 0))
+    return SaveResult(
+        upserted=upserted,
+        deleted=int(counts.get("deleted", 0)),
+        unchanged=len(records) - upserted if not conflicts else 0,
+        conflicts=conflicts,
+    )
+
+
+def resolve_conflicts(
+    baseline: Mapping[int, Mapping[str, Any]],
+    conflicts: Sequence[ScoreConflict],
+) -> Dict[int, Dict[str, Any]]:
+    """競合した行のベースラインを現在の行（バージョン）に置き換える
+
+    自分の入力を残して再保存すると、相手の変更を確認したうえでの上書きになる。
+    """
+    resolved = {player_id: dict(row) for player_id, row in baseline.items()}
+    for conflict in conflicts:
+        if conflict.theirs is None:
+            resolved.pop(conflict.player_id, None)
+        else:
+            resolved.update(score_baseline([conflict.theirs]))
+    return resolved
+
+
+def write_score_changes(
+    supabase,
+    competition_id: int,
+    changed: Sequence[Mapping[str, Any]],
+    removed: Sequence[int],
+) -> SaveResult:
+    """変更行の upsert と指定したプレイヤーの行の削除だけを行う（送信待ちキューからの送信にも使用）"""
+    if not changed and not removed:
+        return SaveResult()
+
+    try:
+        response = supabase.rpc(
+            "save_competition_scores",
+            {
+                "p_competition_id": competition_id,
+                "p_scores": _rpc_payload(changed),
+                "p_deleted_player_ids": list(removed),
+            },
+        ).execute()
+    except Exception as e:
+        if not _is_missing_function(e):
+            raise
+        _write_changes(supabase, competition_id, changed, removed)
+        return SaveResult(upserted=len(changed), deleted=len(removed))
+    return _rpc_counts(response, changed)
+
+
+def _write_changes(supabase, competition_id: int, changed: Sequence[Mapping[str, Any]], removed: Sequence[int]) -> None:
+    if changed:
+        rows = [
+            {key: value for key, value in {**record, **_rpc_payload([record])[0]}.items() if key != "hole_scores"}
+            for record in changed
+        ]
+        supabase.table("scores").upsert(rows, on_conflict="competition_id,player_id").execute()
+    if removed:
+        supabase.table("scores").delete().eq("competition_id", competition_id).in_("player_id", list(removed)).execute()
+
+
+def _save_with_client_diff(supabase, competition_id: int, records: Sequence[Mapping[str, Any]]) -> SaveResult:
+    """サーバー側の関数が無い環境向け：既存の行と比較し、変更行の upsert と不要行の削除だけを行う"""
+    from paginated_reader import fetch_all_rows
+
+    existing_rows = fetch_all_rows(
+        supabase, "scores", ", ".join(("player_id",) + _LEGACY_VALUE_COLUMNS),
+        modify=lambda query: query.eq("competition_id", competition_id),
+        order_key="player_id",
+    )
+    changed, removed, unchanged = diff_score_records(records, existing_rows)
+    _write_changes(supabase, competition_id, changed, removed)
+    return SaveResult(upserted=len(changed), deleted=len(removed), unchanged=unchanged)
+
+
+def import_score_records(
+    supabase,
+    records: Sequence[Mapping[str, Any]],
+    tiebreak: Optional[Sequence[str]] = None,
+    method: Optional[str] = None,
+) -> ImportResult:
+    """複数コンペのスコア行をまとめて保存し、取り込んだコンペの順位を付け直す
+
+    サーバー側の関数 import_scores（マイグレーション 0010）があれば1回の呼び出し・1トランザクションで行う。
+    取り込みに含まれない既存の行は削除しない。
+    """
+    from ranking import RANKING_METHOD, RANKING_TIEBREAK, validate_ranking_rule
+
+    tiebreak = tuple(tiebreak or RANKING_TIEBREAK)
+    method = method or RANKING_METHOD
+    validate_ranking_rule(tiebreak, method)
+    if not records:
+        return ImportResult()
+
+    payload = [{column: _json_value(record.get(column)) for column in _IMPORT_COLUMNS} for record in records]
+    try:
+        response = supabase.rpc(
+            "import_scores",
+            {"p_scores": payload, "p_tiebreak": list(tiebreak), "p_method": method},
+        ).execute()
+    except Exception as e:
+        if not _is_missing_function(e):
+            raise
+        return _import_with_client_ranking(supabase, payload, tiebreak, method)
+
+    counts: Optional[Mapping[str, Any]] = response.data
+    if isinstance(counts, list):
+        counts = counts[0] if counts else {}
+    counts = counts or {}
+    return ImportResult(
+        upserted=int(counts.get("upserted", 0)),
+        reranked=int(counts.get("reranked", 0)),
+        competitions=int(counts.get("competitions", 0)),
+    )
+
+
+def _import_with_client_ranking(
+    supabase,
+    payload: Sequence[Dict[str, Any]],
+    tiebreak: Sequence[str],
+    method: str,
+) -> ImportResult:
+    """サーバー側の関数が無い環境向け：対象コンペの既存行と合わせて順位を計算し、1回の upsert で保存する"""
+    from paginated_reader import fetch_all_rows
+    from ranking import compute_rankings
+
+    competition_ids = sorted({row["competition_id"] for row in payload})
+    existing_rows = fetch_all_rows(
+        supabase, "scores", ", ".join(("competition_id", "player_id") + _LEGACY_VALUE_COLUMNS),
+        modify=lambda query: query.in_("competition_id", competition_ids),
+    )
+    existing = {(row["competition_id"], row["player_id"]): row for row in existing_rows}
+    merged = {**existing, **{(row["competition_id"], row["player_id"]): dict(row) for row in payload}}
+
+    by_competition: Dict[int, List[Dict[str, Any]]] = {}
+    for row in merged.values():
+        by_competition.setdefault(row["competition_id"], []).append(row)
+
+    writes, upserted, reranked = [], 0, 0
+    for rows in by_competition.values():
+        rankings = compute_rankings(rows, tiebreak, method)
+        for row in rows:
+            key = (row["competition_id"], row["player_id"])
+            stored = existing.get(key)
+            new_row = {**row, "ranking": rankings[row["player_id"]]}
+            if stored is not None and _values(stored) == _values(new_row):
+                continue
+            if stored is None or _values(stored)[:-1] != _values(new_row)[:-1]:
+                upserted += 1
+            if stored is None or _normalize("ranking", stored.get("ranking")) != new_row["ranking"]:
+                reranked += 1
+            writes.append(new_row)
+
+    if writes:
+        supabase.table("scores").upsert(writes, on_conflict="competition_id,player_id").execute()
+    return ImportResult(upserted=upserted, reranked=reranked, competitions=len(competition_ids))
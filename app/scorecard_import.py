@@ -0,0 +1,369 @@
+# -*- coding: utf-8 -*-
+"""
+スコアカードの一括取り込み
+CSV / Excel のスコアカードを一定行数ずつ読み込み、スコア入力画面と同じ規則で行をまとめて検証する
+
+- 列名は日本語・英語のどちらでもよい（COLUMN_ALIASES）。1行が「コンペ × プレイヤー」の1スコア
+- プレイヤーは名前（またはプレイヤーID）で指定し、players の名前 → ID の索引で変換する
+- 日付・コースは competitions から補完し、ネットスコアはグロス − ハンディキャップで計算する
+- 検証を通った行は score_writer.import_score_records() で1回の upsert としてまとめて保存する
+"""
+
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List, Sequence, Tuple
+
+import pandas as pd
+
+# スコア入力画面（score_entry.py）と同じ入力範囲・チェック
+HALF_SCORE_MAX = 100  # OUT / IN（0 は未入力として扱う）
+HANDICAP_MAX = 50.0
+GROSS_SCORE_MAX = 200  # app.validate_score と同じ上限
+GROSS_SCORE_LOW = 50  # これ未満は警告
+
+DEFAULT_CHUNK_SIZE = 1000
+SUPPORTED_SUFFIXES = (".csv", ".xlsx", ".xlsm", ".xls")
+
+# 取り込み用テンプレートの列
+TEMPLATE_COLUMNS = ("競技ID", "プレイヤー名", "OUT", "IN", "ハンディキャップ")
+
+# 内部の列名 → 受け付ける見出し（NFKC正規化・小文字・空白除去後に比較）
+COLUMN_ALIASES = {
+    "competition_id": ("competition_id", "競技id", "コンペid", "コンペ番号"),
+    "player_name": ("player_name", "name", "プレイヤー名", "プレイヤー", "氏名", "名前"),
+    "player_id": ("player_id", "プレイヤーid"),
+    "out_score": ("out_score", "out", "outスコア", "アウト"),
+    "in_score": ("in_score", "in", "inスコア", "イン"),
+    "handicap": ("handicap", "hc", "hdcp", "ハンディキャップ", "ハンディ"),
+}
+
+# エラー表示用の列名
+_LABELS = {
+    "competition_id": "競技ID",
+    "player": "プレイヤー",
+    "out_score": "OUT",
+    "in_score": "IN",
+    "handicap": "ハンディキャップ",
+    "gross_score": "グロス",
+    "net_score": "ネット",
+}
+
+ERROR = "エラー"
+WARNING = "警告"
+ISSUE_COLUMNS = ("行", "列", "区分", "内容")
+
+# 同名のプレイヤーが複数いる名前（索引の値）
+AMBIGUOUS_PLAYER = -1
+
+
+class ScorecardFormatError(ValueError):
+    """ファイル形式・見出しが取り込みに対応していない"""
+
+
+@dataclass
+class ScorecardImport:
+    """検証結果（保存する行と、行番号付きのエラー・警告）"""
+
+    records: List[Dict[str, Any]] = field(default_factory=list)
+    issues: pd.DataFrame = field(default_factory=lambda: pd.DataFrame(columns=list(ISSUE_COLUMNS)))
+    rows: int = 0
+
+    @property
+    def errors(self) -> pd.DataFrame:
+        return self.issues[self.issues["区分"] == ERROR]
+
+    @property
+    def warnings(self) -> pd.DataFrame:
+        return self.issues[self.issues["区分"] == WARNING]
+
+    @property
+    def competition_ids(self) -> List[int]:
+        return sorted({record["competition_id"] for record in self.records})
+
+
+def _header_key(value: Any) -> str:
+    return re.sub(r"\s+", "", unicodedata.normalize("NFKC", str(value))).lower()
+
+
+_HEADER_LOOKUP = {alias: column for column, aliases in COLUMN_ALIASES.items() for alias in aliases}
+
+
+def normalize_name(value: Any) -> str:
+    """名前の比較用キー（全角・半角と空白の違いを無視する）"""
+    return re.sub(r"\s+", "", unicodedata.normalize("NFKC", str(value)))
+
+
+def build_player_index(players: pd.DataFrame) -> Dict[str, int]:
+    """players（id, name）から名前 → プレイヤーID の索引を作成（同名が複数いる名前は AMBIGUOUS_PLAYER）"""
+    index: Dict[str, int] = {}
+    if players is None or players.empty:
+        return index
+    for player_id, name in zip(players["id"], players["name"]):
+        if name is None or pd.isna(name):
+            continue
+        key = normalize_name(name)
+        index[key] = AMBIGUOUS_PLAYER if key in index else int(player_id)
+    return index
+
+
+def scorecard_template() -> bytes:
+    """取り込み用テンプレート（見出しのみのCSV、Excelで開けるようBOM付きUTF-8）"""
+    return (",".join(TEMPLATE_COLUMNS) + "\r\n").encode("utf-8-sig")
+
+
+def _detect_encoding(source: BinaryIO) -> str:
+    # 先頭だけを見て、UTF-8 として読めなければ Excel の既定（Shift_JIS / cp932）とみなす
+    sample = source.read(65536)
+    source.seek(0)
+    try:
+        sample.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # 読み込み範囲の末尾で文字が途切れただけの場合は UTF-8
+        if e.start < len(sample) - 3:
+            return "cp932"
+    return "utf-8-sig"
+
+
+def _iter_csv(source: BinaryIO, chunksize: int) -> Iterator[pd.DataFrame]:
+    reader = pd.read_csv(
+        source,
+        encoding=_detect_encoding(source),
+        dtype=str,
+        chunksize=chunksize,
+        skip_blank_lines=False,
+    )
+    with reader:
+        yield from reader
+
+
+def _iter_xlsx(source: BinaryIO, chunksize: int) -> Iterator[pd.DataFrame]:
+    from openpyxl import load_workbook
+
+    # read_only モードではシート全体を展開せず、行を順に読み込む
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(value) if value is not None else f"列{position}" for position, value in enumerate(header, start=1)]
+        width = len(columns)
+        buffer: List[Sequence[Any]] = []
+        start = 0
+        for row in rows:
+            buffer.append((tuple(row) + (None,) * width)[:width])
+            if len(buffer) >= chunksize:
+                yield pd.DataFrame(buffer, columns=columns, index=range(start, start + len(buffer)))
+                start += len(buffer)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=columns, index=range(start, start + len(buffer)))
+    finally:
+        workbook.close()
+
+
+def _iter_xls(source: BinaryIO, chunksize: int) -> Iterator[pd.DataFrame]:
+    # 旧形式（.xls）は xlrd で一括で読み込み、検証は他の形式と同じ単位で行う
+    frame = pd.read_excel(source, engine="xlrd", dtype=object)
+    for start in range(0, len(frame), chunksize):
+        yield frame.iloc[start:start + chunksize]
+
+
+def iter_scorecard_chunks(source: BinaryIO, filename: str, chunksize: int = DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """スコアカードを chunksize 行ずつのデータフレームで返す（インデックスはファイル上の行番号）"""
+    if chunksize < 1:
+        raise ValueError("chunksize must be positive")
+    suffix = Path(filename).suffix.lower()
+    if suffix == ".csv":
+        chunks = _iter_csv(source, chunksize)
+    elif suffix in (".xlsx", ".xlsm"):
+        chunks = _iter_xlsx(source, chunksize)
+    elif suffix == ".xls":
+        chunks = _iter_xls(source, chunksize)
+    else:
+        raise ScorecardFormatError(f"対応していないファイル形式です（{', '.join(SUPPORTED_SUFFIXES)}）: {filename}")
+
+    for chunk in chunks:
+        # 見出しが1行目なので、データの1行目は2行目
+        chunk = chunk.copy()
+        chunk.index = chunk.index + 2
+        yield chunk
+
+
+def normalize_columns(chunk: pd.DataFrame) -> pd.DataFrame:
+    """見出しを内部の列名に揃え、必要な列が無い場合は ScorecardFormatError"""
+    renamed = {}
+    for column in chunk.columns:
+        target = _HEADER_LOOKUP.get(_header_key(column))
+        if target is not None and target not in renamed.values():
+            renamed[column] = target
+    frame = chunk.rename(columns=renamed)[list(renamed.values())]
+
+    missing = [
+        label for columns, label in (
+            (("competition_id",), "競技ID"),
+            (("player_name", "player_id"), "プレイヤー名"),
+            (("out_score",), "OUT"),
+            (("in_score",), "IN"),
+        )
+        if not any(column in frame.columns for column in columns)
+    ]
+    if missing:
+        raise ScorecardFormatError(f"必要な列がありません: {', '.join(missing)}（見出しの例: {', '.join(TEMPLATE_COLUMNS)}）")
+    return frame
+
+
+def _blank(series: pd.Series) -> pd.Series:
+    return series.isna() | series.astype(str).str.strip().eq("")
+
+
+def _issues(mask: pd.Series, column: str, message: str, level: str = ERROR) -> pd.DataFrame:
+    rows = mask.index[mask.to_numpy()]
+    return pd.DataFrame({"行": rows, "列": _LABELS[column], "区分": level, "内容": message}, columns=list(ISSUE_COLUMNS))
+
+
+def validate_chunk(
+    chunk: pd.DataFrame,
+    player_index: Dict[str, int],
+    player_ids: set,
+    competition_ids: set,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """1チャンク分を列単位で検証し、(有効な行のデータフレーム, エラー・警告のデータフレーム) を返す"""
+    frame = normalize_columns(chunk)
+    # 空行は読み飛ばす
+    frame = frame[~frame.apply(_blank).all(axis=1)]
+    issues: List[pd.DataFrame] = []
+    invalid = pd.Series(False, index=frame.index)
+
+    def flag(mask: pd.Series, column: str, message: str, level: str = ERROR) -> None:
+        nonlocal invalid
+        mask = mask.fillna(False).astype(bool)
+        if mask.any():
+            issues.append(_issues(mask, column, message, level))
+            if level == ERROR:
+                invalid = invalid | mask
+
+    # コンペ
+    competition_id = pd.to_numeric(frame["competition_id"], errors="coerce")
+    flag(_blank(frame["competition_id"]), "competition_id", "未入力です")
+    flag(
+        ~_blank(frame["competition_id"]) & ~competition_id.isin(competition_ids),
+        "competition_id",
+        "登録されていないコンペです",
+    )
+
+    # プレイヤー（IDの指定を優先し、無い場合は名前の索引で変換）
+    player_id = pd.Series(float("nan"), index=frame.index)
+    named = pd.Series(False, index=frame.index)
+    if "player_id" in frame.columns:
+        player_id = pd.to_numeric(frame["player_id"], errors="coerce")
+        flag(player_id.notna() & ~player_id.isin(player_ids), "player", "登録されていないプレイヤーIDです")
+    if "player_name" in frame.columns:
+        named = player_id.isna() & ~_blank(frame["player_name"])
+        matched = frame.loc[named, "player_name"].map(normalize_name).map(player_index)
+        player_id = player_id.where(~named, matched)
+        flag(named & player_id.isna(), "player", "登録されていないプレイヤー名です")
+        flag(named & player_id.eq(AMBIGUOUS_PLAYER), "player", "同じ名前のプレイヤーが複数います（player_id 列で指定してください）")
+    flag(player_id.isna() & ~named, "player", "プレイヤー名が未入力です")
+
+    # OUT / IN
+    scores = {}
+    for column in ("out_score", "in_score"):
+        blank = _blank(frame[column])
+        value = pd.to_numeric(frame[column], errors="coerce")
+        flag(blank | value.eq(0), column, "未入力です")
+        flag(~blank & value.isna(), column, "数値ではありません")
+        flag(value.notna() & (value % 1 != 0), column, "整数で入力してください")
+        flag((value < 0) | (value > HALF_SCORE_MAX), column, f"0から{HALF_SCORE_MAX}の範囲で入力してください")
+        scores[column] = value
+
+    # ハンディキャップ（未入力は0）
+    if "handicap" in frame.columns:
+        blank = _blank(frame["handicap"])
+        handicap = pd.to_numeric(frame["handicap"], errors="coerce")
+        flag(~blank & handicap.isna(), "handicap", "数値ではありません")
+        handicap = handicap.where(~blank, 0.0)
+    else:
+        handicap = pd.Series(0.0, index=frame.index)
+    flag((handicap < 0) | (handicap > HANDICAP_MAX), "handicap", f"0から{HANDICAP_MAX:.0f}の範囲で入力してください")
+
+    # グロス・ネット（スコア入力画面と同じチェック）
+    gross = scores["out_score"] + scores["in_score"]
+    flag(gross > GROSS_SCORE_MAX, "gross_score", f"スコアは0から{GROSS_SCORE_MAX}の範囲で入力してください")
+    flag(gross < GROSS_SCORE_LOW, "gross_score", "グロススコアが通常より低すぎます。入力内容を確認してください", WARNING)
+    net = gross - handicap
+    flag(net < 0, "net_score", "ネットスコアがマイナスです。ハンディキャップを確認してください")
+
+    valid = ~invalid
+    result = pd.DataFrame({
+        "competition_id": competition_id[valid],
+        "player_id": player_id[valid],
+        "out_score": scores["out_score"][valid],
+        "in_score": scores["in_score"][valid],
+        "handicap": handicap[valid].round(2),
+        "net_score": net[valid].round(2),
+    })
+    issues_frame = pd.concat(issues) if issues else pd.DataFrame(columns=list(ISSUE_COLUMNS))
+    return result, issues_frame
+
+
+def read_scorecard(
+    source: BinaryIO,
+    filename: str,
+    players: pd.DataFrame,
+    competitions: pd.DataFrame,
+    chunksize: int = DEFAULT_CHUNK_SIZE,
+) -> ScorecardImport:
+    """スコアカードを読み込んで検証し、保存用の行とエラー・警告を返す
+
+    Args:
+        source: アップロードされたファイル（バイナリのファイルオブジェクト）
+        filename: 形式の判定に使うファイル名
+        players: プレイヤー（id, name）
+        competitions: コンペ（competition_id, date, course）
+        chunksize: 一度に検証する行数
+    """
+    player_index = build_player_index(players)
+    player_ids = set(players["id"].astype(int)) if players is not None and not players.empty else set()
+    competition_info = (
+        competitions.drop_duplicates("competition_id").set_index("competition_id")[["date", "course"]]
+        if competitions is not None and not competitions.empty
+        else pd.DataFrame(columns=["date", "course"])
+    )
+    competition_ids = set(competition_info.index.astype(int))
+
+    valid_frames, issue_frames, rows = [], [], 0
+    for chunk in iter_scorecard_chunks(source, filename, chunksize):
+        valid, issues = validate_chunk(chunk, player_index, player_ids, competition_ids)
+        rows += len(chunk)
+        valid_frames.append(valid)
+        issue_frames.append(issues)
+
+    valid = pd.concat(valid_frames) if valid_frames else pd.DataFrame()
+    issues = [frame for frame in issue_frames if not frame.empty]
+
+    if not valid.empty:
+        # 同じコンペ・プレイヤーの行が複数ある場合は、どちらを保存すべきか決められないためすべてエラー
+        duplicated = valid.duplicated(["competition_id", "player_id"], keep=False)
+        if duplicated.any():
+            issues.append(_issues(duplicated, "player", "同じコンペ・プレイヤーの行が複数あります"))
+            valid = valid[~duplicated]
+
+    result = ScorecardImport(rows=rows)
+    if issues:
+        result.issues = pd.concat(issues).sort_values(["行", "区分"], kind="stable").reset_index(drop=True)
+    if valid.empty:
+        return result
+
+    valid = valid.astype({"competition_id": int, "player_id": int, "out_score": int, "in_score": int})
+    info = competition_info.reindex(valid["competition_id"])
+    valid = valid.assign(
+        date=info["date"].astype(str).str[:10].to_numpy(),
+        course=info["course"].to_numpy(),
+    )
+    result.records = valid[
+        ["competition_id", "player_id", "date", "course", "out_score", "in_score", "handicap", "net_score"]
+    ].to_dict("records")
+    return result
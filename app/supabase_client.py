@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+Supabaseクライアント共通化
+メイン画面・スコア入力・管理画面で1つのクライアント（HTTP接続プールを含む）を共有する
+
+接続確認はクライアント取得のたびではなく、バックグラウンドのヘルスチェックで行う
+（失敗時は指数バックオフで再確認）
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+import streamlit as st
+from dotenv import load_dotenv
+from supabase import Client, create_client
+
+# 環境変数の読み込み
+# .envファイルのパスをプロジェクトルートから解決
+dotenv_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env')
+load_dotenv(dotenv_path=dotenv_path, override=True)
+
+
+# Supabase接続情報 - Streamlit secrets と環境変数の両方をサポート
+def get_secret_supabase(*keys: str) -> str:
+    try:
+        supabase_secrets = st.secrets.get("supabase", {})
+        for key in keys:
+            value = supabase_secrets.get(key, "")
+            if isinstance(value, str) and value.strip():
+                return value.strip()
+        return ""
+    except Exception:
+        return ""
+
+
+SUPABASE_URL = get_secret_supabase("url") or os.getenv("SUPABASE_URL", "").strip()
+SUPABASE_KEY = (
+    get_secret_supabase("key", "anon_key", "anonKey")
+    or os.getenv("SUPABASE_KEY", "").strip()
+    or os.getenv("SUPABASE_ANON_KEY", "").strip()
+)
+SUPABASE_SERVICE_KEY = (
+    get_secret_supabase("service_key", "service_role_key", "serviceKey", "serviceRoleKey")
+    or os.getenv("SUPABASE_SERVICE_KEY", "").strip()
+    or os.getenv("SUPABASE_SERVICE_ROLE_KEY", "").strip()
+)
+
+HEALTH_CHECK_INTERVAL_SECONDS = float(os.getenv("SUPABASE_HEALTH_CHECK_INTERVAL", "60"))
+
+
+class HealthProbe:
+    """バックグラウンドで接続確認を行い、結果を保持する
+
+    成功時は interval 秒ごと、失敗時は initial_backoff 秒から倍々に（max_backoff まで）間隔を空けて再確認する
+    """
+
+    def __init__(
+        self,
+        check: Callable[[], object],
+        interval: float = HEALTH_CHECK_INTERVAL_SECONDS,
+        initial_backoff: float = 0.5,
+        max_backoff: float = 60.0,
+    ):
+        self._check = check
+        self.interval = interval
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.healthy: Optional[bool] = None  # 未確認の間はNone
+        self.last_error: Optional[str] = None
+        self.consecutive_failures = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> float:
+        """接続確認を1回行い、次回までの待機秒数を返す"""
+        try:
+            self._check()
+        except Exception as e:
+            self.consecutive_failures += 1
+            self.healthy = False
+            self.last_error = str(e)
+            logging.warning(f"Supabase接続確認に失敗しました（{self.consecutive_failures}回連続）: {e}")
+            return min(self.initial_backoff * (2 ** (self.consecutive_failures - 1)), self.max_backoff)
+        self.consecutive_failures = 0
+        self.healthy = True
+        self.last_error = None
+        return self.interval
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="supabase-health-probe", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._stop.wait(self.run_once())
+
+
+def _create_client_with_retry(url: str, key: str, label: str) -> Optional[Client]:
+    max_retries = 3
+    for attempt in range(max_retries):
+        try:
+            return create_client(url, key)
+        except Exception as e:
+            if attempt == max_retries - 1:
+                st.error(f"{label}接続エラー（{max_retries}回試行後）: {str(e)}")
+                return None
+            # リトライ前に少し待機
+            time.sleep(0.5 * (attempt + 1))
+    return None
+
+
+@st.cache_resource
+def get_health_probe() -> Optional[HealthProbe]:
+    """共有クライアントのヘルスチェックを取得（初回呼び出し時に開始）"""
+    client = get_supabase_client()
+    if client is None:
+        return None
+    probe = HealthProbe(lambda: client.table("players").select("id").limit(1).execute())
+    probe.start()
+    return probe
+
+
+@st.cache_resource
+def get_supabase_client() -> Optional[Client]:
+    """Supabaseクライアントを取得（プロセス全体で共有）"""
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        return None
+    return _create_client_with_retry(SUPABASE_URL, SUPABASE_KEY, "Supabase")
+
+
+@st.cache_resource
+def get_supabase_admin_client() -> Optional[Client]:
+    """管理者（サービスロール）用のSupabaseクライアントを取得（プロセス全体で共有）"""
+    if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
+        return None
+    return _create_client_with_retry(SUPABASE_URL, SUPABASE_SERVICE_KEY, "Supabase管理者クライアント")
+
+
+def is_supabase_healthy() -> bool:
+    """直近のヘルスチェック結果（未確認の場合は正常とみなす）"""
+    probe = get_health_probe()
+    return probe is None or probe.healthy is not False
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+"""
+タイムスタンプ文字列の解釈
+REST API（ISO 8601）と直接接続（PostgreSQLのテキスト形式）のどちらの updated_at なども同じように解釈する
+
+本番環境の Python 3.10 の datetime.fromisoformat は、PostgreSQL が小数秒の末尾の0を省いた値
+（"…56.12345+00:00"）やテキスト形式（"… 12:34:56.123456+00"）を受け付けないため、dateutil の isoparse を使う
+"""
+
+from datetime import datetime
+from typing import Any
+
+from dateutil.parser import isoparse
+
+
+def parse_timestamp(value: Any) -> datetime:
+    """タイムスタンプ（datetime または文字列）を datetime に変換（解釈できない場合は ValueError）"""
+    if isinstance(value, datetime):
+        return value
+    return isoparse(str(value))
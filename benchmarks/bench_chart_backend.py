@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""Micro-benchmark: server CPU time per main-page chart render, per chart backend.
+
+Builds the main page's charts (average ranking, score trend and winner-count
+ranking) from synthetic history and serializes them the way Streamlit does
+before sending them to the browser:
+
+    matplotlib-cold  PNG rendered on the server, chart cache cleared every page
+    matplotlib-warm  PNG served from app/chart_cache.py (all users share renders)
+    altair           Vega-Lite spec (JSON) rendered in the browser
+    plotly           Plotly figure (JSON) rendered in the browser
+
+N concurrent users each render the page several times from their own thread;
+the table reports process CPU time per page and the payload size.
+
+Usage examples:
+    python benchmarks/bench_chart_backend.py
+    python benchmarks/bench_chart_backend.py --users 1 8 32 --pages 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import matplotlib
+
+matplotlib.use("Agg")
+import pandas as pd  # noqa: E402
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from chart_backend import AltairChartBackend, MatplotlibChartBackend, PlotlyChartBackend  # noqa: E402
+from chart_cache import get_chart_cache  # noqa: E402
+
+# Japanese labels fall back to DejaVu Sans here; the glyph warnings are noise.
+warnings.filterwarnings("ignore", message="Glyph")
+
+BACKENDS = ("matplotlib-cold", "matplotlib-warm", "altair", "plotly")
+
+
+def make_history(players: int, competitions: int, seed: int = 0) -> pd.DataFrame:
+    """Synthetic scores_df with the main page's columns."""
+    rng = random.Random(seed)
+    rows = []
+    for competition in range(1, competitions + 1):
+        date = f"20{10 + competition // 12:02d}-{competition % 12 + 1:02d}-15"
+        for player in rng.sample(range(1, players + 1), k=min(players, 16)):
+            rows.append({
+                "日付": date,
+                "プレイヤー名": f"プレイヤー{player:03d}",
+                "合計スコア": rng.randint(72, 120),
+            })
+    frame = pd.DataFrame(rows)
+    frame["順位"] = frame.groupby("日付")["合計スコア"].rank(method="min").astype(int)
+    return frame
+
+
+def page_inputs(history: pd.DataFrame) -> List[Tuple[str, object, Dict[str, str]]]:
+    """The (kind, data, options) of each chart on the main page."""
+    ranking = history.groupby("プレイヤー名")["合計スコア"].mean().sort_values()
+    player = history["プレイヤー名"].iloc[0]
+    trend = history[history["プレイヤー名"] == player].sort_values("日付")[["日付", "合計スコア"]]
+    winners = (
+        history[history["順位"] == 1].groupby("プレイヤー名").size().reset_index(name="優勝回数")
+        .sort_values("優勝回数", ascending=False).reset_index(drop=True)
+    )
+    return [
+        ("average_ranking", ranking, {}),
+        ("score_trend", trend, {"player": player}),
+        ("winner_counts", winners, {}),
+    ]
+
+
+def page_renderer(name: str, inputs) -> Callable[[], int]:
+    """Render one page; returns the bytes that would be sent to the browser."""
+    if name.startswith("matplotlib"):
+        backend = MatplotlibChartBackend()
+        cold = name == "matplotlib-cold"
+
+        def render() -> int:
+            if cold:
+                get_chart_cache().clear()
+            return sum(len(backend.build(kind, data, **options)) for kind, data, options in inputs)
+    elif name == "altair":
+        backend = AltairChartBackend()
+
+        def render() -> int:
+            return sum(len(backend.build(kind, data, **options).to_json()) for kind, data, options in inputs)
+    else:
+        import plotly.io as pio
+
+        backend = PlotlyChartBackend()
+
+        def render() -> int:
+            return sum(len(pio.to_json(backend.build(kind, data, **options), validate=False)) for kind, data, options in inputs)
+    return render
+
+
+def run(render: Callable[[], int], users: int, pages: int) -> Tuple[float, float, int]:
+    """CPU seconds per page, wall seconds per page and payload bytes per page."""
+    render()  # warm-up (imports, fonts, and the shared cache for matplotlib-warm)
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        sizes = list(pool.map(lambda _: [render() for _ in range(pages)], range(users)))
+    cpu, wall = time.process_time() - cpu_start, time.perf_counter() - wall_start
+    total = users * pages
+    return cpu / total, wall / total, sizes[0][0]
+
+
+def parse_args(argv: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark server CPU per main-page chart render")
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 8], help="Concurrent users (default: 1 8)")
+    parser.add_argument("--pages", type=int, default=3, help="Page renders per user")
+    parser.add_argument("--players", type=int, default=40, help="Players in the synthetic history")
+    parser.add_argument("--competitions", type=int, default=120, help="Competitions in the synthetic history")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = parse_args(argv or sys.argv[1:])
+    inputs = page_inputs(make_history(args.players, args.competitions))
+    print(f"{'backend':>16} {'users':>6} {'cpu/page [ms]':>14} {'wall/page [ms]':>15} {'payload [KB]':>13}")
+    for name in args.backends:
+        render = page_renderer(name, inputs)
+        for users in args.users:
+            cpu, wall, size = run(render, users, args.pages)
+            print(f"{name:>16} {users:>6} {cpu * 1000:>14.1f} {wall * 1000:>15.1f} {size / 1024:>13.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Micro-benchmark: per-query latency of the REST and direct PostgreSQL backends.
+
+Runs the reads behind the stats and results pages (the scores_with_players
+view projection, the player list and the cache version probe) against each
+configured backend and reports median / p95 latency per query.
+
+The REST backend needs SUPABASE_URL and SUPABASE_KEY; the direct backend
+needs DATABASE_URL (or one of the Supabase *_DB_URL variables).
+
+Usage examples:
+    python benchmarks/bench_data_backend.py
+    python benchmarks/bench_data_backend.py --repeat 50 --backends postgres
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from data_backend import (  # noqa: E402
+    DataBackend,
+    PostgresPoolBackend,
+    SupabaseRestBackend,
+    resolve_database_url,
+)
+
+STATS_PAGE_COLUMNS = (
+    "date", "course", "player_name", "out_score", "in_score",
+    "gross_score", "handicap", "net_score", "ranking",
+)
+
+
+def build_backends(names: Sequence[str]) -> Dict[str, DataBackend]:
+    backends: Dict[str, DataBackend] = {}
+    if "supabase" in names:
+        from supabase import create_client
+        from supabase_client import SUPABASE_KEY, SUPABASE_URL
+
+        if SUPABASE_URL and SUPABASE_KEY:
+            backends["supabase"] = SupabaseRestBackend(create_client(SUPABASE_URL, SUPABASE_KEY))
+        else:
+            print("skipping supabase: SUPABASE_URL / SUPABASE_KEY not set")
+    if "postgres" in names:
+        database_url = resolve_database_url()
+        if database_url:
+            backends["postgres"] = PostgresPoolBackend(database_url)
+        else:
+            print("skipping postgres: DATABASE_URL not set")
+    return backends
+
+
+def time_query(func: Callable[[], object], repeat: int) -> List[float]:
+    func()  # warm-up (connection setup, statement preparation)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--backends", nargs="+", default=["supabase", "postgres"])
+    args = parser.parse_args(argv)
+
+    backends = build_backends(args.backends)
+    if not backends:
+        print("no backend configured")
+        return 1
+
+    queries: Dict[str, Callable[[DataBackend], object]] = {
+        "scores_with_players": lambda backend: backend.fetch_all_rows("scores_with_players", STATS_PAGE_COLUMNS),
+        "players": lambda backend: backend.fetch_all_rows("players", ("id", "name")),
+        "version probe": lambda backend: backend.table_version("scores"),
+    }
+
+    print(f"{'backend':<10} {'query':<22} {'median ms':>10} {'p95 ms':>10}")
+    for name, backend in backends.items():
+        try:
+            for label, query in queries.items():
+                timings = sorted(time_query(lambda: query(backend), args.repeat))
+                p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+                print(f"{name:<10} {label:<22} {statistics.median(timings) * 1000:>10.2f} {p95 * 1000:>10.2f}")
+        finally:
+            backend.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Soak test: live matplotlib figures and RSS over many chart renders.
+
+Renders the average-ranking chart (app/charts.py) repeatedly, with different
+data each time so no render is served from a cache, in two ways:
+
+    pyplot  the pattern the app used before: plt.figure() + savefig, never closed
+    pool    app/figure_pool.py: OO Figure API, disposed after every render
+
+At each checkpoint it prints the number of figures still alive and the
+process RSS. The pool run should stay flat; the pyplot run grows with every
+render.
+
+Usage examples:
+    python benchmarks/bench_figure_pool.py
+    python benchmarks/bench_figure_pool.py --renders 2000 --every 250 --modes pool
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import io
+import os
+import resource
+import sys
+import warnings
+from pathlib import Path
+from typing import Callable, Sequence
+
+import matplotlib
+
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt  # noqa: E402
+import pandas as pd  # noqa: E402
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from charts import draw_average_ranking  # noqa: E402
+from figure_pool import FigurePool  # noqa: E402
+
+# Japanese labels fall back to DejaVu Sans here, and the pyplot run opens
+# figures on purpose; both warnings are noise.
+warnings.filterwarnings("ignore", message="Glyph")
+warnings.filterwarnings("ignore", message="More than 20 figures")
+
+
+def rss_mb() -> float:
+    """Current resident set size (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def ranking(index: int, players: int) -> pd.Series:
+    values = [80 + (index * 7 + player * 13) % 40 + 0.25 for player in range(players)]
+    return pd.Series(values, index=[f"プレイヤー{player:02d}" for player in range(players)]).sort_values()
+
+
+def pyplot_renderer() -> tuple[Callable[[pd.Series], bytes], Callable[[], int]]:
+    def render(data: pd.Series) -> bytes:
+        fig = plt.figure()
+        draw_average_ranking(fig, data)
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png", dpi=100)
+        return buffer.getvalue()
+
+    return render, lambda: len(plt.get_fignums())
+
+
+def pool_renderer() -> tuple[Callable[[pd.Series], bytes], Callable[[], int]]:
+    pool = FigurePool()
+
+    def render(data: pd.Series) -> bytes:
+        with pool.figure() as fig:
+            draw_average_ranking(fig, data)
+            buffer = io.BytesIO()
+            fig.savefig(buffer, format="png", dpi=100)
+            return buffer.getvalue()
+
+    return render, lambda: pool.stats().unreleased
+
+
+MODES = {"pyplot": pyplot_renderer, "pool": pool_renderer}
+
+
+def parse_args(argv: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Soak-test matplotlib figure disposal")
+    parser.add_argument("--renders", type=int, default=300, help="Charts rendered per mode (default: 300)")
+    parser.add_argument("--every", type=int, default=50, help="Report every N renders (default: 50)")
+    parser.add_argument("--players", type=int, default=30, help="Bars per chart (default: 30)")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = parse_args(argv or sys.argv[1:])
+    print(f"{'mode':>8} {'renders':>8} {'live figures':>13} {'rss [MB]':>9}")
+    for mode in args.modes:
+        render, live_figures = MODES[mode]()
+        for index in range(1, args.renders + 1):
+            render(ranking(index, args.players))
+            if index % args.every == 0:
+                gc.collect()
+                print(f"{mode:>8} {index:>8} {live_figures():>13} {rss_mb():>9.1f}")
+        plt.close("all")
+        gc.collect()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
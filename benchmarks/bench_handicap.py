@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Micro-benchmark: per-player loop vs. vectorized handicap recompute.
+
+Compares recomputing every player's handicap one player at a time (filter,
+sort and average per player) with app/handicap.compute_handicaps(), which does
+the same work with one sort and a few groupby passes, on synthetic score
+history. It also times app/handicap.handicap_rows(), the full
+player_handicaps rows (handicap plus recent-rounds window) that
+manage_handicaps.py writes. All must produce the same handicaps.
+
+Usage examples:
+    python benchmarks/bench_handicap.py
+    python benchmarks/bench_handicap.py --sizes 10000 100000 --players 500
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from handicap import HandicapRule, compute_handicaps, handicap_rows, recent_rounds, window_handicap  # noqa: E402
+
+
+def per_player_handicaps(scores: pd.DataFrame, rule: HandicapRule) -> pd.DataFrame:
+    """Recompute each player separately from their full history."""
+    rows = []
+    for player_id in sorted(scores["player_id"].unique()):
+        window = recent_rounds(scores[scores["player_id"] == player_id], rule)
+        if window.empty:
+            continue
+        rows.append({
+            "player_id": int(player_id),
+            "handicap": window_handicap(window.to_dict("records"), rule),
+            "rounds_counted": len(window),
+        })
+    return pd.DataFrame(rows)
+
+
+def make_scores(count: int, players: int, seed: int = 0) -> pd.DataFrame:
+    """Synthetic score history; roughly 2% of rounds are left blank."""
+    rng = random.Random(seed)
+    rows: List[Dict] = []
+    for index in range(count):
+        blank = rng.random() < 0.02
+        rows.append({
+            "player_id": rng.randint(1, players),
+            "competition_id": index // 12 + 1,
+            "date": f"20{10 + index * 15 // max(count, 1):02d}-{rng.randint(1, 12):02d}-15",
+            "out_score": None if blank else rng.randint(36, 60),
+            "in_score": None if blank else rng.randint(36, 60),
+        })
+    return pd.DataFrame(rows)
+
+
+def rows_frame(scores: pd.DataFrame, rule: HandicapRule) -> pd.DataFrame:
+    """handicap_rows() for every player, reduced to the compute_handicaps() columns."""
+    rows = handicap_rows(scores, sorted(int(player_id) for player_id in scores["player_id"].unique()), rule)
+    frame = pd.DataFrame(rows)
+    frame = frame[frame["rounds_counted"] > 0]
+    return frame[["player_id", "handicap", "rounds_counted"]].reset_index(drop=True)
+
+
+def best_of(func: Callable[[], object], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def parse_args(argv: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the batch handicap recompute")
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[10_000, 100_000],
+        help="Score row counts to benchmark (default: 10000 100000)",
+    )
+    parser.add_argument("--players", type=int, default=200, help="Distinct players in the synthetic history")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions per size (best is reported)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = parse_args(argv or sys.argv[1:])
+    rule = HandicapRule()
+    print(f"{'rows':>10} {'per player [s]':>16} {'vectorized [s]':>16} {'speedup':>9} {'rows [s]':>10}")
+    for size in args.sizes:
+        scores = make_scores(size, args.players)
+        expected = per_player_handicaps(scores, rule)
+        pd.testing.assert_frame_equal(compute_handicaps(scores, rule).reset_index(drop=True), expected, check_dtype=False)
+        pd.testing.assert_frame_equal(rows_frame(scores, rule), expected, check_dtype=False)
+        player_ids = sorted(int(player_id) for player_id in scores["player_id"].unique())
+        legacy = best_of(lambda: per_player_handicaps(scores, rule), args.repeat)
+        vectorized = best_of(lambda: compute_handicaps(scores, rule), args.repeat)
+        rows = best_of(lambda: handicap_rows(scores, player_ids, rule), args.repeat)
+        print(f"{size:>10} {legacy:>16.3f} {vectorized:>16.3f} {legacy / vectorized:>8.1f}x {rows:>10.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""Micro-benchmark: full Styler render vs. one page of the past-data grid.
+
+The main page used to send the whole past-data table through
+DataFrame.style.format(...), which formats every cell on the server. The grid
+(app/data_grid.py) filters and sorts on the server and sends one page, with
+number formats left to column_config in the browser.
+
+    styler  style.format(...) rendered for every row (to_html as the proxy)
+    grid    filter + sort + one page, serialized to Arrow as st.dataframe does
+
+Usage examples:
+    python benchmarks/bench_past_data_grid.py
+    python benchmarks/bench_past_data_grid.py --sizes 1000 10000 50000 --page-size 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Sequence
+
+import pandas as pd
+import pyarrow as pa
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from data_grid import filter_rows, page_rows, sort_rows  # noqa: E402
+
+STYLER_FORMATS = {
+    "ハンディキャップ": "{:.2f}",
+    "ネットスコア": "{:.2f}",
+    "アウトスコア": "{:.0f}",
+    "インスコア": "{:.0f}",
+    "合計スコア": "{:.0f}",
+    "順位": "{:.0f}",
+    "競技ID": "{:.0f}",
+}
+
+
+def make_past_data(count: int, seed: int = 0) -> pd.DataFrame:
+    """Synthetic past-data frame with the main page's columns."""
+    rng = random.Random(seed)
+    rows = []
+    for index in range(count):
+        out_score, in_score = rng.randint(36, 60), rng.randint(36, 60)
+        handicap = round(rng.uniform(0, 36), 1)
+        rows.append({
+            "順位": index % 16 + 1,
+            "競技ID": index // 16 + 1,
+            "日付": f"20{10 + index * 15 // max(count, 1):02d}-{rng.randint(1, 12):02d}-15",
+            "コース": f"コース{rng.randint(0, 9)}",
+            "プレイヤー名": f"選手{rng.randint(1, 60)}",
+            "アウトスコア": out_score,
+            "インスコア": in_score,
+            "合計スコア": out_score + in_score,
+            "ハンディキャップ": handicap,
+            "ネットスコア": out_score + in_score - handicap,
+        })
+    return pd.DataFrame(rows)
+
+
+def best_of(func: Callable[[], object], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def styler_render(frame: pd.DataFrame) -> int:
+    return len(frame.style.format(STYLER_FORMATS).to_html())
+
+
+def grid_render(frame: pd.DataFrame, page_size: int) -> int:
+    view = sort_rows(filter_rows(frame, {"プレイヤー名": None, "コース": None}), "合計スコア", ascending=True)
+    page = page_rows(view, 2, page_size)
+    table = pa.Table.from_pandas(page, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().size
+
+
+def parse_args(argv: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the paginated past-data grid")
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[1_000, 10_000],
+        help="Past-data row counts to benchmark (default: 1000 10000)",
+    )
+    parser.add_argument("--page-size", type=int, default=50, help="Rows per grid page (default: 50)")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions per size (best is reported)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = parse_args(argv or sys.argv[1:])
+    print(f"{'rows':>10} {'styler [s]':>11} {'grid [s]':>10} {'speedup':>9} {'styler [KB]':>12} {'grid [KB]':>10}")
+    for size in args.sizes:
+        frame = make_past_data(size)
+        assert len(page_rows(sort_rows(frame, "合計スコア"), 2, args.page_size)) == min(args.page_size, max(size - args.page_size, 0))
+        styler = best_of(lambda: styler_render(frame), args.repeat)
+        grid = best_of(lambda: grid_render(frame, args.page_size), args.repeat)
+        styler_bytes, grid_bytes = styler_render(frame), grid_render(frame, args.page_size)
+        print(
+            f"{size:>10} {styler:>11.3f} {grid:>10.4f} {styler / grid:>8.0f}x"
+            f" {styler_bytes / 1024:>12.0f} {grid_bytes / 1024:>10.1f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Micro-benchmark: row-loop vs. vectorized score normalization.
+
+Compares the previous per-row loop in fetch_scores() with
+app/score_frames.build_scores_frame() on synthetic scores_with_players rows
+and checks that both produce identical DataFrames.
+
+Usage examples:
+    python benchmarks/bench_score_frames.py
+    python benchmarks/bench_score_frames.py --sizes 10000 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from score_frames import build_scores_frame  # noqa: E402
+
+
+def legacy_build_scores_frame(scores: List[Dict]) -> pd.DataFrame:
+    """Per-row normalization as previously implemented in fetch_scores()."""
+    scores_list = []
+    for score in scores:
+        if not isinstance(score, dict):
+            continue
+        out_score_val = score.get("out_score")
+        out_score = int(out_score_val) if isinstance(out_score_val, (int, str)) and str(out_score_val).isdigit() else 0
+        in_score_val = score.get("in_score")
+        in_score = int(in_score_val) if isinstance(in_score_val, (int, str)) and str(in_score_val).isdigit() else 0
+        if "gross_score" in score:
+            total_score = score.get("gross_score")
+        elif out_score > 0 and in_score > 0:
+            total_score = out_score + in_score
+        else:
+            total_score = None
+        scores_list.append({
+            "競技ID": score.get("competition_id"),
+            "日付": score.get("date"),
+            "コース": score.get("course"),
+            "プレイヤー名": score.get("player_name") if score.get("player_name") is not None else "不明",
+            "アウトスコア": out_score,
+            "インスコア": in_score,
+            "合計スコア": total_score,
+            "ハンディキャップ": score.get("handicap"),
+            "ネットスコア": score.get("net_score"),
+            "順位": score.get("ranking"),
+        })
+    return pd.DataFrame(scores_list)
+
+
+def make_rows(count: int, seed: int = 0) -> List[Dict]:
+    """Synthetic rows shaped like the scores_with_players view."""
+    rng = random.Random(seed)
+    names = [f"player{index}" for index in range(40)]
+    courses = ["本千葉", "鎌ケ谷", "成田", "袖ケ浦"]
+    rows = []
+    for index in range(count):
+        out_score = rng.choice([None, 0] + list(range(36, 60)))
+        in_score = rng.choice([None, 0] + list(range(36, 60)))
+        handicap = round(rng.uniform(0, 30), 1)
+        valid = bool(out_score) and bool(in_score)
+        rows.append({
+            "id": index + 1,
+            "competition_id": index // 12 + 1,
+            "player_id": rng.randint(1, 40),
+            "player_name": rng.choice(names),
+            "date": f"20{rng.randint(10, 25)}-{rng.randint(1, 12):02d}-15",
+            "course": rng.choice(courses),
+            "out_score": out_score,
+            "in_score": in_score,
+            "gross_score": out_score + in_score if valid else None,
+            "handicap": handicap,
+            "net_score": round(out_score + in_score - handicap, 1) if valid else None,
+            "ranking": rng.randint(1, 12),
+            "updated_at": "2024-01-01T00:00:00+00:00",
+        })
+    return rows
+
+
+def best_of(func: Callable[[], pd.DataFrame], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def parse_args(argv: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark score normalization")
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[10_000, 100_000, 1_000_000],
+        help="Row counts to benchmark (default: 10000 100000 1000000)",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions per size (best is reported)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = parse_args(argv or sys.argv[1:])
+    print(f"{'rows':>10} {'row loop [s]':>14} {'vectorized [s]':>16} {'speedup':>9}")
+    for size in args.sizes:
+        rows = make_rows(size)
+        pd.testing.assert_frame_equal(build_scores_frame(rows), legacy_build_scores_frame(rows))
+        legacy = best_of(lambda: legacy_build_scores_frame(rows), args.repeat)
+        vectorized = best_of(lambda: build_scores_frame(rows), args.repeat)
+        print(f"{size:>10} {legacy:>14.3f} {vectorized:>16.3f} {legacy / vectorized:>8.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Recompute every player's handicap from their score history.
+
+The app keeps player_handicaps (migration 0013) up to date incrementally:
+saving a round only rebuilds the saved players' recent-rounds windows
+(refresh_player_handicaps, migration 0014). This tool
+rebuilds all rows in one pass instead, for the first deployment or after
+changing the rule (HANDICAP_ROUNDS / HANDICAP_BEST / HANDICAP_PAR).
+
+All score rows are read in a single query and the handicaps are computed with
+vectorized pandas/NumPy (app/handicap.py). The rows are then written back in
+a single INSERT ... ON CONFLICT statement.
+
+Usage examples:
+    python manage_handicaps.py --dry-run
+    python manage_handicaps.py
+    python manage_handicaps.py --rounds 20 --best 8 --par 72
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import pandas as pd
+
+from manage_migrations import psycopg, resolve_database_url
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "app"))
+
+from handicap import (  # noqa: E402
+    HANDICAP_BEST,
+    HANDICAP_PAR,
+    HANDICAP_ROUNDS,
+    ROUND_COLUMNS,
+    HandicapRule,
+    handicap_rows,
+)
+
+UPSERT_QUERY = """
+INSERT INTO player_handicaps (player_id, handicap, rounds_counted, recent_rounds, rule)
+SELECT r.player_id, r.handicap, r.rounds_counted, r.recent_rounds, r.rule
+FROM jsonb_to_recordset(%s) AS r(
+    player_id INTEGER,
+    handicap NUMERIC,
+    rounds_counted INTEGER,
+    recent_rounds JSONB,
+    rule TEXT
+)
+ON CONFLICT (player_id) DO UPDATE SET
+    handicap = EXCLUDED.handicap,
+    rounds_counted = EXCLUDED.rounds_counted,
+    recent_rounds = EXCLUDED.recent_rounds,
+    rule = EXCLUDED.rule
+"""
+
+
+def load_scores(connection: psycopg.Connection) -> pd.DataFrame:
+    """Read every score row needed for the handicap calculation."""
+
+    cursor = connection.execute(f"SELECT {', '.join(ROUND_COLUMNS)} FROM scores")
+    return pd.DataFrame(cursor.fetchall(), columns=list(ROUND_COLUMNS))
+
+
+def recompute(connection: psycopg.Connection, rule: HandicapRule, dry_run: bool = False) -> Dict[str, float]:
+    """Rebuild player_handicaps for every player and return timings in seconds."""
+
+    from psycopg.types.json import Jsonb
+
+    started = time.perf_counter()
+    scores = load_scores(connection)
+    player_ids = [row[0] for row in connection.execute("SELECT id FROM players ORDER BY id").fetchall()]
+    loaded = time.perf_counter()
+
+    rows = handicap_rows(scores, player_ids, rule)
+    computed = time.perf_counter()
+
+    if not dry_run:
+        connection.execute(UPSERT_QUERY, (Jsonb(rows),))
+        connection.commit()
+    written = time.perf_counter()
+
+    return {
+        "rows": float(len(scores)),
+        "players": float(len(rows)),
+        "rated": float(sum(1 for row in rows if row["handicap"] is not None)),
+        "load": loaded - started,
+        "compute": computed - loaded,
+        "write": written - computed,
+    }
+
+
+def parse_args(argv: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Recompute player_handicaps from score history")
+    parser.add_argument(
+        "--database-url",
+        dest="database_url",
+        help="PostgreSQL connection string. Defaults to DATABASE_URL or Supabase env vars.",
+    )
+    parser.add_argument("--rounds", type=int, default=HANDICAP_ROUNDS, help="Recent rounds considered (default: %(default)s).")
+    parser.add_argument("--best", type=int, default=HANDICAP_BEST, help="Best rounds averaged (default: %(default)s).")
+    parser.add_argument("--par", type=int, default=HANDICAP_PAR, help="Par the differentials are taken from (default: %(default)s).")
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Compute and report without writing player_handicaps.",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = parse_args(argv or sys.argv[1:])
+    try:
+        rule = HandicapRule(rounds=args.rounds, best=args.best, par=args.par)
+    except ValueError as exc:
+        raise SystemExit(str(exc)) from exc
+
+    database_url = resolve_database_url(args.database_url)
+    if not database_url:
+        raise SystemExit(
+            "Database URL not provided. Set DATABASE_URL (or Supabase *_DB_URL) or pass --database-url."
+        )
+
+    with psycopg.connect(database_url) as connection:
+        stats = recompute(connection, rule, dry_run=args.dry_run)
+
+    summary: List[str] = [
+        f"{int(stats['rated'])}/{int(stats['players'])} player(s) rated from {int(stats['rows'])} score row(s) ({rule.key})",
+        f"load {stats['load'] * 1000:.0f} ms, compute {stats['compute'] * 1000:.0f} ms, write {stats['write'] * 1000:.0f} ms",
+    ]
+    if args.dry_run:
+        summary.append("Dry run: player_handicaps was not modified.")
+    print("\n".join(summary))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""Backfill and consistency check for the player_stats summary table.
+
+player_stats (migration 0004) is maintained by statement-level triggers on
+scores. This tool rebuilds it from scratch and verifies it against a full
+recompute (the player_stats_recomputed view).
+
+Usage examples:
+    python manage_player_stats.py --check
+    python manage_player_stats.py --backfill
+    python manage_player_stats.py --backfill --player-id 3 --player-id 7
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from typing import List, Sequence, Tuple
+
+from manage_migrations import psycopg, resolve_database_url
+
+# Columns compared by --check (everything except the maintenance timestamp)
+STAT_COLUMNS = (
+    "participation_count",
+    "avg_net",
+    "best_net",
+    "worst_net",
+    "stddev_net",
+    "avg_gross",
+    "best_gross",
+    "win_count",
+    "top3_count",
+    "last_played",
+    "course_net_averages",
+)
+
+CHECK_QUERY = f"""
+SELECT
+    COALESCE(ps.player_id, r.player_id) AS player_id,
+    CASE
+        WHEN ps.player_id IS NULL THEN 'missing'
+        WHEN r.player_id IS NULL THEN 'orphaned'
+        ELSE 'mismatch'
+    END AS problem,
+    ARRAY(
+        SELECT column_name
+        FROM unnest(
+            ARRAY[{", ".join(f"'{column}'" for column in STAT_COLUMNS)}],
+            ARRAY[{", ".join(f"ps.{column}::TEXT IS DISTINCT FROM r.{column}::TEXT" for column in STAT_COLUMNS)}]
+        ) AS differences(column_name, differs)
+        WHERE differs
+    ) AS columns
+FROM player_stats ps
+FULL OUTER JOIN player_stats_recomputed r ON r.player_id = ps.player_id
+WHERE ps.player_id IS NULL
+   OR r.player_id IS NULL
+   OR ({" OR ".join(f"ps.{column}::TEXT IS DISTINCT FROM r.{column}::TEXT" for column in STAT_COLUMNS)})
+ORDER BY 1
+"""
+
+
+def backfill(connection: psycopg.Connection, player_ids: Sequence[int] | None = None) -> int:
+    """Recompute player_stats for the given players (all players when omitted)."""
+
+    row = connection.execute(
+        "SELECT refresh_player_stats(%s)",
+        (list(player_ids) if player_ids else None,),
+    ).fetchone()
+    connection.commit()
+    return row[0] if row else 0
+
+
+def check(connection: psycopg.Connection) -> List[Tuple[int, str, List[str]]]:
+    """Return (player_id, problem, differing columns) for rows that disagree with a full recompute."""
+
+    return [tuple(row) for row in connection.execute(CHECK_QUERY).fetchall()]
+
+
+def parse_args(argv: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Maintain the player_stats summary table")
+    parser.add_argument(
+        "--database-url",
+        dest="database_url",
+        help="PostgreSQL connection string. Defaults to DATABASE_URL or Supabase env vars.",
+    )
+    parser.add_argument(
+        "--backfill",
+        action="store_true",
+        help="Recompute player_stats from scores.",
+    )
+    parser.add_argument(
+        "--player-id",
+        dest="player_ids",
+        type=int,
+        action="append",
+        help="Limit --backfill to this player (repeatable).",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Diff player_stats against a full recompute; exits 1 on differences.",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = parse_args(argv or sys.argv[1:])
+    if not args.backfill and not args.check:
+        raise SystemExit("Nothing to do. Pass --backfill and/or --check.")
+
+    database_url = resolve_database_url(args.database_url)
+    if not database_url:
+        raise SystemExit(
+            "Database URL not provided. Set DATABASE_URL (or Supabase *_DB_URL) or pass --database-url."
+        )
+
+    with psycopg.connect(database_url) as connection:
+        if args.backfill:
+            updated = backfill(connection, args.player_ids)
+            print(f"Refreshed {updated} player_stats row(s).")
+
+        if args.check:
+            problems = check(connection)
+            if not problems:
+                print("✅ player_stats matches a full recompute.")
+                return 0
+            for player_id, problem, columns in problems:
+                detail = f" ({', '.join(columns)})" if problem == "mismatch" else ""
+                print(f"player {player_id}: {problem}{detail}")
+            print(f"❌ {len(problems)} player_stats row(s) differ. Run with --backfill to repair.")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""Bulk re-rank every competition with set-based SQL.
+
+Historic ranking values were imported from SQLite or written by older
+versions of calculate_rankings(), so they may not follow the current tie
+rules. This tool recomputes them with rerank_competitions() (migration 0008).
+Each chunk of competitions is a single UPDATE that ranks with a window
+function partitioned by competition. Chunks run in parallel on a small
+connection pool.
+
+Completed chunks are recorded in a state file, so an interrupted run resumes
+where it stopped. Every row whose ranking changed is appended to a CSV report.
+
+Usage examples:
+    python manage_rankings.py --dry-run --report rerank.csv
+    python manage_rankings.py --workers 4 --chunk-size 500 --report rerank.csv
+    python manage_rankings.py --tiebreak net_score,handicap,in_score --method dense --restart
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Sequence, Set, Tuple
+
+from manage_migrations import psycopg, resolve_database_url
+
+try:
+    from psycopg_pool import ConnectionPool
+except ModuleNotFoundError as exc:  # pragma: no cover - guarded by requirements
+    raise SystemExit(
+        "psycopg-pool is required to re-rank competitions. Install dependencies via `pip install -r requirements.txt`."
+    ) from exc
+
+# Same defaults and environment variables as app/ranking.py
+DEFAULT_TIEBREAK = os.getenv("RANKING_TIEBREAK", "net_score,handicap")
+DEFAULT_METHOD = os.getenv("RANKING_METHOD", "competition")
+DEFAULT_STATE_FILE = ".rerank_state.json"
+REPORT_HEADER = ("competition_id", "player_id", "old_ranking", "new_ranking")
+
+# Concurrent chunks refresh overlapping player_stats rows. Those refreshes are
+# serialized per player (migration 0004); a chunk that still hits a deadlock
+# or serialization failure is retried.
+RETRYABLE_ERRORS = (psycopg.errors.DeadlockDetected, psycopg.errors.SerializationFailure)
+
+ChangedRow = Tuple[int, int, "int | None", int]
+
+
+@dataclass
+class RerankState:
+    """Competitions already re-ranked under a given rule, persisted as JSON."""
+
+    path: Path
+    tiebreak: Tuple[str, ...]
+    method: str
+    completed: Set[int] = field(default_factory=set)
+
+    @classmethod
+    def load(cls, path: Path, tiebreak: Sequence[str], method: str, restart: bool = False) -> "RerankState":
+        state = cls(path=path, tiebreak=tuple(tiebreak), method=method)
+        if restart or not path.exists():
+            return state
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if tuple(data.get("tiebreak", ())) != state.tiebreak or data.get("method") != method:
+            raise SystemExit(
+                f"{path} was written for a different ranking rule "
+                f"({','.join(data.get('tiebreak', ()))} / {data.get('method')}). Pass --restart to discard it."
+            )
+        state.completed = {int(competition_id) for competition_id in data.get("completed", [])}
+        return state
+
+    def mark_done(self, competition_ids: Sequence[int]) -> None:
+        self.completed.update(competition_ids)
+        payload = {"tiebreak": list(self.tiebreak), "method": self.method, "completed": sorted(self.completed)}
+        temporary = self.path.with_name(self.path.name + ".tmp")
+        temporary.write_text(json.dumps(payload), encoding="utf-8")
+        os.replace(temporary, self.path)
+
+
+@dataclass
+class RerankSummary:
+    competitions: int = 0
+    skipped: int = 0
+    chunks: int = 0
+    changed: int = 0
+    seconds: float = 0.0
+
+
+def chunked(values: Sequence[int], size: int) -> List[List[int]]:
+    """Split values into consecutive chunks of at most `size` items."""
+
+    if size < 1:
+        raise ValueError("chunk size must be positive")
+    return [list(values[start:start + size]) for start in range(0, len(values), size)]
+
+
+def fetch_competition_ids(connection: psycopg.Connection) -> List[int]:
+    """Return every competition id that has scores, in ascending order."""
+
+    rows = connection.execute("SELECT DISTINCT competition_id FROM scores ORDER BY 1").fetchall()
+    return [row[0] for row in rows]
+
+
+def rerank_chunk(
+    pool: ConnectionPool,
+    competition_ids: Sequence[int],
+    tiebreak: Sequence[str],
+    method: str,
+    dry_run: bool = False,
+    retries: int = 3,
+) -> List[ChangedRow]:
+    """Re-rank one chunk in its own transaction and return the changed rows."""
+
+    for attempt in range(retries + 1):
+        try:
+            with pool.connection() as connection:
+                rows = connection.execute(
+                    "SELECT competition_id, player_id, old_ranking, new_ranking"
+                    " FROM rerank_competitions(%s, %s, %s) ORDER BY 1, 4, 2",
+                    (list(competition_ids), list(tiebreak), method),
+                ).fetchall()
+                if dry_run:
+                    connection.rollback()
+                else:
+                    connection.commit()
+                return [tuple(row) for row in rows]
+        except RETRYABLE_ERRORS:
+            if attempt == retries:
+                raise
+            time.sleep(0.1 * (attempt + 1))
+    return []
+
+
+def open_report(path: Path | None, append: bool):
+    if path is None:
+        return None, None
+    append = append and path.exists()
+    handle = path.open("a" if append else "w", newline="", encoding="utf-8")
+    writer = csv.writer(handle)
+    if not append:
+        writer.writerow(REPORT_HEADER)
+    return handle, writer
+
+
+def run(
+    conninfo: str,
+    tiebreak: Sequence[str],
+    method: str,
+    workers: int = 4,
+    chunk_size: int = 500,
+    state_path: Path | None = None,
+    report_path: Path | None = None,
+    dry_run: bool = False,
+    restart: bool = False,
+) -> RerankSummary:
+    """Re-rank every competition and return a summary of the run."""
+
+    started = time.perf_counter()
+    # A dry run writes nothing, so there is no progress to resume from.
+    state = None
+    if state_path is not None and not dry_run:
+        state = RerankState.load(state_path, tiebreak, method, restart=restart)
+
+    summary = RerankSummary()
+    with ConnectionPool(conninfo, min_size=1, max_size=max(1, workers), open=True) as pool:
+        with pool.connection() as connection:
+            competition_ids = fetch_competition_ids(connection)
+        pending = [competition_id for competition_id in competition_ids if not state or competition_id not in state.completed]
+        summary.competitions = len(pending)
+        summary.skipped = len(competition_ids) - len(pending)
+        chunks = chunked(pending, chunk_size)
+        summary.chunks = len(chunks)
+
+        handle, writer = open_report(report_path, append=state is not None and bool(state.completed))
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+                futures = {
+                    executor.submit(rerank_chunk, pool, chunk, tiebreak, method, dry_run): chunk
+                    for chunk in chunks
+                }
+                for future in as_completed(futures):
+                    changed = future.result()
+                    summary.changed += len(changed)
+                    if writer is not None:
+                        writer.writerows(changed)
+                        handle.flush()
+                    if state is not None:
+                        state.mark_done(futures[future])
+        finally:
+            if handle is not None:
+                handle.close()
+
+    summary.seconds = time.perf_counter() - started
+    return summary
+
+
+def parse_args(argv: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Recompute rankings for every competition")
+    parser.add_argument(
+        "--database-url",
+        dest="database_url",
+        help="PostgreSQL connection string. Defaults to DATABASE_URL or Supabase env vars.",
+    )
+    parser.add_argument(
+        "--tiebreak",
+        default=DEFAULT_TIEBREAK,
+        help="Comma-separated tiebreak chain (default: RANKING_TIEBREAK or net_score,handicap).",
+    )
+    parser.add_argument(
+        "--method",
+        default=DEFAULT_METHOD,
+        choices=("competition", "dense"),
+        help="Tie handling: competition (1,1,3) or dense (1,1,2). Defaults to RANKING_METHOD or competition.",
+    )
+    parser.add_argument("--workers", type=int, default=4, help="Number of chunks processed in parallel (default: 4).")
+    parser.add_argument("--chunk-size", type=int, default=500, help="Competitions per UPDATE (default: 500).")
+    parser.add_argument(
+        "--state-file",
+        default=DEFAULT_STATE_FILE,
+        help=f"Progress file used to resume an interrupted run (default: {DEFAULT_STATE_FILE}).",
+    )
+    parser.add_argument("--restart", action="store_true", help="Ignore the state file and re-rank everything.")
+    parser.add_argument("--report", help="Write changed rows (old and new ranking) to this CSV file.")
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Compute and report changes without writing them.",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = parse_args(argv or sys.argv[1:])
+    database_url = resolve_database_url(args.database_url)
+    if not database_url:
+        raise SystemExit(
+            "Database URL not provided. Set DATABASE_URL (or Supabase *_DB_URL) or pass --database-url."
+        )
+
+    tiebreak = [key.strip() for key in args.tiebreak.split(",") if key.strip()]
+    summary = run(
+        database_url,
+        tiebreak,
+        args.method,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        state_path=Path(args.state_file),
+        report_path=Path(args.report) if args.report else None,
+        dry_run=args.dry_run,
+        restart=args.restart,
+    )
+
+    verb = "Would change" if args.dry_run else "Changed"
+    print(
+        f"Re-ranked {summary.competitions} competition(s) in {summary.chunks} chunk(s) "
+        f"({summary.skipped} already done) in {summary.seconds:.2f}s."
+    )
+    print(f"{verb} {summary.changed} ranking(s).")
+    if args.report:
+        print(f"Report: {args.report}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
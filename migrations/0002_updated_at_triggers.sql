@@ -0,0 +1,39 @@
+-- 0002_updated_at_triggers.sql
+-- 更新時に updated_at を自動更新し、アプリのキャッシュがテーブルのバージョン（件数と最大updated_at）で変更を検知できるようにする
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION set_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at := timezone('utc', now());
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_players_updated_at ON players;
+CREATE TRIGGER trg_players_updated_at
+    BEFORE UPDATE ON players
+    FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+DROP TRIGGER IF EXISTS trg_competitions_updated_at ON competitions;
+CREATE TRIGGER trg_competitions_updated_at
+    BEFORE UPDATE ON competitions
+    FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+DROP TRIGGER IF EXISTS trg_scores_updated_at ON scores;
+CREATE TRIGGER trg_scores_updated_at
+    BEFORE UPDATE ON scores
+    FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+DROP TRIGGER IF EXISTS trg_announcements_updated_at ON announcements;
+CREATE TRIGGER trg_announcements_updated_at
+    BEFORE UPDATE ON announcements
+    FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+-- バージョン確認（ORDER BY updated_at DESC LIMIT 1）用のインデックス
+CREATE INDEX IF NOT EXISTS idx_players_updated_at ON players (updated_at DESC);
+CREATE INDEX IF NOT EXISTS idx_competitions_updated_at ON competitions (updated_at DESC);
+CREATE INDEX IF NOT EXISTS idx_scores_updated_at ON scores (updated_at DESC);
+
+COMMIT;
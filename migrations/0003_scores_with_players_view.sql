@@ -0,0 +1,42 @@
+-- 0003_scores_with_players_view.sql
+-- スコアにプレイヤー名を結合し、グロススコアをSQL側で計算したビュー
+-- fetch_scores() はこのビューを1回のリクエストで取得する
+
+BEGIN;
+
+CREATE OR REPLACE VIEW scores_with_players
+WITH (security_invoker = true) AS
+SELECT
+    s.id,
+    s.competition_id,
+    s.player_id,
+    p.name AS player_name,
+    s.date,
+    s.course,
+    s.out_score,
+    s.in_score,
+    -- OUT/INの両方が入力されている場合のみグロススコアを計算
+    CASE
+        WHEN s.out_score > 0 AND s.in_score > 0 THEN s.out_score + s.in_score
+    END AS gross_score,
+    s.handicap,
+    s.net_score,
+    s.ranking,
+    -- プレイヤー名の変更もビューの更新として扱う
+    GREATEST(s.updated_at, p.updated_at) AS updated_at
+FROM scores s
+LEFT JOIN players p ON p.id = s.player_id;
+
+-- Supabase環境のみ、APIロールに参照権限を付与（ローカルPostgreSQLにはロールが存在しない）
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN
+        GRANT SELECT ON scores_with_players TO anon;
+    END IF;
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'authenticated') THEN
+        GRANT SELECT ON scores_with_players TO authenticated;
+    END IF;
+END
+$$;
+
+COMMIT;
@@ -0,0 +1,172 @@
+-- 0004_player_stats.sql
+-- プレイヤーごとの集計（参加回数・平均/ベスト・入賞回数・コース別平均など）を保持する player_stats テーブル
+-- scores への書き込み時にトリガーで対象プレイヤーの行だけを再計算し、個人成績ダッシュボードは1行を読むだけにする
+
+BEGIN;
+
+-- 集計の定義（全件の再計算と整合性チェックにも使用）
+CREATE OR REPLACE VIEW player_stats_recomputed AS
+WITH course_averages AS (
+    SELECT
+        player_id,
+        jsonb_object_agg(course, avg_net) AS course_net_averages
+    FROM (
+        SELECT player_id, course, AVG(net_score) AS avg_net
+        FROM scores
+        WHERE course IS NOT NULL AND net_score IS NOT NULL
+        GROUP BY player_id, course
+    ) c
+    GROUP BY player_id
+)
+SELECT
+    s.player_id,
+    COUNT(*)::INTEGER AS participation_count,
+    AVG(s.net_score) AS avg_net,
+    MIN(s.net_score) AS best_net,
+    MAX(s.net_score) AS worst_net,
+    STDDEV_SAMP(s.net_score) AS stddev_net,
+    -- グロスは scores_with_players と同じく OUT/IN の両方が入力されている場合のみ
+    AVG(CASE WHEN s.out_score > 0 AND s.in_score > 0 THEN s.out_score + s.in_score END) AS avg_gross,
+    MIN(CASE WHEN s.out_score > 0 AND s.in_score > 0 THEN s.out_score + s.in_score END) AS best_gross,
+    COUNT(*) FILTER (WHERE s.ranking = 1)::INTEGER AS win_count,
+    COUNT(*) FILTER (WHERE s.ranking <= 3)::INTEGER AS top3_count,
+    MAX(s.date) AS last_played,
+    COALESCE(ca.course_net_averages, '{}'::JSONB) AS course_net_averages
+FROM scores s
+JOIN players p ON p.id = s.player_id
+LEFT JOIN course_averages ca ON ca.player_id = s.player_id
+GROUP BY s.player_id, ca.course_net_averages;
+
+CREATE TABLE IF NOT EXISTS player_stats (
+    player_id INTEGER PRIMARY KEY REFERENCES players(id) ON DELETE CASCADE,
+    participation_count INTEGER NOT NULL,
+    avg_net NUMERIC,
+    best_net NUMERIC,
+    worst_net NUMERIC,
+    stddev_net NUMERIC,
+    avg_gross NUMERIC,
+    best_gross INTEGER,
+    win_count INTEGER NOT NULL DEFAULT 0,
+    top3_count INTEGER NOT NULL DEFAULT 0,
+    last_played DATE,
+    course_net_averages JSONB NOT NULL DEFAULT '{}'::JSONB,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT timezone('utc', now())
+);
+
+CREATE INDEX IF NOT EXISTS idx_player_stats_updated_at ON player_stats (updated_at DESC);
+
+-- 指定したプレイヤー（NULLの場合は全員）の集計を再計算し、更新した行数を返す
+CREATE OR REPLACE FUNCTION refresh_player_stats(target_player_ids INTEGER[] DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    affected INTEGER;
+    removed INTEGER;
+BEGIN
+    -- 並行するトランザクションが同じプレイヤーを再計算すると、後からコミットした側が
+    -- 先のコミットを含まないスナップショットの集計で上書きしてしまうため、プレイヤーごとの
+    -- トランザクションロックを ID 順に取得してから集計する（以降の文は待機後のスナップショットで実行される）
+    PERFORM pg_advisory_xact_lock(hashtext('player_stats'), p.id)
+    FROM (
+        SELECT id FROM players
+        WHERE target_player_ids IS NULL OR id = ANY(target_player_ids)
+        ORDER BY id
+    ) AS p;
+
+    INSERT INTO player_stats (
+        player_id, participation_count, avg_net, best_net, worst_net, stddev_net,
+        avg_gross, best_gross, win_count, top3_count, last_played, course_net_averages, updated_at
+    )
+    SELECT
+        r.player_id, r.participation_count, r.avg_net, r.best_net, r.worst_net, r.stddev_net,
+        r.avg_gross, r.best_gross, r.win_count, r.top3_count, r.last_played, r.course_net_averages,
+        timezone('utc', now())
+    FROM player_stats_recomputed r
+    WHERE target_player_ids IS NULL OR r.player_id = ANY(target_player_ids)
+    ON CONFLICT (player_id) DO UPDATE SET
+        participation_count = EXCLUDED.participation_count,
+        avg_net = EXCLUDED.avg_net,
+        best_net = EXCLUDED.best_net,
+        worst_net = EXCLUDED.worst_net,
+        stddev_net = EXCLUDED.stddev_net,
+        avg_gross = EXCLUDED.avg_gross,
+        best_gross = EXCLUDED.best_gross,
+        win_count = EXCLUDED.win_count,
+        top3_count = EXCLUDED.top3_count,
+        last_played = EXCLUDED.last_played,
+        course_net_averages = EXCLUDED.course_net_averages,
+        updated_at = EXCLUDED.updated_at;
+    GET DIAGNOSTICS affected = ROW_COUNT;
+
+    -- スコアが無くなったプレイヤーの行を削除
+    DELETE FROM player_stats ps
+    WHERE (target_player_ids IS NULL OR ps.player_id = ANY(target_player_ids))
+      AND NOT EXISTS (SELECT 1 FROM scores s WHERE s.player_id = ps.player_id);
+    GET DIAGNOSTICS removed = ROW_COUNT;
+
+    RETURN affected + removed;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path FROM CURRENT;
+
+-- 文単位のトリガーで、変更された行のプレイヤーだけをまとめて再計算する
+-- refresh_player_stats の実行権限を持たないロールの書き込みでも再計算されるよう、所有者の権限で実行する
+CREATE OR REPLACE FUNCTION player_stats_on_scores_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM refresh_player_stats(ARRAY(SELECT DISTINCT player_id FROM new_scores));
+    ELSIF TG_OP = 'UPDATE' THEN
+        PERFORM refresh_player_stats(ARRAY(
+            SELECT player_id FROM new_scores UNION SELECT player_id FROM old_scores
+        ));
+    ELSE
+        PERFORM refresh_player_stats(ARRAY(SELECT DISTINCT player_id FROM old_scores));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path FROM CURRENT;
+
+-- 遷移テーブルは1つのトリガーに1つのイベントしか指定できないため、イベントごとに作成
+DROP TRIGGER IF EXISTS trg_scores_player_stats_insert ON scores;
+CREATE TRIGGER trg_scores_player_stats_insert
+    AFTER INSERT ON scores
+    REFERENCING NEW TABLE AS new_scores
+    FOR EACH STATEMENT EXECUTE FUNCTION player_stats_on_scores_change();
+
+DROP TRIGGER IF EXISTS trg_scores_player_stats_update ON scores;
+CREATE TRIGGER trg_scores_player_stats_update
+    AFTER UPDATE ON scores
+    REFERENCING OLD TABLE AS old_scores NEW TABLE AS new_scores
+    FOR EACH STATEMENT EXECUTE FUNCTION player_stats_on_scores_change();
+
+DROP TRIGGER IF EXISTS trg_scores_player_stats_delete ON scores;
+CREATE TRIGGER trg_scores_player_stats_delete
+    AFTER DELETE ON scores
+    REFERENCING OLD TABLE AS old_scores
+    FOR EACH STATEMENT EXECUTE FUNCTION player_stats_on_scores_change();
+
+-- 既存のスコアから初期データを作成
+SELECT refresh_player_stats(NULL);
+
+-- 全件の再計算は所有者の権限で実行されるため、APIロール（PostgREST の /rpc）からは呼び出せないようにする
+REVOKE EXECUTE ON FUNCTION refresh_player_stats(INTEGER[]) FROM PUBLIC;
+REVOKE EXECUTE ON FUNCTION player_stats_on_scores_change() FROM PUBLIC;
+
+-- Supabase環境のみ、APIロールに参照権限を付与（ローカルPostgreSQLにはロールが存在しない）
+-- 再計算は manage_player_stats.py（所有者または service_role で接続）からのみ実行する
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN
+        GRANT SELECT ON player_stats TO anon;
+        REVOKE EXECUTE ON FUNCTION refresh_player_stats(INTEGER[]) FROM anon;
+    END IF;
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'authenticated') THEN
+        GRANT SELECT ON player_stats TO authenticated;
+        REVOKE EXECUTE ON FUNCTION refresh_player_stats(INTEGER[]) FROM authenticated;
+    END IF;
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'service_role') THEN
+        GRANT EXECUTE ON FUNCTION refresh_player_stats(INTEGER[]) TO service_role;
+    END IF;
+END
+$$;
+
+COMMIT;
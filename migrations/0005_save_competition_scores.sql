@@ -0,0 +1,51 @@
+-- 0005_save_competition_scores.sql
+-- コンペのスコアを1回の呼び出し・1トランザクションで保存する関数
+-- (competition_id, player_id) をキーに upsert し、値が変わった行だけを更新、入力に含まれないプレイヤーの行を削除する
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION save_competition_scores(p_competition_id INTEGER, p_scores JSONB)
+RETURNS JSONB AS $$
+DECLARE
+    v_upserted INTEGER;
+    v_deleted INTEGER;
+BEGIN
+    INSERT INTO scores (competition_id, player_id, date, course, out_score, in_score, handicap, net_score, ranking)
+    SELECT p_competition_id, r.player_id, r.date, r.course, r.out_score, r.in_score, r.handicap, r.net_score, r.ranking
+    FROM jsonb_to_recordset(p_scores) AS r(
+        player_id INTEGER,
+        date DATE,
+        course TEXT,
+        out_score INTEGER,
+        in_score INTEGER,
+        handicap NUMERIC,
+        net_score NUMERIC,
+        ranking INTEGER
+    )
+    ON CONFLICT (competition_id, player_id) DO UPDATE SET
+        date = EXCLUDED.date,
+        course = EXCLUDED.course,
+        out_score = EXCLUDED.out_score,
+        in_score = EXCLUDED.in_score,
+        handicap = EXCLUDED.handicap,
+        net_score = EXCLUDED.net_score,
+        ranking = EXCLUDED.ranking
+    -- 値が同じ行は更新しない（updated_at やトリガーによる再集計も発生しない）
+    WHERE (scores.date, scores.course, scores.out_score, scores.in_score, scores.handicap, scores.net_score, scores.ranking)
+        IS DISTINCT FROM
+          (EXCLUDED.date, EXCLUDED.course, EXCLUDED.out_score, EXCLUDED.in_score, EXCLUDED.handicap, EXCLUDED.net_score, EXCLUDED.ranking);
+    GET DIAGNOSTICS v_upserted = ROW_COUNT;
+
+    DELETE FROM scores s
+    WHERE s.competition_id = p_competition_id
+      AND NOT EXISTS (
+          SELECT 1 FROM jsonb_array_elements(p_scores) AS e
+          WHERE (e->>'player_id')::INTEGER = s.player_id
+      );
+    GET DIAGNOSTICS v_deleted = ROW_COUNT;
+
+    RETURN jsonb_build_object('upserted', v_upserted, 'deleted', v_deleted);
+END;
+$$ LANGUAGE plpgsql;
+
+COMMIT;
@@ -0,0 +1,64 @@
+-- 0006_save_score_changes.sql
+-- save_competition_scores に削除対象のプレイヤーIDを渡せるようにする
+-- p_deleted_player_ids を指定した場合は p_scores を変更行のみ（差分）として扱い、指定したプレイヤーの行だけを削除する
+-- 省略（NULL）時は従来どおり p_scores をコンペの全行として扱い、含まれないプレイヤーの行を削除する
+
+BEGIN;
+
+DROP FUNCTION IF EXISTS save_competition_scores(INTEGER, JSONB);
+
+CREATE OR REPLACE FUNCTION save_competition_scores(
+    p_competition_id INTEGER,
+    p_scores JSONB,
+    p_deleted_player_ids INTEGER[] DEFAULT NULL
+)
+RETURNS JSONB AS $$
+DECLARE
+    v_upserted INTEGER;
+    v_deleted INTEGER;
+BEGIN
+    INSERT INTO scores (competition_id, player_id, date, course, out_score, in_score, handicap, net_score, ranking)
+    SELECT p_competition_id, r.player_id, r.date, r.course, r.out_score, r.in_score, r.handicap, r.net_score, r.ranking
+    FROM jsonb_to_recordset(p_scores) AS r(
+        player_id INTEGER,
+        date DATE,
+        course TEXT,
+        out_score INTEGER,
+        in_score INTEGER,
+        handicap NUMERIC,
+        net_score NUMERIC,
+        ranking INTEGER
+    )
+    ON CONFLICT (competition_id, player_id) DO UPDATE SET
+        date = EXCLUDED.date,
+        course = EXCLUDED.course,
+        out_score = EXCLUDED.out_score,
+        in_score = EXCLUDED.in_score,
+        handicap = EXCLUDED.handicap,
+        net_score = EXCLUDED.net_score,
+        ranking = EXCLUDED.ranking
+    -- 値が同じ行は更新しない（updated_at やトリガーによる再集計も発生しない）
+    WHERE (scores.date, scores.course, scores.out_score, scores.in_score, scores.handicap, scores.net_score, scores.ranking)
+        IS DISTINCT FROM
+          (EXCLUDED.date, EXCLUDED.course, EXCLUDED.out_score, EXCLUDED.in_score, EXCLUDED.handicap, EXCLUDED.net_score, EXCLUDED.ranking);
+    GET DIAGNOSTICS v_upserted = ROW_COUNT;
+
+    IF p_deleted_player_ids IS NULL THEN
+        DELETE FROM scores s
+        WHERE s.competition_id = p_competition_id
+          AND NOT EXISTS (
+              SELECT 1 FROM jsonb_array_elements(p_scores) AS e
+              WHERE (e->>'player_id')::INTEGER = s.player_id
+          );
+    ELSE
+        DELETE FROM scores s
+        WHERE s.competition_id = p_competition_id
+          AND s.player_id = ANY (p_deleted_player_ids);
+    END IF;
+    GET DIAGNOSTICS v_deleted = ROW_COUNT;
+
+    RETURN jsonb_build_object('upserted', v_upserted, 'deleted', v_deleted);
+END;
+$$ LANGUAGE plpgsql;
+
+COMMIT;
@@ -0,0 +1,69 @@
+-- 0007_competition_rankings.sql
+-- コンペの順位をウィンドウ関数（RANK / DENSE_RANK）で計算する関数
+-- タイブレーク順（例: net_score → handicap → in_score）を指定でき、app/ranking.py の compute_rankings と同じ規則で計算する
+-- rerank_competition は登録済みスコアの順位を再計算し、順位が変わった行だけを更新する
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION competition_rankings(
+    p_competition_id INTEGER,
+    p_tiebreak TEXT[] DEFAULT ARRAY['net_score', 'handicap'],
+    p_method TEXT DEFAULT 'competition'
+)
+RETURNS TABLE (player_id INTEGER, ranking INTEGER) AS $$
+DECLARE
+    v_order TEXT;
+BEGIN
+    IF p_method IS NULL OR p_method NOT IN ('competition', 'dense') THEN
+        RAISE EXCEPTION 'unknown ranking method: %', p_method;
+    END IF;
+    IF coalesce(cardinality(p_tiebreak), 0) = 0 THEN
+        RAISE EXCEPTION 'ranking tiebreak is empty';
+    END IF;
+    IF EXISTS (
+        SELECT 1 FROM unnest(p_tiebreak) AS t(key)
+        WHERE t.key IS NULL OR t.key NOT IN ('net_score', 'handicap', 'in_score', 'out_score', 'gross_score')
+    ) THEN
+        RAISE EXCEPTION 'unknown ranking tiebreak key in %', p_tiebreak;
+    END IF;
+
+    -- 昇順・NULLは最後
+    SELECT string_agg(
+        CASE t.key
+            WHEN 'gross_score' THEN '(s.out_score + s.in_score)'
+            ELSE format('s.%I', t.key)
+        END || ' ASC NULLS LAST',
+        ', ' ORDER BY t.ord
+    )
+    INTO v_order
+    FROM unnest(p_tiebreak) WITH ORDINALITY AS t(key, ord);
+
+    RETURN QUERY EXECUTE format(
+        'SELECT s.player_id, (%s() OVER (ORDER BY %s))::INTEGER FROM scores s WHERE s.competition_id = $1',
+        CASE p_method WHEN 'dense' THEN 'DENSE_RANK' ELSE 'RANK' END,
+        v_order
+    ) USING p_competition_id;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+CREATE OR REPLACE FUNCTION rerank_competition(
+    p_competition_id INTEGER,
+    p_tiebreak TEXT[] DEFAULT ARRAY['net_score', 'handicap'],
+    p_method TEXT DEFAULT 'competition'
+)
+RETURNS INTEGER AS $$
+DECLARE
+    v_updated INTEGER;
+BEGIN
+    UPDATE scores s
+    SET ranking = r.ranking
+    FROM competition_rankings(p_competition_id, p_tiebreak, p_method) AS r
+    WHERE s.competition_id = p_competition_id
+      AND s.player_id = r.player_id
+      AND s.ranking IS DISTINCT FROM r.ranking;
+    GET DIAGNOSTICS v_updated = ROW_COUNT;
+    RETURN v_updated;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMIT;
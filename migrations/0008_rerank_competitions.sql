@@ -0,0 +1,94 @@
+-- 0008_rerank_competitions.sql
+-- 複数コンペの順位を1回の UPDATE（PARTITION BY competition_id）で再計算する rerank_competitions
+-- 順位が変わった行（コンペID・プレイヤーID・旧順位・新順位）を返し、manage_rankings.py のレポートに使う
+-- タイブレーク順の検証と ORDER BY の組み立ては ranking_window_sql にまとめ、competition_rankings / rerank_competition も同じ定義を使う
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION ranking_window_sql(p_tiebreak TEXT[], p_method TEXT)
+RETURNS TEXT AS $$
+DECLARE
+    v_order TEXT;
+BEGIN
+    IF p_method IS NULL OR p_method NOT IN ('competition', 'dense') THEN
+        RAISE EXCEPTION 'unknown ranking method: %', p_method;
+    END IF;
+    IF coalesce(cardinality(p_tiebreak), 0) = 0 THEN
+        RAISE EXCEPTION 'ranking tiebreak is empty';
+    END IF;
+    IF EXISTS (
+        SELECT 1 FROM unnest(p_tiebreak) AS t(key)
+        WHERE t.key IS NULL OR t.key NOT IN ('net_score', 'handicap', 'in_score', 'out_score', 'gross_score')
+    ) THEN
+        RAISE EXCEPTION 'unknown ranking tiebreak key in %', p_tiebreak;
+    END IF;
+
+    -- 昇順・NULLは最後
+    SELECT string_agg(
+        CASE t.key
+            WHEN 'gross_score' THEN '(s.out_score + s.in_score)'
+            ELSE format('s.%I', t.key)
+        END || ' ASC NULLS LAST',
+        ', ' ORDER BY t.ord
+    )
+    INTO v_order
+    FROM unnest(p_tiebreak) WITH ORDINALITY AS t(key, ord);
+
+    RETURN format(
+        '(%s() OVER (PARTITION BY s.competition_id ORDER BY %s))::INTEGER',
+        CASE p_method WHEN 'dense' THEN 'DENSE_RANK' ELSE 'RANK' END,
+        v_order
+    );
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION competition_rankings(
+    p_competition_id INTEGER,
+    p_tiebreak TEXT[] DEFAULT ARRAY['net_score', 'handicap'],
+    p_method TEXT DEFAULT 'competition'
+)
+RETURNS TABLE (player_id INTEGER, ranking INTEGER) AS $$
+BEGIN
+    RETURN QUERY EXECUTE format(
+        'SELECT s.player_id, %s FROM scores s WHERE s.competition_id = $1',
+        ranking_window_sql(p_tiebreak, p_method)
+    ) USING p_competition_id;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+CREATE OR REPLACE FUNCTION rerank_competitions(
+    p_competition_ids INTEGER[],
+    p_tiebreak TEXT[] DEFAULT ARRAY['net_score', 'handicap'],
+    p_method TEXT DEFAULT 'competition'
+)
+RETURNS TABLE (competition_id INTEGER, player_id INTEGER, old_ranking INTEGER, new_ranking INTEGER) AS $$
+BEGIN
+    RETURN QUERY EXECUTE format(
+        $sql$
+        WITH ranked AS (
+            SELECT s.id, s.ranking AS old_ranking, %s AS new_ranking
+            FROM scores s
+            WHERE s.competition_id = ANY ($1)
+        )
+        UPDATE scores t
+        SET ranking = r.new_ranking
+        FROM ranked r
+        WHERE t.id = r.id
+          AND r.old_ranking IS DISTINCT FROM r.new_ranking
+        RETURNING t.competition_id, t.player_id, r.old_ranking, r.new_ranking
+        $sql$,
+        ranking_window_sql(p_tiebreak, p_method)
+    ) USING p_competition_ids;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION rerank_competition(
+    p_competition_id INTEGER,
+    p_tiebreak TEXT[] DEFAULT ARRAY['net_score', 'handicap'],
+    p_method TEXT DEFAULT 'competition'
+)
+RETURNS INTEGER AS $$
+    SELECT count(*)::INTEGER FROM rerank_competitions(ARRAY[p_competition_id], p_tiebreak, p_method);
+$$ LANGUAGE sql;
+
+COMMIT;
@@ -0,0 +1,97 @@
+-- 0009_score_change_notifications.sql
+-- scores の変更を LISTEN/NOTIFY（チャンネル score_changes）で通知し、ライブ速報の順位表を差分で更新できるようにする
+-- 文単位のトリガーでコンペごとに1件の通知にまとめ、変更行（プレイヤー名付き）を JSON で送る
+-- 通知のサイズ上限（8000バイト）を超える場合は、そのコンペの再読み込みだけを指示する
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION notify_score_changes()
+RETURNS TRIGGER AS $$
+DECLARE
+    changes JSONB;
+    change RECORD;
+    payload TEXT;
+BEGIN
+    -- 変更行を {competition_id, row} または {competition_id, reload} の配列にまとめる
+    -- （トリガーごとに参照できる遷移テーブルが異なるため、イベントで分岐する）
+    IF TG_OP = 'DELETE' THEN
+        SELECT jsonb_agg(jsonb_build_object(
+            'competition_id', o.competition_id,
+            'row', jsonb_build_object('id', o.id, 'player_id', o.player_id, 'deleted', TRUE)
+        ))
+        INTO changes
+        FROM old_scores o;
+    ELSE
+        SELECT jsonb_agg(jsonb_build_object(
+            'competition_id', s.competition_id,
+            'row', jsonb_build_object(
+                'id', s.id,
+                'player_id', s.player_id,
+                'player_name', p.name,
+                'date', s.date,
+                'course', s.course,
+                'out_score', s.out_score,
+                'in_score', s.in_score,
+                'handicap', s.handicap,
+                'net_score', s.net_score,
+                'ranking', s.ranking,
+                'updated_at', s.updated_at
+            )
+        ))
+        INTO changes
+        FROM new_scores s
+        LEFT JOIN players p ON p.id = s.player_id;
+
+        IF TG_OP = 'UPDATE' THEN
+            -- 別のコンペに移動した行は、移動元のコンペを再読み込みさせる
+            changes := coalesce(changes, '[]'::JSONB) || coalesce((
+                SELECT jsonb_agg(jsonb_build_object('competition_id', o.competition_id, 'reload', TRUE))
+                FROM old_scores o
+                JOIN new_scores n ON n.id = o.id
+                WHERE n.competition_id IS DISTINCT FROM o.competition_id
+            ), '[]'::JSONB);
+        END IF;
+    END IF;
+
+    FOR change IN
+        SELECT
+            (c->>'competition_id')::INTEGER AS competition_id,
+            bool_or(coalesce((c->>'reload')::BOOLEAN, FALSE)) AS reload,
+            jsonb_agg(c->'row') FILTER (WHERE c ? 'row') AS rows
+        FROM jsonb_array_elements(coalesce(changes, '[]'::JSONB)) AS c
+        GROUP BY 1
+    LOOP
+        payload := jsonb_build_object(
+            'competition_id', change.competition_id,
+            'reload', change.reload,
+            'rows', coalesce(change.rows, '[]'::JSONB)
+        )::TEXT;
+        IF change.reload OR octet_length(payload) > 7900 THEN
+            payload := jsonb_build_object('competition_id', change.competition_id, 'reload', TRUE)::TEXT;
+        END IF;
+        PERFORM pg_notify('score_changes', payload);
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 遷移テーブルは1つのトリガーに1つのイベントしか指定できないため、イベントごとに作成
+DROP TRIGGER IF EXISTS trg_scores_notify_insert ON scores;
+CREATE TRIGGER trg_scores_notify_insert
+    AFTER INSERT ON scores
+    REFERENCING NEW TABLE AS new_scores
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_score_changes();
+
+DROP TRIGGER IF EXISTS trg_scores_notify_update ON scores;
+CREATE TRIGGER trg_scores_notify_update
+    AFTER UPDATE ON scores
+    REFERENCING OLD TABLE AS old_scores NEW TABLE AS new_scores
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_score_changes();
+
+DROP TRIGGER IF EXISTS trg_scores_notify_delete ON scores;
+CREATE TRIGGER trg_scores_notify_delete
+    AFTER DELETE ON scores
+    REFERENCING OLD TABLE AS old_scores
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_score_changes();
+
+COMMIT;
@@ -0,0 +1,60 @@
+-- 0010_import_scores.sql
+-- スコアカードの一括取り込み用：複数コンペのスコアを1回の呼び出し・1トランザクションで upsert し、
+-- 取り込んだコンペの順位を rerank_competitions（マイグレーション 0008）で付け直す
+-- 取り込みファイルに含まれない既存の行は削除せず、順位の計算にだけ含める
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION import_scores(
+    p_scores JSONB,
+    p_tiebreak TEXT[] DEFAULT ARRAY['net_score', 'handicap'],
+    p_method TEXT DEFAULT 'competition'
+)
+RETURNS JSONB AS $$
+DECLARE
+    v_competition_ids INTEGER[];
+    v_upserted INTEGER;
+    v_reranked INTEGER;
+BEGIN
+    SELECT array_agg(DISTINCT (e->>'competition_id')::INTEGER)
+    INTO v_competition_ids
+    FROM jsonb_array_elements(p_scores) AS e;
+
+    INSERT INTO scores (competition_id, player_id, date, course, out_score, in_score, handicap, net_score)
+    SELECT r.competition_id, r.player_id, r.date, r.course, r.out_score, r.in_score, r.handicap, r.net_score
+    FROM jsonb_to_recordset(p_scores) AS r(
+        competition_id INTEGER,
+        player_id INTEGER,
+        date DATE,
+        course TEXT,
+        out_score INTEGER,
+        in_score INTEGER,
+        handicap NUMERIC,
+        net_score NUMERIC
+    )
+    ON CONFLICT (competition_id, player_id) DO UPDATE SET
+        date = EXCLUDED.date,
+        course = EXCLUDED.course,
+        out_score = EXCLUDED.out_score,
+        in_score = EXCLUDED.in_score,
+        handicap = EXCLUDED.handicap,
+        net_score = EXCLUDED.net_score
+    -- 値が同じ行は更新しない（順位は下の rerank_competitions でまとめて付け直す）
+    WHERE (scores.date, scores.course, scores.out_score, scores.in_score, scores.handicap, scores.net_score)
+        IS DISTINCT FROM
+          (EXCLUDED.date, EXCLUDED.course, EXCLUDED.out_score, EXCLUDED.in_score, EXCLUDED.handicap, EXCLUDED.net_score);
+    GET DIAGNOSTICS v_upserted = ROW_COUNT;
+
+    SELECT count(*)::INTEGER
+    INTO v_reranked
+    FROM rerank_competitions(coalesce(v_competition_ids, '{}'), p_tiebreak, p_method);
+
+    RETURN jsonb_build_object(
+        'upserted', v_upserted,
+        'reranked', v_reranked,
+        'competitions', coalesce(array_length(v_competition_ids, 1), 0)
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+COMMIT;
@@ -0,0 +1,165 @@
+-- 0011_hole_scores.sql
+-- ホール別スコアを scores.hole_scores（SMALLINT[18]、1ラウンド約40バイト）に保存する
+-- スコア行と同じ行に持つため、統計用に多数のラウンドをまとめて読み込んでも結合や行の展開が不要
+-- 入力する場合は18ホールすべて（1〜20打）とし、OUT/INは前半・後半の合計と一致させる
+
+BEGIN;
+
+ALTER TABLE scores ADD COLUMN IF NOT EXISTS hole_scores SMALLINT[];
+
+-- ホール範囲（p_first〜p_last）の合計打数
+CREATE OR REPLACE FUNCTION hole_scores_total(p_hole_scores SMALLINT[], p_first INTEGER, p_last INTEGER)
+RETURNS INTEGER AS $$
+    SELECT sum(h)::INTEGER FROM unnest(p_hole_scores[p_first:p_last]) AS h;
+$$ LANGUAGE sql IMMUTABLE;
+
+ALTER TABLE scores DROP CONSTRAINT IF EXISTS scores_hole_scores_check;
+ALTER TABLE scores ADD CONSTRAINT scores_hole_scores_check CHECK (
+    hole_scores IS NULL OR (
+        array_ndims(hole_scores) = 1
+        AND array_lower(hole_scores, 1) = 1
+        AND cardinality(hole_scores) = 18
+        AND array_position(hole_scores, NULL) IS NULL
+        AND 1 <= ALL (hole_scores)
+        AND 20 >= ALL (hole_scores)
+        AND out_score = hole_scores_total(hole_scores, 1, 9)
+        AND in_score = hole_scores_total(hole_scores, 10, 18)
+    )
+);
+
+-- ビューの末尾にホール別スコアを追加（既存のカラムの順序は変えない）
+CREATE OR REPLACE VIEW scores_with_players
+WITH (security_invoker = true) AS
+SELECT
+    s.id,
+    s.competition_id,
+    s.player_id,
+    p.name AS player_name,
+    s.date,
+    s.course,
+    s.out_score,
+    s.in_score,
+    CASE
+        WHEN s.out_score > 0 AND s.in_score > 0 THEN s.out_score + s.in_score
+    END AS gross_score,
+    s.handicap,
+    s.net_score,
+    s.ranking,
+    GREATEST(s.updated_at, p.updated_at) AS updated_at,
+    s.hole_scores
+FROM scores s
+LEFT JOIN players p ON p.id = s.player_id;
+
+-- スコア入力画面の保存でホール別スコアも保存する（引数は 0006 と同じ）
+CREATE OR REPLACE FUNCTION save_competition_scores(
+    p_competition_id INTEGER,
+    p_scores JSONB,
+    p_deleted_player_ids INTEGER[] DEFAULT NULL
+)
+RETURNS JSONB AS $$
+DECLARE
+    v_upserted INTEGER;
+    v_deleted INTEGER;
+BEGIN
+    INSERT INTO scores (competition_id, player_id, date, course, out_score, in_score, handicap, net_score, hole_scores, ranking)
+    SELECT p_competition_id, r.player_id, r.date, r.course, r.out_score, r.in_score, r.handicap, r.net_score, r.hole_scores, r.ranking
+    FROM jsonb_to_recordset(p_scores) AS r(
+        player_id INTEGER,
+        date DATE,
+        course TEXT,
+        out_score INTEGER,
+        in_score INTEGER,
+        handicap NUMERIC,
+        net_score NUMERIC,
+        hole_scores SMALLINT[],
+        ranking INTEGER
+    )
+    ON CONFLICT (competition_id, player_id) DO UPDATE SET
+        date = EXCLUDED.date,
+        course = EXCLUDED.course,
+        out_score = EXCLUDED.out_score,
+        in_score = EXCLUDED.in_score,
+        handicap = EXCLUDED.handicap,
+        net_score = EXCLUDED.net_score,
+        hole_scores = EXCLUDED.hole_scores,
+        ranking = EXCLUDED.ranking
+    WHERE (scores.date, scores.course, scores.out_score, scores.in_score, scores.handicap, scores.net_score, scores.hole_scores, scores.ranking)
+        IS DISTINCT FROM
+          (EXCLUDED.date, EXCLUDED.course, EXCLUDED.out_score, EXCLUDED.in_score, EXCLUDED.handicap, EXCLUDED.net_score, EXCLUDED.hole_scores, EXCLUDED.ranking);
+    GET DIAGNOSTICS v_upserted = ROW_COUNT;
+
+    IF p_deleted_player_ids IS NULL THEN
+        DELETE FROM scores s
+        WHERE s.competition_id = p_competition_id
+          AND NOT EXISTS (
+              SELECT 1 FROM jsonb_array_elements(p_scores) AS e
+              WHERE (e->>'player_id')::INTEGER = s.player_id
+          );
+    ELSE
+        DELETE FROM scores s
+        WHERE s.competition_id = p_competition_id
+          AND s.player_id = ANY (p_deleted_player_ids);
+    END IF;
+    GET DIAGNOSTICS v_deleted = ROW_COUNT;
+
+    RETURN jsonb_build_object('upserted', v_upserted, 'deleted', v_deleted);
+END;
+$$ LANGUAGE plpgsql;
+
+-- 一括取り込み（ホール別スコアを含まない）で OUT/IN が変わった行は、合わなくなったホール別スコアを消す
+CREATE OR REPLACE FUNCTION import_scores(
+    p_scores JSONB,
+    p_tiebreak TEXT[] DEFAULT ARRAY['net_score', 'handicap'],
+    p_method TEXT DEFAULT 'competition'
+)
+RETURNS JSONB AS $$
+DECLARE
+    v_competition_ids INTEGER[];
+    v_upserted INTEGER;
+    v_reranked INTEGER;
+BEGIN
+    SELECT array_agg(DISTINCT (e->>'competition_id')::INTEGER)
+    INTO v_competition_ids
+    FROM jsonb_array_elements(p_scores) AS e;
+
+    INSERT INTO scores (competition_id, player_id, date, course, out_score, in_score, handicap, net_score)
+    SELECT r.competition_id, r.player_id, r.date, r.course, r.out_score, r.in_score, r.handicap, r.net_score
+    FROM jsonb_to_recordset(p_scores) AS r(
+        competition_id INTEGER,
+        player_id INTEGER,
+        date DATE,
+        course TEXT,
+        out_score INTEGER,
+        in_score INTEGER,
+        handicap NUMERIC,
+        net_score NUMERIC
+    )
+    ON CONFLICT (competition_id, player_id) DO UPDATE SET
+        date = EXCLUDED.date,
+        course = EXCLUDED.course,
+        out_score = EXCLUDED.out_score,
+        in_score = EXCLUDED.in_score,
+        handicap = EXCLUDED.handicap,
+        net_score = EXCLUDED.net_score,
+        hole_scores = CASE
+            WHEN (scores.out_score, scores.in_score) IS NOT DISTINCT FROM (EXCLUDED.out_score, EXCLUDED.in_score)
+                THEN scores.hole_scores
+        END
+    WHERE (scores.date, scores.course, scores.out_score, scores.in_score, scores.handicap, scores.net_score)
+        IS DISTINCT FROM
+          (EXCLUDED.date, EXCLUDED.course, EXCLUDED.out_score, EXCLUDED.in_score, EXCLUDED.handicap, EXCLUDED.net_score);
+    GET DIAGNOSTICS v_upserted = ROW_COUNT;
+
+    SELECT count(*)::INTEGER
+    INTO v_reranked
+    FROM rerank_competitions(coalesce(v_competition_ids, '{}'), p_tiebreak, p_method);
+
+    RETURN jsonb_build_object(
+        'upserted', v_upserted,
+        'reranked', v_reranked,
+        'competitions', coalesce(array_length(v_competition_ids, 1), 0)
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+COMMIT;
@@ -0,0 +1,182 @@
+-- 0012_score_versions.sql
+-- スコア行ごとのバージョン（楽観的ロック）
+-- 値（順位以外）が変わるたびにトリガーで version を1つ進め、スコア入力画面は読み込み時の version を付けて保存する
+-- save_score_changes_checked は他の管理者が読み込み後に変更・削除した行があれば何も書き込まずに競合を返し、
+-- 競合が無ければ変更行の保存・削除と順位の付け直しを1回の呼び出し・1トランザクションで行う
+
+BEGIN;
+
+ALTER TABLE scores ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+
+-- 順位だけの変更（付け直し）では version を進めない（保存のたびに他の行が競合にならないようにする）
+CREATE OR REPLACE FUNCTION bump_score_version()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF (NEW.competition_id, NEW.player_id, NEW.date, NEW.course, NEW.out_score, NEW.in_score, NEW.handicap, NEW.net_score, NEW.hole_scores)
+        IS DISTINCT FROM
+       (OLD.competition_id, OLD.player_id, OLD.date, OLD.course, OLD.out_score, OLD.in_score, OLD.handicap, OLD.net_score, OLD.hole_scores)
+    THEN
+        NEW.version := OLD.version + 1;
+    ELSE
+        NEW.version := OLD.version;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_scores_version ON scores;
+CREATE TRIGGER trg_scores_version
+    BEFORE UPDATE ON scores
+    FOR EACH ROW EXECUTE FUNCTION bump_score_version();
+
+-- ビューの末尾にバージョンを追加（既存のカラムの順序は変えない）
+CREATE OR REPLACE VIEW scores_with_players
+WITH (security_invoker = true) AS
+SELECT
+    s.id,
+    s.competition_id,
+    s.player_id,
+    p.name AS player_name,
+    s.date,
+    s.course,
+    s.out_score,
+    s.in_score,
+    CASE
+        WHEN s.out_score > 0 AND s.in_score > 0 THEN s.out_score + s.in_score
+    END AS gross_score,
+    s.handicap,
+    s.net_score,
+    s.ranking,
+    GREATEST(s.updated_at, p.updated_at) AS updated_at,
+    s.hole_scores,
+    s.version
+FROM scores s
+LEFT JOIN players p ON p.id = s.player_id;
+
+-- p_scores の各行の version は読み込み時の値（新規の行は NULL）、p_deleted は [{player_id, version}]
+-- 競合した行は conflicts に [{player_id, current}]（current は現在の行、削除済みの場合は NULL）として返す
+CREATE OR REPLACE FUNCTION save_score_changes_checked(
+    p_competition_id INTEGER,
+    p_scores JSONB,
+    p_deleted JSONB DEFAULT '[]',
+    p_tiebreak TEXT[] DEFAULT ARRAY['net_score', 'handicap'],
+    p_method TEXT DEFAULT 'competition'
+)
+RETURNS JSONB AS $$
+DECLARE
+    v_conflicts JSONB;
+    v_upserted INTEGER;
+    v_deleted INTEGER;
+    v_reranked INTEGER;
+BEGIN
+    -- 同じコンペの保存を直列化し、対象の行を確認から書き込みまでロックする
+    PERFORM pg_advisory_xact_lock(hashtext('score_entry'), p_competition_id);
+
+    CREATE TEMP TABLE IF NOT EXISTS pg_temp.score_changes (
+        player_id INTEGER PRIMARY KEY,
+        date DATE,
+        course TEXT,
+        out_score INTEGER,
+        in_score INTEGER,
+        handicap NUMERIC,
+        net_score NUMERIC,
+        hole_scores SMALLINT[],
+        version INTEGER,
+        is_delete BOOLEAN NOT NULL
+    ) ON COMMIT DROP;
+    TRUNCATE pg_temp.score_changes;
+
+    INSERT INTO pg_temp.score_changes
+    SELECT r.player_id, r.date, r.course, r.out_score, r.in_score, r.handicap, r.net_score, r.hole_scores, r.version, false
+    FROM jsonb_to_recordset(p_scores) AS r(
+        player_id INTEGER,
+        date DATE,
+        course TEXT,
+        out_score INTEGER,
+        in_score INTEGER,
+        handicap NUMERIC,
+        net_score NUMERIC,
+        hole_scores SMALLINT[],
+        version INTEGER
+    )
+    UNION ALL
+    SELECT d.player_id, NULL, NULL, NULL, NULL, NULL, NULL, NULL, d.version, true
+    FROM jsonb_to_recordset(coalesce(p_deleted, '[]')) AS d(player_id INTEGER, version INTEGER);
+
+    PERFORM 1
+    FROM scores s
+    JOIN pg_temp.score_changes c ON c.player_id = s.player_id
+    WHERE s.competition_id = p_competition_id
+    FOR UPDATE OF s;
+
+    -- 読み込み時から変更・削除された行（相手の変更が自分の入力と同じ値なら競合にしない）
+    SELECT coalesce(jsonb_agg(
+        jsonb_build_object(
+            'player_id', c.player_id,
+            'current', CASE WHEN s.id IS NOT NULL THEN jsonb_build_object(
+                'player_id', s.player_id,
+                'date', s.date,
+                'course', s.course,
+                'out_score', s.out_score,
+                'in_score', s.in_score,
+                'handicap', s.handicap,
+                'net_score', s.net_score,
+                'hole_scores', s.hole_scores,
+                'ranking', s.ranking,
+                'version', s.version
+            ) END
+        )
+        ORDER BY c.player_id
+    ), '[]')
+    INTO v_conflicts
+    FROM pg_temp.score_changes c
+    LEFT JOIN scores s ON s.competition_id = p_competition_id AND s.player_id = c.player_id
+    WHERE CASE
+        WHEN c.is_delete THEN s.id IS NOT NULL AND s.version IS DISTINCT FROM c.version
+        WHEN s.id IS NULL THEN c.version IS NOT NULL
+        ELSE s.version IS DISTINCT FROM c.version
+            AND (s.date, s.course, s.out_score, s.in_score, s.handicap, s.net_score, s.hole_scores)
+                IS DISTINCT FROM
+                (c.date, c.course, c.out_score, c.in_score, c.handicap, c.net_score, c.hole_scores)
+    END;
+
+    IF jsonb_array_length(v_conflicts) > 0 THEN
+        RETURN jsonb_build_object('upserted', 0, 'deleted', 0, 'reranked', 0, 'conflicts', v_conflicts);
+    END IF;
+
+    INSERT INTO scores (competition_id, player_id, date, course, out_score, in_score, handicap, net_score, hole_scores)
+    SELECT p_competition_id, c.player_id, c.date, c.course, c.out_score, c.in_score, c.handicap, c.net_score, c.hole_scores
+    FROM pg_temp.score_changes c
+    WHERE NOT c.is_delete
+    ON CONFLICT (competition_id, player_id) DO UPDATE SET
+        date = EXCLUDED.date,
+        course = EXCLUDED.course,
+        out_score = EXCLUDED.out_score,
+        in_score = EXCLUDED.in_score,
+        handicap = EXCLUDED.handicap,
+        net_score = EXCLUDED.net_score,
+        hole_scores = EXCLUDED.hole_scores
+    WHERE (scores.date, scores.course, scores.out_score, scores.in_score, scores.handicap, scores.net_score, scores.hole_scores)
+        IS DISTINCT FROM
+          (EXCLUDED.date, EXCLUDED.course, EXCLUDED.out_score, EXCLUDED.in_score, EXCLUDED.handicap, EXCLUDED.net_score, EXCLUDED.hole_scores);
+    GET DIAGNOSTICS v_upserted = ROW_COUNT;
+
+    DELETE FROM scores s
+    USING pg_temp.score_changes c
+    WHERE c.is_delete
+      AND s.competition_id = p_competition_id
+      AND s.player_id = c.player_id;
+    GET DIAGNOSTICS v_deleted = ROW_COUNT;
+
+    v_reranked := rerank_competition(p_competition_id, p_tiebreak, p_method);
+
+    RETURN jsonb_build_object(
+        'upserted', v_upserted,
+        'deleted', v_deleted,
+        'reranked', v_reranked,
+        'conflicts', '[]'::JSONB
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+COMMIT;
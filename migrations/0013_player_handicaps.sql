@@ -0,0 +1,25 @@
+-- 0013_player_handicaps.sql
+-- プレイヤーごとのハンディキャップ（直近Nラウンドのベスト数ラウンドの差の平均）を保持する player_handicaps テーブル
+-- recent_rounds に直近Nラウンド（コンペID・日付・差）を持ち、新しいラウンドの登録時は履歴を読み直さずにこの行だけを更新する
+-- 計算規則（rule）が変わった行は、アプリがその時点のスコアから作り直す（全員分は manage_handicaps.py）
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS player_handicaps (
+    player_id INTEGER PRIMARY KEY REFERENCES players(id) ON DELETE CASCADE,
+    handicap NUMERIC(4,1),
+    rounds_counted INTEGER NOT NULL DEFAULT 0,
+    recent_rounds JSONB NOT NULL DEFAULT '[]'::JSONB,
+    rule TEXT NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT timezone('utc', now())
+);
+
+DROP TRIGGER IF EXISTS trg_player_handicaps_updated_at ON player_handicaps;
+CREATE TRIGGER trg_player_handicaps_updated_at
+    BEFORE UPDATE ON player_handicaps
+    FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+-- 作り直し時にプレイヤーの直近のラウンドだけを日付順に読む
+CREATE INDEX IF NOT EXISTS idx_scores_player_date ON scores (player_id, date DESC);
+
+COMMIT;
@@ -0,0 +1,86 @@
+-- 0014_refresh_player_handicaps.sql
+-- スコアの保存後に、指定したプレイヤーの player_handicaps をサーバー側で1回の呼び出しで作り直す関数
+-- アプリ側で行を読んで更新してから upsert すると、同じプレイヤーのスコアを並行して保存したときに
+-- 後から書いた側が先のラウンドを含まない直近ラウンドで上書きしてしまうため、
+-- プレイヤーごとのトランザクションロックを取得してから scores の直近ラウンドだけを読んで計算する
+-- 計算規則はアプリ（app/handicap.py の compute_handicaps）と同じ
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION refresh_player_handicaps(
+    p_player_ids INTEGER[],
+    p_rounds INTEGER,
+    p_best INTEGER,
+    p_par INTEGER,
+    p_max NUMERIC,
+    p_rule TEXT
+)
+RETURNS SETOF player_handicaps AS $$
+BEGIN
+    -- ID 順に取得してデッドロックを避ける（以降の文は待機後のスナップショットで実行される）
+    PERFORM pg_advisory_xact_lock(hashtext('player_handicaps'), p.id)
+    FROM (SELECT id FROM players WHERE id = ANY(p_player_ids) ORDER BY id) AS p;
+
+    RETURN QUERY
+    WITH recent AS (
+        -- OUT/IN が入力済みのラウンドのうち直近 p_rounds ラウンド（idx_scores_player_date で読む）
+        SELECT
+            p.id AS player_id,
+            r.competition_id,
+            r.date,
+            r.differential,
+            ROW_NUMBER() OVER (PARTITION BY p.id ORDER BY r.date DESC, r.competition_id DESC) AS recency,
+            ROW_NUMBER() OVER (PARTITION BY p.id ORDER BY r.differential, r.date DESC, r.competition_id DESC) AS best_rank,
+            COUNT(*) OVER (PARTITION BY p.id) AS counted
+        FROM players p
+        CROSS JOIN LATERAL (
+            SELECT s.competition_id, s.date, (s.out_score + s.in_score - p_par)::DOUBLE PRECISION AS differential
+            FROM scores s
+            WHERE s.player_id = p.id AND s.out_score > 0 AND s.in_score > 0
+            ORDER BY s.date DESC, s.competition_id DESC
+            LIMIT p_rounds
+        ) AS r
+        WHERE p.id = ANY(p_player_ids)
+    ),
+    computed AS (
+        SELECT
+            p.id AS player_id,
+            -- ラウンド数が足りない場合は同じ割合のラウンド数（最低1）の平均を小数1桁に四捨五入
+            -- （GREATEST/LEAST は NULL を無視するため、ラウンドが無いプレイヤーは CASE で NULL にする）
+            CASE WHEN COUNT(r.player_id) > 0 THEN
+                LEAST(GREATEST(FLOOR(AVG(r.differential) FILTER (
+                    WHERE r.best_rank <= LEAST(GREATEST(CEIL(r.counted * p_best::DOUBLE PRECISION / p_rounds), 1), p_best)
+                ) * 10 + 0.5) / 10, 0), p_max)::NUMERIC(4,1)
+            END AS handicap,
+            COUNT(r.player_id)::INTEGER AS rounds_counted,
+            COALESCE(
+                jsonb_agg(
+                    jsonb_build_object(
+                        'competition_id', r.competition_id,
+                        'date', to_char(r.date, 'YYYY-MM-DD'),
+                        'differential', r.differential
+                    ) ORDER BY r.recency
+                ) FILTER (WHERE r.player_id IS NOT NULL),
+                '[]'::JSONB
+            ) AS recent_rounds
+        FROM players p
+        LEFT JOIN recent r ON r.player_id = p.id
+        WHERE p.id = ANY(p_player_ids)
+        GROUP BY p.id
+    ),
+    saved AS (
+        INSERT INTO player_handicaps (player_id, handicap, rounds_counted, recent_rounds, rule)
+        SELECT c.player_id, c.handicap, c.rounds_counted, c.recent_rounds, p_rule
+        FROM computed c
+        ON CONFLICT (player_id) DO UPDATE SET
+            handicap = EXCLUDED.handicap,
+            rounds_counted = EXCLUDED.rounds_counted,
+            recent_rounds = EXCLUDED.recent_rounds,
+            rule = EXCLUDED.rule
+        RETURNING *
+    )
+    SELECT * FROM saved ORDER BY saved.player_id;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMIT;
@@ -0,0 +1,63 @@
+import importlib.util
+import os
+from contextlib import contextmanager
+from pathlib import Path
+import sys
+import uuid
+
+import pytest
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+APP_DIR = ROOT_DIR / "app"
+MIGRATIONS_DIR = ROOT_DIR / "migrations"
+# app/ のモジュールは互いにフラットに import する
+sys.path.insert(0, str(APP_DIR))
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL", "")
+
+
+def load_module(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    assert spec and spec.loader, f"{path} not found"
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)  # type: ignore[arg-type]
+    return module
+
+
+@contextmanager
+def migrated_schema(prefix, migrations=None):
+    """使い捨てのスキーマにマイグレーション（省略時はすべて）を適用し、その接続文字列を返す"""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    import psycopg
+    from psycopg.conninfo import make_conninfo
+
+    paths = sorted(MIGRATIONS_DIR.glob("*.sql")) if migrations is None else [MIGRATIONS_DIR / name for name in migrations]
+    schema = f"{prefix}_{uuid.uuid4().hex[:8]}"
+    with psycopg.connect(TEST_DATABASE_URL, autocommit=True) as admin:
+        admin.execute(f'CREATE SCHEMA "{schema}"')
+    conninfo = make_conninfo(TEST_DATABASE_URL, options=f"-c search_path={schema}")
+    try:
+        with psycopg.connect(conninfo) as connection:
+            for path in paths:
+                connection.execute(path.read_text(encoding="utf-8"))
+        yield conninfo
+    finally:
+        with psycopg.connect(TEST_DATABASE_URL, autocommit=True) as admin:
+            admin.execute(f'DROP SCHEMA "{schema}" CASCADE')
+
+
+@pytest.fixture
+def conninfo(request):
+    """すべてのマイグレーションを適用したテストモジュール専用のスキーマ"""
+    with migrated_schema(request.module.__name__) as conninfo:
+        yield conninfo
+
+
+@pytest.fixture
+def connection(conninfo):
+    import psycopg
+
+    with psycopg.connect(conninfo) as connection:
+        yield connection
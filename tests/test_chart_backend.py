@@ -0,0 +1,79 @@
+import json
+
+import matplotlib
+
+matplotlib.use("Agg")
+import pandas as pd  # noqa: E402
+import pytest  # noqa: E402
+
+from conftest import APP_DIR, load_module
+
+chart_backend = load_module("chart_backend", APP_DIR / "chart_backend.py")
+
+VALID_DATA = pd.DataFrame({
+    "日付": ["2024-01-01T00:00:00", "2024-02-01T00:00:00", "2024-03-01T00:00:00"],
+    "ネットスコア": [72, 70, 75],
+    "合計スコア": [90, 88, 93],
+    "ハンディキャップ": [18.0, 18.0, 18.0],
+})
+WINNERS = pd.DataFrame({"プレイヤー名": ["A", "B"], "優勝回数": [3, 1]}, index=pd.Index([1, 2], name="順位"))
+CHART_INPUTS = {
+    "average_ranking": (pd.Series([80.5, 90.0], index=pd.Index(["A", "B"], name="プレイヤー名")), {}),
+    "score_trend": (VALID_DATA[["日付", "合計スコア"]], {"player": "A"}),
+    "net_gross_trend": (VALID_DATA[["日付", "ネットスコア", "合計スコア"]], {"player": "A"}),
+    "handicap_history": (VALID_DATA[["日付", "ハンディキャップ"]], {"player": "A"}),
+    "winner_counts": (WINNERS, {}),
+}
+
+
+@pytest.mark.parametrize("kind", chart_backend.CHART_KINDS)
+def test_altair_specs_carry_only_the_chart_data(kind):
+    data, options = CHART_INPUTS[kind]
+    spec = chart_backend.AltairChartBackend().build(kind, data, **options).to_dict()
+
+    datasets = list(spec["datasets"].values())
+    rows = [row for dataset in datasets for row in dataset]
+    assert rows
+    # 日付は表示する10文字だけを送る
+    assert all(len(row.get("競技日", row.get("日付", "")) or "") <= 10 for row in rows)
+    assert len(json.dumps(spec, ensure_ascii=False)) < 5000
+
+
+@pytest.mark.parametrize("kind", chart_backend.CHART_KINDS)
+def test_plotly_figures_serialize(kind):
+    data, options = CHART_INPUTS[kind]
+    figure = chart_backend.PlotlyChartBackend().build(kind, data, **options)
+
+    payload = json.loads(figure.to_json())
+    assert payload["data"]
+    assert payload["layout"]["title"]["text"]
+
+
+def test_average_ranking_keeps_the_ranking_order():
+    ranking = pd.Series([80.5, 90.0, 95.25], index=["C", "A", "B"])
+
+    spec = chart_backend.AltairChartBackend().build("average_ranking", ranking).to_dict()
+    [dataset] = spec["datasets"].values()
+    assert [row["プレイヤー名"] for row in dataset] == ["C", "A", "B"]
+    figure = chart_backend.PlotlyChartBackend().build("average_ranking", ranking)
+    assert list(figure.data[0].x) == ["C", "A", "B"]
+    assert list(figure.data[0].text) == ["80.50", "90.00", "95.25"]
+
+
+@pytest.mark.filterwarnings("ignore:Glyph")
+def test_matplotlib_backend_renders_cached_png():
+    backend = chart_backend.MatplotlibChartBackend()
+    data, options = CHART_INPUTS["winner_counts"]
+
+    image = backend.build("winner_counts", data, **options)
+    assert image.startswith(b"\x89PNG")
+    assert backend.build("winner_counts", data.copy(), **options) is image
+
+
+def test_create_backend_falls_back_to_matplotlib(caplog):
+    assert chart_backend.create_chart_backend("plotly").name == "plotly"
+    assert chart_backend.create_chart_backend(" Altair ").name == "altair"
+    assert chart_backend.create_chart_backend("bokeh").name == "matplotlib"
+    assert "CHART_BACKEND=bokeh" in caplog.text
+    with pytest.raises(ValueError):
+        chart_backend.AltairChartBackend().render("pie", pd.DataFrame())
@@ -0,0 +1,123 @@
+import threading
+import time
+
+import matplotlib
+import pytest
+
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from conftest import APP_DIR, load_module
+
+chart_cache = load_module("chart_cache", APP_DIR / "chart_cache.py")
+charts = load_module("charts", APP_DIR / "charts.py")
+
+
+def counting_draw(calls):
+    def draw(fig, data, title="chart"):
+        calls.append(title)
+        fig.set_size_inches(2, 1)
+        ax = fig.subplots()
+        ax.plot(range(len(data)), list(data))
+        ax.set_title(title)
+    return draw
+
+
+def test_fingerprint_follows_values_columns_and_index():
+    frame = pd.DataFrame({"日付": ["2024-01-01", "2024-02-01"], "合計スコア": [80, 85]})
+    fingerprint = chart_cache.data_fingerprint
+
+    assert fingerprint(frame) == fingerprint(frame.copy())
+    assert fingerprint(frame) != fingerprint(frame.assign(合計スコア=[80, 86]))
+    assert fingerprint(frame) != fingerprint(frame.rename(columns={"合計スコア": "ネットスコア"}))
+    assert fingerprint(frame) != fingerprint(frame.set_axis([1, 2]))
+    series = pd.Series([80.5, 90.0], index=["A", "B"])
+    assert fingerprint(series) != fingerprint(series.set_axis(["B", "A"]))
+
+
+def test_render_reuses_images_per_data_and_options():
+    cache = chart_cache.ChartCache()
+    calls = []
+    draw = counting_draw(calls)
+    data = pd.Series([80, 85, 78])
+
+    first = cache.render("trend", data, draw, {"title": "A"})
+    assert first.startswith(b"\x89PNG")
+    assert cache.render("trend", data.copy(), draw, {"title": "A"}) is first
+    cache.render("trend", data, draw, {"title": "B"})
+    cache.render("trend", pd.Series([80, 85, 79]), draw, {"title": "A"})
+    assert cache.render("trend", data, draw, {"title": "A"}, fmt="svg").lstrip().startswith(b"<?xml")
+
+    assert calls == ["A", "B", "A", "A"]
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.entries) == (1, 4, 4)
+    # 描画したグラフは pyplot に残さない
+    assert plt.get_fignums() == []
+
+
+def test_lru_eviction_respects_entry_and_byte_limits():
+    cache = chart_cache.ChartCache(max_bytes=25, max_entries=3)
+    for key in "abc":
+        cache.put(key, b"x" * 5)
+    assert cache.get("a") is not None
+    cache.put("d", b"x" * 5)
+    # 最も長く使われていない "b" から破棄
+    assert cache.get("b") is None
+    assert [key for key in "acd" if cache.get(key) is not None] == ["a", "c", "d"]
+
+    cache.put("e", b"x" * 20)
+    assert cache.stats().bytes <= 25
+    assert cache.get("e") is not None and cache.get("a") is None
+    # 1枚で上限を超える画像は保存しない
+    cache.put("huge", b"x" * 26)
+    assert cache.get("huge") is None and cache.get("e") is not None
+
+
+class SlowPutCache(chart_cache.ChartCache):
+    def put(self, key, image):
+        # 描画の完了から保存までの間に、待っているセッションがロックを取れる余地を作る
+        time.sleep(0.05)
+        super().put(key, image)
+
+
+def test_concurrent_sessions_share_one_render():
+    cache = SlowPutCache()
+    calls = []
+    draw = counting_draw(calls)
+    data = pd.Series([80, 85, 78])
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.render("trend", data, draw)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == ["chart"]
+    assert len(set(results)) == 1
+
+
+@pytest.mark.filterwarnings("ignore:Glyph")
+def test_chart_drawers_render_app_frames():
+    cache = chart_cache.ChartCache()
+    valid_data = pd.DataFrame({
+        "日付": ["2024-01-01T00:00:00", "2024-02-01T00:00:00"],
+        "ネットスコア": [72, 70],
+        "合計スコア": [90, 88],
+        "ハンディキャップ": [18.0, 18.0],
+    })
+    winners = pd.DataFrame({"プレイヤー名": ["A", "B"], "優勝回数": [3, 1]}, index=[1, 2])
+
+    images = [
+        cache.render("average_ranking", pd.Series([80.5, 90.0], index=["A", "B"]), charts.draw_average_ranking),
+        cache.render("score_trend", valid_data[["日付", "合計スコア"]], charts.draw_score_trend, {"player": "A"}),
+        cache.render("net_gross_trend", valid_data, charts.draw_net_gross_trend, {"player": "A"}),
+        cache.render("handicap_history", valid_data, charts.draw_handicap_history, {"player": "A"}),
+        cache.render("winner_counts", winners, charts.draw_winner_counts),
+    ]
+
+    assert all(image.startswith(b"\x89PNG") for image in images)
+    assert plt.get_fignums() == []
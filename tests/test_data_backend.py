@@ -0,0 +1,207 @@
+import pytest
+
+from conftest import APP_DIR, load_module, migrated_schema
+
+data_backend = load_module("data_backend", APP_DIR / "data_backend.py")
+
+
+class FakeResponse:
+    def __init__(self, data, count):
+        self.data = data
+        self.count = count
+
+
+class FakeQuery:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self.calls = []
+        self.offset = 0
+        self.limit = None
+        self.payload = None
+
+    def select(self, columns, count=None):
+        self.calls.append(("select", columns))
+        return self
+
+    def eq(self, column, value):
+        self.calls.append(("eq", column, value))
+        return self
+
+    def in_(self, column, values):
+        self.calls.append(("in", column, values))
+        return self
+
+    def order(self, column, desc=False):
+        self.calls.append(("order", column, desc))
+        return self
+
+    def range(self, start, end):
+        self.offset = start
+        self.limit = end - start + 1
+        return self
+
+    def insert(self, rows):
+        self.payload = rows
+        return self
+
+    def execute(self):
+        self.client.queries.append(self)
+        if self.payload is not None:
+            return FakeResponse(self.payload, None)
+        rows = self.client.rows[self.offset:self.offset + self.limit]
+        return FakeResponse(rows, len(self.client.rows))
+
+
+class FakeClient:
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+        self.queries = []
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+
+def test_column_list_accepts_strings_and_sequences():
+    assert data_backend.column_list("id, name") == ["id", "name"]
+    assert data_backend.column_list(("id", "name")) == ["id", "name"]
+    assert data_backend.column_list("*") == ["*"]
+
+
+def test_rest_backend_translates_filters_and_order():
+    client = FakeClient([{"id": 1}, {"id": 2}])
+    backend = data_backend.SupabaseRestBackend(client)
+    rows = backend.fetch_all_rows(
+        "scores",
+        ("id", "player_id"),
+        filters=[("competition_id", "eq", 3), ("player_id", "in", (1, 2))],
+        order=[("date", True)],
+    )
+    assert rows == [{"id": 1}, {"id": 2}]
+    calls = client.queries[0].calls
+    assert calls[0] == ("select", "id, player_id")
+    assert ("eq", "competition_id", 3) in calls
+    assert ("in", "player_id", [1, 2]) in calls
+    # 指定の並び順の後にページ分割用の一意なカラムが付く
+    assert [call for call in calls if call[0] == "order"] == [("order", "date", True), ("order", "id", False)]
+
+
+def test_rest_backend_rejects_unknown_operator():
+    backend = data_backend.SupabaseRestBackend(FakeClient())
+    with pytest.raises(ValueError):
+        backend.fetch_all_rows("scores", filters=[("id", "like", "1%")])
+
+
+def test_rest_backend_inserts_in_chunks():
+    client = FakeClient()
+    backend = data_backend.SupabaseRestBackend(client)
+    rows = [{"id": index} for index in range(250)]
+    assert backend.insert_rows("scores", rows) == 250
+    assert [len(query.payload) for query in client.queries] == [100, 100, 50]
+
+
+def test_build_select_query_quotes_identifiers_and_appends_order_key():
+    query, params = data_backend.build_select_query(
+        "scores_with_players",
+        "player_name, net_score",
+        filters=[("competition_id", "eq", 3), ("player_id", "in", [1, 2])],
+        order=[("date", True)],
+    )
+    assert query.as_string(None) == (
+        'SELECT "player_name", "net_score" FROM "scores_with_players"'
+        ' WHERE "competition_id" = %s AND "player_id" = ANY(%s)'
+        ' ORDER BY "date" DESC, "id"'
+    )
+    assert params == [3, [1, 2]]
+
+
+def test_build_select_query_pages_by_key_or_offset():
+    query, params = data_backend.build_select_query(
+        "scores", "id, net_score", filters=[("competition_id", "eq", 3)], after=40, limit=20
+    )
+    assert query.as_string(None) == (
+        'SELECT "id", "net_score" FROM "scores" WHERE "competition_id" = %s AND "id" > %s ORDER BY "id" LIMIT %s'
+    )
+    assert params == [3, 40, 20]
+
+    query, params = data_backend.build_select_query("scores", "id", order=[("date", True)], limit=20, offset=40)
+    assert query.as_string(None) == 'SELECT "id" FROM "scores" ORDER BY "date" DESC, "id" LIMIT %s OFFSET %s'
+    assert params == [20, 40]
+
+
+def test_build_select_query_without_order_key():
+    query, params = data_backend.build_select_query("players", "*", order_key=None)
+    assert query.as_string(None) == 'SELECT * FROM "players"'
+    assert params == []
+
+
+def test_copy_value_converts_json_values_for_binary_copy():
+    from datetime import date
+    from decimal import Decimal
+
+    assert data_backend._copy_value("date", "2024-05-01") == date(2024, 5, 1)
+    assert data_backend._copy_value("numeric", 12.5) == Decimal("12.5")
+    assert data_backend._copy_value("int4", "7") == 7
+    assert data_backend._copy_value("timestamptz", "2024-05-01T09:00:00+00:00").tzinfo is not None
+    # 小数秒の末尾の0が省かれた値とPostgreSQLのテキスト形式（Python 3.10 の fromisoformat では解釈できない）
+    assert data_backend._copy_value("timestamptz", "2024-05-01T09:00:00.12345+00:00").microsecond == 123450
+    assert data_backend._copy_value("timestamptz", "2024-05-01 09:00:00.1+00").microsecond == 100000
+    assert data_backend._copy_value("text", None) is None
+
+
+@pytest.fixture
+def postgres_backend():
+    migrations = ("0001_initial_schema.sql", "0002_updated_at_triggers.sql", "0003_scores_with_players_view.sql")
+    with migrated_schema("test_backend", migrations) as conninfo:
+        backend = data_backend.PostgresPoolBackend(conninfo, min_size=1, max_size=2)
+        try:
+            yield backend
+        finally:
+            backend.close()
+
+
+def test_postgres_backend_round_trips_rows_like_rest(postgres_backend):
+    postgres_backend.insert_rows("players", [{"id": 1, "name": "山田"}, {"id": 2, "name": "佐藤", "initial_handicap": 12.4}])
+    postgres_backend.insert_rows(
+        "competitions", [{"id": 1, "name": "第1回", "date": "2024-05-01", "course": "A"}]
+    )
+    postgres_backend.insert_rows(
+        "scores",
+        [
+            {"id": index + 1, "competition_id": 1, "player_id": index + 1, "date": "2024-05-01",
+             "out_score": 40 + index, "in_score": 41, "handicap": 10.5, "net_score": 70.5 + index}
+            for index in range(2)
+        ],
+    )
+
+    pages = list(postgres_backend.iter_pages("scores_with_players", ("id", "player_name", "date", "gross_score", "net_score"), page_size=1))
+    assert [len(page) for page in pages] == [1, 1]
+    first = pages[0][0]
+    # REST APIと同じく日付は文字列、numericはfloatで返る
+    assert first == {"id": 1, "player_name": "山田", "date": "2024-05-01", "gross_score": 81, "net_score": 70.5}
+
+    filtered = postgres_backend.fetch_all_rows("players", "id", filters=[("id", "in", [2])])
+    assert filtered == [{"id": 2}]
+
+    count, latest = postgres_backend.table_version("scores")
+    assert count == 2 and latest is not None
+
+    # COPYでidを指定した後も、通常のINSERTが採番で衝突しない
+    postgres_backend.insert_rows("players", [{"name": "鈴木"}])
+    assert [row["id"] for row in postgres_backend.fetch_all_rows("players", "id")] == [1, 2, 3]
+
+
+def test_postgres_backend_reads_one_page_per_connection(postgres_backend):
+    postgres_backend.insert_rows("players", [{"id": index, "name": f"P{index}"} for index in range(1, 8)])
+
+    pages = postgres_backend.iter_pages("players", "name", page_size=3)
+    first = next(pages)
+    # ページを処理している間は接続をプールに返している
+    stats = postgres_backend.pool.get_stats()
+    assert stats["pool_available"] == stats["pool_size"]
+    # キーセットに使う id は要求したカラムに含めない
+    assert first == [{"name": "P1"}, {"name": "P2"}, {"name": "P3"}]
+    assert [[row["name"] for row in page] for page in pages] == [["P4", "P5", "P6"], ["P7"]]
+
+    ordered = postgres_backend.fetch_all_rows("players", ("id",), order=[("name", True)], page_size=3)
+    assert [row["id"] for row in ordered] == [7, 6, 5, 4, 3, 2, 1]
@@ -0,0 +1,77 @@
+import pandas as pd
+
+from conftest import APP_DIR, load_module
+
+data_cache = load_module("data_cache", APP_DIR / "data_cache.py")
+
+
+class CountingLoader:
+    def __init__(self, frame):
+        self.frame = frame
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.frame
+
+
+def setup_function():
+    data_cache.invalidate()
+
+
+def test_get_or_load_serves_from_memory_within_ttl():
+    loader = CountingLoader(pd.DataFrame({"id": [1, 2]}))
+    probes = []
+
+    def probe(table):
+        probes.append(table)
+        return (2, "2024-01-01")
+
+    for _ in range(3):
+        result = data_cache.get_or_load("players", loader, ("players",), probe, ttl=60)
+    assert loader.calls == 1
+    # TTL内はバージョン確認も行わない（初回取得時の1回のみ）
+    assert probes == ["players"]
+    assert result["id"].tolist() == [1, 2]
+
+
+def test_expired_entry_is_reused_when_version_unchanged():
+    loader = CountingLoader(pd.DataFrame({"id": [1]}))
+    version = {"players": (1, "2024-01-01")}
+
+    def probe(table):
+        return version[table]
+
+    data_cache.get_or_load("players", loader, ("players",), probe, ttl=0)
+    data_cache.get_or_load("players", loader, ("players",), probe, ttl=0)
+    assert loader.calls == 1
+
+    version["players"] = (2, "2024-02-01")
+    data_cache.get_or_load("players", loader, ("players",), probe, ttl=0)
+    assert loader.calls == 2
+
+
+def test_invalidate_drops_dependent_entries_only():
+    scores_loader = CountingLoader(pd.DataFrame({"id": [1]}))
+    competitions_loader = CountingLoader(pd.DataFrame({"id": [1]}))
+    data_cache.get_or_load("scores", scores_loader, ("scores", "players"), ttl=60)
+    data_cache.get_or_load("competitions", competitions_loader, ("competitions",), ttl=60)
+
+    data_cache.invalidate("players")
+    data_cache.get_or_load("scores", scores_loader, ("scores", "players"), ttl=60)
+    data_cache.get_or_load("competitions", competitions_loader, ("competitions",), ttl=60)
+    assert scores_loader.calls == 2
+    assert competitions_loader.calls == 1
+
+
+def test_empty_results_are_not_cached_and_copies_are_returned():
+    empty_loader = CountingLoader(pd.DataFrame())
+    data_cache.get_or_load("scores", empty_loader, ("scores",), ttl=60)
+    data_cache.get_or_load("scores", empty_loader, ("scores",), ttl=60)
+    assert empty_loader.calls == 2
+
+    loader = CountingLoader(pd.DataFrame({"id": [1]}))
+    first = data_cache.get_or_load("players", loader, ("players",), ttl=60)
+    first["id"] = 99
+    second = data_cache.get_or_load("players", loader, ("players",), ttl=60)
+    assert second["id"].tolist() == [1]
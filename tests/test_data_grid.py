@@ -0,0 +1,43 @@
+import pandas as pd
+import pytest
+
+from conftest import APP_DIR, load_module
+
+data_grid = load_module("data_grid", APP_DIR / "data_grid.py")
+
+FRAME = pd.DataFrame({
+    "競技ID": [1, 1, 2, 2, 3],
+    "プレイヤー名": ["A", "B", "A", "C", "B"],
+    "コース": ["本千葉", "本千葉", "鎌ケ谷", "鎌ケ谷", "本千葉"],
+    "合計スコア": [90, None, 85, 90, 88],
+})
+
+
+def test_filter_rows_ignores_unset_conditions():
+    assert data_grid.filter_rows(FRAME, {"プレイヤー名": None, "存在しない列": "x"}) is FRAME
+    assert data_grid.filter_rows(FRAME, {"プレイヤー名": "A"})["競技ID"].tolist() == [1, 2]
+    assert data_grid.filter_rows(FRAME, {"プレイヤー名": "B", "コース": "本千葉"})["競技ID"].tolist() == [1, 3]
+    assert data_grid.filter_rows(FRAME, {"プレイヤー名": "Z"}).empty
+
+
+def test_sort_rows_is_stable_and_keeps_missing_values_last():
+    ascending = data_grid.sort_rows(FRAME, "合計スコア")
+    assert ascending.index.tolist() == [2, 4, 0, 3, 1]
+    descending = data_grid.sort_rows(FRAME, "合計スコア", ascending=False)
+    # 同じスコアの行は元の順序のまま、欠損値は降順でも末尾
+    assert descending.index.tolist() == [0, 3, 4, 2, 1]
+    assert data_grid.sort_rows(FRAME, None) is FRAME
+
+
+def test_page_rows_sends_only_the_requested_page():
+    frame = pd.DataFrame({"value": range(53)})
+
+    assert data_grid.page_count(53, 25) == 3
+    assert data_grid.page_count(0, 25) == 1
+    assert data_grid.page_rows(frame, 2, 25)["value"].tolist() == list(range(25, 50))
+    assert data_grid.page_rows(frame, 3, 25)["value"].tolist() == [50, 51, 52]
+    # 範囲外のページ番号は最初・最後のページに丸める
+    assert data_grid.page_rows(frame, 9, 25)["value"].tolist() == [50, 51, 52]
+    assert data_grid.page_rows(frame, 0, 25)["value"].tolist() == list(range(25))
+    with pytest.raises(ValueError):
+        data_grid.page_count(10, 0)
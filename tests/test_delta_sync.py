@@ -0,0 +1,167 @@
+from datetime import datetime, timedelta, timezone
+
+from conftest import APP_DIR, load_module
+
+import data_cache
+from timestamps import parse_timestamp
+
+delta_sync = load_module("delta_sync", APP_DIR / "delta_sync.py")
+
+BASE_TIME = datetime(2024, 5, 1, tzinfo=timezone.utc)
+
+
+class FakeBackend:
+    """updated_at をサーバー側で付与するテーブルを模したバックエンド"""
+
+    def __init__(self):
+        self.rows = {}
+        self.clock = BASE_TIME
+        self.transferred = 0
+        self.next_id = 1
+
+    def tick(self):
+        self.clock += timedelta(minutes=1)
+        return self.clock.isoformat()
+
+    def insert(self, **values):
+        row = {"id": self.next_id, **values, "updated_at": self.tick()}
+        self.rows[row["id"]] = row
+        self.next_id += 1
+        return row["id"]
+
+    def update(self, row_id, **values):
+        self.rows[row_id].update(values, updated_at=self.tick())
+
+    def delete(self, row_id):
+        del self.rows[row_id]
+
+    def table_version(self, table):
+        latest = max((row["updated_at"] for row in self.rows.values()), default=None)
+        return len(self.rows), latest
+
+    def fetch_all_rows(self, table, columns="*", filters=(), order=(), page_size=1000, order_key="id"):
+        rows = list(self.rows.values())
+        for column, operator, value in filters:
+            if operator == "gt":
+                rows = [row for row in rows if parse_timestamp(row[column]) > parse_timestamp(value)]
+            elif operator == "in":
+                rows = [row for row in rows if row[column] in value]
+            else:
+                raise AssertionError(operator)
+        rows = [{column: row.get(column) for column in columns} for row in sorted(rows, key=lambda r: r["id"])]
+        self.transferred += len(rows)
+        return rows
+
+
+def make_backend(count=50):
+    backend = FakeBackend()
+    for index in range(count):
+        backend.insert(player_name=f"P{index}", net_score=70 + index)
+    return backend
+
+
+def make_snapshot(**kwargs):
+    return delta_sync.TableSnapshot("scores_with_players", ("player_name", "net_score"), overlap_seconds=0, **kwargs)
+
+
+def test_refresh_pulls_only_changed_rows_after_initial_load():
+    backend = make_backend()
+    snapshot = make_snapshot()
+    assert snapshot.refresh(backend).full_reload
+    assert backend.transferred == 50
+
+    backend.transferred = 0
+    backend.update(3, net_score=99)
+    new_id = backend.insert(player_name="新規", net_score=80)
+    result = snapshot.refresh(backend)
+
+    assert not result.full_reload
+    assert backend.transferred == 2
+    rows = {row["id"]: row for row in snapshot.snapshot_rows()}
+    assert rows[3]["net_score"] == 99
+    assert rows[new_id]["player_name"] == "新規"
+    assert len(rows) == 51
+
+
+def test_watermark_advances_past_trimmed_postgres_timestamps():
+    backend = make_backend(3)
+    snapshot = make_snapshot()
+    snapshot.refresh(backend)
+
+    # PostgreSQLのテキスト形式で、小数秒の末尾の0が省かれた値（Python 3.10 の fromisoformat では解釈できない）
+    backend.rows[2].update(net_score=60, updated_at="2024-05-02 09:00:00.12345+00")
+    result = snapshot.refresh(backend)
+
+    assert result.fetched == 1
+    assert snapshot.watermark == datetime(2024, 5, 2, 9, 0, 0, 123450, tzinfo=timezone.utc)
+    backend.transferred = 0
+    backend.rows[3].update(net_score=61, updated_at="2024-05-02 09:00:01.5+00")
+    assert snapshot.refresh(backend).fetched == 1
+    assert backend.transferred == 1
+
+
+def test_refresh_skips_fetch_when_version_is_unchanged():
+    backend = make_backend()
+    snapshot = make_snapshot()
+    snapshot.refresh(backend)
+    backend.transferred = 0
+    assert snapshot.refresh(backend) == delta_sync.SyncResult()
+    assert backend.transferred == 0
+
+
+def test_refresh_reconciles_deleted_rows_by_count():
+    backend = make_backend()
+    snapshot = make_snapshot()
+    snapshot.refresh(backend)
+
+    backend.delete(10)
+    backend.delete(20)
+    result = snapshot.refresh(backend)
+
+    assert result.deleted == 2
+    assert [row["id"] for row in snapshot.snapshot_rows()] == [row_id for row_id in sorted(backend.rows)]
+
+
+def test_snapshot_round_trips_through_disk(tmp_path):
+    backend = make_backend()
+    path = str(tmp_path / "scores.json")
+    make_snapshot(path=path).refresh(backend)
+
+    backend.update(5, net_score=50)
+    backend.transferred = 0
+    restored = make_snapshot(path=path)
+    result = restored.refresh(backend)
+
+    assert not result.full_reload
+    assert backend.transferred == 1
+    assert {row["id"]: row for row in restored.snapshot_rows()}[5]["net_score"] == 50
+
+
+def test_full_invalidate_resets_registered_snapshots():
+    backend = make_backend(3)
+    rows = delta_sync.sync_rows(backend, "scores_with_players", ("player_name",))
+    assert len(rows) == 3
+
+    # リストアでupdated_atが巻き戻った場合も、全件を取り直す
+    backend.rows[1]["player_name"] = "復元"
+    backend.rows[1]["updated_at"] = BASE_TIME.isoformat()
+    data_cache.invalidate()
+    rows = delta_sync.sync_rows(backend, "scores_with_players", ("player_name",))
+    assert rows[0]["player_name"] == "復元"
+
+
+def test_sync_rows_shares_one_snapshot_and_projects_each_call():
+    from score_frames import build_scores_frame
+
+    backend = make_backend(4)
+    sync_columns = ("competition_id", "player_name", "net_score")
+    stats_columns = ("player_name", "net_score")
+    delta_sync.sync_rows(backend, "scores_with_players", sync_columns, sync_columns=sync_columns)
+    backend.transferred = 0
+
+    rows = delta_sync.sync_rows(backend, "scores_with_players", stats_columns, sync_columns=sync_columns)
+
+    # 同じスナップショットを使うため取得は発生せず、要求したカラムだけが返る
+    assert backend.transferred == 0
+    assert all(set(row) == {"id", *stats_columns} for row in rows)
+    assert list(build_scores_frame(rows, stats_columns).columns) == ["プレイヤー名", "ネットスコア"]
@@ -0,0 +1,72 @@
+import gc
+import threading
+
+import pytest
+
+from conftest import APP_DIR, load_module
+
+figure_pool = load_module("figure_pool", APP_DIR / "figure_pool.py")
+
+
+def draw_line(fig, values, title="chart"):
+    fig.set_size_inches(2, 1)
+    ax = fig.subplots()
+    ax.plot(range(len(values)), values)
+    ax.set_title(title)
+
+
+def test_figures_are_disposed_after_many_renders():
+    pool = figure_pool.FigurePool(size=2)
+    for index in range(30):
+        image = pool.render(draw_line, [index, index + 1, index % 7], title=f"chart {index}")
+        assert image.startswith(b"\x89PNG")
+    gc.collect()
+
+    stats = pool.stats()
+    assert (stats.created, stats.disposed, stats.live, stats.peak) == (30, 30, 0, 1)
+    # 図が残り続けない（pyplot の管理下にも入らない）
+    assert stats.unreleased == 0
+    assert stats.pyplot_figures == 0
+
+
+def test_figure_is_disposed_when_drawing_fails():
+    pool = figure_pool.FigurePool(size=1)
+
+    def broken(fig):
+        fig.subplots()
+        raise RuntimeError("描画エラー")
+
+    with pytest.raises(RuntimeError):
+        pool.render(broken)
+    # 失敗しても枠は返却され、次の描画ができる
+    assert pool.render(draw_line, [1, 2]).startswith(b"\x89PNG")
+    assert pool.stats().live == 0
+
+
+def test_pool_bounds_live_figures():
+    pool = figure_pool.FigurePool(size=1, timeout=0.05)
+    borrowed = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with pool.figure():
+            borrowed.set()
+            release.wait(5)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    borrowed.wait(5)
+    try:
+        with pytest.raises(TimeoutError):
+            with pool.figure():
+                pass
+        assert pool.stats().live == 1
+    finally:
+        release.set()
+        holder.join()
+    with pool.figure(figsize=(2, 1)) as fig:
+        assert tuple(fig.get_size_inches()) == (2, 1)
+    assert pool.stats().peak == 1
+
+    with pytest.raises(ValueError):
+        figure_pool.FigurePool(size=0)
@@ -0,0 +1,244 @@
+import threading
+
+import pytest
+from hypothesis import HealthCheck, given, settings, strategies as st
+
+from conftest import APP_DIR, load_module
+
+handicap = load_module("handicap", APP_DIR / "handicap.py")
+
+RULE = handicap.HandicapRule(rounds=5, best=2, par=72)
+
+
+def score(player_id, competition_id, gross, out_score=None):
+    out_score = gross // 2 if out_score is None else out_score
+    return {"player_id": player_id, "competition_id": competition_id, "date": f"2024-01-{competition_id:02d}",
+            "out_score": out_score, "in_score": gross - out_score if gross else 0}
+
+
+def test_rule_validation_and_best_counts():
+    with pytest.raises(ValueError):
+        handicap.HandicapRule(rounds=5, best=6)
+    with pytest.raises(ValueError):
+        handicap.HandicapRule(rounds=0, best=0)
+    assert handicap.HandicapRule(rounds=20, best=8).best_counts([1, 3, 10, 19, 20, 25]).tolist() == [1, 2, 4, 8, 8, 8]
+
+
+def test_compute_handicaps_uses_best_of_recent_rounds():
+    scores = [score(1, competition_id, gross) for competition_id, gross in enumerate([80, 90, 85, 100, 95, 84], start=1)]
+    # 未入力のラウンドは数えない
+    scores += [score(1, 7, 0), score(2, 3, 70), score(3, 1, 130)]
+
+    result = handicap.compute_handicaps(scores, RULE)
+
+    # プレイヤー1の直近5ラウンド（コンペ2〜6）の差は 18, 13, 28, 23, 12 → ベスト2の平均 12.5
+    assert result.to_dict("records") == [
+        {"player_id": 1, "handicap": 12.5, "rounds_counted": 5},
+        {"player_id": 2, "handicap": 0.0, "rounds_counted": 1},
+        {"player_id": 3, "handicap": 50.0, "rounds_counted": 1},
+    ]
+    assert handicap.compute_handicaps([], RULE).empty
+
+
+rounds_strategy = st.lists(
+    st.tuples(st.integers(min_value=1, max_value=3), st.integers(min_value=1, max_value=12), st.integers(min_value=70, max_value=120)),
+    max_size=40,
+)
+
+
+@given(rounds_strategy)
+def test_incremental_updates_match_batch(events):
+    # 登録・修正の順序にかかわらず、直近ラウンドの更新結果は一括計算と一致する
+    windows = {}
+    latest = {}
+    for player_id, competition_id, gross in events:
+        row = score(player_id, competition_id, gross)
+        windows[player_id] = handicap.apply_round(windows.get(player_id, []), row, RULE)
+        latest[(player_id, competition_id)] = row
+
+    expected = handicap.compute_handicaps(list(latest.values()), RULE).set_index("player_id")
+    for player_id, window in windows.items():
+        assert handicap.window_handicap(window, RULE) == expected.loc[player_id, "handicap"]
+        assert len(window) == expected.loc[player_id, "rounds_counted"]
+
+
+def test_remove_round_requests_rebuild_only_when_window_was_full():
+    window = []
+    for competition_id in range(1, 4):
+        window = handicap.apply_round(window, score(1, competition_id, 80 + competition_id), RULE)
+    assert [item["competition_id"] for item in handicap.remove_round(window, 2, RULE)] == [3, 1]
+
+    for competition_id in range(4, 8):
+        window = handicap.apply_round(window, score(1, competition_id, 80 + competition_id), RULE)
+    assert [item["competition_id"] for item in window] == [7, 6, 5, 4, 3]
+    # 直近の範囲より古いラウンドの修正・削除は影響しない
+    assert handicap.apply_round(window, score(1, 1, 70), RULE) == window
+    assert handicap.remove_round(window, 1, RULE) == window
+    assert handicap.remove_round(window, 5, RULE) is None
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+
+    def select(self, columns):
+        return self
+
+    def in_(self, column, values):
+        self.client.calls.append(("in", self.table, list(values)))
+        return self
+
+    def upsert(self, rows, on_conflict=None):
+        self.client.upserts.append((rows, on_conflict))
+        return self
+
+    def execute(self):
+        return FakeResponse(self.client.stored)
+
+
+class MissingFunction(Exception):
+    code = "PGRST202"
+
+
+class FakeRPC:
+    def __init__(self, data):
+        self.data = data
+
+    def execute(self):
+        if self.data is None:
+            raise MissingFunction("Could not find the function public.refresh_player_handicaps")
+        return FakeResponse(self.data)
+
+
+class FakeClient:
+    def __init__(self, stored, rpc_data=None):
+        self.stored = stored
+        self.rpc_data = rpc_data
+        self.calls = []
+        self.upserts = []
+
+    def table(self, table):
+        return FakeQuery(self, table)
+
+    def rpc(self, name, params):
+        self.calls.append(("rpc", name, params))
+        return FakeRPC(self.rpc_data)
+
+
+def test_refresh_without_the_function_updates_stored_windows_and_rebuilds_the_rest(monkeypatch):
+    paginated_reader = load_module("paginated_reader", APP_DIR / "paginated_reader.py")
+    history = [score(2, 1, 90), score(2, 9, 84)]
+    fetched = []
+    monkeypatch.setattr(
+        paginated_reader, "fetch_all_rows",
+        lambda supabase, table, columns, modify=None, **kwargs: fetched.append(table) or history,
+    )
+
+    stored_window = handicap.handicap_rows([score(1, 1, 80), score(1, 2, 90)], [1], RULE)[0]["recent_rounds"]
+    client = FakeClient([
+        {"player_id": 1, "recent_rounds": stored_window, "rule": RULE.key},
+        {"player_id": 2, "recent_rounds": [], "rule": "best8of20/par72"},
+    ])
+
+    result = handicap.refresh_player_handicaps(client, [score(1, 9, 76), score(2, 9, 84)], rule=RULE)
+
+    assert result == {1: 6.0, 2: 12.0}
+    # 規則が変わったプレイヤー2だけをスコアから作り直す
+    assert fetched == ["scores"]
+    [(rows, on_conflict)] = client.upserts
+    assert on_conflict == "player_id"
+    assert [(row["player_id"], row["rounds_counted"], row["rule"]) for row in rows] == [(1, 3, RULE.key), (2, 2, RULE.key)]
+
+
+def test_refresh_uses_the_server_function_when_available():
+    client = FakeClient([], rpc_data=[{"player_id": 1, "handicap": "6.0"}, {"player_id": 2, "handicap": None}])
+
+    result = handicap.refresh_player_handicaps(client, [score(1, 9, 76)], [(9, 2)], rule=RULE)
+
+    assert result == {1: 6.0, 2: None}
+    assert client.calls == [("rpc", "refresh_player_handicaps", {
+        "p_player_ids": [1, 2], "p_rounds": 5, "p_best": 2, "p_par": 72,
+        "p_max": handicap.HANDICAP_MAX, "p_rule": RULE.key,
+    })]
+    assert client.upserts == []
+
+
+def refresh_on_server(connection, player_ids, rule=RULE):
+    return connection.execute(
+        "SELECT player_id, handicap, rounds_counted, recent_rounds FROM refresh_player_handicaps(%s::INTEGER[], %s::INTEGER, %s::INTEGER, %s::INTEGER, %s::NUMERIC, %s)",
+        (player_ids, rule.rounds, rule.best, rule.par, handicap.HANDICAP_MAX, rule.key),
+    ).fetchall()
+
+
+@pytest.fixture
+def connection(connection):
+    connection.execute("INSERT INTO players (id, name) SELECT i, 'player' || i FROM generate_series(1, 3) AS i")
+    connection.execute(
+        "INSERT INTO competitions (id, name, date) "
+        "SELECT i, 'competition' || i, DATE '2024-01-01' + i - 1 FROM generate_series(1, 12) AS i"
+    )
+    connection.commit()
+    return connection
+
+
+@settings(max_examples=25, deadline=None, suppress_health_check=[HealthCheck.function_scoped_fixture])
+@given(rounds_strategy)
+def test_server_refresh_matches_batch(connection, events):
+    connection.execute("DELETE FROM scores")
+    latest = {}
+    for player_id, competition_id, gross in events:
+        latest[(player_id, competition_id)] = score(player_id, competition_id, gross)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            "INSERT INTO scores (competition_id, player_id, date, out_score, in_score) "
+            "VALUES (%(competition_id)s, %(player_id)s, %(date)s, %(out_score)s, %(in_score)s)",
+            list(latest.values()),
+        )
+
+    rows = refresh_on_server(connection, [1, 2, 3])
+    connection.rollback()
+
+    expected = {row["player_id"]: row for row in handicap.handicap_rows(list(latest.values()), [1, 2, 3], RULE)}
+    assert [row[0] for row in rows] == [1, 2, 3]
+    for player_id, value, rounds_counted, recent_rounds in rows:
+        assert (None if value is None else float(value)) == expected[player_id]["handicap"]
+        assert rounds_counted == expected[player_id]["rounds_counted"]
+        assert recent_rounds == expected[player_id]["recent_rounds"]
+
+
+def test_concurrent_server_refreshes_keep_every_round(connection, conninfo):
+    import psycopg
+
+    connection.execute(
+        "INSERT INTO scores (competition_id, player_id, date, out_score, in_score) VALUES (1, 1, '2024-01-01', 40, 40)"
+    )
+    refresh_on_server(connection, [1])
+
+    # 1つ目のトランザクションがロックを持っている間に、別の接続が同じプレイヤーのラウンドを保存する
+    results = []
+
+    def save_second_round():
+        with psycopg.connect(conninfo) as other:
+            other.execute(
+                "INSERT INTO scores (competition_id, player_id, date, out_score, in_score) VALUES (2, 1, '2024-01-02', 45, 45)"
+            )
+            results.append(refresh_on_server(other, [1]))
+
+    thread = threading.Thread(target=save_second_round)
+    thread.start()
+    thread.join(timeout=1)
+    assert thread.is_alive()
+    connection.commit()
+    thread.join()
+
+    [(_, _, rounds_counted, recent_rounds)] = results[0]
+    assert rounds_counted == 2
+    assert [item["competition_id"] for item in recent_rounds] == [2, 1]
+    stored = connection.execute("SELECT rounds_counted FROM player_handicaps WHERE player_id = 1").fetchone()
+    assert stored == (2,)
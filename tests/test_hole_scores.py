@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from conftest import APP_DIR, load_module
+
+hole_scores = load_module("hole_scores", APP_DIR / "hole_scores.py")
+score_writer = load_module("score_writer", APP_DIR / "score_writer.py")
+
+
+ROUND = [4, 5, 3, 4, 4, 5, 3, 4, 6, 5, 4, 4, 3, 5, 4, 4, 3, 5]  # OUT 38 / IN 37
+
+
+def test_half_totals_and_completeness_are_computed_per_round():
+    matrix = hole_scores.hole_matrix([ROUND, None, ROUND[:9] + [None] * 9])
+    assert matrix.shape == (3, 18)
+
+    out_scores, in_scores = hole_scores.half_totals(matrix)
+    np.testing.assert_array_equal(out_scores, [38, np.nan, 38])
+    np.testing.assert_array_equal(in_scores, [37, np.nan, np.nan])
+    assert hole_scores.complete_rounds(matrix).tolist() == [True, False, False]
+
+    assert hole_scores.to_db_array(matrix[0]) == ROUND
+    assert hole_scores.to_db_array(matrix[2]) is None
+    assert hole_scores.matches_totals(ROUND, 38, 37)
+    assert not hole_scores.matches_totals(ROUND, 38, 38)
+    assert not hole_scores.matches_totals(None, 38, 37)
+
+    with pytest.raises(ValueError):
+        hole_scores.hole_matrix([ROUND[:17]])
+
+
+def test_invalid_holes_and_summary():
+    matrix = hole_scores.hole_matrix([[0, 4.5, 21] + ROUND[3:], ROUND])
+    assert hole_scores.invalid_holes(matrix).sum() == 3
+
+    summary = hole_scores.hole_summary(hole_scores.hole_matrix([ROUND, [6] + ROUND[1:], None]))
+    assert summary["ホール"].tolist() == list(range(1, 19))
+    assert summary.loc[0, ["平均", "ベスト", "ラウンド数"]].tolist() == [5.0, 4.0, 2]
+
+    empty = hole_scores.hole_summary(hole_scores.hole_matrix([]))
+    assert empty["ラウンド数"].sum() == 0 and empty["平均"].isna().all()
+
+
+@pytest.fixture
+def connection(connection):
+    connection.execute("INSERT INTO players (id, name) VALUES (1, '山田'), (2, '佐藤')")
+    connection.execute("INSERT INTO competitions (id, name, date, course) VALUES (7, '第1回', '2024-05-01', 'A')")
+    connection.commit()
+    return connection
+
+
+def test_hole_scores_are_saved_and_must_match_totals(connection):
+    import psycopg
+    from psycopg.types.json import Jsonb
+
+    scores_data = {
+        1: {"out_score": 38, "in_score": 37, "handicap": 10, "net_score": 65, "hole_scores": ROUND},
+        2: {"out_score": 40, "in_score": 40, "handicap": 5, "net_score": 75},
+    }
+    records = score_writer.build_score_records(7, scores_data, "2024-05-01", "A", {1: 1, 2: 2})
+    connection.execute("SELECT save_competition_scores(7, %s)", (Jsonb(score_writer._rpc_payload(records)),))
+    assert connection.execute(
+        "SELECT player_id, hole_scores FROM scores_with_players ORDER BY player_id"
+    ).fetchall() == [(1, ROUND), (2, None)]
+
+    # 一括取り込みで OUT/IN が変わった行は、合わなくなったホール別スコアを消す
+    connection.execute(
+        "SELECT import_scores(%s)",
+        (Jsonb([{"competition_id": 7, "player_id": 1, "date": "2024-05-01", "course": "A",
+                 "out_score": 39, "in_score": 37, "handicap": 10, "net_score": 66}]),),
+    )
+    assert connection.execute("SELECT hole_scores FROM scores WHERE player_id = 1").fetchone()[0] is None
+    connection.commit()
+
+    with pytest.raises(psycopg.errors.CheckViolation):
+        connection.execute("UPDATE scores SET hole_scores = %s WHERE player_id = 2", (ROUND,))
+    connection.rollback()
+    with pytest.raises(psycopg.errors.CheckViolation):
+        connection.execute("UPDATE scores SET hole_scores = %s WHERE player_id = 2", (ROUND[:17],))
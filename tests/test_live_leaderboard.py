@@ -0,0 +1,132 @@
+import time
+
+import pytest
+
+from conftest import APP_DIR, load_module
+
+live_leaderboard = load_module("live_leaderboard", APP_DIR / "live_leaderboard.py")
+
+
+def score_row(player_id, net_score, updated_at, **values):
+    return {
+        "id": player_id * 10,
+        "player_id": player_id,
+        "player_name": f"player {player_id}",
+        "out_score": 40,
+        "in_score": 40,
+        "handicap": 80 - net_score,
+        "net_score": net_score,
+        "updated_at": updated_at,
+        **values,
+    }
+
+
+def test_apply_patches_rows_and_ignores_stale_changes():
+    board = live_leaderboard.LiveLeaderboard(1)
+    board.load([score_row(1, 72, "2024-05-01 10:00:00+00"), score_row(2, 70, "2024-05-01 10:00:00+00")])
+
+    assert board.apply({"competition_id": 1, "rows": [score_row(3, 68, "2024-05-01T10:05:00+00:00")]})
+    # 読み込み済みの値より古い通知は反映しない
+    assert not board.apply({"competition_id": 1, "rows": [score_row(1, 60, "2024-05-01T09:59:00+00:00")]})
+    assert board.apply({"competition_id": 1, "rows": [{"id": 20, "player_id": 2, "deleted": True}]})
+
+    standings = board.standings()
+    assert standings["プレイヤー名"].tolist() == ["player 3", "player 1"]
+    assert standings["順位"].tolist() == [1, 2]
+
+    board.apply({"competition_id": 1, "reload": True})
+    assert board.needs_reload
+
+
+def test_apply_compares_trimmed_postgres_timestamps():
+    # 通知（to_jsonb）と読み込み（テキスト形式）は小数秒の末尾の0を省く（Python 3.10 の fromisoformat では解釈できない）
+    board = live_leaderboard.LiveLeaderboard(1)
+    board.load([score_row(1, 72, "2024-05-01 10:00:00.12345+00")])
+
+    assert not board.apply({"competition_id": 1, "rows": [score_row(1, 60, "2024-05-01T10:00:00.1+00:00")]})
+    assert board.apply({"competition_id": 1, "rows": [score_row(1, 70, "2024-05-01T10:00:00.2+00:00")]})
+    assert board.standings()["ネット"].tolist() == [70]
+
+
+def test_polling_feed_reloads_only_when_version_changes():
+    loads = []
+    version = [(2, "a")]
+
+    def loader(competition_id):
+        loads.append(competition_id)
+        return [score_row(1, 72, "2024-05-01 10:00:00+00")]
+
+    feed = live_leaderboard.PollingScoreFeed(loader, lambda: version[0])
+    board = feed.board(5)
+    feed.board(5)
+    assert loads == [5]
+
+    version[0] = (3, "b")
+    assert feed.board(5) is board
+    assert loads == [5, 5]
+
+
+@pytest.fixture
+def conninfo(conninfo):
+    import psycopg
+
+    with psycopg.connect(conninfo) as connection:
+        connection.execute("INSERT INTO players (id, name) VALUES (1, '山田'), (2, '佐藤')")
+        connection.execute("INSERT INTO competitions (id, name, date, course) VALUES (901, '第1回', '2024-05-01', 'A')")
+        connection.execute(
+            "INSERT INTO scores (competition_id, player_id, date, out_score, in_score, handicap, net_score)"
+            " VALUES (901, 1, '2024-05-01', 40, 42, 10, 72)"
+        )
+    return conninfo
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_score_change_feed_patches_board_from_notifications(conninfo):
+    import psycopg
+    from psycopg.rows import dict_row
+
+    loads = []
+
+    def loader(competition_id):
+        loads.append(competition_id)
+        with psycopg.connect(conninfo, row_factory=dict_row) as connection:
+            return connection.execute(
+                "SELECT id, competition_id, player_id, player_name, out_score, in_score,"
+                " handicap::float8 AS handicap, net_score::float8 AS net_score, updated_at::text AS updated_at"
+                " FROM scores_with_players WHERE competition_id = %s",
+                (competition_id,),
+            ).fetchall()
+
+    feed = live_leaderboard.ScoreChangeFeed(conninfo, loader, poll_timeout=0.2)
+    try:
+        assert feed.listening
+        board = feed.board(901)
+        assert board.standings()["プレイヤー名"].tolist() == ["山田"]
+
+        with psycopg.connect(conninfo, autocommit=True) as writer:
+            writer.execute(
+                "INSERT INTO scores (competition_id, player_id, date, out_score, in_score, handicap, net_score)"
+                " VALUES (901, 2, '2024-05-01', 38, 40, 10, 68)"
+            )
+            assert wait_for(lambda: len(board.standings()) == 2)
+            assert board.standings()["プレイヤー名"].tolist() == ["佐藤", "山田"]
+
+            writer.execute("UPDATE scores SET in_score = 36, net_score = 66 WHERE player_id = 1")
+            assert wait_for(lambda: board.standings()["プレイヤー名"].tolist() == ["山田", "佐藤"])
+
+            writer.execute("DELETE FROM scores WHERE player_id = 2")
+            assert wait_for(lambda: len(board.standings()) == 1)
+
+        # 通知だけで反映され、コンペの行は最初の1回しか読み込まない
+        feed.board(901)
+        assert loads == [901]
+    finally:
+        feed.close()
@@ -0,0 +1,118 @@
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+from conftest import APP_DIR, load_module
+from score_frames import build_scores_frame
+
+local_replica = load_module("local_replica", APP_DIR / "local_replica.py")
+
+
+def make_rows():
+    rows = []
+    players = ["山田", "佐藤", "鈴木", None]
+    for competition in range(1, 7):
+        date = f"{2022 + competition // 3}-{competition:02d}-15"
+        for index, player in enumerate(players):
+            out_score = 0 if (competition, index) == (2, 1) else 40 + index + competition % 2
+            in_score = 42 + index
+            rows.append({
+                "id": competition * 10 + index,
+                "competition_id": competition,
+                "date": date,
+                "course": f"コース{competition % 2}",
+                "player_name": player,
+                "out_score": out_score,
+                "in_score": in_score,
+                "gross_score": out_score + in_score if out_score > 0 else None,
+                "handicap": 10.0 + index,
+                "net_score": 70.0 + (index + competition) % 4,
+                "ranking": (index + competition) % 4 + 1,
+                "updated_at": "2024-01-01T00:00:00+00:00",
+            })
+    return rows
+
+
+@pytest.fixture
+def replica(tmp_path):
+    replica = local_replica.LocalReplica(str(tmp_path / "replica.sqlite3"))
+    assert replica.ensure_fresh(make_rows)
+    return replica
+
+
+def test_scores_frame_matches_remote_frame(replica):
+    expected = build_scores_frame(make_rows())
+    pdt.assert_frame_equal(replica.scores_frame(), expected, check_dtype=False)
+
+    expected_filtered = expected[(expected["日付"].str[:4] == "2023") & (expected["コース"] == "コース1")]
+    actual = replica.scores_frame(year="2023", course="コース1")
+    pdt.assert_frame_equal(actual, expected_filtered.reset_index(drop=True), check_dtype=False)
+
+
+def test_aggregations_match_pandas_definitions(replica):
+    frame = build_scores_frame(make_rows())
+
+    valid = frame.dropna(subset=["合計スコア"])
+    valid = valid[(valid["合計スコア"] >= 50) & (valid["アウトスコア"] > 0) & (valid["インスコア"] > 0)]
+    expected_average = valid.groupby("プレイヤー名")["合計スコア"].mean().sort_values()
+    pdt.assert_series_equal(
+        replica.average_gross_by_player().sort_index(), expected_average.sort_index(), check_dtype=False
+    )
+
+    winners = frame[frame["順位"] == 1].groupby("プレイヤー名").size()
+    actual = replica.winner_counts().set_index("プレイヤー名")["優勝回数"]
+    assert actual.to_dict() == winners.to_dict()
+    assert list(actual) == sorted(actual, reverse=True)
+
+    assert replica.participation_counts().to_dict() == frame["プレイヤー名"].value_counts().to_dict()
+    assert replica.years() == sorted(frame["日付"].str[:4].unique())
+    assert replica.months("2022") == ["01", "02"]
+
+
+def test_failed_refresh_keeps_previous_data(replica):
+    replica.stale = True
+
+    def broken_loader():
+        raise ConnectionError("supabase unavailable")
+
+    assert replica.ensure_fresh(broken_loader)
+    assert replica.last_error == "supabase unavailable"
+    assert replica.stale
+    assert len(replica.scores_frame()) == len(make_rows())
+
+
+def test_refresh_interval_and_invalidation_mark_replica_stale(tmp_path, monkeypatch):
+    replica = local_replica.LocalReplica(str(tmp_path / "replica.sqlite3"), refresh_interval=3600)
+    assert replica.needs_refresh()
+    replica.ensure_fresh(make_rows)
+    assert not replica.needs_refresh()
+
+    monkeypatch.setattr(local_replica, "_replica", replica)
+    local_replica._on_invalidate(("competitions",))
+    assert not replica.needs_refresh()
+    local_replica._on_invalidate(("scores",))
+    assert replica.needs_refresh()
+
+    replica.ensure_fresh(lambda: make_rows()[:4])
+    assert len(replica.scores_frame()) == 4
+
+
+def test_version_probe_detects_writes_from_other_processes(tmp_path):
+    replica = local_replica.LocalReplica(str(tmp_path / "replica.sqlite3"), refresh_interval=3600, probe_interval=0)
+    version = [(24, "2024-01-01T00:00:00+00:00")]
+    replica.ensure_fresh(make_rows, lambda: version[0])
+
+    # 同じバージョンの間は取得し直さない
+    replica.ensure_fresh(lambda: make_rows()[:4], lambda: version[0])
+    assert len(replica.scores_frame()) == len(make_rows())
+
+    # invalidate() を経由しない書き込みも、バージョンの変化で取得し直す
+    version[0] = (4, "2024-01-02T00:00:00+00:00")
+    replica.ensure_fresh(lambda: make_rows()[:4], lambda: version[0])
+    assert len(replica.scores_frame()) == 4
+
+    # 確認間隔内はバージョンを確認しない
+    replica.probe_interval = 3600
+    version[0] = (0, None)
+    replica.ensure_fresh(lambda: [], lambda: version[0])
+    assert len(replica.scores_frame()) == 4
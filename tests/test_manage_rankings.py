@@ -0,0 +1,85 @@
+import csv
+
+import pytest
+
+from conftest import ROOT_DIR, load_module
+
+load_module("manage_migrations", ROOT_DIR / "manage_migrations.py")
+manage_rankings = load_module("manage_rankings", ROOT_DIR / "manage_rankings.py")
+
+
+def test_chunked_splits_in_order():
+    assert manage_rankings.chunked([1, 2, 3, 4, 5], 2) == [[1, 2], [3, 4], [5]]
+    with pytest.raises(ValueError):
+        manage_rankings.chunked([1], 0)
+
+
+def test_state_resumes_only_for_the_same_rule(tmp_path):
+    path = tmp_path / "state.json"
+    state = manage_rankings.RerankState.load(path, ["net_score", "handicap"], "competition")
+    state.mark_done([3, 1])
+
+    resumed = manage_rankings.RerankState.load(path, ["net_score", "handicap"], "competition")
+    assert resumed.completed == {1, 3}
+    assert manage_rankings.RerankState.load(path, ["net_score", "handicap"], "competition", restart=True).completed == set()
+    with pytest.raises(SystemExit):
+        manage_rankings.RerankState.load(path, ["net_score"], "dense")
+
+
+@pytest.fixture
+def conninfo(conninfo):
+    import psycopg
+
+    with psycopg.connect(conninfo) as connection:
+        connection.execute("INSERT INTO players (id, name) SELECT g, 'player ' || g FROM generate_series(1, 3) AS g")
+        connection.execute(
+            "INSERT INTO competitions (id, name, date, course)"
+            " SELECT g, 'competition ' || g, DATE '2024-01-01' + g, 'A' FROM generate_series(1, 5) AS g"
+        )
+        # 旧バージョンの1..N連番（同スコアでも別順位）と、取り込み時の欠損
+        connection.execute(
+            """
+            INSERT INTO scores (competition_id, player_id, date, out_score, in_score, handicap, net_score, ranking)
+            SELECT c, p, DATE '2024-01-01' + c, 40, 40, 10, CASE WHEN p = 3 THEN 75 ELSE 70 END,
+                   CASE WHEN c = 5 THEN NULL ELSE p END
+            FROM generate_series(1, 5) AS c, generate_series(1, 3) AS p
+            """
+        )
+    return conninfo
+
+
+def read_report(path):
+    with path.open(encoding="utf-8") as handle:
+        return list(csv.DictReader(handle))
+
+
+def test_run_reranks_in_parallel_chunks_and_resumes(conninfo, tmp_path):
+    import psycopg
+
+    state_path, report_path = tmp_path / "state.json", tmp_path / "report.csv"
+    rule = (["net_score", "handicap"], "competition")
+
+    dry = manage_rankings.run(conninfo, *rule, workers=2, chunk_size=2, state_path=state_path, report_path=report_path, dry_run=True)
+    assert (dry.competitions, dry.chunks, dry.changed) == (5, 3, 7)
+    assert not state_path.exists()
+
+    summary = manage_rankings.run(conninfo, *rule, workers=2, chunk_size=2, state_path=state_path, report_path=report_path)
+    assert (summary.competitions, summary.changed) == (5, 7)
+    report = read_report(report_path)
+    assert len(report) == 7
+    assert {"competition_id": "5", "player_id": "3", "old_ranking": "", "new_ranking": "3"} in report
+    assert {"competition_id": "1", "player_id": "2", "old_ranking": "2", "new_ranking": "1"} in report
+
+    with psycopg.connect(conninfo) as connection:
+        assert connection.execute("SELECT DISTINCT player_id, ranking FROM scores ORDER BY 1").fetchall() == [
+            (1, 1), (2, 1), (3, 3),
+        ]
+        # 順位の変更がトリガー経由で player_stats にも反映される
+        assert connection.execute("SELECT win_count FROM player_stats WHERE player_id = 2").fetchone()[0] == 5
+
+    resumed = manage_rankings.run(conninfo, *rule, state_path=state_path, report_path=report_path)
+    assert (resumed.competitions, resumed.skipped, resumed.changed) == (0, 5, 0)
+    assert len(read_report(report_path)) == 7
+
+    dense = manage_rankings.run(conninfo, ["net_score"], "dense", state_path=state_path, restart=True)
+    assert (dense.competitions, dense.changed) == (5, 5)
@@ -0,0 +1,176 @@
+import pytest
+
+from conftest import APP_DIR, load_module
+
+offline_queue = load_module("offline_queue", APP_DIR / "offline_queue.py")
+
+
+def record(player_id, out_score, in_score=40):
+    return {"competition_id": 10, "player_id": player_id, "out_score": out_score, "in_score": in_score}
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return offline_queue.OfflineScoreQueue(str(tmp_path / "queue" / "scores.sqlite3"))
+
+
+def test_enqueue_keeps_only_latest_edit_per_player(queue):
+    queue.enqueue(10, [record(1, 40), record(2, 45)])
+    queue.enqueue(10, [record(1, 38)], deleted_player_ids=[2])
+    queue.enqueue(11, [record(1, 50)])
+
+    pending = {(entry.competition_id, entry.player_id): entry.record for entry in queue.pending()}
+    assert pending == {(10, 1): record(1, 38), (10, 2): None, (11, 1): record(1, 50)}
+    assert [entry.player_id for entry in queue.pending(10)] == [1, 2]
+    assert queue.status() == offline_queue.QueueStatus(pending=3, failing=0, last_error=None)
+
+
+def test_flush_sends_one_batch_per_competition(queue):
+    queue.enqueue(10, [record(1, 40), record(2, 45)], deleted_player_ids=[3])
+    queue.enqueue(11, [record(1, 50)])
+    sent = []
+
+    result = queue.flush(lambda competition_id, records, deleted: sent.append((competition_id, records, deleted)), limit=1)
+
+    # 上限を超えても1つのコンペの行は分割しない
+    assert sent == [(10, [record(1, 40), record(2, 45)], [3])]
+    assert (result.sent, result.failed, result.batches) == (3, 0, 1)
+    assert [(entry.competition_id, entry.player_id) for entry in queue.pending()] == [(11, 1)]
+
+
+def test_failed_batch_backs_off_exponentially(queue, monkeypatch):
+    monkeypatch.setattr(offline_queue, "OFFLINE_QUEUE_RETRY_SECONDS", 2)
+    monkeypatch.setattr(offline_queue, "OFFLINE_QUEUE_MAX_BACKOFF_SECONDS", 10)
+    assert [offline_queue.retry_delay(attempts) for attempts in (1, 2, 3, 4, 5)] == [2, 4, 8, 10, 10]
+
+    def unreachable(competition_id, records, deleted):
+        raise ConnectionError("network is unreachable")
+
+    queue.enqueue(10, [record(1, 40)])
+    assert queue.flush(unreachable, now=100).failed == 1
+    assert queue.flush(unreachable, now=101).batches == 0
+    assert queue.flush(unreachable, now=102).failed == 1
+    assert queue.due_batch(now=105) == {}
+    assert queue.status() == offline_queue.QueueStatus(pending=1, failing=1, last_error="network is unreachable")
+
+    queue.retry_now()
+    sent = []
+    assert queue.flush(lambda *args: sent.append(args), now=105).sent == 1
+    assert len(sent) == 1 and queue.pending() == []
+
+
+def test_edit_during_send_is_kept_for_next_flush(queue):
+    queue.enqueue(10, [record(1, 40)])
+
+    def send(competition_id, records, deleted):
+        # 送信中に同じプレイヤーのスコアが修正された
+        queue.enqueue(10, [record(1, 39)])
+
+    queue.flush(send)
+    [entry] = queue.pending()
+    assert entry.record == record(1, 39)
+
+
+class FakeAPIError(Exception):
+    def __init__(self, message, code=None, status_code=None):
+        super().__init__(message)
+        self.code = code
+        self.response = type("Response", (), {"status_code": status_code})() if status_code else None
+
+
+def test_is_retryable_error_separates_constraint_violations_from_outages():
+    assert offline_queue.is_retryable_error(ConnectionError("network is unreachable"))
+    assert offline_queue.is_retryable_error(FakeAPIError("timeout", code="PGRST003"))
+    assert offline_queue.is_retryable_error(FakeAPIError("bad gateway", status_code=502))
+    assert offline_queue.is_retryable_error(FakeAPIError("rate limited", status_code=429))
+    assert not offline_queue.is_retryable_error(FakeAPIError("check violation", code="23514"))
+    assert not offline_queue.is_retryable_error(FakeAPIError("invalid input", code="22P02"))
+    assert not offline_queue.is_retryable_error(FakeAPIError("bad request", code="PGRST102"))
+    assert not offline_queue.is_retryable_error(FakeAPIError("unprocessable", status_code=422))
+
+
+def test_rejected_row_is_isolated_and_moved_to_failed_list(queue, monkeypatch):
+    monkeypatch.setattr(offline_queue, "OFFLINE_QUEUE_MAX_ATTEMPTS", 2)
+    sent = []
+
+    def send(competition_id, records, deleted):
+        if any(record["player_id"] == 2 for record in records):
+            raise FakeAPIError('violates check constraint "scores_hole_scores_check"', code="23514")
+        sent.extend(record["player_id"] for record in records)
+
+    queue.enqueue(10, [record(1, 40), record(2, 45), record(3, 41)])
+    result = queue.flush(send, now=100)
+
+    # 1件ずつ送り直し、制約違反の行以外は送信する
+    assert sorted(sent) == [1, 3]
+    assert (result.sent, result.failed, result.dead) == (2, 1, 0)
+    assert [entry.player_id for entry in queue.pending()] == [2]
+
+    result = queue.flush(send, now=200)
+    assert (result.failed, result.dead) == (1, 1)
+    assert queue.pending() == []
+    [dead] = queue.failed(10)
+    assert dead.player_id == 2 and dead.attempts == 2 and "scores_hole_scores_check" in dead.last_error
+    assert queue.status() == offline_queue.QueueStatus(pending=0, failing=0, last_error=None, dead=1)
+
+    # 同じコンペの後続の編集は止まらない
+    queue.enqueue(10, [record(4, 39)])
+    assert queue.flush(send, now=201).sent == 1
+
+    assert queue.requeue_failed() == 1
+    assert [entry.player_id for entry in queue.pending()] == [2] and queue.failed() == []
+    queue.flush(send, now=300)
+    queue.flush(send, now=400)
+    assert queue.discard_failed() == 1
+    assert queue.status() == offline_queue.QueueStatus()
+
+
+def test_new_edit_replaces_failed_entry(queue, monkeypatch):
+    monkeypatch.setattr(offline_queue, "OFFLINE_QUEUE_MAX_ATTEMPTS", 1)
+
+    def reject(competition_id, records, deleted):
+        raise FakeAPIError("check violation", code="23514")
+
+    queue.enqueue(10, [record(1, 40)])
+    assert queue.flush(reject, now=100).dead == 1
+    queue.enqueue(10, [record(1, 41)])
+    assert queue.failed() == []
+    assert [entry.record for entry in queue.pending()] == [record(1, 41)]
+
+
+class FakeRPCClient:
+    """送信時に呼ばれる関数（rpc）を記録するクライアント"""
+
+    def __init__(self, missing=()):
+        self.missing = set(missing)
+        self.calls = []
+
+    def rpc(self, name, params):
+        self.calls.append(name)
+        return self
+
+    def execute(self):
+        name = self.calls[-1]
+        if name in self.missing:
+            raise FakeAPIError(f"Could not find the function public.{name}", code="PGRST202")
+        data = {"save_competition_scores": {"upserted": 1, "deleted": 1}, "rerank_competition": 2}.get(name, [])
+        return type("Response", (), {"data": data})()
+
+
+def test_send_reranks_competition_on_the_server(monkeypatch):
+    import supabase_client
+
+    client = FakeRPCClient()
+    monkeypatch.setattr(supabase_client, "get_supabase_client", lambda: client)
+
+    result = offline_queue._send_to_supabase(10, [record(1, 40)], [2])
+
+    # 端末ごとに計算した順位は残さず、保存後にコンペ全体の順位を付け直す
+    assert client.calls == ["save_competition_scores", "rerank_competition", "refresh_player_handicaps"]
+    assert (result.upserted, result.deleted) == (1, 1)
+
+    # 付け直しの関数が無い環境では送信済みとして扱う（再送しない）
+    client = FakeRPCClient(missing={"rerank_competition"})
+    monkeypatch.setattr(supabase_client, "get_supabase_client", lambda: client)
+    offline_queue._send_to_supabase(10, [record(1, 40)], [])
+    assert client.calls == ["save_competition_scores", "rerank_competition", "refresh_player_handicaps"]
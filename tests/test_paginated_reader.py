@@ -0,0 +1,88 @@
+import pytest
+
+from conftest import APP_DIR, load_module
+
+paginated_reader = load_module("paginated_reader", APP_DIR / "paginated_reader.py")
+
+
+class FakeResponse:
+    def __init__(self, data, count):
+        self.data = data
+        self.count = count
+
+
+class FakeQuery:
+    def __init__(self, client, rows):
+        self.client = client
+        self.rows = rows
+        self.count = None
+        self.filters = []
+        self.offset = 0
+        self.limit = None
+
+    def select(self, columns, count=None):
+        self.count = count
+        return self
+
+    def eq(self, column, value):
+        self.filters.append((column, value))
+        return self
+
+    def order(self, column, desc=False):
+        return self
+
+    def range(self, start, end):
+        self.offset = start
+        self.limit = end - start + 1
+        return self
+
+    def execute(self):
+        self.client.requests.append((self.offset, self.limit, self.count))
+        rows = [row for row in self.rows if all(row[c] == v for c, v in self.filters)]
+        # サーバー側の max-rows を超える件数は返さない
+        limit = min(self.limit, self.client.max_rows)
+        page = rows[self.offset:self.offset + limit]
+        return FakeResponse(page, len(rows) if self.count == "exact" else None)
+
+
+class FakeClient:
+    def __init__(self, rows, max_rows=1000):
+        self.rows = rows
+        self.max_rows = max_rows
+        self.requests = []
+
+    def table(self, name):
+        return FakeQuery(self, self.rows)
+
+
+def make_rows(count):
+    return [{"id": index, "competition_id": index % 3} for index in range(count)]
+
+
+def test_iter_pages_walks_table_in_fixed_size_pages():
+    client = FakeClient(make_rows(25))
+    pages = list(paginated_reader.iter_pages(client, "scores", page_size=10))
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert [request[0] for request in client.requests] == [0, 10, 20]
+    # 件数は初回のみ要求する
+    assert [request[2] for request in client.requests] == ["exact", None, None]
+
+
+def test_iter_pages_reads_past_server_max_rows():
+    client = FakeClient(make_rows(25), max_rows=7)
+    rows = paginated_reader.fetch_all_rows(client, "scores", page_size=10)
+    assert [row["id"] for row in rows] == list(range(25))
+
+
+def test_fetch_all_frame_applies_modifier_and_handles_empty():
+    client = FakeClient(make_rows(30))
+    frame = paginated_reader.fetch_all_frame(
+        client, "scores", modify=lambda query: query.eq("competition_id", 1), page_size=4
+    )
+    assert frame["id"].tolist() == list(range(1, 30, 3))
+    assert paginated_reader.fetch_all_frame(FakeClient([]), "scores").empty
+
+
+def test_iter_pages_rejects_non_positive_page_size():
+    with pytest.raises(ValueError):
+        list(paginated_reader.iter_pages(FakeClient([]), "scores", page_size=0))
@@ -0,0 +1,121 @@
+import math
+import uuid
+
+import pandas as pd
+import pytest
+
+from conftest import APP_DIR, ROOT_DIR, load_module
+
+player_stats = load_module("player_stats", APP_DIR / "player_stats.py")
+load_module("manage_migrations", ROOT_DIR / "manage_migrations.py")
+manage_player_stats = load_module("manage_player_stats", ROOT_DIR / "manage_player_stats.py")
+
+
+def make_player_data():
+    return pd.DataFrame({
+        "コース": ["A", "B", "A", None],
+        "ネットスコア": [72.0, 70.5, 75.0, 68.0],
+        "合計スコア": [85, 90, None, 80],
+        "順位": [1, 3, 5, 2],
+    })
+
+
+def test_summarize_player_scores_matches_dashboard_definitions():
+    summary = player_stats.summarize_player_scores(make_player_data())
+    assert summary.participation_count == 4
+    assert summary.avg_net == pytest.approx(71.375)
+    assert summary.best_net == 68.0 and summary.worst_net == 75.0
+    assert summary.avg_gross == pytest.approx(85.0)
+    assert summary.best_gross == 80
+    assert summary.win_count == 1 and summary.top3_count == 3
+    assert summary.course_net_averages.to_dict() == {"B": 70.5, "A": 73.5}
+
+
+def test_summary_from_stats_row_treats_missing_values_like_pandas():
+    summary = player_stats.summary_from_stats_row({
+        "participation_count": 1,
+        "avg_net": 72.0,
+        "best_net": 72.0,
+        "worst_net": 72.0,
+        "stddev_net": None,
+        "avg_gross": None,
+        "best_gross": None,
+        "win_count": 0,
+        "top3_count": 1,
+        "course_net_averages": {"B": 74.0, "A": 70.0},
+    })
+    # 1件のみの標準偏差やグロス未入力は、pandas と同じくNaN
+    assert math.isnan(summary.stddev_net) and math.isnan(summary.avg_gross)
+    assert list(summary.course_net_averages.index) == ["A", "B"]
+
+
+def test_triggers_keep_player_stats_in_sync(connection):
+    connection.execute("INSERT INTO players (id, name) VALUES (1, '山田'), (2, '佐藤')")
+    connection.execute(
+        "INSERT INTO competitions (id, name, date, course) VALUES (1, '第1回', '2024-05-01', 'A'), (2, '第2回', '2024-06-01', 'B')"
+    )
+    connection.execute(
+        """
+        INSERT INTO scores (competition_id, player_id, date, course, out_score, in_score, handicap, net_score, ranking)
+        VALUES (1, 1, '2024-05-01', 'A', 40, 42, 10, 72, 1),
+               (1, 2, '2024-05-01', 'A', 45, 44, 15, 74, 2),
+               (2, 1, '2024-06-01', 'B', 0, 41, 10, 70, 2)
+        """
+    )
+    connection.execute("UPDATE scores SET net_score = 69, ranking = 1 WHERE competition_id = 2 AND player_id = 1")
+    connection.execute("DELETE FROM scores WHERE player_id = 2")
+    connection.commit()
+
+    row = connection.execute(
+        "SELECT participation_count, avg_net, best_gross, win_count, course_net_averages FROM player_stats WHERE player_id = 1"
+    ).fetchone()
+    assert row[0] == 2 and float(row[1]) == pytest.approx(70.5)
+    assert row[2] == 82 and row[3] == 2
+    assert row[4] == {"A": 72, "B": 69}
+    # スコアが無くなったプレイヤーの行は削除される
+    assert connection.execute("SELECT count(*) FROM player_stats WHERE player_id = 2").fetchone()[0] == 0
+    assert manage_player_stats.check(connection) == []
+
+
+def test_check_reports_drift_and_backfill_repairs_it(connection):
+    connection.execute("INSERT INTO players (id, name) VALUES (1, '山田')")
+    connection.execute("INSERT INTO competitions (id, name, date, course) VALUES (1, '第1回', '2024-05-01', 'A')")
+    connection.execute(
+        "INSERT INTO scores (competition_id, player_id, date, course, out_score, in_score, net_score, ranking)"
+        " VALUES (1, 1, '2024-05-01', 'A', 40, 42, 72, 1)"
+    )
+    connection.execute("UPDATE player_stats SET win_count = 0")
+    connection.commit()
+
+    assert manage_player_stats.check(connection) == [(1, "mismatch", ["win_count"])]
+    assert manage_player_stats.backfill(connection) == 1
+    assert manage_player_stats.check(connection) == []
+
+
+def test_api_roles_cannot_call_refresh_but_their_writes_still_refresh(connection):
+    import psycopg
+
+    connection.execute("INSERT INTO players (id, name) VALUES (1, '山田')")
+    connection.execute("INSERT INTO competitions (id, name, date, course) VALUES (1, '第1回', '2024-05-01', 'A')")
+    # APIロール（anon など）と同じく、テーブルの参照と scores への書き込み権限だけを持つロール（ロールバックで破棄する）
+    role = f"test_api_{uuid.uuid4().hex[:8]}"
+    schema = connection.execute("SELECT current_schema()").fetchone()[0]
+    connection.execute(f'CREATE ROLE "{role}" NOLOGIN')
+    connection.execute(f'GRANT USAGE ON SCHEMA "{schema}" TO "{role}"')
+    connection.execute(f'GRANT SELECT ON ALL TABLES IN SCHEMA "{schema}" TO "{role}"')
+    connection.execute(f'GRANT INSERT ON scores TO "{role}"')
+    connection.execute(f'GRANT USAGE ON ALL SEQUENCES IN SCHEMA "{schema}" TO "{role}"')
+    try:
+        connection.execute(f'SET ROLE "{role}"')
+        connection.execute(
+            "INSERT INTO scores (competition_id, player_id, date, course, out_score, in_score, net_score, ranking)"
+            " VALUES (1, 1, '2024-05-01', 'A', 40, 42, 72, 1)"
+        )
+        connection.execute("RESET ROLE")
+        assert connection.execute("SELECT win_count FROM player_stats WHERE player_id = 1").fetchone() == (1,)
+
+        connection.execute(f'SET ROLE "{role}"')
+        with pytest.raises(psycopg.errors.InsufficientPrivilege):
+            connection.execute("SELECT refresh_player_stats(NULL)")
+    finally:
+        connection.rollback()
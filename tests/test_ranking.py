@@ -0,0 +1,116 @@
+import pytest
+from hypothesis import given, settings, strategies as st
+
+from conftest import APP_DIR, load_module, migrated_schema
+
+ranking = load_module("ranking", APP_DIR / "ranking.py")
+
+
+# 同スコアが出やすい値（numeric(…,2) の丸め境界を含む）と任意の値を混ぜる
+decimal_values = st.one_of(
+    st.none(),
+    st.sampled_from([70, 70.0, 70.004, 70.005, 70.01, 71.5, 10, 12.3]),
+    st.floats(min_value=0, max_value=150, allow_nan=False, allow_infinity=False),
+)
+half_scores = st.one_of(st.none(), st.integers(min_value=35, max_value=45))
+
+score_rows = st.lists(
+    st.fixed_dictionaries({
+        "net_score": decimal_values,
+        "handicap": decimal_values,
+        "out_score": half_scores,
+        "in_score": half_scores,
+    }),
+    max_size=12,
+).map(lambda rows: [{"player_id": index + 1, **row} for index, row in enumerate(rows)])
+
+tiebreaks = st.lists(st.sampled_from(ranking.RANKING_KEYS), min_size=1, max_size=4, unique=True)
+methods = st.sampled_from(ranking.RANKING_METHODS)
+
+
+def test_ties_share_a_rank():
+    rows = [
+        {"player_id": 1, "net_score": 72.0, "handicap": 10, "in_score": 40},
+        {"player_id": 2, "net_score": 70.0, "handicap": 12, "in_score": 41},
+        {"player_id": 3, "net_score": 72, "handicap": 10, "in_score": 39},
+        {"player_id": 4, "net_score": None, "handicap": 0, "in_score": 38},
+        {"player_id": 5, "net_score": 74.0, "handicap": 9, "in_score": 40},
+    ]
+    assert ranking.compute_rankings(rows, ["net_score", "handicap"], "competition") == {2: 1, 1: 2, 3: 2, 5: 4, 4: 5}
+    assert ranking.compute_rankings(rows, ["net_score", "handicap"], "dense") == {2: 1, 1: 2, 3: 2, 5: 3, 4: 4}
+    # バックナインのグロスで同スコアを分ける
+    assert ranking.compute_rankings(rows, ["net_score", "handicap", "in_score"], "competition") == {
+        2: 1, 3: 2, 1: 3, 5: 4, 4: 5,
+    }
+
+
+def test_invalid_rules_are_rejected():
+    with pytest.raises(ValueError):
+        ranking.compute_rankings([], ["net_score", "putts"], "competition")
+    with pytest.raises(ValueError):
+        ranking.compute_rankings([], ["net_score"], "ordinal")
+
+
+@given(score_rows, tiebreaks)
+def test_competition_rank_counts_strictly_better_rows(rows, tiebreak):
+    rankings = ranking.compute_rankings(rows, tiebreak, "competition")
+    keys = {row["player_id"]: ranking._sort_key(row, tiebreak) for row in rows}
+    for player_id, rank in rankings.items():
+        assert rank == 1 + sum(1 for other in keys.values() if other < keys[player_id])
+
+
+@given(score_rows, tiebreaks)
+def test_dense_rank_counts_distinct_better_keys(rows, tiebreak):
+    rankings = ranking.compute_rankings(rows, tiebreak, "dense")
+    keys = {row["player_id"]: ranking._sort_key(row, tiebreak) for row in rows}
+    for player_id, rank in rankings.items():
+        assert rank == 1 + len({other for other in keys.values() if other < keys[player_id]})
+
+
+@pytest.fixture(scope="module")
+def connection():
+    import psycopg
+
+    # hypothesis の多数の例で1つのスキーマを使い回すため、モジュール単位で作成する
+    with migrated_schema("test_ranking") as conninfo, psycopg.connect(conninfo) as connection:
+        connection.execute("INSERT INTO players (id, name) SELECT g, 'player ' || g FROM generate_series(1, 12) AS g")
+        connection.execute("INSERT INTO competitions (id, name, date, course) VALUES (1, '第1回', '2024-05-01', 'A')")
+        connection.commit()
+        yield connection
+
+
+def _text(value):
+    # アプリと同じく、JSONに書き出す表記のまま numeric に変換する
+    return None if value is None else str(value)
+
+
+@settings(max_examples=60, deadline=None)
+@given(rows=score_rows, tiebreak=tiebreaks, method=methods)
+def test_sql_rankings_match_python(connection, rows, tiebreak, method):
+    connection.execute("DELETE FROM scores WHERE competition_id = 1")
+    for row in rows:
+        connection.execute(
+            "INSERT INTO scores (competition_id, player_id, date, out_score, in_score, handicap, net_score)"
+            " VALUES (1, %s, '2024-05-01', %s, %s, %s::numeric, %s::numeric)",
+            (row["player_id"], row["out_score"], row["in_score"], _text(row["handicap"]), _text(row["net_score"])),
+        )
+    sql_rankings = dict(
+        connection.execute("SELECT player_id, ranking FROM competition_rankings(1, %s, %s)", (tiebreak, method)).fetchall()
+    )
+    connection.rollback()
+    assert sql_rankings == ranking.compute_rankings(rows, tiebreak, method)
+
+
+def test_rerank_competition_updates_only_shifted_rows(connection):
+    connection.execute(
+        """
+        INSERT INTO scores (competition_id, player_id, date, out_score, in_score, handicap, net_score, ranking)
+        VALUES (1, 1, '2024-05-01', 40, 42, 10, 72, 1),
+               (1, 2, '2024-05-01', 44, 38, 10, 72, 2),
+               (1, 3, '2024-05-01', 45, 45, 10, 80, 3)
+        """
+    )
+    assert connection.execute("SELECT rerank_competition(1, ARRAY['net_score', 'handicap'], 'competition')").fetchone()[0] == 1
+    assert connection.execute("SELECT rerank_competition(1, ARRAY['net_score', 'handicap', 'in_score'], 'competition')").fetchone()[0] == 1
+    assert connection.execute("SELECT player_id, ranking FROM scores ORDER BY player_id").fetchall() == [(1, 2), (2, 1), (3, 3)]
+    connection.rollback()
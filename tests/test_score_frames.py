@@ -0,0 +1,96 @@
+import random
+
+import pandas as pd
+import pytest
+
+from conftest import APP_DIR, load_module
+
+score_frames = load_module("score_frames", APP_DIR / "score_frames.py")
+
+build_scores_frame = score_frames.build_scores_frame
+
+
+def legacy_build_scores_frame(scores):
+    """行ごとのループによる従来の整形処理（比較用）"""
+    scores_list = []
+    for score in scores:
+        out_score_val = score.get("out_score")
+        out_score = int(out_score_val) if isinstance(out_score_val, (int, str)) and str(out_score_val).isdigit() else 0
+        in_score_val = score.get("in_score")
+        in_score = int(in_score_val) if isinstance(in_score_val, (int, str)) and str(in_score_val).isdigit() else 0
+        if "gross_score" in score:
+            total_score = score.get("gross_score")
+        elif out_score > 0 and in_score > 0:
+            total_score = out_score + in_score
+        else:
+            total_score = None
+        scores_list.append({
+            "競技ID": score.get("competition_id"),
+            "日付": score.get("date"),
+            "コース": score.get("course"),
+            "プレイヤー名": score.get("player_name") if score.get("player_name") is not None else "不明",
+            "アウトスコア": out_score,
+            "インスコア": in_score,
+            "合計スコア": total_score,
+            "ハンディキャップ": score.get("handicap"),
+            "ネットスコア": score.get("net_score"),
+            "順位": score.get("ranking"),
+        })
+    return pd.DataFrame(scores_list)
+
+
+def make_rows(count, seed, with_gross=True, half_values=None):
+    rng = random.Random(seed)
+    half_values = half_values or [None, 0, 38, 45, 52]
+    rows = []
+    for index in range(count):
+        out_score = rng.choice(half_values)
+        in_score = rng.choice(half_values)
+        row = {
+            "id": index + 1,
+            "competition_id": rng.randint(1, 60),
+            "player_id": rng.randint(1, 20),
+            "player_name": rng.choice(["山田", "佐藤", None]),
+            "date": f"20{rng.randint(10, 24)}-0{rng.randint(1, 9)}-15",
+            "course": rng.choice(["本千葉", "鎌ケ谷", None]),
+            "out_score": out_score,
+            "in_score": in_score,
+            "handicap": rng.choice([0, 12.5, 20.0, None]),
+            "net_score": rng.choice([70.5, 80.0, None]),
+            "ranking": rng.choice([1, 2, 3, None]),
+        }
+        if with_gross:
+            valid = isinstance(out_score, int) and isinstance(in_score, int) and out_score > 0 and in_score > 0
+            row["gross_score"] = out_score + in_score if valid else None
+        rows.append(row)
+    return rows
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("with_gross", [True, False])
+def test_matches_legacy_row_loop(seed, with_gross):
+    rows = make_rows(200, seed, with_gross=with_gross)
+    pd.testing.assert_frame_equal(build_scores_frame(rows), legacy_build_scores_frame(rows))
+
+
+def test_matches_legacy_for_mixed_half_score_types():
+    rows = make_rows(
+        100, seed=42, with_gross=False,
+        half_values=[None, 0, 45, "45", "-3", " 40", "4.5", "abc", -5, True],
+    )
+    pd.testing.assert_frame_equal(build_scores_frame(rows), legacy_build_scores_frame(rows))
+
+
+@pytest.mark.parametrize("half_values", [[45, 50], [None, 0]])
+def test_matches_legacy_when_all_rows_valid_or_invalid(half_values):
+    rows = make_rows(20, seed=7, with_gross=False, half_values=half_values)
+    pd.testing.assert_frame_equal(build_scores_frame(rows), legacy_build_scores_frame(rows))
+
+
+def test_accepts_dataframe_and_missing_columns():
+    rows = [{"competition_id": 1, "out_score": 40, "in_score": 41}]
+    result = build_scores_frame(pd.DataFrame(rows))
+    assert list(result.columns) == list(score_frames.SCORE_COLUMN_LABELS.values())
+    assert result.loc[0, "合計スコア"] == 81
+    assert result.loc[0, "プレイヤー名"] == "不明"
+    assert build_scores_frame([]).empty
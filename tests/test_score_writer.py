@@ -0,0 +1,296 @@
+from conftest import APP_DIR, load_module
+
+score_writer = load_module("score_writer", APP_DIR / "score_writer.py")
+
+
+def make_records():
+    scores_data = {
+        1: {"out_score": 40, "in_score": 42, "handicap": 10.0, "net_score": 72.0},
+        2: {"out_score": 45, "in_score": 44, "handicap": 15.2, "net_score": 73.8},
+        3: {"out_score": None, "in_score": 41, "handicap": 0, "net_score": 41},
+    }
+    return score_writer.build_score_records(7, scores_data, "2024-05-01", "A", {1: 1, 2: 2, 3: 3})
+
+
+def test_build_score_records_skips_incomplete_scores():
+    records = make_records()
+    assert [record["player_id"] for record in records] == [1, 2]
+    assert records[1] == {
+        "competition_id": 7,
+        "player_id": 2,
+        "date": "2024-05-01",
+        "course": "A",
+        "out_score": 45,
+        "in_score": 44,
+        "handicap": 15.2,
+        "net_score": 73.8,
+        "hole_scores": None,
+        "ranking": 2,
+    }
+
+
+def test_diff_score_records_returns_only_changed_and_removed_rows():
+    existing = [
+        # numeric は文字列・小数桁の違いがあっても同じ値として扱う
+        {"player_id": 1, "date": "2024-05-01", "course": "A", "out_score": 40, "in_score": 42,
+         "handicap": "10.00", "net_score": 72, "ranking": 1},
+        {"player_id": 2, "date": "2024-05-01", "course": "A", "out_score": 46, "in_score": 44,
+         "handicap": 15.2, "net_score": 74.8, "ranking": 2},
+        {"player_id": 9, "date": "2024-05-01", "course": "A", "out_score": 50, "in_score": 50,
+         "handicap": 0, "net_score": 100, "ranking": 3},
+    ]
+    changed, removed, unchanged = score_writer.diff_score_records(make_records(), existing)
+    assert [record["player_id"] for record in changed] == [2]
+    assert removed == [9]
+    assert unchanged == 1
+
+
+def test_diff_against_baseline_includes_rows_whose_ranking_shifted():
+    stored = [
+        {"player_id": 1, "date": "2024-05-01", "course": "A", "out_score": 40, "in_score": 42,
+         "handicap": 10.0, "net_score": 72.0, "ranking": 1},
+        {"player_id": 2, "date": "2024-05-01", "course": "A", "out_score": 45, "in_score": 44,
+         "handicap": 15.2, "net_score": 73.8, "ranking": 2},
+        {"player_id": 3, "date": "2024-05-01", "course": "A", "out_score": 45, "in_score": 45,
+         "handicap": 10.0, "net_score": 80.0, "ranking": float("nan")},
+    ]
+    baseline = score_writer.score_baseline(stored)
+    # プレイヤー2のINスコアだけを修正し、1位と2位が入れ替わる
+    scores_data = {
+        1: {"out_score": 40, "in_score": 42, "handicap": 10.0, "net_score": 72.0},
+        2: {"out_score": 45, "in_score": 40, "handicap": 15.2, "net_score": 69.8},
+        3: {"out_score": 45, "in_score": 45, "handicap": 10.0, "net_score": 80.0},
+    }
+    records = score_writer.build_score_records(7, scores_data, "2024-05-01", "A", {2: 1, 1: 2, 3: 3})
+
+    changed, removed, unchanged = score_writer.diff_score_records(records, baseline.values())
+    assert sorted(record["player_id"] for record in changed) == [1, 2, 3]
+    assert removed == [] and unchanged == 0
+
+    records[2]["ranking"] = None
+    changed, _, unchanged = score_writer.diff_score_records(records, baseline.values())
+    assert sorted(record["player_id"] for record in changed) == [1, 2] and unchanged == 1
+
+
+class MissingFunctionError(Exception):
+    code = "PGRST202"
+
+
+class FakeQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+
+    def upsert(self, rows, on_conflict=None):
+        self.client.calls.append(("upsert", self.table, [row["player_id"] for row in rows], on_conflict))
+        return self
+
+    def delete(self):
+        self.client.calls.append(("delete", self.table))
+        return self
+
+    def eq(self, column, value):
+        return self
+
+    def in_(self, column, values):
+        self.client.calls.append(("in", column, list(values)))
+        return self
+
+    def execute(self):
+        return None
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def execute(self):
+        return self
+
+
+class FakeClient:
+    def __init__(self, has_function=False):
+        self.calls = []
+        self.has_function = has_function
+
+    def rpc(self, name, params):
+        if not self.has_function:
+            raise MissingFunctionError(name)
+        self.calls.append(("rpc", name, params))
+        return FakeResponse({"upserted": len(params["p_scores"]), "deleted": len(params.get("p_deleted_player_ids") or [])})
+
+    def table(self, table):
+        return FakeQuery(self, table)
+
+
+def test_save_falls_back_to_client_diff_without_rpc(monkeypatch):
+    paginated_reader = load_module("paginated_reader", APP_DIR / "paginated_reader.py")
+    existing = [
+        {"player_id": 1, "date": "2024-05-01", "course": "A", "out_score": 40, "in_score": 42,
+         "handicap": 10, "net_score": 72, "ranking": 1},
+        {"player_id": 9, "date": "2024-05-01", "course": "A", "out_score": 50, "in_score": 50,
+         "handicap": 0, "net_score": 100, "ranking": 2},
+    ]
+    monkeypatch.setattr(paginated_reader, "fetch_all_rows", lambda *args, **kwargs: existing)
+
+    client = FakeClient()
+    result = score_writer.save_competition_scores(client, 7, make_records())
+
+    assert client.calls == [
+        ("upsert", "scores", [2], "competition_id,player_id"),
+        ("delete", "scores"),
+        ("in", "player_id", [9]),
+    ]
+    assert (result.upserted, result.deleted, result.unchanged, result.touched) == (1, 1, 1, 2)
+
+
+def test_save_with_baseline_sends_only_changes_without_reading():
+    baseline = score_writer.score_baseline([
+        {"player_id": 1, "date": "2024-05-01", "course": "A", "out_score": 40, "in_score": 42,
+         "handicap": 10, "net_score": 72, "ranking": 1},
+        {"player_id": 9, "date": "2024-05-01", "course": "A", "out_score": 50, "in_score": 50,
+         "handicap": 0, "net_score": 100, "ranking": 2},
+    ])
+    client = FakeClient(has_function=True)
+    result = score_writer.save_competition_scores(client, 7, make_records(), baseline=baseline)
+
+    [(kind, name, params)] = client.calls
+    assert (kind, name) == ("rpc", "save_competition_scores")
+    assert [row["player_id"] for row in params["p_scores"]] == [2]
+    assert params["p_deleted_player_ids"] == [9]
+    assert (result.upserted, result.deleted, result.unchanged) == (1, 1, 1)
+
+    # 変更が無ければ書き込みのリクエストを送らない
+    client = FakeClient(has_function=True)
+    unchanged_baseline = score_writer.score_baseline(make_records())
+    result = score_writer.save_competition_scores(client, 7, make_records(), baseline=unchanged_baseline)
+    assert client.calls == [] and result.touched == 0 and result.unchanged == 2
+
+
+class VersionedClient:
+    def __init__(self, conflicts=()):
+        self.calls = []
+        self.conflicts = list(conflicts)
+
+    def rpc(self, name, params):
+        self.calls.append((name, params))
+        if self.conflicts:
+            return FakeResponse({"upserted": 0, "deleted": 0, "reranked": 0, "conflicts": self.conflicts})
+        return FakeResponse({"upserted": len(params["p_scores"]), "deleted": len(params["p_deleted"]), "reranked": 2, "conflicts": []})
+
+
+def test_save_with_versions_sends_edited_rows_and_reports_conflicts():
+    stored = [
+        {"player_id": 1, "date": "2024-05-01", "course": "A", "out_score": 40, "in_score": 42,
+         "handicap": 10, "net_score": 72, "ranking": 2, "version": 3},
+        {"player_id": 2, "date": "2024-05-01", "course": "A", "out_score": 46, "in_score": 44,
+         "handicap": 15.2, "net_score": 74.8, "ranking": 1, "version": 1},
+        {"player_id": 9, "date": "2024-05-01", "course": "A", "out_score": 50, "in_score": 50,
+         "handicap": 0, "net_score": 100, "ranking": 3, "version": 5},
+    ]
+    baseline = score_writer.score_baseline(stored)
+
+    client = VersionedClient()
+    result = score_writer.save_competition_scores(client, 7, make_records(), baseline=baseline)
+
+    [(name, params)] = client.calls
+    assert name == "save_score_changes_checked"
+    # 順位だけが変わった行（プレイヤー1）は送らず、順位はサーバー側で付け直す
+    assert [(row["player_id"], row["version"]) for row in params["p_scores"]] == [(2, 1)]
+    assert params["p_deleted"] == [{"player_id": 9, "version": 5}]
+    assert (result.upserted, result.deleted, result.unchanged, result.conflicts) == (1, 1, 1, [])
+
+    theirs = {**stored[1], "out_score": 47, "net_score": 75.8, "version": 2}
+    client = VersionedClient(conflicts=[{"player_id": 2, "current": theirs}, {"player_id": 9, "current": None}])
+    result = score_writer.save_competition_scores(client, 7, make_records(), baseline=baseline)
+
+    assert result.touched == 0
+    assert [(conflict.player_id, conflict.mine and conflict.mine["out_score"], conflict.theirs) for conflict in result.conflicts] == [
+        (2, 45, theirs),
+        (9, None, None),
+    ]
+
+    # 相手の保存を確認した後は、そのバージョンに対する変更として再保存する
+    resolved = score_writer.resolve_conflicts(baseline, result.conflicts)
+    assert sorted(resolved) == [1, 2]
+    assert (resolved[2]["out_score"], resolved[2]["version"]) == (47, 2)
+    client = VersionedClient()
+    score_writer.save_competition_scores(client, 7, make_records(), baseline=resolved)
+    [(_, params)] = client.calls
+    assert [(row["player_id"], row["version"]) for row in params["p_scores"]] == [(2, 2)]
+    assert params["p_deleted"] == []
+
+
+def test_save_competition_scores_function_writes_only_changes(connection):
+    from psycopg.types.json import Jsonb
+
+    connection.execute("INSERT INTO players (id, name) VALUES (1, '山田'), (2, '佐藤'), (9, '鈴木')")
+    connection.execute("INSERT INTO competitions (id, name, date, course) VALUES (7, '第1回', '2024-05-01', 'A')")
+    connection.execute(
+        "INSERT INTO scores (competition_id, player_id, date, course, out_score, in_score, handicap, net_score, ranking)"
+        " VALUES (7, 1, '2024-05-01', 'A', 40, 42, 10, 72, 1), (7, 9, '2024-05-01', 'A', 50, 50, 0, 100, 2)"
+    )
+    connection.commit()
+    before = connection.execute("SELECT updated_at FROM scores WHERE player_id = 1").fetchone()[0]
+
+    payload = score_writer._rpc_payload(make_records())
+    counts = connection.execute("SELECT save_competition_scores(7, %s)", (Jsonb(payload),)).fetchone()[0]
+    connection.commit()
+
+    assert counts == {"upserted": 1, "deleted": 1}
+    assert connection.execute("SELECT player_id FROM scores ORDER BY player_id").fetchall() == [(1,), (2,)]
+    # 変更のない行は更新されない
+    assert connection.execute("SELECT updated_at FROM scores WHERE player_id = 1").fetchone()[0] == before
+
+    counts = connection.execute("SELECT save_competition_scores(7, %s)", (Jsonb(payload),)).fetchone()[0]
+    assert counts == {"upserted": 0, "deleted": 0}
+
+    # 差分のみ送る場合は、指定したプレイヤーの行だけを削除する
+    counts = connection.execute(
+        "SELECT save_competition_scores(7, %s, %s)", (Jsonb(payload[1:]), [1])
+    ).fetchone()[0]
+    assert counts == {"upserted": 0, "deleted": 1}
+    assert connection.execute("SELECT player_id FROM scores ORDER BY player_id").fetchall() == [(2,)]
+
+
+def test_save_score_changes_checked_rejects_stale_versions(connection):
+    from psycopg.types.json import Jsonb
+
+    connection.execute("INSERT INTO players (id, name) VALUES (1, '山田'), (2, '佐藤'), (9, '鈴木')")
+    connection.execute("INSERT INTO competitions (id, name, date, course) VALUES (7, '第1回', '2024-05-01', 'A')")
+    connection.execute(
+        "INSERT INTO scores (competition_id, player_id, date, course, out_score, in_score, handicap, net_score, ranking)"
+        " VALUES (7, 1, '2024-05-01', 'A', 40, 42, 10, 72, 1), (7, 9, '2024-05-01', 'A', 50, 50, 0, 100, 2)"
+    )
+    # 順位だけの更新ではバージョンは変わらない
+    connection.execute("UPDATE scores SET ranking = ranking + 10")
+    assert connection.execute("SELECT player_id, version FROM scores ORDER BY player_id").fetchall() == [(1, 1), (9, 1)]
+
+    # 他の管理者がプレイヤー1を修正した
+    connection.execute("UPDATE scores SET out_score = 39, net_score = 71 WHERE player_id = 1")
+
+    mine = [{**row, "version": 1 if row["player_id"] == 1 else None} for row in score_writer._rpc_payload(make_records())]
+    deleted = [{"player_id": 9, "version": 1}]
+    counts = connection.execute(
+        "SELECT save_score_changes_checked(7, %s, %s)", (Jsonb(mine), Jsonb(deleted))
+    ).fetchone()[0]
+    assert counts["upserted"] == 0 and [conflict["player_id"] for conflict in counts["conflicts"]] == [1]
+    assert counts["conflicts"][0]["current"]["out_score"] == 39
+    assert counts["conflicts"][0]["current"]["version"] == 2
+    # 競合があれば何も書き込まない
+    assert connection.execute("SELECT player_id FROM scores ORDER BY player_id").fetchall() == [(1,), (9,)]
+
+    mine[0]["version"] = 2
+    counts = connection.execute(
+        "SELECT save_score_changes_checked(7, %s, %s)", (Jsonb(mine), Jsonb(deleted))
+    ).fetchone()[0]
+    assert counts == {"upserted": 2, "deleted": 1, "reranked": 2, "conflicts": []}
+    assert connection.execute(
+        "SELECT player_id, out_score, ranking, version FROM scores ORDER BY player_id"
+    ).fetchall() == [(1, 40, 1, 3), (2, 45, 2, 1)]
+
+    # 相手が同じ値に修正していた場合は競合にしない
+    connection.execute("UPDATE scores SET handicap = 16, net_score = 73 WHERE player_id = 2")
+    same = [{**mine[1], "handicap": 16, "net_score": 73, "version": 1}]
+    counts = connection.execute("SELECT save_score_changes_checked(7, %s)", (Jsonb(same),)).fetchone()[0]
+    assert counts["conflicts"] == [] and counts["upserted"] == 0
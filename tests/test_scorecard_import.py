@@ -0,0 +1,167 @@
+import io
+
+import pandas as pd
+import pytest
+
+from conftest import APP_DIR, load_module
+
+scorecard_import = load_module("scorecard_import", APP_DIR / "scorecard_import.py")
+score_writer = load_module("score_writer", APP_DIR / "score_writer.py")
+
+
+PLAYERS = pd.DataFrame({"id": [1, 2, 3, 4], "name": ["山田 太郎", "佐藤", "鈴木", "鈴木"]})
+COMPETITIONS = pd.DataFrame({"competition_id": [10, 11], "date": ["2024-05-01", "2024-06-01"], "course": ["A", "B"]})
+
+SCORECARD = "\n".join([
+    "競技ID,プレイヤー名,OUT,IN,ハンディキャップ",
+    "10,山田　太郎,40,42,10.5",  # 2行目：全角スペースの違いは無視して照合
+    "10,佐藤,45,44,",  # 3行目：ハンディ未入力は0
+    ",,,,",  # 4行目：空行は読み飛ばす
+    "11,鈴木,40,40,5",  # 5行目：同名が2人
+    "12,佐藤,40,40,5",  # 6行目：未登録のコンペ
+    "11,田中,x,101,60",  # 7行目
+    "11,佐藤,20,20,45",  # 8行目：ネットがマイナス・グロスが低すぎる
+    "11,山田太郎,30,25,0",  # 9行目：警告のみ
+]) + "\n"
+
+
+def issues_by_row(result):
+    return {
+        row: sorted(zip(group["列"], group["区分"]))
+        for row, group in result.issues.groupby("行")
+    }
+
+
+@pytest.mark.parametrize("encoding", ["utf-8-sig", "cp932"])
+def test_read_scorecard_validates_csv_in_chunks(encoding):
+    source = io.BytesIO(SCORECARD.encode(encoding))
+    result = scorecard_import.read_scorecard(source, "scores.csv", PLAYERS, COMPETITIONS, chunksize=3)
+
+    assert result.rows == 8
+    assert result.records == [
+        {"competition_id": 10, "player_id": 1, "date": "2024-05-01", "course": "A",
+         "out_score": 40, "in_score": 42, "handicap": 10.5, "net_score": 71.5},
+        {"competition_id": 10, "player_id": 2, "date": "2024-05-01", "course": "A",
+         "out_score": 45, "in_score": 44, "handicap": 0.0, "net_score": 89.0},
+        {"competition_id": 11, "player_id": 1, "date": "2024-06-01", "course": "B",
+         "out_score": 30, "in_score": 25, "handicap": 0.0, "net_score": 55.0},
+    ]
+    assert issues_by_row(result) == {
+        5: [("プレイヤー", "エラー")],
+        6: [("競技ID", "エラー")],
+        7: [("IN", "エラー"), ("OUT", "エラー"), ("ハンディキャップ", "エラー"), ("プレイヤー", "エラー")],
+        8: [("グロス", "警告"), ("ネット", "エラー")],
+    }
+    assert result.competition_ids == [10, 11]
+
+
+def test_read_scorecard_streams_xlsx_and_rejects_duplicates():
+    from openpyxl import Workbook
+
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["competition_id", "player_id", "out_score", "in_score", "HC"])
+    for row in ([10, 1, 40, 42, 10], [10, 2, 45, 44, 5.5], [11, 2, 41, 41, 5.5], [10, 1, 39, 42, 10], [10, 9, 40, 40, 0]):
+        sheet.append(row)
+    source = io.BytesIO()
+    workbook.save(source)
+    source.seek(0)
+
+    result = scorecard_import.read_scorecard(source, "scores.xlsx", PLAYERS, COMPETITIONS, chunksize=2)
+
+    assert [(record["competition_id"], record["player_id"]) for record in result.records] == [(10, 2), (11, 2)]
+    assert result.records[0]["net_score"] == 83.5
+    assert issues_by_row(result) == {2: [("プレイヤー", "エラー")], 5: [("プレイヤー", "エラー")], 6: [("プレイヤー", "エラー")]}
+
+
+def test_read_scorecard_rejects_unknown_format_and_missing_columns():
+    with pytest.raises(scorecard_import.ScorecardFormatError):
+        scorecard_import.read_scorecard(io.BytesIO(b""), "scores.txt", PLAYERS, COMPETITIONS)
+    with pytest.raises(scorecard_import.ScorecardFormatError, match="OUT"):
+        scorecard_import.read_scorecard(io.BytesIO("競技ID,名前,IN\n10,佐藤,40\n".encode()), "scores.csv", PLAYERS, COMPETITIONS)
+
+    template = scorecard_import.scorecard_template()
+    empty = scorecard_import.read_scorecard(io.BytesIO(template), "template.csv", PLAYERS, COMPETITIONS)
+    assert (empty.rows, empty.records, len(empty.issues)) == (0, [], 0)
+
+
+class MissingFunctionError(Exception):
+    code = "PGRST202"
+
+
+class FakeQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+
+    def upsert(self, rows, on_conflict=None):
+        self.client.upserts.append((rows, on_conflict))
+        return self
+
+    def execute(self):
+        return None
+
+
+class FakeClient:
+    def __init__(self):
+        self.upserts = []
+
+    def rpc(self, name, params):
+        raise MissingFunctionError(name)
+
+    def table(self, table):
+        return FakeQuery(self, table)
+
+
+def test_import_without_rpc_ranks_with_existing_rows_in_one_upsert(monkeypatch):
+    paginated_reader = load_module("paginated_reader", APP_DIR / "paginated_reader.py")
+    existing = [
+        {"competition_id": 10, "player_id": 3, "date": "2024-05-01", "course": "A", "out_score": 40, "in_score": 40,
+         "handicap": 10, "net_score": 70, "ranking": 1},
+        {"competition_id": 10, "player_id": 1, "date": "2024-05-01", "course": "A", "out_score": 40, "in_score": 42,
+         "handicap": 10.5, "net_score": 71.5, "ranking": 2},
+    ]
+    monkeypatch.setattr(paginated_reader, "fetch_all_rows", lambda *args, **kwargs: existing)
+    records = scorecard_import.read_scorecard(
+        io.BytesIO(SCORECARD.encode()), "scores.csv", PLAYERS, COMPETITIONS
+    ).records
+
+    client = FakeClient()
+    result = score_writer.import_score_records(client, records, ["net_score", "handicap"], "competition")
+
+    [(rows, on_conflict)] = client.upserts
+    assert on_conflict == "competition_id,player_id"
+    # 変更のない既存行（プレイヤー1のコンペ10）は送らない
+    assert sorted((row["competition_id"], row["player_id"], row["ranking"]) for row in rows) == [(10, 2, 3), (11, 1, 1)]
+    assert (result.upserted, result.reranked, result.competitions) == (2, 2, 2)
+
+
+def test_import_scores_function_upserts_and_reranks(connection):
+    from psycopg.types.json import Jsonb
+
+    connection.execute("INSERT INTO players (id, name) VALUES (1, '山田'), (2, '佐藤'), (3, '鈴木')")
+    connection.execute(
+        "INSERT INTO competitions (id, name, date, course) VALUES (10, '第1回', '2024-05-01', 'A'), (11, '第2回', '2024-06-01', 'B')"
+    )
+    connection.execute(
+        "INSERT INTO scores (competition_id, player_id, date, course, out_score, in_score, handicap, net_score, ranking)"
+        " VALUES (10, 3, '2024-05-01', 'A', 40, 40, 10, 70, 1)"
+    )
+    records = [
+        {"competition_id": 10, "player_id": 1, "date": "2024-05-01", "course": "A",
+         "out_score": 38, "in_score": 40, "handicap": 12.5, "net_score": 65.5},
+        {"competition_id": 10, "player_id": 2, "date": "2024-05-01", "course": "A",
+         "out_score": 45, "in_score": 44, "handicap": 0, "net_score": 89},
+        {"competition_id": 11, "player_id": 1, "date": "2024-06-01", "course": "B",
+         "out_score": 40, "in_score": 40, "handicap": 12.5, "net_score": 67.5},
+    ]
+
+    counts = connection.execute("SELECT import_scores(%s)", (Jsonb(records),)).fetchone()[0]
+    assert counts == {"upserted": 3, "reranked": 4, "competitions": 2}
+    # 取り込みに含まれない既存の行は残し、順位だけを付け直す
+    assert connection.execute(
+        "SELECT competition_id, player_id, ranking FROM scores ORDER BY competition_id, ranking"
+    ).fetchall() == [(10, 1, 1), (10, 3, 2), (10, 2, 3), (11, 1, 1)]
+
+    counts = connection.execute("SELECT import_scores(%s)", (Jsonb(records),)).fetchone()[0]
+    assert counts == {"upserted": 0, "reranked": 0, "competitions": 2}
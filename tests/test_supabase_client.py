@@ -0,0 +1,31 @@
+from conftest import APP_DIR, load_module
+
+supabase_client = load_module("supabase_client", APP_DIR / "supabase_client.py")
+
+HealthProbe = supabase_client.HealthProbe
+
+
+def test_health_probe_backs_off_exponentially_and_recovers():
+    outcomes = [False, False, False, False, True]
+
+    def check():
+        if not outcomes.pop(0):
+            raise ConnectionError("unreachable")
+
+    probe = HealthProbe(check, interval=30, initial_backoff=1, max_backoff=5)
+    assert probe.healthy is None
+    waits = [probe.run_once() for _ in range(5)]
+    assert waits == [1, 2, 4, 5, 30]
+    assert probe.healthy is True
+    assert probe.consecutive_failures == 0
+    assert probe.last_error is None
+
+
+def test_health_probe_records_last_error():
+    def check():
+        raise ConnectionError("timeout")
+
+    probe = HealthProbe(check)
+    probe.run_once()
+    assert probe.healthy is False
+    assert probe.last_error == "timeout"